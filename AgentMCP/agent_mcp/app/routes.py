@@ -5,6 +5,9 @@ import datetime
 import sqlite3
 from typing import List, Dict, Any, Optional  # Added List, Dict, Any, Optional
 
+import anyio
+import anyio.to_thread
+
 from starlette.routing import Route
 from starlette.responses import (
     JSONResponse,
@@ -19,13 +22,22 @@ from ..core.config import logger
 from ..core import globals as g
 from ..core.auth import verify_token, get_agent_id as auth_get_agent_id
 from ..utils.json_utils import get_sanitized_json_body
-from ..db.connection import get_db_connection
+from ..db.connection import get_db_connection, get_db_pool_stats
+from ..db.actions.task_db import TASK_SELECT_COLUMNS, add_task_note
+from ..db.write_queue import get_write_queue
 from ..db.actions.agent_actions_db import log_agent_action_to_db
 
 from ..features.dashboard.api import fetch_graph_data_logic, fetch_task_tree_data_logic
 
 # Adicionar importação para métricas de sistema
 from ..features.dashboard.system_metrics import get_system_metrics
+from ..features.rag.query_cache import get_rag_cache_stats
+from AgentMCP.genesys_integration.backend_router import DECISION_HISTORY
+from AgentMCP.genesys_integration.inference_scheduler import (
+    InferenceQueueFullError,
+    parse_priority,
+)
+from AgentMCP.genesys_integration.chat_format import ContextWindowExceededError
 
 # Adicionar importação para o gerenciador de serviços
 from ..features.dashboard.service_manager import (
@@ -49,7 +61,6 @@ from ..features.service_manager import (
 
 import uuid
 import time
-import asyncio # Adicionado para o gerador de streaming
 
 
 # --- Funções de Rota da API ---
@@ -70,6 +81,42 @@ async def system_metrics_api_route(request: Request) -> JSONResponse:
         )
 
 
+async def rag_cache_stats_api_route(request: Request) -> JSONResponse:
+    """Endpoint com os contadores de acerto/falha dos caches de consulta RAG."""
+    if request.method == "OPTIONS":
+        return await handle_options(request)
+
+    return JSONResponse(get_rag_cache_stats())
+
+
+async def db_pool_stats_api_route(request: Request) -> JSONResponse:
+    """Endpoint com as métricas do pool de conexões SQLite e da fila de escrita."""
+    if request.method == "OPTIONS":
+        return await handle_options(request)
+
+    return JSONResponse(
+        {"pool": get_db_pool_stats(), "write_queue": get_write_queue().get_stats()}
+    )
+
+
+async def genesys_router_report_api_route(request: Request) -> JSONResponse:
+    """Endpoint com a acurácia do roteamento local/Gemini do agente Genesys."""
+    if request.method == "OPTIONS":
+        return await handle_options(request)
+    if g.genesys_agent_instance is None:
+        return JSONResponse({"error": "Agente Genesys não inicializado."}, status_code=503)
+
+    try:
+        recent = int(request.query_params.get("recent", 20))
+    except ValueError:
+        return JSONResponse(
+            {"error": "O parâmetro recent deve ser um inteiro."}, status_code=400
+        )
+    # O roteador só guarda as últimas DECISION_HISTORY decisões
+    recent = max(1, min(recent, DECISION_HISTORY))
+    return JSONResponse(g.genesys_agent_instance.router.get_report(recent=recent))
+
+
 async def service_status_api_route(request: Request) -> JSONResponse:
     """Endpoint para obter o status dos serviços."""
     if request.method == "OPTIONS":
@@ -333,7 +380,8 @@ async def node_details_api_route(request: Request) -> JSONResponse:
             details["related"]["assigned_tasks"] = [dict(r) for r in cursor.fetchall()]
         elif node_type_from_id == "task":
             cursor.execute(
-                "SELECT * FROM tasks WHERE task_id = ?", (actual_id_from_node,)
+                f"SELECT {TASK_SELECT_COLUMNS} FROM tasks WHERE task_id = ?",
+                (actual_id_from_node,),
             )
             row = cursor.fetchone()
             if row:
@@ -445,7 +493,9 @@ async def all_tasks_api_route(request: Request) -> JSONResponse:
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tasks ORDER BY created_at DESC")
+        cursor.execute(
+            f"SELECT {TASK_SELECT_COLUMNS} FROM tasks ORDER BY created_at DESC"
+        )
         tasks_data = [dict(row) for row in cursor.fetchall()]
         return JSONResponse(tasks_data)
     except Exception as e:
@@ -478,19 +528,20 @@ async def update_task_details_api_route(request: Request) -> JSONResponse:
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT notes FROM tasks WHERE task_id = ?", (task_id_to_update,)
+            "SELECT task_id FROM tasks WHERE task_id = ?", (task_id_to_update,)
         )
         task_row = cursor.fetchone()
         if not task_row:
             return JSONResponse({"error": "Task not found"}, status_code=404)
-        existing_notes_str = task_row["notes"]
+        updated_at = datetime.datetime.now().isoformat()
+        new_note_entry = None
         update_fields: List[str] = []
         params: List[Any] = []
         log_details: Dict[str, Any] = {"status_updated_to": new_status}
         update_fields.append("status = ?")
         params.append(new_status)
         update_fields.append("updated_at = ?")
-        params.append(datetime.datetime.now().isoformat())
+        params.append(updated_at)
         if "title" in data and data["title"] is not None:
             update_fields.append("title = ?")
             params.append(data["title"])
@@ -509,18 +560,13 @@ async def update_task_details_api_route(request: Request) -> JSONResponse:
             and isinstance(data["notes"], str)
             and data["notes"].strip()
         ):
-            try:
-                current_notes_list = json.loads(existing_notes_str or "[]")
-            except json.JSONDecodeError:
-                current_notes_list = []
-            new_note_entry = {
-                "timestamp": datetime.datetime.now().isoformat(),
-                "author": requesting_admin_id,
-                "content": data["notes"].strip(),
-            }
-            current_notes_list.append(new_note_entry)
-            update_fields.append("notes = ?")
-            params.append(json.dumps(current_notes_list))
+            new_note_entry = add_task_note(
+                cursor,
+                task_id_to_update,
+                requesting_admin_id,
+                data["notes"].strip(),
+                updated_at,
+            )
             log_details["notes_added"] = True
         params.append(task_id_to_update)
         if update_fields:
@@ -536,22 +582,17 @@ async def update_task_details_api_route(request: Request) -> JSONResponse:
         )
         conn.commit()
         if task_id_to_update in g.tasks:
-            cursor.execute(
-                "SELECT * FROM tasks WHERE task_id = ?", (task_id_to_update,)
-            )
-            updated_task_for_cache = cursor.fetchone()
-            if updated_task_for_cache:
-                g.tasks[task_id_to_update] = dict(updated_task_for_cache)
-                for field_key in ["child_tasks", "depends_on_tasks", "notes"]:
-                    if isinstance(g.tasks[task_id_to_update].get(field_key), str):
-                        try:
-                            g.tasks[task_id_to_update][field_key] = json.loads(
-                                g.tasks[task_id_to_update][field_key] or "[]"
-                            )
-                        except json.JSONDecodeError:
-                            g.tasks[task_id_to_update][field_key] = []
-            else:
-                del g.tasks[task_id_to_update]
+            cached_task = g.tasks[task_id_to_update]
+            cached_task["status"] = new_status
+            cached_task["updated_at"] = updated_at
+            if "title" in data and data["title"] is not None:
+                cached_task["title"] = data["title"]
+            if "description" in data and data["description"] is not None:
+                cached_task["description"] = data["description"]
+            if "priority" in data and data["priority"]:
+                cached_task["priority"] = data["priority"]
+            if new_note_entry:
+                cached_task.setdefault("notes", []).append(new_note_entry)
         return JSONResponse(
             {"success": True, "message": "Task updated successfully via dashboard."}
         )
@@ -765,7 +806,9 @@ async def all_data_api_route(request: Request) -> JSONResponse:
         )
 
         # Get all tasks
-        cursor.execute("SELECT * FROM tasks ORDER BY created_at DESC")
+        cursor.execute(
+            f"SELECT {TASK_SELECT_COLUMNS} FROM tasks ORDER BY created_at DESC"
+        )
         tasks_data = [dict(row) for row in cursor.fetchall()]
 
         # Get all context entries
@@ -992,9 +1035,27 @@ async def models_endpoint(request: Request) -> JSONResponse:
     return JSONResponse(model_data)
 
 
+def _context_length_exceeded_response(
+    error: ContextWindowExceededError,
+) -> JSONResponse:
+    """OpenAI-style 400 for prompts that do not fit the model context window."""
+    return JSONResponse(
+        status_code=400,
+        content={
+            "error": {
+                "message": str(error),
+                "type": "invalid_request_error",
+                "code": "context_length_exceeded",
+            }
+        },
+    )
+
+
 async def chat_completions_endpoint(request: Request) -> Response:
     """
     OpenAI-compatible endpoint for chat completions.
+    Renders the full messages list with the model's chat template, fits it into
+    the context window and reports tokenizer-based usage.
     Supports both standard and streaming responses.
     """
     if g.genesys_agent_instance is None or not g.genesys_agent_instance.is_loaded:
@@ -1011,6 +1072,11 @@ async def chat_completions_endpoint(request: Request) -> Response:
         model_name = body.get("model", "genesys-local")
         messages = body.get("messages", [])
         stream = body.get("stream", False)
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        temperature = body.get("temperature")
+        stop = body.get("stop")
+        if isinstance(stop, str):
+            stop = [stop]
 
         if not messages:
             return JSONResponse(
@@ -1018,11 +1084,32 @@ async def chat_completions_endpoint(request: Request) -> Response:
                 content={"error": "The 'messages' list cannot be empty."},
             )
 
-        last_message = messages[-1].get("content", "")
+        # Identidade e prioridade usadas pela fila justa do modelo local
+        client_id = body.get("user") or (
+            request.client.host if request.client else "anonymous"
+        )
+        priority = parse_priority(
+            request.headers.get("x-priority", body.get("priority", "normal"))
+        )
+        agent = g.genesys_agent_instance
 
         if not stream:
-            # Comportamento original: resposta única e completa
-            response_text = await g.genesys_agent_instance.process_task(last_message)
+            try:
+                completion = await agent.complete_chat(
+                    messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=stop,
+                    client_id=client_id,
+                    priority=priority,
+                    cache=body.get("cache"),
+                )
+            except ContextWindowExceededError as e:
+                return _context_length_exceeded_response(e)
+            if completion["dropped_messages"] or completion["truncated"]:
+                logger.info(
+                    f"Chat completion trimmed to fit context: dropped {completion['dropped_messages']} messages, truncated={completion['truncated']}"
+                )
             return JSONResponse(
                 {
                     "id": f"chatcmpl-{uuid.uuid4()}",
@@ -1032,32 +1119,46 @@ async def chat_completions_endpoint(request: Request) -> Response:
                     "choices": [
                         {
                             "index": 0,
-                            "message": {"role": "assistant", "content": response_text},
-                            "finish_reason": "stop",
+                            "message": {
+                                "role": "assistant",
+                                "content": completion["content"],
+                            },
+                            "finish_reason": completion["finish_reason"],
                         }
                     ],
-                    "usage": {
-                        "prompt_tokens": len(last_message.split()),
-                        "completion_tokens": len(response_text.split()),
-                        "total_tokens": len(last_message.split())
-                        + len(response_text.split()),
-                    },
+                    "usage": completion["usage"],
                 }
             )
         else:
+            try:
+                # Tokenizar um histórico longo é CPU pura: fora do event loop
+                rendered = await anyio.to_thread.run_sync(
+                    agent.prepare_chat, messages, max_tokens
+                )
+            except ContextWindowExceededError as e:
+                return _context_length_exceeded_response(e)
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
             # Novo comportamento: resposta via streaming
             async def stream_generator():
                 completion_id = f"chatcmpl-{uuid.uuid4()}"
                 created_time = int(time.time())
-                
+                completion_parts = []
+
                 try:
-                    # Chama o novo método de streaming do agente
-                    token_stream = g.genesys_agent_instance.stream_task(last_message)
-                    
+                    token_stream = agent.stream_chat(
+                        rendered,
+                        temperature=temperature,
+                        stop=stop,
+                        client_id=client_id,
+                        priority=priority,
+                    )
+
                     async for token in token_stream:
                         if not token:
                             continue
-                        
+                        completion_parts.append(token)
+
                         # Formata o chunk no padrão OpenAI SSE
                         chunk = {
                             "id": completion_id,
@@ -1073,8 +1174,8 @@ async def chat_completions_endpoint(request: Request) -> Response:
                             ],
                         }
                         yield f"data: {json.dumps(chunk)}\n\n"
-                        await asyncio.sleep(0.01) # Pequeno sleep para o event loop
 
+                    completion_tokens = agent.count_tokens("".join(completion_parts))
                     # Envia o chunk final de terminação
                     final_chunk = {
                         "id": completion_id,
@@ -1085,12 +1186,32 @@ async def chat_completions_endpoint(request: Request) -> Response:
                             {
                                 "index": 0,
                                 "delta": {},
-                                "finish_reason": "stop",
+                                "finish_reason": (
+                                    "length"
+                                    if completion_tokens >= rendered.max_tokens
+                                    else "stop"
+                                ),
                             }
                         ],
                     }
                     yield f"data: {json.dumps(final_chunk)}\n\n"
-                    
+
+                    if include_usage:
+                        usage_chunk = {
+                            "id": completion_id,
+                            "object": "chat.completion.chunk",
+                            "created": created_time,
+                            "model": model_name,
+                            "choices": [],
+                            "usage": {
+                                "prompt_tokens": rendered.prompt_tokens,
+                                "completion_tokens": completion_tokens,
+                                "total_tokens": rendered.prompt_tokens
+                                + completion_tokens,
+                            },
+                        }
+                        yield f"data: {json.dumps(usage_chunk)}\n\n"
+
                     # Envia a mensagem de finalização do stream
                     yield "data: [DONE]\n\n"
 
@@ -1112,10 +1233,23 @@ async def chat_completions_endpoint(request: Request) -> Response:
                     yield f"data: {json.dumps(error_chunk)}\n\n"
                     yield "data: [DONE]\n\n"
 
+            # Rejeita antes de abrir o stream, enquanto ainda é possível responder 429
+            g.genesys_agent_instance.scheduler.check_capacity()
             return StreamingResponse(
                 stream_generator(), media_type="text/event-stream"
             )
 
+    except InferenceQueueFullError as e:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={
+                "error": {
+                    "message": str(e),
+                    "type": "rate_limit_error",
+                }
+            },
+        )
     except Exception as e:
         logger.error(f"Error in chat completions endpoint: {e}", exc_info=True)
         return JSONResponse(
@@ -1524,6 +1658,9 @@ routes = [
     # --- Rotas de Métricas e Status (Dashboard) ---
     Route("/api/dashboard/system-metrics", endpoint=system_metrics_api_route, name="system_metrics_api", methods=["GET", "OPTIONS"]),
     Route("/api/dashboard/service-status", endpoint=service_status_api_route, name="service_status_api", methods=["GET", "OPTIONS"]),
+    Route("/api/dashboard/rag-cache-stats", endpoint=rag_cache_stats_api_route, name="rag_cache_stats_api", methods=["GET", "OPTIONS"]),
+    Route("/api/dashboard/db-pool-stats", endpoint=db_pool_stats_api_route, name="db_pool_stats_api", methods=["GET", "OPTIONS"]),
+    Route("/api/dashboard/genesys-router", endpoint=genesys_router_report_api_route, name="genesys_router_report_api", methods=["GET", "OPTIONS"]),
     Route("/api/dashboard/service-control", endpoint=service_control_api_route, name="service_control_api", methods=["POST", "OPTIONS"]),
     Route("/api/dashboard/recent-activity", endpoint=recent_activity_api_route, name="recent_activity_api", methods=["GET", "OPTIONS"]),
     
@@ -15,13 +15,24 @@ from ..core import globals as g
 from ..core.auth import generate_token  # For admin token generation
 from ..utils.project_utils import init_agent_directory
 from ..db.schema import init_database as initialize_database_schema
-from ..db.connection import get_db_connection, check_vss_loadability
-from ..external.openai_service import initialize_openai_client
-from ..features.rag.indexing import run_rag_indexing_periodically
+from ..db.connection import (
+    get_db_connection,
+    check_vss_loadability,
+    close_connection_pool,
+)
+from ..external.openai_service import (
+    initialize_openai_client,
+    close_async_openai_client,
+)
+from ..features.rag.indexing import (
+    run_rag_indexing_periodically,
+    run_rag_indexing_on_changes,
+)
 
 from ..features.claude_session_monitor import run_claude_session_monitoring
 from ..utils.signal_utils import register_signal_handlers  # For graceful shutdown
 from ..db.write_queue import get_write_queue
+from ..db.actions.task_db import TASK_SELECT_COLUMNS
 
 # Adicionar importação para o encerramento do monitoramento da GPU
 from ..features.dashboard.system_metrics import shutdown_gpu_monitoring
@@ -233,7 +244,7 @@ async def application_startup(
 
         # Load All Tasks into g.tasks
         task_count = 0
-        cursor.execute("SELECT * FROM tasks")  # Load all tasks
+        cursor.execute(f"SELECT {TASK_SELECT_COLUMNS} FROM tasks")  # Load all tasks
         for row_dict in (dict(row) for row in cursor.fetchall()):
             task_id_val = row_dict["task_id"]
             # Ensure complex fields are Python lists/dicts in memory
@@ -356,10 +367,20 @@ async def start_background_tasks(task_group: anyio.abc.TaskGroup, *args, task_st
 
     # Start RAG Indexer (Original main.py: 2625-2627)
     rag_interval = int(os.environ.get("MCP_RAG_INDEX_INTERVAL_SECONDS", "300"))
-    g.rag_index_task_scope = await task_group.start(
-        run_rag_indexing_periodically, rag_interval
-    )
-    logger.info(f"RAG indexing task started with interval {rag_interval}s.")
+    rag_index_mode = os.environ.get("MCP_RAG_INDEX_MODE", "periodic").lower()
+    if rag_index_mode == "watch":
+        rag_debounce_ms = int(os.environ.get("MCP_RAG_WATCH_DEBOUNCE_MS", "1500"))
+        g.rag_index_task_scope = await task_group.start(
+            run_rag_indexing_on_changes, rag_debounce_ms, rag_interval
+        )
+        logger.info(
+            f"RAG indexing task started in filesystem-watch mode (debounce {rag_debounce_ms}ms)."
+        )
+    else:
+        g.rag_index_task_scope = await task_group.start(
+            run_rag_indexing_periodically, rag_interval
+        )
+        logger.info(f"RAG indexing task started with interval {rag_interval}s.")
 
     # Start Claude Code Session Monitor
     claude_session_interval = int(
@@ -407,6 +428,9 @@ async def application_shutdown():
     await write_queue.stop()
     logger.info("Database write queue stopped.")
 
+    # Close the shared embedding client and its pooled HTTP connections
+    await close_async_openai_client()
+
     # Stop the Genesys subprocess if it's running
     from ..features.service_manager import stop_genesys_process
 
@@ -414,8 +438,8 @@ async def application_shutdown():
         logger.info("Shutting down Genesys Agent subprocess...")
         stop_genesys_process()
 
-    # Add any other cleanup (e.g., closing persistent connections if not managed by context)
-    # For SQLite, connections are typically short-lived per request/operation.
+    # Close the pooled SQLite connections (after the write queue has drained)
+    close_connection_pool()
 
     # Adicionar encerramento do monitoramento da GPU
     shutdown_gpu_monitoring()
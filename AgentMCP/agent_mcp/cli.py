@@ -151,6 +151,13 @@ def get_admin_token_from_db(project_dir: str) -> Optional[str]:
     default=False,
     help="Disable automatic markdown file indexing. Allows selective manual indexing of specific content into the RAG system.",
 )
+@click.option(
+    "--index-mode",
+    type=click.Choice(["periodic", "watch"], case_sensitive=False),
+    default=os.environ.get("MCP_RAG_INDEX_MODE", "periodic"),
+    show_default=True,
+    help="RAG indexing mode: periodic rescans, or near-real-time re-indexing driven by filesystem events (requires 'watchfiles').",
+)
 def main_cli(
     port: int,
     transport: str,
@@ -161,6 +168,7 @@ def main_cli(
     advanced: bool,
     git: bool,
     no_index: bool,
+    index_mode: str,
 ):
     """Main entry point for the MCP server CLI."""
     # --- Set Environment Variables from CLI options ---
@@ -172,6 +180,7 @@ def main_cli(
     os.environ["MCP_ADVANCED_EMBEDDINGS"] = "true" if advanced else "false"
     os.environ["MCP_GIT_WORKTREES"] = "true" if git else "false"
     os.environ["MCP_DISABLE_AUTO_INDEXING"] = "true" if no_index else "false"
+    os.environ["MCP_RAG_INDEX_MODE"] = index_mode.lower()
 
     # Store the admin token from the CLI in a temporary global or env var
     # so `application_startup` can access it.
@@ -198,6 +198,16 @@ TASK_ANALYSIS_MODEL: str = (
     "gpt-4.1-2025-04-14"  # Same model for consistent task placement analysis
 )
 MAX_EMBEDDING_BATCH_SIZE: int = 100  # From main.py:181
+# Embedding batches are sized by estimated tokens (the API caps a request at 300k
+# tokens and 2048 inputs); inputs per batch are additionally capped at this count.
+MAX_EMBEDDING_BATCH_TOKENS: int = int(
+    os.getenv("MCP_EMBEDDING_BATCH_TOKENS", "100000")
+)
+MAX_EMBEDDING_BATCH_INPUTS: int = int(os.getenv("MCP_EMBEDDING_BATCH_INPUTS", "2048"))
+EMBEDDING_MAX_RETRIES: int = int(os.getenv("MCP_EMBEDDING_MAX_RETRIES", "6"))
+# Initial rate limits until the API's x-ratelimit-* headers are seen (Tier 3 defaults)
+EMBEDDING_DEFAULT_RPM: int = int(os.getenv("MCP_EMBEDDING_RPM", "5000"))
+EMBEDDING_DEFAULT_TPM: int = int(os.getenv("MCP_EMBEDDING_TPM", "5000000"))
 MAX_CONTEXT_TOKENS: int = 1000000  # GPT-4.1 has 1M token context window
 TASK_ANALYSIS_MAX_TOKENS: int = (
     1000000  # Same 1M token context window for task analysis
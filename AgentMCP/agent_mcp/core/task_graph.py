@@ -0,0 +1,254 @@
+# Agent-MCP/agent_mcp/core/task_graph.py
+"""
+Incremental dependency-graph engine over the cached tasks (g.tasks.graph).
+
+TaskGraph is owned by a TaskStore, which calls its hooks whenever a task is
+added, removed, changes status or changes depends_on_tasks. From those events
+it maintains, without rescanning the task set:
+
+- the ready set: pending tasks whose dependencies are all completed
+- the blocked set: tasks with a failed/cancelled/missing dependency, and
+  pending tasks still waiting on a pending/in_progress one (the same rule
+  _analyze_task_dependencies applies to a single task)
+- the remaining depth of each unfinished task: the number of unfinished
+  tasks on the longest dependency chain ending at it. Ordering by it is a
+  topological order of the remaining work, and its maximum is the critical
+  path length.
+
+Each dependent keeps per-state counts of its dependencies, so a status
+change costs O(dependents) plus the depth changes it actually causes.
+Cycles are rejected by callers before writing (find_cycle); if one still
+reaches the graph, depths are capped so propagation terminates.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Dependency states, as seen from the tasks depending on it
+DONE = "done"  # completed
+OPEN = "open"  # pending / in_progress: dependents must wait
+HARD = "hard"  # failed / cancelled / missing: dependents are blocked
+OTHER = "other"  # any other status: not satisfied, not blocking
+
+FINISHED_STATUSES = ("completed", "cancelled")
+
+
+def dependency_state(status: Optional[str]) -> str:
+    if status == "completed":
+        return DONE
+    if status in ("failed", "cancelled"):
+        return HARD
+    if status in ("pending", "in_progress"):
+        return OPEN
+    return OTHER
+
+
+class TaskGraph:
+    """Ready/blocked sets and remaining depths, maintained incrementally."""
+
+    def __init__(self, store: Any):
+        self._store = store
+        # task_id -> [hard, open, not done] dependency counts
+        self._counts: Dict[str, List[int]] = {}
+        self.ready: Set[str] = set()
+        self.blocked: Set[str] = set()
+        self._depth: Dict[str, int] = {}
+        self._by_depth: Dict[int, Set[str]] = {}
+
+    # --- Hooks called by TaskStore ---
+
+    def task_added(self, task_id: str, task: Dict[str, Any]) -> None:
+        self._recount(task_id)
+        self._refresh(task_id, task.get("status"))
+        self._shift_dependents(task_id, HARD, dependency_state(task.get("status")))
+        self._propagate([task_id])
+
+    def task_removed(self, task_id: str, task: Dict[str, Any]) -> None:
+        self._counts.pop(task_id, None)
+        self.ready.discard(task_id)
+        self.blocked.discard(task_id)
+        self._set_depth(task_id, None)
+        self._shift_dependents(task_id, dependency_state(task.get("status")), HARD)
+        self._propagate(self._store._dependents.get(task_id, ()))
+
+    def status_changed(
+        self, task_id: str, old_status: Optional[str], new_status: Optional[str]
+    ) -> None:
+        self._refresh(task_id, new_status)
+        self._shift_dependents(
+            task_id, dependency_state(old_status), dependency_state(new_status)
+        )
+        if (old_status in FINISHED_STATUSES) != (new_status in FINISHED_STATUSES):
+            self._propagate([task_id])
+
+    def dependencies_changed(self, task_id: str, task: Dict[str, Any]) -> None:
+        self._recount(task_id)
+        self._refresh(task_id, task.get("status"))
+        self._propagate([task_id])
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self.ready.clear()
+        self.blocked.clear()
+        self._depth.clear()
+        self._by_depth.clear()
+
+    # --- Maintenance ---
+
+    @staticmethod
+    def _apply(counts: List[int], state: str, sign: int) -> None:
+        if state == HARD:
+            counts[0] += sign
+        elif state == OPEN:
+            counts[1] += sign
+        if state != DONE:
+            counts[2] += sign
+
+    def _recount(self, task_id: str) -> None:
+        counts = [0, 0, 0]
+        tasks = self._store._tasks
+        for dep_id in self._store.dependencies_of(task_id):
+            dep_task = tasks.get(dep_id)
+            self._apply(
+                counts, HARD if dep_task is None else dependency_state(dep_task.get("status")), 1
+            )
+        self._counts[task_id] = counts
+
+    def _refresh(self, task_id: str, status: Optional[str]) -> None:
+        """Recomputes ready/blocked membership of one task from its counts."""
+        hard, waiting, unsatisfied = self._counts.get(task_id, (0, 0, 0))
+        if status == "pending" and not unsatisfied:
+            self.ready.add(task_id)
+        else:
+            self.ready.discard(task_id)
+        if hard or (status == "pending" and waiting):
+            self.blocked.add(task_id)
+        else:
+            self.blocked.discard(task_id)
+
+    def _shift_dependents(self, task_id: str, old_state: str, new_state: str) -> None:
+        if old_state == new_state:
+            return
+        tasks = self._store._tasks
+        for dependent_id in self._store._dependents.get(task_id, ()):
+            counts = self._counts.get(dependent_id)
+            if counts is None:
+                continue
+            self._apply(counts, old_state, -1)
+            self._apply(counts, new_state, 1)
+            self._refresh(dependent_id, tasks[dependent_id].get("status"))
+
+    def _set_depth(self, task_id: str, depth: Optional[int]) -> None:
+        old = self._depth.pop(task_id, None)
+        if old:
+            members = self._by_depth[old]
+            members.discard(task_id)
+            if not members:
+                del self._by_depth[old]
+        if depth is not None:
+            self._depth[task_id] = depth
+            if depth:
+                self._by_depth.setdefault(depth, set()).add(task_id)
+
+    def _compute_depth(self, task_id: str) -> int:
+        if self._store._tasks[task_id].get("status") in FINISHED_STATUSES:
+            return 0
+        return 1 + max(
+            (self._depth.get(dep_id, 0) for dep_id in self._store.dependencies_of(task_id)),
+            default=0,
+        )
+
+    def _propagate(self, task_ids: Iterable[str]) -> None:
+        """Recomputes depths from task_ids, following dependents only while they change."""
+        tasks = self._store._tasks
+        dependents = self._store._dependents
+        cap = max(1, len(tasks))
+        stack = list(task_ids)
+        while stack:
+            task_id = stack.pop()
+            if task_id not in tasks:
+                continue
+            depth = min(self._compute_depth(task_id), cap)
+            if self._depth.get(task_id) == depth:
+                continue
+            self._set_depth(task_id, depth)
+            stack.extend(dependents.get(task_id, ()))
+
+    # --- Queries ---
+
+    def is_ready(self, task_id: str) -> bool:
+        return task_id in self.ready
+
+    def is_blocked(self, task_id: str) -> bool:
+        return task_id in self.blocked
+
+    def remaining_depth(self, task_id: str) -> int:
+        return self._depth.get(task_id, 0)
+
+    def critical_path_length(self) -> int:
+        return max(self._by_depth, default=0)
+
+    def critical_path(self) -> List[str]:
+        """One longest chain of unfinished tasks, first dependency first."""
+        length = self.critical_path_length()
+        if not length:
+            return []
+        task_id = min(self._by_depth[length])
+        path = [task_id]
+        while length > 1:
+            length -= 1
+            task_id = min(
+                (
+                    dep_id
+                    for dep_id in self._store.dependencies_of(task_id)
+                    if self._depth.get(dep_id) == length
+                ),
+                default=None,
+            )
+            if task_id is None:  # Only on a capped (cyclic) chain
+                break
+            path.append(task_id)
+        path.reverse()
+        return path
+
+    def topological_order(self) -> List[str]:
+        """Unfinished tasks ordered so every task follows its unfinished dependencies."""
+        return [
+            task_id
+            for depth in sorted(self._by_depth)
+            for task_id in sorted(self._by_depth[depth])
+        ]
+
+    def find_cycle(self, task_id: str, depends_on: Iterable[str]) -> Optional[List[str]]:
+        """
+        The cycle that setting task_id's dependencies to `depends_on` would
+        create, as [task_id, ..., task_id], or None if the graph stays acyclic.
+        """
+        parents: Dict[str, Optional[str]] = {}
+        stack: List[str] = []
+        for dep_id in depends_on:
+            if dep_id not in parents:
+                parents[dep_id] = None
+                stack.append(dep_id)
+        while stack:
+            current = stack.pop()
+            if current == task_id:
+                path = [current]
+                while parents[current] is not None:
+                    current = parents[current]
+                    path.append(current)
+                path.append(task_id)
+                path.reverse()
+                return path
+            for dep_id in self._store.dependencies_of(current):
+                if dep_id not in parents:
+                    parents[dep_id] = current
+                    stack.append(dep_id)
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ready": len(self.ready),
+            "blocked": len(self.blocked),
+            "unfinished": sum(len(members) for members in self._by_depth.values()),
+            "critical_path_length": self.critical_path_length(),
+        }
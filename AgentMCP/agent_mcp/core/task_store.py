@@ -0,0 +1,398 @@
+# Agent-MCP/agent_mcp/core/task_store.py
+"""
+Indexed in-memory task cache (g.tasks).
+
+TaskStore is a drop-in replacement for the plain ``Dict[str, Dict]`` cache:
+it is a MutableMapping of task_id -> task dict, so existing reads and writes
+(``g.tasks[task_id]["status"] = ...``, ``g.tasks[task_id] = data``) keep
+working. Stored tasks are wrapped in TrackedTask, a dict subclass that reports
+field writes back to the store, which keeps these indexes current:
+
+- hash indexes on assigned_to, status, priority and parent_task
+- reverse-dependency adjacency (task_id -> tasks whose depends_on_tasks contain it)
+- ordered indexes for the view_tasks sort orders (created_at, updated_at,
+  priority, status)
+- the dependency graph (``graph``, see task_graph.TaskGraph): ready/blocked
+  sets and remaining critical-path depths
+
+List fields are indexed when assigned; ``depends_on_tasks`` must be replaced
+(``task["depends_on_tasks"] = [...]``), not appended to in place.
+"""
+
+import json
+from bisect import bisect_left, insort
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .task_graph import TaskGraph
+
+PRIORITY_ORDER = {"high": 3, "medium": 2, "low": 1}
+STATUS_ORDER = {
+    "failed": 5,
+    "in_progress": 4,
+    "pending": 3,
+    "completed": 2,
+    "cancelled": 1,
+}
+
+HASH_INDEX_FIELDS = ("assigned_to", "status", "priority", "parent_task")
+
+
+def _created_key(task: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (task.get("created_at") or "",)
+
+
+def _updated_key(task: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (task.get("updated_at") or "",)
+
+
+def _priority_key(task: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (PRIORITY_ORDER.get(task.get("priority"), 2), task.get("created_at") or "")
+
+
+def _status_key(task: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (STATUS_ORDER.get(task.get("status"), 3), task.get("created_at") or "")
+
+
+# sort_by -> (key function, task fields the key depends on)
+SORT_ORDERS: Dict[str, Tuple[Callable[[Dict[str, Any]], Tuple[Any, ...]], Tuple[str, ...]]] = {
+    "created_at": (_created_key, ("created_at",)),
+    "updated_at": (_updated_key, ("updated_at",)),
+    "priority": (_priority_key, ("priority", "created_at")),
+    "status": (_status_key, ("status", "created_at")),
+}
+
+# Below this fraction of the store, sorting the matching tasks directly is
+# cheaper than walking a full ordered index and skipping non-matches
+DIRECT_SORT_FRACTION = 0.125
+
+
+def parse_task_id_list(value: Any) -> List[str]:
+    """Normalizes a child_tasks/depends_on_tasks value (list or JSON string)."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value or "[]")
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(value, (list, tuple, set)):
+        return []
+    return [item for item in value if isinstance(item, str)]
+
+
+class TrackedTask(dict):
+    """A cached task dict that keeps its TaskStore's indexes in sync on writes."""
+
+    __slots__ = ("_store", "_task_id")
+
+    def __init__(self, store: "TaskStore", task_id: str, data: Dict[str, Any]):
+        super().__init__(data)
+        self._store = store
+        self._task_id = task_id
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        store = self._store
+        if store is not None and key in store._indexed_fields:
+            store._reindex_field(self._task_id, self, key, value)
+        else:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        store = self._store
+        if store is not None and key in store._indexed_fields:
+            self[key] = None
+        super().__delitem__(key)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self) -> Tuple[str, Any]:
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+
+    def __reduce__(self):
+        # Pickles/copies as a plain dict, detached from the store
+        return (dict, (dict(self),))
+
+
+class _OrderIndex:
+    """Ascending list of (sort key, task_id), maintained with bisect."""
+
+    def __init__(self, key_func: Callable[[Dict[str, Any]], Tuple[Any, ...]]):
+        self.key_func = key_func
+        self.entries: List[Tuple[Any, ...]] = []
+        self.keys: Dict[str, Tuple[Any, ...]] = {}
+
+    def add(self, task_id: str, task: Dict[str, Any]) -> None:
+        entry = (*self.key_func(task), task_id)
+        self.keys[task_id] = entry
+        insort(self.entries, entry)
+
+    def remove(self, task_id: str) -> None:
+        entry = self.keys.pop(task_id, None)
+        if entry is None:
+            return
+        position = bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.keys.clear()
+
+
+class TaskStore(MutableMapping):
+    """Task ID -> task data, with secondary indexes maintained on every mutation."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, TrackedTask] = {}
+        self._by_field: Dict[str, Dict[Any, Set[str]]] = {
+            field: {} for field in HASH_INDEX_FIELDS
+        }
+        self._dependents: Dict[str, Set[str]] = {}
+        self._dependencies: Dict[str, Tuple[str, ...]] = {}
+        self._orders: Dict[str, _OrderIndex] = {
+            name: _OrderIndex(key_func) for name, (key_func, _) in SORT_ORDERS.items()
+        }
+        self._orders_by_field: Dict[str, List[_OrderIndex]] = {}
+        for name, (_, fields) in SORT_ORDERS.items():
+            for field in fields:
+                self._orders_by_field.setdefault(field, []).append(self._orders[name])
+        self.graph = TaskGraph(self)
+        self._indexed_fields = frozenset(
+            HASH_INDEX_FIELDS + ("depends_on_tasks",) + tuple(self._orders_by_field)
+        )
+
+    # --- Mapping protocol ---
+
+    def __getitem__(self, task_id: str) -> TrackedTask:
+        return self._tasks[task_id]
+
+    def __setitem__(self, task_id: str, data: Dict[str, Any]) -> None:
+        previous = self._tasks.get(task_id)
+        if previous is not None:
+            self._unindex(task_id, previous)
+            previous._store = None
+        task = TrackedTask(self, task_id, data)
+        self._tasks[task_id] = task
+        self._index(task_id, task)
+
+    def __delitem__(self, task_id: str) -> None:
+        task = self._tasks.pop(task_id)
+        self._unindex(task_id, task)
+        task._store = None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tasks)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._tasks
+
+    def get(self, task_id: Any, default: Any = None) -> Any:
+        return self._tasks.get(task_id, default)
+
+    def clear(self) -> None:
+        for task in self._tasks.values():
+            task._store = None
+        self._tasks.clear()
+        for index in self._by_field.values():
+            index.clear()
+        self._dependents.clear()
+        self._dependencies.clear()
+        for order in self._orders.values():
+            order.clear()
+        self.graph.clear()
+
+    # --- Index maintenance ---
+
+    def _index(self, task_id: str, task: Dict[str, Any]) -> None:
+        for field in HASH_INDEX_FIELDS:
+            self._by_field[field].setdefault(task.get(field), set()).add(task_id)
+        self._set_dependencies(task_id, task.get("depends_on_tasks"))
+        for order in self._orders.values():
+            order.add(task_id, task)
+        self.graph.task_added(task_id, task)
+
+    def _unindex(self, task_id: str, task: Dict[str, Any]) -> None:
+        for field in HASH_INDEX_FIELDS:
+            self._discard(self._by_field[field], task.get(field), task_id)
+        self._set_dependencies(task_id, None)
+        for order in self._orders.values():
+            order.remove(task_id)
+        self.graph.task_removed(task_id, task)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[str]], value: Any, task_id: str) -> None:
+        members = index.get(value)
+        if members is not None:
+            members.discard(task_id)
+            if not members:
+                del index[value]
+
+    def _set_dependencies(self, task_id: str, depends_on: Any) -> None:
+        for dep_id in self._dependencies.pop(task_id, ()):
+            self._discard(self._dependents, dep_id, task_id)
+        dep_ids = tuple(dict.fromkeys(parse_task_id_list(depends_on)))
+        if dep_ids:
+            self._dependencies[task_id] = dep_ids
+            for dep_id in dep_ids:
+                self._dependents.setdefault(dep_id, set()).add(task_id)
+
+    def _reindex_field(
+        self, task_id: str, task: TrackedTask, field: str, value: Any
+    ) -> None:
+        """Writes task[field] = value and updates the indexes that depend on it."""
+        if field in self._by_field:
+            index = self._by_field[field]
+            self._discard(index, task.get(field), task_id)
+            index.setdefault(value, set()).add(task_id)
+        old_value = task.get(field)
+        orders = self._orders_by_field.get(field, ())
+        for order in orders:
+            order.remove(task_id)
+        dict.__setitem__(task, field, value)
+        for order in orders:
+            order.add(task_id, task)
+        if field == "depends_on_tasks":
+            self._set_dependencies(task_id, value)
+            self.graph.dependencies_changed(task_id, task)
+        elif field == "status" and old_value != value:
+            self.graph.status_changed(task_id, old_value, value)
+
+    # --- Queries ---
+
+    def ids_where(self, field: str, value: Any) -> Set[str]:
+        """IDs of tasks whose indexed `field` equals `value` (a live set; do not mutate)."""
+        return self._by_field[field].get(value, set())
+
+    def count_by(self, field: str) -> Dict[Any, int]:
+        """Number of tasks per value of an indexed field."""
+        return {value: len(ids) for value, ids in self._by_field[field].items()}
+
+    def dependents_of(self, task_id: str) -> List[str]:
+        """IDs of the tasks that list `task_id` in their depends_on_tasks."""
+        return sorted(self._dependents.get(task_id, ()))
+
+    def dependencies_of(self, task_id: str) -> Tuple[str, ...]:
+        return self._dependencies.get(task_id, ())
+
+    def select(
+        self, within: Optional[Set[str]] = None, **filters: Any
+    ) -> Optional[Set[str]]:
+        """
+        IDs in `within` (if given, e.g. graph.ready) matching every field=value
+        filter on the hash-indexed fields (filters whose value is None are
+        ignored). The smallest set drives the intersection. Returns None when
+        nothing restricts the selection, meaning "all tasks".
+        """
+        sets = [
+            self.ids_where(field, value)
+            for field, value in filters.items()
+            if value is not None
+        ]
+        if within is not None:
+            sets.append(within)
+        if not sets:
+            return None
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def iter_sorted(
+        self,
+        ids: Optional[Set[str]] = None,
+        sort_by: str = "created_at",
+        descending: bool = True,
+        start_after: Optional[str] = None,
+    ) -> Iterator[TrackedTask]:
+        """
+        Lazily yields the tasks in `ids` (all tasks if None) in `sort_by` order,
+        resuming after task `start_after` when it is among them. Small selections
+        are sorted directly; large ones walk the ordered index, so consuming
+        only the first page touches only that page.
+        """
+        order = self._orders.get(sort_by) or self._orders["created_at"]
+        if ids is not None and start_after not in ids:
+            start_after = None
+        elif start_after is not None and start_after not in self._tasks:
+            start_after = None
+
+        if ids is not None and len(ids) <= len(self._tasks) * DIRECT_SORT_FRACTION:
+            entries = sorted((order.keys[task_id] for task_id in ids), reverse=descending)
+            start = 0
+            if start_after is not None:
+                start = entries.index(order.keys[start_after]) + 1
+            for position in range(start, len(entries)):
+                yield self._tasks[entries[position][-1]]
+            return
+
+        entries = order.entries
+        if descending:
+            position = len(entries) - 1
+            if start_after is not None:
+                position = bisect_left(entries, order.keys[start_after]) - 1
+            positions = range(position, -1, -1)
+        else:
+            position = 0
+            if start_after is not None:
+                position = bisect_left(entries, order.keys[start_after]) + 1
+            positions = range(position, len(entries))
+        for position in positions:
+            task_id = entries[position][-1]
+            if ids is None or task_id in ids:
+                yield self._tasks[task_id]
+
+    def count_after(
+        self,
+        ids: Optional[Set[str]] = None,
+        sort_by: str = "created_at",
+        descending: bool = True,
+        start_after: Optional[str] = None,
+    ) -> int:
+        """Number of tasks iter_sorted() would yield for the same arguments."""
+        total = len(self._tasks) if ids is None else len(ids)
+        if start_after is None or start_after not in (self._tasks if ids is None else ids):
+            return total
+        order = self._orders.get(sort_by) or self._orders["created_at"]
+        pivot = order.keys[start_after]
+        if ids is None:
+            before = bisect_left(order.entries, pivot)
+            return before if descending else total - before - 1
+        keys = order.keys
+        if descending:
+            return sum(1 for task_id in ids if keys[task_id] < pivot)
+        return sum(1 for task_id in ids if keys[task_id] > pivot)
@@ -0,0 +1,495 @@
+# Agent-MCP/agent_mcp/db/actions/rag_db.py
+import os
+import re
+import sqlite3
+import time
+import hashlib
+import datetime
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple, Union
+
+from ...core.config import logger
+from ...utils.vector_utils import pack_embedding, unpack_embedding
+
+# This module provides reusable database operations for the RAG tables
+# (rag_chunks, rag_embeddings, rag_meta, rag_file_manifest, rag_embedding_cache).
+# Like agent_actions_db, the helpers expect an active cursor; the caller owns
+# the connection and is responsible for commit/rollback.
+
+
+def get_file_manifest(cursor: sqlite3.Cursor) -> Dict[str, Dict[str, Any]]:
+    """
+    Loads the persisted file manifest used by the incremental RAG indexer.
+
+    Returns:
+        A dict of normalized relative path -> {"size", "mtime_ns", "inode",
+        "content_hash", "source_type"}.
+    """
+    cursor.execute(
+        "SELECT path, size, mtime_ns, inode, content_hash, source_type FROM rag_file_manifest"
+    )
+    return {
+        row["path"]: {
+            "size": row["size"],
+            "mtime_ns": row["mtime_ns"],
+            "inode": row["inode"],
+            "content_hash": row["content_hash"],
+            "source_type": row["source_type"],
+        }
+        for row in cursor.fetchall()
+    }
+
+
+def upsert_file_manifest_entries(
+    cursor: sqlite3.Cursor,
+    entries: Iterable[Tuple[str, int, int, int, str, str, str]],
+) -> int:
+    """
+    Inserts or replaces manifest rows.
+
+    Args:
+        cursor: An active sqlite3.Cursor object.
+        entries: Tuples of (path, size, mtime_ns, inode, content_hash, source_type, indexed_at).
+
+    Returns:
+        The number of rows written.
+    """
+    rows = list(entries)
+    if not rows:
+        return 0
+    cursor.executemany(
+        """
+        INSERT OR REPLACE INTO rag_file_manifest
+            (path, size, mtime_ns, inode, content_hash, source_type, indexed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def delete_rag_source(
+    cursor: sqlite3.Cursor, source_type: str, source_ref: str, vec_table_exists: bool
+) -> int:
+    """
+    Removes every chunk (and its embedding) indexed for one source, plus its
+    stored content hash in rag_meta.
+
+    Returns:
+        The number of rag_chunks rows deleted.
+    """
+    if vec_table_exists:
+        cursor.execute(
+            "DELETE FROM rag_embeddings WHERE rowid IN (SELECT chunk_id FROM rag_chunks WHERE source_type = ? AND source_ref = ?)",
+            (source_type, source_ref),
+        )
+    res_chk = cursor.execute(
+        "DELETE FROM rag_chunks WHERE source_type = ? AND source_ref = ?",
+        (source_type, source_ref),
+    )
+    cursor.execute(
+        "DELETE FROM rag_meta WHERE meta_key = ?",
+        (f"hash_{source_type}_{source_ref}",),
+    )
+    if res_chk.rowcount > 0:
+        bump_rag_index_version(cursor)
+    return max(res_chk.rowcount, 0)
+
+
+def remove_deleted_files_from_index(
+    cursor: sqlite3.Cursor,
+    removed: Dict[str, str],
+    vec_table_exists: bool,
+) -> int:
+    """
+    Drops index data for files that disappeared from the project since the
+    last cycle: their chunks, embeddings, rag_meta hash and manifest row.
+
+    Args:
+        cursor: An active sqlite3.Cursor object.
+        removed: Mapping of normalized path -> source_type recorded in the manifest.
+        vec_table_exists: Whether rag_embeddings exists and can be deleted from.
+
+    Returns:
+        The number of rag_chunks rows deleted.
+    """
+    deleted_chunks = 0
+    for path, source_type in removed.items():
+        deleted_chunks += delete_rag_source(
+            cursor, source_type or "markdown", path, vec_table_exists
+        )
+        cursor.execute("DELETE FROM rag_file_manifest WHERE path = ?", (path,))
+        logger.info(f"File removed from project, dropped from RAG index: {path}")
+    return deleted_chunks
+
+
+# --- Full-text search (FTS5) ---
+
+# Words that carry no signal in a BM25 query over project text
+_FTS_STOPWORDS = frozenset(
+    "a an is in of on to or it be do me my we the and for are was what which who how "
+    "why when where does did this that with "
+    "from into about there their has have can should would could our you your its "
+    "not all any use used using".split()
+)
+_FTS_TOKEN_PATTERN = re.compile(r"[\w-]+", re.UNICODE)
+
+
+def build_fts_match_query(query_text: str, max_terms: int = 16) -> Optional[str]:
+    """
+    Turns free text into an FTS5 MATCH expression: each distinct term is
+    quoted (so identifiers and IDs are matched literally) and OR-ed, letting
+    BM25 rank rows that match more and rarer terms first.
+
+    Returns:
+        The MATCH expression, or None if the text has no usable terms.
+    """
+    terms: List[str] = []
+    for token in _FTS_TOKEN_PATTERN.findall(query_text):
+        token = token.strip("-")
+        if len(token) < 2 or token.lower() in _FTS_STOPWORDS:
+            continue
+        if token.lower() not in (t.lower() for t in terms):
+            terms.append(token)
+        if len(terms) >= max_terms:
+            break
+    if not terms:
+        return None
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_chunks_fts(
+    cursor: sqlite3.Cursor, query_text: str, limit: int
+) -> List[Dict[str, Any]]:
+    """
+    BM25-ranked lexical search over rag_chunks via rag_chunks_fts.
+
+    Returns:
+        Chunk dicts (chunk_id, chunk_text, source_type, source_ref, metadata,
+        bm25) best match first. Empty if the query has no usable terms.
+
+    Raises:
+        sqlite3.OperationalError: If rag_chunks_fts does not exist.
+    """
+    match_query = build_fts_match_query(query_text)
+    if match_query is None:
+        return []
+    cursor.execute(
+        """
+        SELECT c.chunk_id, c.chunk_text, c.source_type, c.source_ref, c.metadata,
+               bm25(rag_chunks_fts) AS bm25
+        FROM rag_chunks_fts
+        JOIN rag_chunks c ON c.chunk_id = rag_chunks_fts.rowid
+        WHERE rag_chunks_fts MATCH ?
+        ORDER BY bm25
+        LIMIT ?
+        """,
+        (match_query, limit),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def search_tasks_fts(
+    cursor: sqlite3.Cursor, query_text: str, limit: int
+) -> List[Dict[str, Any]]:
+    """
+    BM25-ranked lookup of tasks by ID, title and description via tasks_fts.
+    Title and ID matches are weighted above description matches.
+
+    Raises:
+        sqlite3.OperationalError: If tasks_fts does not exist.
+    """
+    match_query = build_fts_match_query(query_text)
+    if match_query is None:
+        return []
+    cursor.execute(
+        """
+        SELECT t.task_id, t.title, t.status, t.description, t.updated_at
+        FROM tasks_fts
+        JOIN tasks t ON t.task_id = tasks_fts.task_id
+        WHERE tasks_fts MATCH ?
+        ORDER BY bm25(tasks_fts, 10.0, 5.0, 1.0)
+        LIMIT ?
+        """,
+        (match_query, limit),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+
+# --- Index version (invalidates cached RAG answers) ---
+
+RAG_INDEX_VERSION_KEY = "index_version"
+
+
+def get_rag_index_version(cursor: sqlite3.Cursor) -> int:
+    """Returns the current RAG index version (0 if never bumped)."""
+    cursor.execute(
+        "SELECT meta_value FROM rag_meta WHERE meta_key = ?", (RAG_INDEX_VERSION_KEY,)
+    )
+    row = cursor.fetchone()
+    try:
+        return int(row["meta_value"]) if row else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def bump_rag_index_version(cursor: sqlite3.Cursor) -> None:
+    """
+    Increments the RAG index version. Call in the same transaction as any
+    change to rag_chunks/rag_embeddings so cached answers keyed on the old
+    version are no longer served once the change is visible.
+    """
+    cursor.execute(
+        """
+        INSERT INTO rag_meta (meta_key, meta_value) VALUES (?, '1')
+        ON CONFLICT(meta_key) DO UPDATE
+        SET meta_value = CAST(CAST(meta_value AS INTEGER) + 1 AS TEXT)
+        """,
+        (RAG_INDEX_VERSION_KEY,),
+    )
+
+
+# Keep IN (...) lists well below SQLite's host parameter limit
+_CACHE_LOOKUP_BATCH_SIZE = 500
+
+
+def get_cached_embeddings(
+    cursor: sqlite3.Cursor, model: str, dimension: int, text_hashes: Iterable[str]
+) -> Dict[str, bytes]:
+    """
+    Looks up previously computed embeddings by chunk text hash.
+
+    Args:
+        cursor: An active sqlite3.Cursor object.
+        model: Embedding model name the vectors were produced with.
+        dimension: Embedding dimension the vectors were produced with.
+        text_hashes: SHA256 hex digests of chunk texts.
+
+    Returns:
+        A dict of text_hash -> packed float32 embedding for every cache hit,
+        ready to be inserted into rag_embeddings without re-encoding.
+    """
+    unique_hashes = list(dict.fromkeys(text_hashes))
+    hits: Dict[str, bytes] = {}
+    expected_size = dimension * 4
+    for start in range(0, len(unique_hashes), _CACHE_LOOKUP_BATCH_SIZE):
+        batch = unique_hashes[start : start + _CACHE_LOOKUP_BATCH_SIZE]
+        placeholders = ",".join("?" * len(batch))
+        cursor.execute(
+            f"SELECT text_hash, embedding FROM rag_embedding_cache WHERE model = ? AND dimension = ? AND text_hash IN ({placeholders})",
+            (model, dimension, *batch),
+        )
+        for row in cursor.fetchall():
+            stored = row["embedding"]
+            if isinstance(stored, bytes) and len(stored) == expected_size:
+                hits[row["text_hash"]] = stored
+                continue
+            # Legacy JSON row (pre binary migration) or corrupt entry
+            vector = unpack_embedding(stored, dimension)
+            if vector is None:
+                logger.warning(
+                    f"Discarding unreadable embedding cache entry {row['text_hash']}"
+                )
+                continue
+            hits[row["text_hash"]] = pack_embedding(vector)
+    return hits
+
+
+def store_cached_embeddings(
+    cursor: sqlite3.Cursor,
+    model: str,
+    dimension: int,
+    entries: Iterable[Tuple[str, Union[bytes, List[float]]]],
+) -> int:
+    """
+    Inserts or refreshes embedding cache rows.
+
+    Args:
+        entries: Tuples of (text_hash, embedding as a float list or packed float32 blob).
+
+    Returns:
+        The number of rows written.
+    """
+    now_iso = datetime.datetime.now().isoformat()
+    rows = [
+        (
+            model,
+            dimension,
+            text_hash,
+            vector if isinstance(vector, bytes) else pack_embedding(vector),
+            now_iso,
+        )
+        for text_hash, vector in entries
+    ]
+    if not rows:
+        return 0
+    cursor.executemany(
+        """
+        INSERT OR REPLACE INTO rag_embedding_cache
+            (model, dimension, text_hash, embedding, last_used_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def touch_cached_embeddings(
+    cursor: sqlite3.Cursor, model: str, dimension: int, text_hashes: Iterable[str]
+) -> None:
+    """Marks cache entries as recently used so LRU pruning keeps them."""
+    now_iso = datetime.datetime.now().isoformat()
+    cursor.executemany(
+        "UPDATE rag_embedding_cache SET last_used_at = ? WHERE model = ? AND dimension = ? AND text_hash = ?",
+        [(now_iso, model, dimension, text_hash) for text_hash in text_hashes],
+    )
+
+
+def prune_embedding_cache(cursor: sqlite3.Cursor, max_entries: int) -> int:
+    """
+    Deletes the least recently used cache rows beyond `max_entries`.
+
+    Returns:
+        The number of rows deleted.
+    """
+    cursor.execute("SELECT COUNT(*) FROM rag_embedding_cache")
+    excess = cursor.fetchone()[0] - max_entries
+    if excess <= 0:
+        return 0
+    cursor.execute(
+        "DELETE FROM rag_embedding_cache WHERE rowid IN (SELECT rowid FROM rag_embedding_cache ORDER BY last_used_at ASC LIMIT ?)",
+        (excess,),
+    )
+    return max(cursor.rowcount, 0)
+
+
+def harvest_source_embeddings_into_cache(
+    cursor: sqlite3.Cursor,
+    model: str,
+    dimension: int,
+    source_type: str,
+    source_ref: str,
+) -> int:
+    """
+    Copies the vectors currently stored for one source into the embedding
+    cache (keyed by chunk text hash) before that source is re-chunked.
+    Existing cache rows are left untouched.
+
+    Returns:
+        The number of vectors harvested.
+    """
+    cursor.execute(
+        """
+        SELECT c.chunk_text, e.embedding
+        FROM rag_chunks c
+        JOIN rag_embeddings e ON e.rowid = c.chunk_id
+        WHERE c.source_type = ? AND c.source_ref = ?
+        """,
+        (source_type, source_ref),
+    )
+    now_iso = datetime.datetime.now().isoformat()
+    rows = []
+    for row in cursor.fetchall():
+        stored = row["embedding"]
+        # sqlite-vec returns vectors as packed float32 blobs
+        if not (isinstance(stored, bytes) and len(stored) == dimension * 4):
+            vector = unpack_embedding(stored, dimension)
+            if vector is None:
+                continue
+            stored = pack_embedding(vector)
+        text_hash = hashlib.sha256(row["chunk_text"].encode("utf-8")).hexdigest()
+        rows.append((model, dimension, text_hash, stored, now_iso))
+    if rows:
+        cursor.executemany(
+            """
+            INSERT OR IGNORE INTO rag_embedding_cache
+                (model, dimension, text_hash, embedding, last_used_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+    return len(rows)
+
+
+# Rows per explicit transaction in bulk_insert_chunks_with_embeddings.
+# Bounded so the request-serving DB is never write-locked for long.
+RAG_BULK_INSERT_BATCH_SIZE = int(
+    os.environ.get("MCP_RAG_BULK_INSERT_BATCH_SIZE", "500")
+)
+
+
+def _next_chunk_id(cursor: sqlite3.Cursor) -> int:
+    """
+    Returns the first unused chunk_id. rag_chunks is AUTOINCREMENT, so ids
+    already handed out (sqlite_sequence) are never reused either.
+    Must be called inside a write transaction.
+    """
+    cursor.execute("SELECT COALESCE(MAX(chunk_id), 0) FROM rag_chunks")
+    max_chunk_id = cursor.fetchone()[0]
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'rag_chunks'")
+    seq_row = cursor.fetchone()
+    max_seq = seq_row[0] if seq_row else 0
+    return max(max_chunk_id, max_seq) + 1
+
+
+def bulk_insert_chunks_with_embeddings(
+    conn: sqlite3.Connection,
+    rows: Sequence[Tuple[str, str, str, str, Optional[str], bytes]],
+    batch_size: int = RAG_BULK_INSERT_BATCH_SIZE,
+) -> List[int]:
+    """
+    Inserts chunks and their embeddings in bounded batches.
+
+    Each batch runs in its own `BEGIN IMMEDIATE` transaction: the next free
+    chunk_id is read once, ids are pre-assigned to every row, and both tables
+    are written with a single executemany each, so no per-row `lastrowid`
+    round-trip is needed. A failing batch is rolled back and skipped; other
+    batches are unaffected. Any transaction already open on `conn` is
+    committed first.
+
+    Args:
+        conn: An open connection with sqlite-vec loaded.
+        rows: Tuples of (source_type, source_ref, chunk_text, indexed_at,
+            metadata_json, embedding_blob).
+        batch_size: Rows per transaction.
+
+    Returns:
+        Positions (indexes into `rows`) of the rows that were inserted.
+    """
+    if not rows:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+
+    cursor = conn.cursor()
+    inserted_positions: List[int] = []
+    start_time = time.perf_counter()
+
+    for batch_start in range(0, len(rows), batch_size):
+        batch = rows[batch_start : batch_start + batch_size]
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            first_id = _next_chunk_id(cursor)
+            cursor.executemany(
+                "INSERT INTO rag_chunks (chunk_id, source_type, source_ref, chunk_text, indexed_at, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [(first_id + offset, *row[:5]) for offset, row in enumerate(batch)],
+            )
+            cursor.executemany(
+                "INSERT INTO rag_embeddings (rowid, embedding) VALUES (?, ?)",
+                [(first_id + offset, row[5]) for offset, row in enumerate(batch)],
+            )
+            bump_rag_index_version(cursor)
+            conn.commit()
+            inserted_positions.extend(range(batch_start, batch_start + len(batch)))
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(
+                f"DB Error bulk inserting chunks/embeddings (rows {batch_start}-{batch_start + len(batch) - 1}): {e}"
+            )
+
+    elapsed = time.perf_counter() - start_time
+    rows_per_second = len(inserted_positions) / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Bulk inserted {len(inserted_positions)}/{len(rows)} chunks+embeddings in {elapsed:.2f}s ({rows_per_second:.0f} rows/s, batch size {batch_size})."
+    )
+    return inserted_positions
@@ -28,6 +28,153 @@ def _parse_task_json_fields(task_data: Dict[str, Any]) -> Dict[str, Any]:
     return parsed_data
 
 
+# Columns stored on the tasks table itself. Child tasks, dependencies and notes
+# live in task_children, task_dependencies and task_notes (the old JSON text
+# columns of the same names are no longer read or written).
+TASK_BASE_COLUMNS = (
+    "task_id",
+    "title",
+    "description",
+    "assigned_to",
+    "created_by",
+    "status",
+    "priority",
+    "created_at",
+    "updated_at",
+    "parent_task",
+)
+
+# The relations re-assembled as JSON arrays, in insertion order, so rows read
+# with TASK_SELECT_COLUMNS have the same shape as the old JSON columns.
+TASK_CHILDREN_JSON_SQL = (
+    "(SELECT json_group_array(child_task_id) FROM ("
+    "SELECT child_task_id FROM task_children "
+    "WHERE task_children.parent_task_id = tasks.task_id ORDER BY task_children.rowid))"
+)
+TASK_DEPENDENCIES_JSON_SQL = (
+    "(SELECT json_group_array(depends_on_task_id) FROM ("
+    "SELECT depends_on_task_id FROM task_dependencies "
+    "WHERE task_dependencies.task_id = tasks.task_id ORDER BY task_dependencies.rowid))"
+)
+TASK_NOTES_JSON_SQL = (
+    "(SELECT json_group_array(json_object('timestamp', timestamp, 'author', author, 'content', content)) FROM ("
+    "SELECT timestamp, author, content FROM task_notes "
+    "WHERE task_notes.task_id = tasks.task_id ORDER BY task_notes.note_id))"
+)
+
+# Everything but the notes, for callers that only append to them
+TASK_SELECT_COLUMNS_WITHOUT_NOTES = ", ".join(
+    [f"tasks.{column}" for column in TASK_BASE_COLUMNS]
+    + [
+        f"{TASK_CHILDREN_JSON_SQL} AS child_tasks",
+        f"{TASK_DEPENDENCIES_JSON_SQL} AS depends_on_tasks",
+    ]
+)
+# Drop-in replacement for `SELECT *` on the tasks table
+TASK_SELECT_COLUMNS = f"{TASK_SELECT_COLUMNS_WITHOUT_NOTES}, {TASK_NOTES_JSON_SQL} AS notes"
+
+
+def insert_task(cursor: sqlite3.Cursor, task_data: Dict[str, Any]) -> None:
+    """
+    Inserts a task and its relations. `task_data` holds the TASK_BASE_COLUMNS
+    plus optional `depends_on_tasks` (list of task IDs) and `notes` (list of
+    note dicts). The task is also registered as a child of its parent_task.
+    """
+    cursor.execute(
+        f"INSERT INTO tasks ({', '.join(TASK_BASE_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + column for column in TASK_BASE_COLUMNS)})",
+        {column: task_data.get(column) for column in TASK_BASE_COLUMNS},
+    )
+    if task_data.get("parent_task"):
+        add_task_child(cursor, task_data["parent_task"], task_data["task_id"])
+    set_task_dependencies(
+        cursor, task_data["task_id"], task_data.get("depends_on_tasks") or []
+    )
+    for note in task_data.get("notes") or []:
+        add_task_note(
+            cursor,
+            task_data["task_id"],
+            note.get("author"),
+            note.get("content"),
+            note.get("timestamp"),
+        )
+
+
+def add_task_note(
+    cursor: sqlite3.Cursor,
+    task_id: str,
+    author: str,
+    content: str,
+    timestamp: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Appends a note to a task (a single insert) and returns the note dict."""
+    note = {
+        "timestamp": timestamp or datetime.datetime.now().isoformat(),
+        "author": author,
+        "content": content,
+    }
+    cursor.execute(
+        "INSERT INTO task_notes (task_id, timestamp, author, content) VALUES (?, ?, ?, ?)",
+        (task_id, note["timestamp"], note["author"], note["content"]),
+    )
+    return note
+
+
+def set_task_dependencies(
+    cursor: sqlite3.Cursor, task_id: str, depends_on_tasks: List[str]
+) -> None:
+    """Replaces the list of tasks `task_id` depends on."""
+    cursor.execute("DELETE FROM task_dependencies WHERE task_id = ?", (task_id,))
+    cursor.executemany(
+        "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on_task_id) VALUES (?, ?)",
+        [(task_id, dep_id) for dep_id in depends_on_tasks],
+    )
+
+
+def add_task_child(
+    cursor: sqlite3.Cursor, parent_task_id: str, child_task_id: str
+) -> None:
+    cursor.execute(
+        "INSERT OR IGNORE INTO task_children (parent_task_id, child_task_id) VALUES (?, ?)",
+        (parent_task_id, child_task_id),
+    )
+
+
+def set_task_children(
+    cursor: sqlite3.Cursor, parent_task_id: str, child_task_ids: List[str]
+) -> None:
+    """Replaces the list of child tasks of `parent_task_id`."""
+    cursor.execute(
+        "DELETE FROM task_children WHERE parent_task_id = ?", (parent_task_id,)
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO task_children (parent_task_id, child_task_id) VALUES (?, ?)",
+        [(parent_task_id, child_id) for child_id in child_task_ids],
+    )
+
+
+def get_dependent_task_ids(cursor: sqlite3.Cursor, task_id: str) -> List[str]:
+    """IDs of the tasks that depend on `task_id` (indexed lookup)."""
+    cursor.execute(
+        "SELECT task_id FROM task_dependencies WHERE depends_on_task_id = ? ORDER BY rowid",
+        (task_id,),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def delete_task_relations(cursor: sqlite3.Cursor, task_id: str) -> None:
+    """Removes a deleted task's notes, dependencies and child links, in both directions."""
+    cursor.execute("DELETE FROM task_notes WHERE task_id = ?", (task_id,))
+    cursor.execute(
+        "DELETE FROM task_dependencies WHERE task_id = ? OR depends_on_task_id = ?",
+        (task_id, task_id),
+    )
+    cursor.execute(
+        "DELETE FROM task_children WHERE parent_task_id = ? OR child_task_id = ?",
+        (task_id, task_id),
+    )
+
+
 def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
     """
     Fetches a single task's details from the database by task_id.
@@ -38,7 +185,9 @@ def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+        cursor.execute(
+            f"SELECT {TASK_SELECT_COLUMNS} FROM tasks WHERE task_id = ?", (task_id,)
+        )
         row = cursor.fetchone()
         if row:
             return _parse_task_json_fields(dict(row))
@@ -71,7 +220,7 @@ def get_all_tasks_from_db() -> List[Dict[str, Any]]:
         cursor = conn.cursor()
         # Query matches the one in server_lifecycle.application_startup and all_tasks_api_route
         cursor.execute(
-            "SELECT * FROM tasks ORDER BY created_at DESC"
+            f"SELECT {TASK_SELECT_COLUMNS} FROM tasks ORDER BY created_at DESC"
         )  # Order for consistency
         for row in cursor.fetchall():
             tasks_list.append(_parse_task_json_fields(dict(row)))
@@ -100,7 +249,7 @@ def get_tasks_by_agent_id(
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        query = "SELECT * FROM tasks WHERE assigned_to = ?"
+        query = f"SELECT {TASK_SELECT_COLUMNS} FROM tasks WHERE assigned_to = ?"
         params: List[Any] = [agent_id]
 
         if status_filter:
@@ -136,7 +285,7 @@ def update_task_fields_in_db(task_id: str, fields_to_update: Dict[str, Any]) ->
     """
     Updates specified fields for a task in the database.
     Automatically updates the 'updated_at' timestamp.
-    Handles JSON serialization for complex fields like 'notes', 'child_tasks', 'depends_on_tasks'.
+    'notes', 'child_tasks' and 'depends_on_tasks' replace the task's rows in the relation tables.
     Returns True on success, False on failure.
     """
     if not task_id or not fields_to_update:
@@ -152,8 +301,14 @@ def update_task_fields_in_db(task_id: str, fields_to_update: Dict[str, Any]) ->
 
         update_clauses: List[str] = []
         update_values: List[Any] = []
+        relation_updates: Dict[str, List[Any]] = {}
 
         for field, value in fields_to_update.items():
+            # Relations are stored in their own tables
+            if field in ["child_tasks", "depends_on_tasks", "notes"]:
+                relation_updates[field] = value or []
+                continue
+
             # Basic validation against known task fields from schema.py
             # This list should match columns in the 'tasks' table.
             valid_fields = [
@@ -163,9 +318,6 @@ def update_task_fields_in_db(task_id: str, fields_to_update: Dict[str, Any]) ->
                 "status",
                 "priority",
                 "parent_task",
-                "child_tasks",
-                "depends_on_tasks",
-                "notes",
             ]
             if field not in valid_fields:
                 logger.warning(
@@ -181,22 +333,14 @@ def update_task_fields_in_db(task_id: str, fields_to_update: Dict[str, Any]) ->
                 "status": "status",
                 "priority": "priority",
                 "parent_task": "parent_task",
-                "child_tasks": "child_tasks",
-                "depends_on_tasks": "depends_on_tasks",
-                "notes": "notes",
             }
             safe_field = safe_field_mapping[
                 field
             ]  # This will raise KeyError if invalid
             update_clauses.append(f"{safe_field} = ?")
-            if field in ["child_tasks", "depends_on_tasks", "notes"]:
-                update_values.append(
-                    json.dumps(value or [])
-                )  # Ensure JSON list for these
-            else:
-                update_values.append(value)
+            update_values.append(value)
 
-        if not update_clauses:
+        if not update_clauses and not relation_updates:
             logger.info(f"No valid fields to update for task {task_id}.")
             return False  # Or True, as no actual update was needed/performed
 
@@ -209,9 +353,27 @@ def update_task_fields_in_db(task_id: str, fields_to_update: Dict[str, Any]) ->
         sql = f"UPDATE tasks SET {', '.join(update_clauses)} WHERE task_id = ?"
 
         cursor.execute(sql, tuple(update_values))
+        task_found = cursor.rowcount > 0
+        if task_found:
+            if "child_tasks" in relation_updates:
+                set_task_children(cursor, task_id, relation_updates["child_tasks"])
+            if "depends_on_tasks" in relation_updates:
+                set_task_dependencies(
+                    cursor, task_id, relation_updates["depends_on_tasks"]
+                )
+            if "notes" in relation_updates:
+                cursor.execute("DELETE FROM task_notes WHERE task_id = ?", (task_id,))
+                for note in relation_updates["notes"]:
+                    add_task_note(
+                        cursor,
+                        task_id,
+                        note.get("author"),
+                        note.get("content"),
+                        note.get("timestamp"),
+                    )
         conn.commit()
 
-        if cursor.rowcount > 0:
+        if task_found:
             logger.info(
                 f"Task '{task_id}' updated in DB with fields: {list(fields_to_update.keys())}."
             )
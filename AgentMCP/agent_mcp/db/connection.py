@@ -1,5 +1,11 @@
 # Agent-MCP/mcp_template/mcp_server_src/db/connection.py
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
 
 # Import the sqlite_vec library if available.
 # This allows the module to be imported even if sqlite_vec is not installed,
@@ -14,7 +20,24 @@ from ..core.config import logger, get_db_path
 from ..core import globals as g  # For setting global VSS flags
 
 # Import write queue for serializing database write operations
-from .write_queue import execute_write_operation
+from .write_queue import (
+    LATENCY_MS_BUCKETS,
+    Histogram,
+    execute_batched_write_operation,
+    execute_write_operation,
+)
+
+# Connection pool: at most MCP_DB_POOL_SIZE read connections exist at once; they
+# are kept open and reused, each configured (pragmas, sqlite-vec) once when it is
+# opened. A checkout waits up to MCP_DB_POOL_TIMEOUT_SECONDS for a free one.
+DB_POOL_SIZE = int(os.environ.get("MCP_DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("MCP_DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("MCP_DB_BUSY_TIMEOUT_MS", "10000"))
+DB_CACHE_SIZE_KB = int(os.environ.get("MCP_DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE_MB = int(os.environ.get("MCP_DB_MMAP_SIZE_MB", "256"))
+DB_SYNCHRONOUS = os.environ.get("MCP_DB_SYNCHRONOUS", "NORMAL").upper()
+if DB_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    DB_SYNCHRONOUS = "NORMAL"
 
 # Module-level flags for VSS loadability, now directly using the global ones.
 # These are initialized in mcp_server_src.core.globals
@@ -93,81 +116,79 @@ def check_vss_loadability() -> bool:
     return g.global_vss_load_successful
 
 
-# Original location: main.py lines 228-263 (get_db_connection function)
-def get_db_connection() -> sqlite3.Connection:
-    """
-    Establishes and returns a connection to the SQLite database.
-    If `is_vss_loadable()` is true, it attempts to load the sqlite-vec extension for this connection.
-    """
-    db_file_path = get_db_path()  # Uses the function from core.config
+def _load_vec_extension(conn: sqlite3.Connection) -> bool:
+    """Loads sqlite-vec into `conn` if it was deemed loadable globally. Returns whether it is loaded."""
+    # Attempt to load VSS extension if it was deemed loadable globally and sqlite_vec is imported
+    if not (g.global_vss_load_successful and sqlite_vec):
+        if sqlite_vec:  # Only log this if sqlite_vec was imported but not deemed loadable
+            logger.debug(
+                "sqlite-vec extension not loaded for this connection (globally not loadable or library not found)."
+            )
+        return False
 
-    # Ensure the directory for the database exists
     try:
-        db_file_path.parent.mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        logger.error(
-            f"Failed to create directory for database at {db_file_path.parent}: {e}"
+        # From main.py:228 (original line numbers)
+        conn.enable_load_extension(True)
+        # From main.py:230 (original line numbers)
+        sqlite_vec.load(conn)
+        return True
+    except AttributeError:
+        # This specific connection's sqlite3 might not support it, even if the check passed.
+        # Or, sqlite_vec.load might fail for other reasons on this specific connection.
+        logger.warning(
+            "This sqlite3 connection instance does not support enable_load_extension, or sqlite_vec.load failed."
         )
-        raise RuntimeError(f"Could not create database directory: {e}") from e
+        # VSS features will not be available on this connection.
+    except sqlite3.Error as e_load:  # Catch sqlite3 specific errors during load
+        logger.error(f"SQLite error loading sqlite-vec for new connection: {e_load}")
+    except Exception as e_load_ext:  # From main.py:232 (original line numbers)
+        logger.error(f"Failed to load sqlite-vec for new connection: {e_load_ext}")
+    finally:
+        # Always disable extension loading after attempting, regardless of success.
+        # From main.py:235-238 (original line numbers)
+        try:
+            conn.enable_load_extension(False)
+        except (
+            sqlite3.Error,
+            AttributeError,
+        ):  # Catch errors if disabling also fails or not supported
+            pass
+    return False
+
 
+# Original location: main.py lines 228-263 (get_db_connection function)
+def _create_connection(db_file_path: Path) -> "PooledConnection":
+    """
+    Opens a new connection to the database and configures it once:
+    row factory, pragmas and (if loadable) the sqlite-vec extension.
+    """
     conn = None
     try:
         # From main.py:225 (original line numbers)
         conn = sqlite3.connect(
-            str(db_file_path), check_same_thread=False, timeout=10.0
-        )  # Added timeout
+            str(db_file_path),
+            check_same_thread=False,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+        )
         # From main.py:226 (original line numbers)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA journal_mode=WAL;")  # Improve concurrency and performance
         conn.execute("PRAGMA foreign_keys = ON;")  # Enforce foreign key constraints
-
-        # Attempt to load VSS extension if it was deemed loadable globally and sqlite_vec is imported
-        if g.global_vss_load_successful and sqlite_vec:
-            try:
-                # From main.py:228 (original line numbers)
-                conn.enable_load_extension(True)
-                # From main.py:230 (original line numbers)
-                sqlite_vec.load(conn)
-                # logger.debug("sqlite-vec loaded for this database connection.") # From main.py:231
-            except AttributeError:
-                # This specific connection's sqlite3 might not support it, even if the check passed.
-                # Or, sqlite_vec.load might fail for other reasons on this specific connection.
-                logger.warning(
-                    "This sqlite3 connection instance does not support enable_load_extension, or sqlite_vec.load failed."
-                )
-                # VSS features will not be available on this connection.
-            except sqlite3.Error as e_load:  # Catch sqlite3 specific errors during load
-                logger.error(
-                    f"SQLite error loading sqlite-vec for new connection: {e_load}"
-                )
-            except Exception as e_load_ext:  # From main.py:232 (original line numbers)
-                logger.error(
-                    f"Failed to load sqlite-vec for new connection: {e_load_ext}"
-                )
-            finally:
-                # Always disable extension loading after attempting, regardless of success.
-                # From main.py:235-238 (original line numbers)
-                try:
-                    conn.enable_load_extension(False)
-                except (
-                    sqlite3.Error,
-                    AttributeError,
-                ):  # Catch errors if disabling also fails or not supported
-                    pass
-        else:
-            if (
-                sqlite_vec
-            ):  # Only log this if sqlite_vec was imported but not deemed loadable
-                logger.debug(
-                    "sqlite-vec extension not loaded for this connection (globally not loadable or library not found)."
-                )
+        # WAL makes NORMAL durable against application crashes; only an OS crash
+        # or power loss can roll back the last commits
+        conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS};")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS};")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};")  # Negative: KiB
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE_MB * 1024 * 1024};")
+        conn.vec_loaded = _load_vec_extension(conn)
 
     except AttributeError as e_attr:  # From main.py:240, if sqlite3 itself is too old for enable_load_extension
         logger.error(
             f"The sqlite3 library version does not support enable_load_extension: {e_attr}. sqlite-vec cannot be used."
         )
         if conn:
-            conn.close()
+            conn.close_connection()
         # This is a critical issue if VSS is expected.
         raise RuntimeError(
             "SQLite version does not support extension loading."
@@ -178,7 +199,7 @@ def get_db_connection() -> sqlite3.Connection:
             exc_info=True,
         )
         if conn:
-            conn.close()
+            conn.close_connection()
         raise RuntimeError(f"Failed to connect to database: {e_op}") from e_op
     except (
         sqlite3.Error
@@ -188,7 +209,7 @@ def get_db_connection() -> sqlite3.Connection:
             exc_info=True,
         )
         if conn:
-            conn.close()
+            conn.close_connection()
         raise RuntimeError(
             f"Database connection error: {e_sql}"
         ) from e_sql  # Re-raise as a more generic runtime error
@@ -198,7 +219,7 @@ def get_db_connection() -> sqlite3.Connection:
             exc_info=True,
         )
         if conn:
-            conn.close()
+            conn.close_connection()
         raise RuntimeError(
             f"Unexpected database connection error: {e_unexpected}"
         ) from e_unexpected
@@ -211,6 +232,297 @@ def get_db_connection() -> sqlite3.Connection:
     return conn
 
 
+class PooledConnection(sqlite3.Connection):
+    """
+    A connection owned by a ConnectionPool.
+
+    Callers never get it directly: reads receive a ConnectionCheckout, and the
+    writer connection is only lent inside ConnectionPool.write(), so close() on
+    a pooled connection is a no-op. close_connection() really closes it.
+    """
+
+    pool: Optional["ConnectionPool"] = None
+    checked_out = False
+    vec_loaded = False
+
+    def close(self) -> None:
+        if self.pool is None:
+            self.close_connection()
+
+    def close_connection(self) -> None:
+        sqlite3.Connection.close(self)
+
+
+class ConnectionCheckout:
+    """
+    One checkout of a pooled connection; everything but close() is forwarded
+    to the connection. close() hands the connection back to the pool and
+    detaches this handle, so the existing `conn = get_db_connection() ...
+    conn.close()` call sites reuse connections without changes, and a repeated
+    close() cannot return a connection someone else has checked out since.
+    """
+
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn: PooledConnection, pool: "ConnectionPool"):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_pool", pool)
+
+    def _connection(self) -> PooledConnection:
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._connection(), name, value)
+
+    def __enter__(self) -> "ConnectionCheckout":
+        self._connection().__enter__()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self._connection().__exit__(*exc_info)
+
+    def close(self) -> None:
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.release(conn)
+
+
+def _reset_connection(conn: PooledConnection) -> bool:
+    """Undoes per-use state before a connection is reused. Returns False if it is broken."""
+    try:
+        if conn.in_transaction:
+            # Same outcome as closing a connection with uncommitted changes
+            conn.rollback()
+        conn.isolation_level = ""
+        conn.row_factory = sqlite3.Row
+        return True
+    except sqlite3.Error as e:
+        logger.warning(f"Discarding pooled database connection: {e}")
+        return False
+
+
+class ConnectionPool:
+    """
+    Long-lived, pre-configured connections to one database file.
+
+    Reads (and legacy callers that still commit on their own connection) check
+    out one of at most `size` connections: idle ones are reused LIFO, a new one
+    is opened while fewer than `size` exist, and otherwise the caller waits up
+    to `timeout` seconds for a release before sqlite3.OperationalError is
+    raised (a coroutine may hold a connection across an await, so an unbounded
+    wait on the event loop could never end). Writes from the write queue use a
+    single dedicated writer connection, outside that limit.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT_SECONDS,
+    ):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.closed = False
+        # Ensure the directory for the database exists
+        try:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.error(
+                f"Failed to create directory for database at {db_path.parent}: {e}"
+            )
+            raise RuntimeError(f"Could not create database directory: {e}") from e
+
+        self._idle: List[PooledConnection] = []
+        # One permit per read connection that may exist (idle or checked out)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._writer: Optional[PooledConnection] = None
+        self._writer_lock = threading.Lock()
+        self._in_use = 0
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "timed_out": 0,
+            "reused": 0,
+            "opened": 0,
+            "released": 0,
+            "discarded": 0,
+            "rolled_back_on_release": 0,
+            "writer_acquired": 0,
+        }
+        self._connect_ms = Histogram(LATENCY_MS_BUCKETS)
+        self._acquire_wait_ms = Histogram(LATENCY_MS_BUCKETS)
+        self._writer_wait_ms = Histogram(LATENCY_MS_BUCKETS)
+
+    def _open(self) -> PooledConnection:
+        started = time.perf_counter()
+        conn = _create_connection(self.db_path)
+        conn.pool = self
+        with self._lock:
+            self._stats["opened"] += 1
+            self._connect_ms.observe((time.perf_counter() - started) * 1000)
+        return conn
+
+    def acquire(self) -> ConnectionCheckout:
+        """Checks out a connection, waiting for a free one; return it with conn.close()."""
+        started = time.perf_counter()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise sqlite3.OperationalError(
+                f"No pooled database connection became free within {self.timeout}s "
+                f"(MCP_DB_POOL_SIZE={self.size})"
+            )
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                self._stats["acquired"] += 1
+                if waited:
+                    self._stats["waited"] += 1
+                    self._acquire_wait_ms.observe((time.perf_counter() - started) * 1000)
+                if conn is not None:
+                    self._stats["reused"] += 1
+                self._in_use += 1
+            if conn is not None and g.global_vss_load_successful and not conn.vec_loaded:
+                # Opened before the startup loadability check
+                conn.vec_loaded = _load_vec_extension(conn)
+            if conn is None:
+                try:
+                    conn = self._open()
+                except BaseException:
+                    with self._lock:
+                        self._in_use -= 1
+                    raise
+        except BaseException:
+            self._slots.release()
+            raise
+        conn.checked_out = True
+        return ConnectionCheckout(conn, self)
+
+    def release(self, conn: PooledConnection) -> None:
+        """Called once per checkout, by ConnectionCheckout.close()."""
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        in_transaction = conn.in_transaction
+        healthy = _reset_connection(conn)
+        try:
+            with self._lock:
+                self._in_use -= 1
+                self._stats["released"] += 1
+                if in_transaction:
+                    self._stats["rolled_back_on_release"] += 1
+                if healthy and not self.closed:
+                    self._idle.append(conn)
+                    return
+                self._stats["discarded"] += 1
+            conn.close_connection()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def read(self) -> Iterator[ConnectionCheckout]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def write(self) -> Iterator[PooledConnection]:
+        """Exclusive use of the dedicated writer connection (blocks the calling thread)."""
+        started = time.perf_counter()
+        with self._writer_lock:
+            with self._lock:
+                self._stats["writer_acquired"] += 1
+                self._writer_wait_ms.observe((time.perf_counter() - started) * 1000)
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            try:
+                yield conn
+            finally:
+                if not _reset_connection(conn):
+                    self._writer = None
+                    conn.close_connection()
+
+    def close(self) -> None:
+        """Closes idle connections and the writer; checked-out ones close when released."""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_connection()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close_connection()
+                self._writer = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "db_path": str(self.db_path),
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "timeout_seconds": self.timeout,
+                "acquire_wait_ms": self._acquire_wait_ms.to_dict(),
+                "writer_open": self._writer is not None,
+                "connect_ms": self._connect_ms.to_dict(),
+                "writer_wait_ms": self._writer_wait_ms.to_dict(),
+                "pragmas": {
+                    "synchronous": DB_SYNCHRONOUS,
+                    "busy_timeout_ms": DB_BUSY_TIMEOUT_MS,
+                    "cache_size_kb": DB_CACHE_SIZE_KB,
+                    "mmap_size_mb": DB_MMAP_SIZE_MB,
+                },
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """Returns the pool for the current database path, creating it on first use."""
+    global _pool
+    db_file_path = get_db_path()  # Uses the function from core.config
+    with _pool_lock:
+        if _pool is None or _pool.closed or _pool.db_path != db_file_path:
+            previous, _pool = _pool, ConnectionPool(db_file_path)
+            if previous is not None:
+                previous.close()
+        return _pool
+
+
+def close_connection_pool() -> None:
+    """Closes the pooled connections (application shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """
+    Returns a pooled connection to the SQLite database, with sqlite-vec loaded
+    if `is_vss_loadable()` is true. Calling close() on it returns it to the pool.
+    Prefer `with read_connection() as conn:` in new code.
+    """
+    return get_connection_pool().acquire()
+
+
 def get_db_connection_read() -> sqlite3.Connection:
     """
     Get a database connection for read operations.
@@ -219,6 +531,25 @@ def get_db_connection_read() -> sqlite3.Connection:
     return get_db_connection()
 
 
+def read_connection() -> ContextManager[sqlite3.Connection]:
+    """Context manager checking out a pooled connection for the duration of the block."""
+    return get_connection_pool().read()
+
+
+def write_connection() -> ContextManager[sqlite3.Connection]:
+    """
+    Context manager giving exclusive use of the dedicated writer connection.
+    Blocks the calling thread while another write holds it, so call it from a
+    worker thread (the write queue does); the block must commit or roll back.
+    """
+    return get_connection_pool().write()
+
+
+def get_db_pool_stats() -> Dict[str, Any]:
+    """Pool metrics for the dashboard."""
+    return get_connection_pool().get_stats()
+
+
 async def execute_db_write(operation_func):
     """
     Execute a database write operation through the write queue.
@@ -230,3 +561,17 @@ async def execute_db_write(operation_func):
         The result of the write operation
     """
     return await execute_write_operation(operation_func)
+
+
+async def execute_db_batched_write(operation_func):
+    """
+    Execute a database write that can be group-committed with other queued writes.
+
+    Args:
+        operation_func: A synchronous function receiving the connection of the
+            shared transaction. It must not commit, roll back or close it.
+
+    Returns:
+        The result of the write operation, after the batch has committed
+    """
+    return await execute_batched_write_operation(operation_func)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Migration script to move stored embeddings from JSON text to packed
+little-endian float32 blobs.
+
+This script:
+1. Converts JSON-encoded rows in rag_embedding_cache to float32 blobs
+2. Re-writes any rag_embeddings row that is not a float32 blob of the
+   configured dimension (sqlite-vec normalises JSON input to float32 on
+   insert, so on a healthy vec0 table this is a verification pass)
+3. Records the migration in rag_meta so it is not repeated
+
+Rows are processed in batches to keep memory bounded on large indexes.
+"""
+
+import datetime
+import sqlite3
+import sys
+from pathlib import Path
+
+# Add parent directories to path to import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from agent_mcp.db.connection import get_db_connection, check_vss_loadability
+from agent_mcp.core.config import logger, EMBEDDING_DIMENSION
+from agent_mcp.utils.vector_utils import pack_embedding, unpack_embedding
+
+MIGRATION_META_KEY = "migration_binary_embeddings"
+BATCH_SIZE = 1000
+
+
+def _table_exists(cursor: sqlite3.Cursor, table_name: str) -> bool:
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+    )
+    return cursor.fetchone() is not None
+
+
+def _migrate_embedding_cache(conn: sqlite3.Connection) -> int:
+    """Converts JSON text rows in rag_embedding_cache to float32 blobs."""
+    cursor = conn.cursor()
+    converted = 0
+    dropped = 0
+    while True:
+        cursor.execute(
+            "SELECT rowid, dimension, embedding FROM rag_embedding_cache WHERE typeof(embedding) = 'text' LIMIT ?",
+            (BATCH_SIZE,),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        updates = []
+        deletes = []
+        for row in rows:
+            vector = unpack_embedding(row["embedding"], row["dimension"])
+            if vector is None:
+                deletes.append((row["rowid"],))
+            else:
+                updates.append((pack_embedding(vector), row["rowid"]))
+        cursor.executemany(
+            "UPDATE rag_embedding_cache SET embedding = ? WHERE rowid = ?", updates
+        )
+        cursor.executemany("DELETE FROM rag_embedding_cache WHERE rowid = ?", deletes)
+        conn.commit()
+        converted += len(updates)
+        dropped += len(deletes)
+    if dropped:
+        logger.warning(f"Dropped {dropped} unreadable embedding cache rows.")
+    return converted
+
+
+def _migrate_vector_table(conn: sqlite3.Connection) -> int:
+    """Re-packs rag_embeddings rows that are not float32 blobs of the right size."""
+    cursor = conn.cursor()
+    expected_size = EMBEDDING_DIMENSION * 4
+    rewritten = 0
+    last_rowid = 0
+    while True:
+        cursor.execute(
+            "SELECT rowid, embedding FROM rag_embeddings WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, BATCH_SIZE),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1]["rowid"]
+        for row in rows:
+            stored = row["embedding"]
+            if isinstance(stored, bytes) and len(stored) == expected_size:
+                continue
+            vector = unpack_embedding(stored, EMBEDDING_DIMENSION)
+            if vector is None:
+                logger.warning(
+                    f"rag_embeddings row {row['rowid']} is unreadable; leaving it for the indexer to rebuild."
+                )
+                continue
+            # vec0 does not support UPDATE of vector columns on all versions
+            cursor.execute(
+                "DELETE FROM rag_embeddings WHERE rowid = ?", (row["rowid"],)
+            )
+            cursor.execute(
+                "INSERT INTO rag_embeddings (rowid, embedding) VALUES (?, ?)",
+                (row["rowid"], pack_embedding(vector)),
+            )
+            rewritten += 1
+        conn.commit()
+    return rewritten
+
+
+def migrate_database():
+    """Run the migration to binary float32 embedding storage."""
+    conn = None
+    try:
+        # rag_embeddings is a vec0 table; sqlite-vec must be loaded on the connection
+        if not check_vss_loadability():
+            logger.warning(
+                "sqlite-vec is not loadable; only the embedding cache can be migrated."
+            )
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT meta_value FROM rag_meta WHERE meta_key = ?", (MIGRATION_META_KEY,)
+        )
+        done_row = cursor.fetchone()
+        if done_row is not None:
+            logger.info(
+                f"Binary embedding migration already applied at {done_row['meta_value']}."
+            )
+            return
+
+        # 1. Embedding cache
+        if _table_exists(cursor, "rag_embedding_cache"):
+            converted = _migrate_embedding_cache(conn)
+            logger.info(f"Converted {converted} embedding cache rows to float32 blobs.")
+        else:
+            logger.info("rag_embedding_cache table does not exist. Nothing to convert.")
+
+        # 2. Vector table
+        if not _table_exists(cursor, "rag_embeddings"):
+            logger.info(
+                "rag_embeddings table does not exist. It will be populated with float32 blobs on first run."
+            )
+        elif not check_vss_loadability():
+            logger.warning(
+                "rag_embeddings cannot be read without sqlite-vec. Re-run this migration once it is installed."
+            )
+            conn.commit()
+            return
+        else:
+            rewritten = _migrate_vector_table(conn)
+            logger.info(f"Re-packed {rewritten} rag_embeddings rows as float32 blobs.")
+
+        # 3. Record completion
+        cursor.execute(
+            "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
+            (MIGRATION_META_KEY, datetime.datetime.now().isoformat()),
+        )
+        conn.commit()
+        logger.info("Migration completed successfully!")
+
+    except sqlite3.Error as e:
+        logger.error(f"Database error during migration: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error during migration: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    print("Agent-MCP Binary Embedding Storage Migration")
+    print("============================================")
+    print(
+        f"This will convert stored embeddings ({EMBEDDING_DIMENSION} dimensions) to packed float32 blobs."
+    )
+    print()
+
+    response = input("Do you want to proceed? (y/N): ")
+    if response.lower() == "y":
+        migrate_database()
+    else:
+        print("Migration cancelled.")
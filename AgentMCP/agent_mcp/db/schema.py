@@ -1,9 +1,13 @@
 # Agent-MCP/mcp_template/mcp_server_src/db/schema.py
+import datetime
+import json
 import sqlite3
+from typing import Optional
 
 # Imports from our own modules
 from ..core.config import logger, EMBEDDING_DIMENSION  # EMBEDDING_DIMENSION from config
 from .connection import get_db_connection, check_vss_loadability, is_vss_loadable
+from .actions.rag_db import bump_rag_index_version
 
 # No direct need for globals here, VSS loadability is checked via connection module functions.
 
@@ -104,6 +108,14 @@ def handle_embedding_dimension_change(conn: sqlite3.Connection) -> None:
         hash_count = cursor.rowcount
         logger.debug(f"Cleared {hash_count} stored file hashes")
 
+        # Clear the file manifest so every file is re-read on the next cycle
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_file_manifest'"
+        )
+        if cursor.fetchone() is not None:
+            cursor.execute("DELETE FROM rag_file_manifest")
+            logger.debug(f"Cleared {cursor.rowcount} file manifest entries")
+
         # Reset last indexed timestamps to force fresh indexing
         cursor.execute(
             "UPDATE rag_meta SET meta_value = '1970-01-01T00:00:00Z' WHERE meta_key LIKE 'last_indexed_%'"
@@ -111,6 +123,9 @@ def handle_embedding_dimension_change(conn: sqlite3.Connection) -> None:
         timestamp_count = cursor.rowcount
         logger.debug(f"Reset {timestamp_count} indexing timestamps")
 
+        # Invalidate cached RAG answers built on the old index
+        bump_rag_index_version(cursor)
+
         # Commit the changes
         conn.commit()
 
@@ -131,6 +146,290 @@ def handle_embedding_dimension_change(conn: sqlite3.Connection) -> None:
         raise RuntimeError(f"Embedding dimension migration failed: {e}") from e
 
 
+# unicode61 with '_' and '-' as token characters keeps identifiers such as
+# snake_case names and task IDs as single tokens, so exact lookups hit the index.
+FTS_TOKENIZER = "unicode61 tokenchars '_-'"
+
+
+def _table_exists(cursor: sqlite3.Cursor, table_name: str) -> bool:
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (table_name,),
+    )
+    return cursor.fetchone() is not None
+
+
+def ensure_fts_tables(cursor: sqlite3.Cursor) -> bool:
+    """
+    Creates the FTS5 full-text indexes used by hybrid RAG retrieval and the
+    live task lookup, plus the triggers that keep them in sync. Existing rows
+    are indexed the first time a table is created.
+
+    - rag_chunks_fts: external-content index over rag_chunks.chunk_text
+      (rowid = chunk_id, so no text is duplicated).
+    - tasks_fts: index over task_id, title and description.
+
+    Returns:
+        False if this SQLite build has no FTS5 support, True otherwise.
+    """
+    try:
+        chunks_fts_is_new = not _table_exists(cursor, "rag_chunks_fts")
+        cursor.execute(
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS rag_chunks_fts USING fts5(
+                chunk_text,
+                content='rag_chunks',
+                content_rowid='chunk_id',
+                tokenize="{FTS_TOKENIZER}"
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS rag_chunks_fts_ai AFTER INSERT ON rag_chunks BEGIN
+                INSERT INTO rag_chunks_fts (rowid, chunk_text) VALUES (new.chunk_id, new.chunk_text);
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS rag_chunks_fts_ad AFTER DELETE ON rag_chunks BEGIN
+                INSERT INTO rag_chunks_fts (rag_chunks_fts, rowid, chunk_text)
+                VALUES ('delete', old.chunk_id, old.chunk_text);
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS rag_chunks_fts_au AFTER UPDATE OF chunk_text ON rag_chunks BEGIN
+                INSERT INTO rag_chunks_fts (rag_chunks_fts, rowid, chunk_text)
+                VALUES ('delete', old.chunk_id, old.chunk_text);
+                INSERT INTO rag_chunks_fts (rowid, chunk_text) VALUES (new.chunk_id, new.chunk_text);
+            END
+        """
+        )
+        if chunks_fts_is_new:
+            cursor.execute(
+                "INSERT INTO rag_chunks_fts (rag_chunks_fts) VALUES ('rebuild')"
+            )
+            logger.info("Built full-text index rag_chunks_fts over existing chunks.")
+
+        # tasks has a TEXT primary key (its implicit rowid is not stable across
+        # VACUUM), so tasks_fts stores its own copy keyed by task_id.
+        tasks_fts_is_new = not _table_exists(cursor, "tasks_fts")
+        cursor.execute(
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                task_id,
+                title,
+                description,
+                tokenize="{FTS_TOKENIZER}"
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (task_id, title, description)
+                VALUES (new.task_id, new.title, COALESCE(new.description, ''));
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+                DELETE FROM tasks_fts
+                WHERE tasks_fts MATCH 'task_id:"' || replace(old.task_id, '"', '""') || '"'
+                  AND task_id = old.task_id;
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF task_id, title, description ON tasks BEGIN
+                DELETE FROM tasks_fts
+                WHERE tasks_fts MATCH 'task_id:"' || replace(old.task_id, '"', '""') || '"'
+                  AND task_id = old.task_id;
+                INSERT INTO tasks_fts (task_id, title, description)
+                VALUES (new.task_id, new.title, COALESCE(new.description, ''));
+            END
+        """
+        )
+        if tasks_fts_is_new:
+            cursor.execute(
+                "INSERT INTO tasks_fts (task_id, title, description) SELECT task_id, title, COALESCE(description, '') FROM tasks"
+            )
+            logger.info("Built full-text index tasks_fts over existing tasks.")
+        return True
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e).lower():
+            raise
+        logger.warning(
+            f"SQLite FTS5 is not available ({e}). RAG retrieval falls back to vector search and LIKE task lookups."
+        )
+        return False
+
+
+TASK_RELATIONS_MIGRATION_META_KEY = "migration_task_relations"
+TASK_RELATIONS_MIGRATION_BATCH_SIZE = 500
+LEGACY_TASK_RELATION_COLUMNS = ("child_tasks", "depends_on_tasks", "notes")
+
+
+def ensure_task_relation_tables(cursor: sqlite3.Cursor) -> None:
+    """
+    Creates the tables holding task relations (one row per child link,
+    dependency and note). rowid order is insertion order.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_children (
+            parent_task_id TEXT NOT NULL,
+            child_task_id TEXT NOT NULL,
+            UNIQUE (parent_task_id, child_task_id)
+        )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_children_child ON task_children (child_task_id)"
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_dependencies (
+            task_id TEXT NOT NULL,            -- The dependent task
+            depends_on_task_id TEXT NOT NULL, -- The task it waits for
+            UNIQUE (task_id, depends_on_task_id)
+        )
+    """
+    )
+    # "Which tasks depend on X"
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_dependencies_depends_on ON task_dependencies (depends_on_task_id)"
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_notes (
+            note_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT NOT NULL,
+            timestamp TEXT,
+            author TEXT,
+            content TEXT
+        )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_notes_task_id ON task_notes (task_id, note_id)"
+    )
+
+
+def _load_legacy_json_list(raw: Optional[str], task_id: str, column: str) -> list:
+    try:
+        value = json.loads(raw or "[]")
+    except json.JSONDecodeError:
+        logger.warning(
+            f"Could not parse legacy {column} JSON for task {task_id}; skipping it."
+        )
+        return []
+    return value if isinstance(value, list) else []
+
+
+def migrate_task_relations(conn: sqlite3.Connection) -> None:
+    """
+    Moves the legacy JSON columns tasks.child_tasks, depends_on_tasks and notes
+    into task_children, task_dependencies and task_notes.
+
+    Tasks are converted in batches, each committed on its own; a converted
+    task has its JSON columns set to NULL in the same transaction, so an
+    interrupted migration resumes where it stopped. No table is rebuilt.
+    Child links implied by tasks.parent_task are backfilled as well (not
+    every creation path used to update the parent's child_tasks).
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT meta_value FROM rag_meta WHERE meta_key = ?",
+        (TASK_RELATIONS_MIGRATION_META_KEY,),
+    )
+    if cursor.fetchone() is not None:
+        return
+
+    cursor.execute("PRAGMA table_info(tasks)")
+    legacy_columns = [
+        row[1] for row in cursor.fetchall() if row[1] in LEGACY_TASK_RELATION_COLUMNS
+    ]
+    migrated = 0
+    if legacy_columns:
+        pending_clause = " OR ".join(f"{column} IS NOT NULL" for column in legacy_columns)
+        null_clause = ", ".join(f"{column} = NULL" for column in legacy_columns)
+        while True:
+            cursor.execute(
+                f"SELECT task_id, {', '.join(legacy_columns)} FROM tasks WHERE {pending_clause} LIMIT ?",
+                (TASK_RELATIONS_MIGRATION_BATCH_SIZE,),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                task_id = row["task_id"]
+                if "child_tasks" in legacy_columns:
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO task_children (parent_task_id, child_task_id) VALUES (?, ?)",
+                        [
+                            (task_id, str(child_id))
+                            for child_id in _load_legacy_json_list(
+                                row["child_tasks"], task_id, "child_tasks"
+                            )
+                        ],
+                    )
+                if "depends_on_tasks" in legacy_columns:
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on_task_id) VALUES (?, ?)",
+                        [
+                            (task_id, str(dep_id))
+                            for dep_id in _load_legacy_json_list(
+                                row["depends_on_tasks"], task_id, "depends_on_tasks"
+                            )
+                        ],
+                    )
+                if "notes" in legacy_columns:
+                    cursor.executemany(
+                        "INSERT INTO task_notes (task_id, timestamp, author, content) VALUES (?, ?, ?, ?)",
+                        [
+                            (
+                                task_id,
+                                note.get("timestamp"),
+                                note.get("author"),
+                                note.get("content"),
+                            )
+                            for note in _load_legacy_json_list(
+                                row["notes"], task_id, "notes"
+                            )
+                            if isinstance(note, dict)
+                        ],
+                    )
+                cursor.execute(
+                    f"UPDATE tasks SET {null_clause} WHERE task_id = ?", (task_id,)
+                )
+            conn.commit()
+            migrated += len(rows)
+
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO task_children (parent_task_id, child_task_id)
+        SELECT parent_task, task_id FROM tasks
+        WHERE parent_task IS NOT NULL
+        ORDER BY created_at
+    """
+    )
+    cursor.execute(
+        "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
+        (TASK_RELATIONS_MIGRATION_META_KEY, datetime.datetime.now().isoformat()),
+    )
+    conn.commit()
+    if migrated:
+        logger.info(
+            f"Moved child tasks, dependencies and notes of {migrated} tasks into relation tables."
+        )
+
+
 def init_database() -> None:
     """
     Initializes the SQLite database and creates tables if they don't exist.
@@ -190,13 +489,13 @@ def init_database() -> None:
                 priority TEXT NOT NULL,   -- e.g., 'low', 'medium', 'high'
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL,
-                parent_task TEXT,         -- Task ID of parent task or None
-                child_tasks TEXT,         -- JSON List of child Task IDs
-                depends_on_tasks TEXT,    -- JSON List of Task IDs this task depends on
-                notes TEXT                -- JSON List of note objects: [{"timestamp": "", "author": "", "content": ""}]
+                parent_task TEXT          -- Task ID of parent task or None
             )
         """
         )
+        # Databases created before the relation tables below also have
+        # child_tasks, depends_on_tasks and notes JSON columns; they are
+        # emptied by migrate_task_relations() and no longer used.
         logger.debug("Tasks table ensured.")
 
         # Agent Actions Table (Original main.py lines 306-317)
@@ -296,6 +595,52 @@ def init_database() -> None:
         )
         logger.debug("Rag_meta table and default entries ensured.")
 
+        # Task relations (needs rag_meta, where the migration is recorded)
+        ensure_task_relation_tables(cursor)
+        migrate_task_relations(conn)
+        logger.debug("Task relation tables ensured.")
+
+        # RAG File Manifest Table (stat signature of every indexed file).
+        # The indexer only re-reads files whose (size, mtime_ns, inode) changed.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rag_file_manifest (
+                path TEXT PRIMARY KEY,     -- Project-relative POSIX path (matches rag_chunks.source_ref)
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                content_hash TEXT NOT NULL, -- SHA256 of the file content at last successful index
+                source_type TEXT NOT NULL,  -- 'markdown' or 'code'
+                indexed_at TEXT NOT NULL
+            )
+        """
+        )
+        logger.debug("Rag_file_manifest table ensured.")
+
+        # RAG Embedding Cache Table (content-addressed chunk vectors).
+        # Lets the indexer reuse vectors for unchanged chunk texts instead of
+        # calling the embedding API again when a file is re-chunked.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rag_embedding_cache (
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,   -- SHA256 of the chunk text
+                embedding BLOB NOT NULL,   -- Packed little-endian float32 vector
+                last_used_at TEXT NOT NULL,
+                PRIMARY KEY (model, dimension, text_hash)
+            )
+        """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rag_embedding_cache_last_used ON rag_embedding_cache (last_used_at)"
+        )
+        logger.debug("Rag_embedding_cache table and index ensured.")
+
+        # Full-text indexes for hybrid (BM25 + vector) retrieval and task lookups
+        if ensure_fts_tables(cursor):
+            logger.debug("FTS5 tables rag_chunks_fts and tasks_fts ensured.")
+
         # Agent Messages Table (for inter-agent communication)
         cursor.execute(
             """
@@ -1,8 +1,67 @@
 # Agent-MCP/mcp_template/mcp_server_src/db/write_queue.py
 import asyncio
-from typing import Any, Callable, Optional, Awaitable
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Awaitable, Sequence
 from ..core.config import logger
 
+# Group commit: the worker drains up to WRITE_QUEUE_MAX_BATCH queued batched
+# operations, waiting at most WRITE_QUEUE_BATCH_WINDOW_MS for more to arrive,
+# and runs them in a single SQLite transaction (one commit/fsync per batch).
+WRITE_QUEUE_MAX_BATCH = int(os.environ.get("MCP_WRITE_QUEUE_MAX_BATCH", "64"))
+WRITE_QUEUE_BATCH_WINDOW_MS = float(
+    os.environ.get("MCP_WRITE_QUEUE_BATCH_WINDOW_MS", "2")
+)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class Histogram:
+    """Fixed-bucket histogram (non-cumulative count per upper bound)."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"<={bound}": n for bound, n in zip(self.bounds, self.counts)}
+        buckets[f">{self.bounds[-1]}"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+
+class _WriteRequest:
+    """A queued write. `batched` ops take the shared connection and must not commit."""
+
+    __slots__ = ("operation", "future", "batched", "enqueued_at")
+
+    def __init__(self, operation: Callable, future: asyncio.Future, batched: bool):
+        self.operation = operation
+        self.future = future
+        self.batched = batched
+        self.enqueued_at = time.perf_counter()
+
 
 class DatabaseWriteQueue:
     """
@@ -10,18 +69,40 @@ class DatabaseWriteQueue:
 
     This class ensures that all write operations (INSERT, UPDATE, DELETE) are executed
     sequentially while allowing concurrent read operations to proceed normally.
+
+    Two kinds of operations are accepted:
+      * execute_write(async_fn): legacy operations that open, commit and close
+        their own connection. They run one at a time.
+      * execute_batched_write(fn): synchronous fn(conn) that only issues
+        statements. Consecutive batched operations are group-committed in one
+        transaction, each inside its own SAVEPOINT so a failing operation is
+        rolled back alone and the rest of the batch still commits.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_batch_size: int = WRITE_QUEUE_MAX_BATCH,
+        batch_window_ms: float = WRITE_QUEUE_BATCH_WINDOW_MS,
+        connection_factory: Optional[Callable[[], sqlite3.Connection]] = None,
+    ):
         self.queue: asyncio.Queue = asyncio.Queue()
         self.worker_task: Optional[asyncio.Task] = None
         self.running: bool = False
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self._connection_factory = connection_factory
         self._stats = {
             "total_operations": 0,
             "successful_operations": 0,
             "failed_operations": 0,
             "queue_high_water_mark": 0,
+            "batches": 0,
+            "batched_operations": 0,
+            "failed_batches": 0,
         }
+        self._batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self._commit_latency_hist = Histogram(LATENCY_MS_BUCKETS)
+        self._queue_wait_hist = Histogram(LATENCY_MS_BUCKETS)
 
     async def start(self) -> None:
         """Start the write queue worker task."""
@@ -40,17 +121,11 @@ class DatabaseWriteQueue:
 
         self.running = False
 
-        # Wait for remaining operations to complete
-        while not self.queue.empty():
-            await asyncio.sleep(0.1)
-
-        # Cancel the worker task
+        # The sentinel is queued behind every pending operation, so the worker
+        # drains the queue and then exits on its own
+        await self.queue.put(None)
         if self.worker_task:
-            self.worker_task.cancel()
-            try:
-                await self.worker_task
-            except asyncio.CancelledError:
-                pass
+            await self.worker_task
 
         logger.info("Database write queue stopped")
 
@@ -67,11 +142,33 @@ class DatabaseWriteQueue:
         Raises:
             Exception: Any exception raised by the write operation
         """
+        return await self._submit(write_operation, batched=False)
+
+    async def execute_batched_write(
+        self, write_operation: Callable[[sqlite3.Connection], Any]
+    ) -> Any:
+        """
+        Execute a write that can share a transaction with other queued writes.
+
+        Args:
+            write_operation: A synchronous function receiving the connection of
+                the open transaction. It must not commit, roll back or close it.
+
+        Returns:
+            The result of the write operation, once the batch has committed
+
+        Raises:
+            Exception: Any exception raised by the write operation, or the
+                commit error if the whole batch failed to commit
+        """
+        return await self._submit(write_operation, batched=True)
+
+    async def _submit(self, operation: Callable, batched: bool) -> Any:
         if not self.running:
             raise RuntimeError("Database write queue is not running")
 
-        future = asyncio.Future()
-        await self.queue.put((write_operation, future))
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_WriteRequest(operation, future, batched))
 
         # Update queue stats
         current_size = self.queue.qsize()
@@ -81,52 +178,167 @@ class DatabaseWriteQueue:
         return await future
 
     async def _worker(self) -> None:
-        """Worker task that processes write operations sequentially."""
+        """Worker task that drains the queue into batches and executes them in order."""
         logger.info("Database write queue worker started")
 
-        while self.running:
-            try:
-                # Wait for operation with timeout to allow clean shutdown
-                operation, future = await asyncio.wait_for(
-                    self.queue.get(), timeout=1.0
-                )
-
-                if future.cancelled():
-                    continue
-
-                self._stats["total_operations"] += 1
+        stopping = False
+        while not stopping:
+            request = await self.queue.get()
+            if request is None:
+                break
+            batch = [request]
+            stopping = await self._fill_batch(batch)
 
-                try:
-                    # Execute the write operation
-                    result = await operation()
-                    future.set_result(result)
-                    self._stats["successful_operations"] += 1
-
-                except Exception as e:
-                    logger.error(f"Database write operation failed: {e}", exc_info=True)
-                    future.set_exception(e)
-                    self._stats["failed_operations"] += 1
-
-                # Mark task as done
-                self.queue.task_done()
-
-            except asyncio.TimeoutError:
-                # Timeout is normal - allows checking if we should continue running
-                continue
+            try:
+                await self._execute_batch(batch)
             except Exception as e:
                 logger.error(
                     f"Unexpected error in database write worker: {e}", exc_info=True
                 )
-                continue
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
 
         logger.info("Database write queue worker stopped")
 
+    async def _fill_batch(self, batch: List[_WriteRequest]) -> bool:
+        """Add queued requests to the batch; returns True if the stop sentinel was reached."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return False
+            if request is None:
+                return True
+            batch.append(request)
+        return False
+
+    async def _execute_batch(self, batch: List[_WriteRequest]) -> None:
+        """Run legacy operations one by one and consecutive batched ones as a group."""
+        group: List[_WriteRequest] = []
+        for request in batch:
+            if request.future.cancelled():
+                continue
+            self._queue_wait_hist.observe(
+                (time.perf_counter() - request.enqueued_at) * 1000
+            )
+            if request.batched:
+                group.append(request)
+                continue
+            if group:
+                await self._commit_group(group)
+                group = []
+            await self._run_single(request)
+        if group:
+            await self._commit_group(group)
+
+    async def _run_single(self, request: _WriteRequest) -> None:
+        self._stats["total_operations"] += 1
+        try:
+            # Execute the write operation
+            result = await request.operation()
+        except Exception as e:
+            logger.error(f"Database write operation failed: {e}", exc_info=True)
+            self._stats["failed_operations"] += 1
+            if not request.future.done():
+                request.future.set_exception(e)
+            return
+        self._stats["successful_operations"] += 1
+        if not request.future.done():
+            request.future.set_result(result)
+
+    async def _commit_group(self, group: List[_WriteRequest]) -> None:
+        self._stats["total_operations"] += len(group)
+        self._stats["batches"] += 1
+        self._stats["batched_operations"] += len(group)
+        self._batch_size_hist.observe(len(group))
+
+        operations = [request.operation for request in group]
+        try:
+            outcomes, commit_ms = await asyncio.to_thread(
+                self._run_transaction, operations
+            )
+            self._commit_latency_hist.observe(commit_ms)
+        except Exception as e:
+            # BEGIN/COMMIT failed: nothing from this batch was persisted
+            logger.error(
+                f"Database write batch of {len(group)} operations failed to commit: {e}",
+                exc_info=True,
+            )
+            self._stats["failed_batches"] += 1
+            outcomes = [(False, e)] * len(group)
+
+        # Futures are resolved on the event loop, only after the commit
+        for request, (ok, value) in zip(group, outcomes):
+            if ok:
+                self._stats["successful_operations"] += 1
+            else:
+                self._stats["failed_operations"] += 1
+            if request.future.done():
+                continue
+            if ok:
+                request.future.set_result(value)
+            else:
+                request.future.set_exception(value)
+
+    def _connection(self) -> ContextManager[sqlite3.Connection]:
+        if self._connection_factory is not None:
+            return closing(self._connection_factory())
+        # Imported here: connection.py imports this module
+        from .connection import write_connection
+
+        return write_connection()
+
+    def _run_transaction(self, operations: List[Callable]) -> tuple:
+        """Runs in a worker thread: one transaction, one savepoint per operation."""
+        with self._connection() as conn:
+            conn.isolation_level = None  # Transactions are managed explicitly below
+            conn.execute("BEGIN IMMEDIATE")
+            outcomes = []
+            try:
+                for i, operation in enumerate(operations):
+                    savepoint = f"write_op_{i}"
+                    conn.execute(f"SAVEPOINT {savepoint}")
+                    try:
+                        result = operation(conn)
+                    except Exception as e:
+                        logger.error(
+                            f"Database write operation failed: {e}", exc_info=True
+                        )
+                        conn.execute(f"ROLLBACK TO {savepoint}")
+                        conn.execute(f"RELEASE {savepoint}")
+                        outcomes.append((False, e))
+                    else:
+                        conn.execute(f"RELEASE {savepoint}")
+                        outcomes.append((True, result))
+                commit_started = time.perf_counter()
+                conn.execute("COMMIT")
+                commit_ms = (time.perf_counter() - commit_started) * 1000
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            return outcomes, commit_ms
+
     def get_stats(self) -> dict:
         """Get statistics about the write queue."""
         return {
             **self._stats,
             "current_queue_size": self.queue.qsize(),
             "is_running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.batch_window * 1000,
+            "batch_size_histogram": self._batch_size_hist.to_dict(),
+            "commit_latency_ms_histogram": self._commit_latency_hist.to_dict(),
+            "queue_wait_ms_histogram": self._queue_wait_hist.to_dict(),
         }
 
     def get_queue_size(self) -> int:
@@ -160,6 +372,23 @@ async def execute_write_operation(operation: Callable[[], Awaitable[Any]]) -> An
     return await queue.execute_write(operation)
 
 
+async def execute_batched_write_operation(
+    operation: Callable[[sqlite3.Connection], Any],
+) -> Any:
+    """
+    Execute a group-committable write operation through the global write queue.
+
+    Args:
+        operation: A synchronous function that issues its statements on the
+            given connection without committing
+
+    Returns:
+        The result of the write operation
+    """
+    queue = get_write_queue()
+    return await queue.execute_batched_write(operation)
+
+
 async def db_write(operation_func: Callable[[], Awaitable[Any]]) -> Any:
     """
     Convenience function to execute database write operations through the queue.
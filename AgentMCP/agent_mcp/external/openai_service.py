@@ -1,6 +1,12 @@
 # Agent-MCP/mcp_template/mcp_server_src/external/openai_service.py
 import os
-from typing import Optional  # Added import for Optional
+import re
+import time
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+import httpx
 
 # Import OpenAI library.
 # It's good practice to handle potential ImportError if it's an optional dependency,
@@ -20,9 +26,22 @@ except ImportError:
     )
     openai = None  # Make openai None so subsequent checks fail gracefully
 
+# Optional: tiktoken gives exact token counts for embedding batch sizing
+try:
+    import tiktoken
+
+    _tiktoken_encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _tiktoken_encoding = None
+
 # Import configurations and global variables
 from ..core.config import (
     logger,
+    MAX_EMBEDDING_BATCH_TOKENS,
+    MAX_EMBEDDING_BATCH_INPUTS,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_DEFAULT_RPM,
+    EMBEDDING_DEFAULT_TPM,
 )  # Removed OPENAI_API_KEY_ENV - it's defined locally below
 
 # The openai_client instance will be stored in g.openai_client_instance
@@ -80,10 +99,310 @@ def get_openai_client() -> Optional[openai.OpenAI]:
     return openai_client
 
 
+# --- Shared async embedding client ---
+# One long-lived AsyncOpenAI client (and therefore one keep-alive HTTP connection
+# pool) is shared by every embedding call, instead of a new client and TLS
+# handshake per batch. Calls go through an adaptive token-bucket limiter fed by
+# the API's x-ratelimit-* headers, and 429/5xx responses are retried with
+# jittered exponential backoff.
+
+_async_openai_client: Optional["openai.AsyncOpenAI"] = None
+
+EMBEDDING_HTTP_MAX_CONNECTIONS = 50
+EMBEDDING_HTTP_MAX_KEEPALIVE = 25
+EMBEDDING_HTTP_TIMEOUT_SECONDS = 60.0
+_BACKOFF_BASE_SECONDS = 0.5
+_BACKOFF_MAX_SECONDS = 30.0
+
+
+def get_async_openai_client() -> Optional["openai.AsyncOpenAI"]:
+    """
+    Returns the shared AsyncOpenAI client, creating it on first use.
+    Returns None if the library or the API key is unavailable.
+    """
+    global _async_openai_client
+    if _async_openai_client is not None:
+        return _async_openai_client
+    if openai is None:
+        return None
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        return None
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=EMBEDDING_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=EMBEDDING_HTTP_MAX_KEEPALIVE,
+        ),
+        timeout=EMBEDDING_HTTP_TIMEOUT_SECONDS,
+    )
+    # Retries are handled by create_embeddings so they respect the shared limiter
+    _async_openai_client = openai.AsyncOpenAI(
+        api_key=api_key, http_client=http_client, max_retries=0
+    )
+    logger.info("Shared async OpenAI client initialized (pooled HTTP connections).")
+    return _async_openai_client
+
+
+async def close_async_openai_client() -> None:
+    """Closes the shared async client and its connection pool."""
+    global _async_openai_client
+    if _async_openai_client is not None:
+        try:
+            await _async_openai_client.close()
+        except Exception as e:
+            logger.warning(f"Error closing async OpenAI client: {e}")
+        _async_openai_client = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the token count of a text. Uses tiktoken when installed,
+    otherwise a conservative ~3 characters per token heuristic.
+    """
+    if _tiktoken_encoding is not None:
+        return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+    return len(text) // 3 + 1
+
+
+def batch_texts_by_tokens(
+    texts: List[str],
+    max_tokens: int = MAX_EMBEDDING_BATCH_TOKENS,
+    max_inputs: int = MAX_EMBEDDING_BATCH_INPUTS,
+) -> List[Tuple[int, int, int]]:
+    """
+    Splits texts into consecutive batches bounded by estimated tokens and
+    input count.
+
+    Returns:
+        A list of (start_index, end_index_exclusive, estimated_tokens).
+    """
+    batches: List[Tuple[int, int, int]] = []
+    batch_start = 0
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        text_tokens = estimate_tokens(text)
+        batch_len = i - batch_start
+        if batch_len and (
+            batch_tokens + text_tokens > max_tokens or batch_len >= max_inputs
+        ):
+            batches.append((batch_start, i, batch_tokens))
+            batch_start = i
+            batch_tokens = 0
+        batch_tokens += text_tokens
+    if batch_start < len(texts):
+        batches.append((batch_start, len(texts), batch_tokens))
+    return batches
+
+
+def _parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parses OpenAI reset durations such as '1s', '6m0s', '20ms' into seconds."""
+    if not value:
+        return None
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+class _TokenBucket:
+    """Async token bucket; capacity and refill rate can be retuned at runtime."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = anyio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self._last_refill) * self.refill_per_second,
+        )
+        self._last_refill = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        # Holding the lock while waiting keeps acquisition FIFO
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                deficit = amount - self.tokens
+                await anyio.sleep(deficit / max(self.refill_per_second, 1e-6))
+
+    def sync_with_server(
+        self, limit: Optional[float], remaining: Optional[float], reset: Optional[float]
+    ) -> None:
+        self._refill()
+        if limit and limit > 0:
+            self.capacity = limit
+            # OpenAI limits are per minute; the reset time tells how fast the
+            # server refills the used part of the window.
+            used = limit - (remaining if remaining is not None else limit)
+            if reset and reset > 0 and used > 0:
+                self.refill_per_second = max(limit / 60.0, used / reset)
+            else:
+                self.refill_per_second = limit / 60.0
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+    def drain(self) -> None:
+        self._refill()
+        self.tokens = 0
+
+
+class EmbeddingRateLimiter:
+    """
+    Request and token buckets for the embeddings endpoint, adapted from the
+    x-ratelimit-* response headers.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = _TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = _TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+    def update_from_headers(self, headers: Any) -> None:
+        def _num(name: str) -> Optional[float]:
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        self.requests.sync_with_server(
+            _num("x-ratelimit-limit-requests"),
+            _num("x-ratelimit-remaining-requests"),
+            _parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+        )
+        self.tokens.sync_with_server(
+            _num("x-ratelimit-limit-tokens"),
+            _num("x-ratelimit-remaining-tokens"),
+            _parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+        )
+
+    def record_request(self) -> None:
+        self._stats["requests"] += 1
+
+    def record_retry(self) -> None:
+        self._stats["retries"] += 1
+
+    def record_failure(self) -> None:
+        self._stats["failures"] += 1
+
+    def on_rate_limited(self) -> None:
+        self._stats["rate_limited"] += 1
+        self.requests.drain()
+        self.tokens.drain()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+        }
+
+
+embedding_rate_limiter = EmbeddingRateLimiter(
+    EMBEDDING_DEFAULT_RPM, EMBEDDING_DEFAULT_TPM
+)
+
+
+def _retry_delay(attempt: int, headers: Any = None) -> float:
+    """Server-provided retry-after if present, else full-jitter exponential backoff."""
+    if headers is not None:
+        retry_after_ms = headers.get("retry-after-ms")
+        retry_after = headers.get("retry-after")
+        try:
+            if retry_after_ms is not None:
+                return float(retry_after_ms) / 1000.0
+            if retry_after is not None:
+                return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+    ceiling = min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * (2**attempt))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+async def create_embeddings(
+    texts: List[str],
+    model: str,
+    dimensions: Optional[int] = None,
+    encoding_format: Optional[str] = None,
+    estimated_tokens: Optional[int] = None,
+) -> Any:
+    """
+    Calls the embeddings endpoint through the shared client and rate limiter,
+    retrying 429, 5xx and connection errors with jittered backoff.
+
+    Returns:
+        The parsed CreateEmbeddingResponse.
+
+    Raises:
+        RuntimeError: If the OpenAI client is unavailable.
+        openai.APIError: If the request fails permanently or retries run out.
+    """
+    client = get_async_openai_client()
+    if client is None:
+        raise RuntimeError("Async OpenAI client not available for embeddings.")
+    if estimated_tokens is None:
+        estimated_tokens = sum(estimate_tokens(text) for text in texts)
+
+    request_kwargs: Dict[str, Any] = {"input": texts, "model": model}
+    if dimensions is not None:
+        request_kwargs["dimensions"] = dimensions
+    if encoding_format is not None:
+        request_kwargs["encoding_format"] = encoding_format
+
+    limiter = embedding_rate_limiter
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        await limiter.acquire(estimated_tokens)
+        limiter.record_request()
+        try:
+            raw_response = await client.embeddings.with_raw_response.create(
+                **request_kwargs
+            )
+            limiter.update_from_headers(raw_response.headers)
+            return raw_response.parse()
+        except openai.APIStatusError as e:
+            retryable = e.status_code == 429 or e.status_code >= 500
+            headers = e.response.headers if e.response is not None else None
+            if headers is not None:
+                limiter.update_from_headers(headers)
+            if e.status_code == 429:
+                limiter.on_rate_limited()
+            if not retryable or attempt == EMBEDDING_MAX_RETRIES:
+                limiter.record_failure()
+                raise
+            delay = _retry_delay(attempt, headers)
+            logger.warning(
+                f"Embedding request failed with HTTP {e.status_code}; retrying in {delay:.1f}s (attempt {attempt + 1}/{EMBEDDING_MAX_RETRIES})."
+            )
+        except openai.APIConnectionError as e:
+            if attempt == EMBEDDING_MAX_RETRIES:
+                limiter.record_failure()
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning(
+                f"Embedding request connection error ({e}); retrying in {delay:.1f}s (attempt {attempt + 1}/{EMBEDDING_MAX_RETRIES})."
+            )
+        limiter.record_retry()
+        await anyio.sleep(delay)
+
+
 # Any other OpenAI specific helper functions that don't belong in RAG or tools
 # could go here. For example, if you had a generic text generation or embedding
 # function used by multiple parts of the system outside of the RAG context.
-# For now, client initialization and access are the main concerns.
 
 # Example of how this is intended to be used at startup:
 # In server_lifecycle.py or cli.py:
@@ -6,6 +6,7 @@ from typing import List, Dict, Any, Set, Tuple  # Added Set, Tuple
 # Import from our project structure
 from ...core.config import logger  # Central logger
 from ...db.connection import get_db_connection  # To get DB connections
+from ...db.actions.task_db import TASK_DEPENDENCIES_JSON_SQL
 from .styles import get_node_style  # Import the styling function from this package
 
 # Note: The original dashboard_api.py had a logger instance:
@@ -88,7 +89,8 @@ async def fetch_graph_data_logic(
 
         # 2. Tasks (Original dashboard_api.py: lines 78-105)
         cursor.execute(
-            "SELECT task_id, title, status, assigned_to, created_by, parent_task, depends_on_tasks, description FROM tasks"
+            "SELECT task_id, title, status, assigned_to, created_by, parent_task, "
+            f"{TASK_DEPENDENCIES_JSON_SQL} AS depends_on_tasks, description FROM tasks"
         )
         task_rows = cursor.fetchall()
         # task_node_map: Dict[str, str] = {} # Not strictly needed if nodes are added to node_ids immediately
@@ -385,7 +387,9 @@ async def fetch_task_tree_data_logic() -> Dict[str, List[Dict[str, Any]]]:
         # 1. Tasks (Original dashboard_api.py: lines 182-200)
         # Order by created_at for potential layout hints or consistent processing
         cursor.execute(
-            "SELECT task_id, title, status, parent_task, depends_on_tasks, description, created_at FROM tasks ORDER BY created_at ASC"
+            "SELECT task_id, title, status, parent_task, "
+            f"{TASK_DEPENDENCIES_JSON_SQL} AS depends_on_tasks, description, created_at "
+            "FROM tasks ORDER BY created_at ASC"
         )
         task_rows = cursor.fetchall()
         # task_node_map: Dict[str, str] = {} # Not strictly needed if using node_ids set
@@ -0,0 +1,192 @@
+# Agent-MCP/agent_mcp/features/rag/chunk_pipeline.py
+import os
+import json
+import hashlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Dict, Tuple, Any, Optional, AsyncIterator, NamedTuple
+
+import anyio
+import anyio.to_process
+import anyio.to_thread
+from anyio.streams.memory import MemoryObjectReceiveStream
+
+from ...core.config import logger
+from .chunking import simple_chunker, markdown_aware_chunker
+from .code_chunking import (
+    chunk_code_aware,
+    extract_code_entities,
+    create_file_summary,
+)
+
+# Reading, hashing, chunking and entity extraction are CPU-bound and run in
+# worker processes so a large initial index does not stall the event loop.
+# Results stream back as they complete; at most RAG_CHUNK_WORKERS files are
+# being processed and RAG_CHUNK_MAX_IN_FLIGHT results are buffered at a time.
+# MCP_RAG_CHUNK_WORKERS=0 runs the same work in a thread instead.
+RAG_CHUNK_WORKERS = int(
+    os.environ.get("MCP_RAG_CHUNK_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+)
+RAG_CHUNK_MAX_IN_FLIGHT = int(
+    os.environ.get("MCP_RAG_CHUNK_MAX_IN_FLIGHT", str(max(1, RAG_CHUNK_WORKERS) * 2))
+)
+
+ChunkWithMetadata = Tuple[str, Dict[str, Any]]
+
+
+class FileChunkJob(NamedTuple):
+    """A file whose stat signature changed and needs to be re-read."""
+
+    source_ref: str  # Project-relative POSIX path
+    source_type: str  # "code" or "markdown"
+    stored_hash: Optional[str]  # Hash recorded in rag_meta, if any
+
+
+class FileChunkResult(NamedTuple):
+    """Outcome of reading and chunking one file in a worker."""
+
+    source_ref: str
+    source_type: str
+    content_hash: Optional[str]  # None if the file could not be read
+    content_size: int
+    # None when the content hash matches the stored hash (nothing to re-index)
+    chunks: Optional[List[ChunkWithMetadata]]
+    error: Optional[str]
+
+
+def chunk_source(
+    source_type: str,
+    source_ref: str,
+    content: str,
+    file_path: Optional[Path],
+    advanced: bool,
+) -> List[ChunkWithMetadata]:
+    """
+    Splits a source into chunks with metadata.
+    Advanced mode uses markdown/code aware chunking and adds a code file
+    summary chunk; simple mode uses character chunking for every type.
+    """
+    if not advanced:
+        # Original/Simple mode: Basic chunking for all types
+        return [
+            (chunk, {"source_type": source_type}) for chunk in simple_chunker(content)
+        ]
+
+    if source_type == "markdown":
+        return [
+            (chunk, {"source_type": "markdown"})
+            for chunk in markdown_aware_chunker(content)
+        ]
+    if source_type == "code":
+        file_path = file_path or Path(source_ref)
+        # First, create a file summary
+        entities = extract_code_entities(content, file_path)
+        file_summary = create_file_summary(content, file_path, entities)
+        summary_text = f"File: {source_ref}\n{json.dumps(file_summary, indent=2)}"
+        chunks_with_metadata: List[ChunkWithMetadata] = [
+            (summary_text, {"source_type": "code_summary", **file_summary})
+        ]
+        # Then chunk the code
+        chunks_with_metadata.extend(chunk_code_aware(content, file_path))
+        return chunks_with_metadata
+    # Simple chunking for other types
+    return [
+        (chunk, {"source_type": source_type}) for chunk in simple_chunker(content)
+    ]
+
+
+def _load_and_chunk_file(
+    project_dir: str, job: FileChunkJob, advanced: bool
+) -> FileChunkResult:
+    """Worker entry point: read, hash and (if changed) chunk one file."""
+    file_path = Path(project_dir) / job.source_ref
+    try:
+        content = file_path.read_text(encoding="utf-8")
+    except Exception as e:
+        return FileChunkResult(
+            job.source_ref, job.source_type, None, 0, None, f"{type(e).__name__}: {e}"
+        )
+
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    if content_hash == job.stored_hash:
+        return FileChunkResult(
+            job.source_ref, job.source_type, content_hash, len(content), None, None
+        )
+    try:
+        chunks = chunk_source(
+            job.source_type, job.source_ref, content, file_path, advanced
+        )
+    except Exception as e:
+        return FileChunkResult(
+            job.source_ref,
+            job.source_type,
+            content_hash,
+            len(content),
+            None,
+            f"chunking failed: {type(e).__name__}: {e}",
+        )
+    return FileChunkResult(
+        job.source_ref, job.source_type, content_hash, len(content), chunks, None
+    )
+
+
+@asynccontextmanager
+async def open_chunk_pipeline(
+    project_dir: Path,
+    jobs: List[FileChunkJob],
+    advanced: bool,
+    workers: int = RAG_CHUNK_WORKERS,
+    max_in_flight: int = RAG_CHUNK_MAX_IN_FLIGHT,
+) -> AsyncIterator[MemoryObjectReceiveStream]:
+    """
+    Reads and chunks files in a process pool and yields a stream of
+    FileChunkResult in completion order. Workers block once max_in_flight
+    results are waiting, so memory stays bounded while the consumer embeds
+    earlier results.
+
+    Usage:
+        async with open_chunk_pipeline(project_dir, jobs, advanced) as results:
+            async for result in results:
+                ...
+    """
+    # A job holds its slot until its result is queued, so finished payloads
+    # waiting on a full stream also stop new files from being read.
+    job_slots = anyio.CapacityLimiter(max(1, workers))
+    worker_limiter = anyio.CapacityLimiter(max(1, workers))
+    send_stream, receive_stream = anyio.create_memory_object_stream(
+        max(1, max_in_flight)
+    )
+    project_dir_str = str(project_dir)
+    run_sync = anyio.to_process.run_sync if workers > 0 else anyio.to_thread.run_sync
+
+    async def _run_job(job: FileChunkJob) -> None:
+        async with job_slots:
+            result = await run_sync(
+                _load_and_chunk_file,
+                project_dir_str,
+                job,
+                advanced,
+                limiter=worker_limiter,
+            )
+            try:
+                await send_stream.send(result)
+            except anyio.BrokenResourceError:
+                pass  # Consumer stopped early
+
+    async def _produce() -> None:
+        async with send_stream:
+            async with anyio.create_task_group() as tg_jobs:
+                for job in jobs:
+                    tg_jobs.start_soon(_run_job, job)
+
+    if jobs:
+        logger.info(
+            f"Chunking {len(jobs)} files with {max(1, workers)} {'worker processes' if workers > 0 else 'worker threads'}..."
+        )
+    async with anyio.create_task_group() as tg_pipeline:
+        tg_pipeline.start_soon(_produce)
+        try:
+            async with receive_stream:
+                yield receive_stream
+        finally:
+            tg_pipeline.cancel_scope.cancel()
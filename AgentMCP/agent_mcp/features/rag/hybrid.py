@@ -0,0 +1,48 @@
+# Agent-MCP/agent_mcp/features/rag/hybrid.py
+from typing import Any, Dict, Hashable, List, Sequence
+
+# Reciprocal-rank fusion (Cormack et al., 2009): each retriever contributes
+# 1 / (RRF_K + rank) per result, so BM25 scores and vector distances, which
+# live on unrelated scales, never have to be normalised against each other.
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Dict[str, Any]]],
+    key_field: str = "chunk_id",
+    limit: int = 13,
+    rrf_k: int = RRF_K,
+) -> List[Dict[str, Any]]:
+    """
+    Fuses several best-first result lists into one ranking.
+
+    Args:
+        ranked_lists: Result dicts from each retriever, best match first.
+        key_field: Field identifying the same item across lists.
+        limit: Number of fused results to return.
+        rrf_k: Damping constant; larger values flatten the rank contribution.
+
+    Returns:
+        Result dicts ordered by fused score, each with an added "rrf_score".
+        When an item appears in several lists, fields from the first list
+        that contains it win (e.g. the vector "distance").
+    """
+    scores: Dict[Hashable, float] = {}
+    merged: Dict[Hashable, Dict[str, Any]] = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, start=1):
+            item_key = item[key_field]
+            scores[item_key] = scores.get(item_key, 0.0) + 1.0 / (rrf_k + rank)
+            if item_key in merged:
+                for field, value in item.items():
+                    merged[item_key].setdefault(field, value)
+            else:
+                merged[item_key] = dict(item)
+
+    fused_keys = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+    fused: List[Dict[str, Any]] = []
+    for item_key in fused_keys:
+        item = merged[item_key]
+        item["rrf_score"] = round(scores[item_key], 6)
+        fused.append(item)
+    return fused
@@ -4,11 +4,11 @@ import time
 import datetime
 import json
 import hashlib
-import glob
+import base64
 import os
 import sqlite3
 from pathlib import Path
-from typing import List, Dict, Tuple, Any, Optional, NoReturn
+from typing import List, Dict, Set, Tuple, Any, Optional, NoReturn, Iterable
 
 # Attempt to import the OpenAI library
 try:
@@ -16,6 +16,13 @@ try:
 except ImportError:
     openai = None
 
+# Optional: watchfiles powers the filesystem-watch indexing mode.
+# Without it, the watch mode falls back to periodic scanning.
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
 # Imports from our own project modules
 from ...core.config import (
     logger,
@@ -27,22 +34,33 @@ from ...core.config import (
 )
 from ...core import globals as g  # For server_running flag
 from ...db.connection import get_db_connection, is_vss_loadable
+from ...db.actions.task_db import TASK_DEPENDENCIES_JSON_SQL
+from ...utils.vector_utils import pack_embedding
+from ...db.actions.rag_db import (
+    get_file_manifest,
+    upsert_file_manifest_entries,
+    remove_deleted_files_from_index,
+    get_cached_embeddings,
+    store_cached_embeddings,
+    touch_cached_embeddings,
+    prune_embedding_cache,
+    harvest_source_embeddings_into_cache,
+    bulk_insert_chunks_with_embeddings,
+    bump_rag_index_version,
+)
 
 # We need the actual OpenAI client, not just the service module, for batching logic.
 # The client instance is stored in g.openai_client_instance by openai_service.initialize_openai_client()
 from ...external.openai_service import (
     get_openai_client,
+    create_embeddings,
+    batch_texts_by_tokens,
 )  # To get the initialized client
 
 # Import chunking functions from this RAG feature package
-from .chunking import simple_chunker, markdown_aware_chunker
-from .code_chunking import (
-    chunk_code_aware,
-    extract_code_entities,
-    create_file_summary,
-    CODE_EXTENSIONS,
-    DOCUMENT_EXTENSIONS,
-)
+from .chunking import simple_chunker
+from .code_chunking import CODE_EXTENSIONS, DOCUMENT_EXTENSIONS
+from .chunk_pipeline import FileChunkJob, chunk_source, open_chunk_pipeline
 
 # Placeholder/Feature Flag para resolver erro de linter
 # Esta variável pode ser movida para config.py se a funcionalidade for implementada
@@ -73,23 +91,175 @@ IGNORE_DIRS_FOR_INDEXING = [
     ".agent",  # Also ignore the .agent directory itself
 ]
 
-# Increased concurrency for Tier 3 pricing (5000 RPM)
-# Original main.py: 654
+# Upper bound on in-flight embedding requests; actual throughput is paced by
+# the shared rate limiter in openai_service. Batches are sized by tokens
+# (MAX_EMBEDDING_BATCH_TOKENS / MAX_EMBEDDING_BATCH_INPUTS), not a fixed count.
 MAX_CONCURRENT_EMBEDDING_REQUESTS = 25
-# Use smaller batch size for more parallelism
-# Original main.py: 660
-PARALLEL_EMBEDDING_BATCH_SIZE = 50
+# Upper bound on rows kept in rag_embedding_cache (least recently used are pruned)
+EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.environ.get("MCP_RAG_EMBEDDING_CACHE_MAX_ENTRIES", "200000")
+)
+# Chunks accumulated from the chunking pipeline before they are embedded and stored
+RAG_EMBED_FLUSH_CHUNKS = int(os.environ.get("MCP_RAG_EMBED_FLUSH_CHUNKS", "5000"))
+# Filesystem-watch mode: seconds between full-tree reconciles against the
+# manifest, catching events the watcher missed. 0 (default) disables them.
+RAG_WATCH_RECONCILE_SECONDS = int(
+    os.environ.get("MCP_RAG_WATCH_RECONCILE_SECONDS", "0")
+)
+
+
+def _get_extensions_to_scan() -> Set[str]:
+    """Returns the file extensions indexed in the current embedding mode."""
+    extensions_to_scan = set(DOCUMENT_EXTENSIONS)
+    if ADVANCED_EMBEDDINGS:
+        extensions_to_scan |= CODE_EXTENSIONS
+    # Skip '.md' if auto-indexing is off
+    if DISABLE_AUTO_INDEXING:
+        extensions_to_scan.discard(".md")
+    return extensions_to_scan
+
+
+def _scan_project_files(
+    project_dir: Path, extensions: Set[str]
+) -> Dict[str, os.stat_result]:
+    """
+    Walks the project tree once and stats every indexable file.
+    Ignored and dot directories are pruned during the walk instead of being
+    filtered after a recursive glob, so their contents are never visited.
+
+    Returns:
+        A dict of project-relative POSIX path -> os.stat_result.
+    """
+    found: Dict[str, os.stat_result] = {}
+    for dir_path, dir_names, file_names in os.walk(project_dir):
+        dir_names[:] = [
+            d
+            for d in dir_names
+            if d not in IGNORE_DIRS_FOR_INDEXING and not d.startswith(".")
+        ]
+        for file_name in file_names:
+            if file_name.startswith("."):
+                continue
+            if os.path.splitext(file_name)[1] not in extensions:
+                continue
+            full_path = os.path.join(dir_path, file_name)
+            try:
+                file_stat = os.stat(full_path)
+            except OSError as e:
+                logger.warning(f"Failed to stat file {full_path}: {e}")
+                continue
+            relative_path = Path(full_path).relative_to(project_dir).as_posix()
+            found[relative_path] = file_stat
+    return found
+
+
+def _is_ignored_relative_path(relative_path: str) -> bool:
+    return any(
+        part in IGNORE_DIRS_FOR_INDEXING or part.startswith(".")
+        for part in Path(relative_path).parts
+    )
+
+
+def _is_indexable_relative_path(relative_path: str, extensions: Set[str]) -> bool:
+    """Applies the same ignore rules as _scan_project_files to a single path."""
+    parts = Path(relative_path).parts
+    if not parts or os.path.splitext(parts[-1])[1] not in extensions:
+        return False
+    return not _is_ignored_relative_path(relative_path)
+
+
+def _expand_directory_changes(
+    project_dir: Path,
+    changed_paths: Set[str],
+    manifest_paths: Iterable[str],
+    extensions: Set[str],
+) -> Set[str]:
+    """
+    Expands watcher events for directories into the files they affect.
+    A renamed, moved or deleted directory only produces directory events, so
+    each directory path is replaced by the indexable files now under it plus
+    the manifest entries recorded under it (which are then re-stat'ed and,
+    if gone, dropped from the index).
+    """
+    expanded: Set[str] = set()
+    directory_prefixes: List[str] = []
+    for relative_path in changed_paths:
+        if _is_ignored_relative_path(relative_path):
+            continue
+        full_path = project_dir / relative_path
+        if full_path.is_dir():
+            for sub_path in _scan_project_files(full_path, extensions):
+                expanded.add(f"{relative_path}/{sub_path}")
+            directory_prefixes.append(f"{relative_path}/")
+        elif _is_indexable_relative_path(relative_path, extensions):
+            expanded.add(relative_path)
+        elif not full_path.exists():
+            # Possibly a directory that was moved away or deleted
+            directory_prefixes.append(f"{relative_path}/")
+    if directory_prefixes:
+        prefixes = tuple(directory_prefixes)
+        expanded.update(path for path in manifest_paths if path.startswith(prefixes))
+    return expanded
+
+
+def _stat_changed_files(
+    project_dir: Path, changed_paths: Set[str], extensions: Set[str]
+) -> Dict[str, os.stat_result]:
+    """
+    Stats only the given project-relative paths (as reported by a filesystem
+    watcher). Paths that no longer exist are omitted, so callers treat them as
+    deleted.
+    """
+    found: Dict[str, os.stat_result] = {}
+    for relative_path in changed_paths:
+        if not _is_indexable_relative_path(relative_path, extensions):
+            continue
+        try:
+            file_stat = os.stat(project_dir / relative_path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Failed to stat file {relative_path}: {e}")
+            continue
+        if os.path.isfile(project_dir / relative_path):
+            found[relative_path] = file_stat
+    return found
+
+
+def _stat_signature_matches(
+    manifest_entry: Dict[str, Any], file_stat: os.stat_result
+) -> bool:
+    """Returns True if a file's (size, mtime_ns, inode) matches its manifest row."""
+    return (
+        manifest_entry["size"] == file_stat.st_size
+        and manifest_entry["mtime_ns"] == file_stat.st_mtime_ns
+        and manifest_entry["inode"] == file_stat.st_ino
+    )
+
+
+def _embedding_to_blob(embedding: Any) -> bytes:
+    """
+    Converts an embedding from the API into a packed float32 blob.
+    With encoding_format="base64" the API returns little-endian float32 bytes
+    base64-encoded; plain float lists are packed as a fallback.
+    """
+    if isinstance(embedding, str):
+        return base64.b64decode(embedding)
+    return pack_embedding(embedding)
 
 
 async def _get_embeddings_batch_openai(
     batch_chunks: List[str],
     batch_index_start: int,
-    results_list: List[Optional[List[float]]],
-    openai_api_key: str,  # Pass API key directly for true async client
+    results_list: List[Optional[bytes]],
+    estimated_tokens: Optional[int] = None,
 ) -> bool:
     """
-    Processes a single batch of embeddings asynchronously using a new AsyncOpenAI client.
+    Processes a single batch of embeddings through the shared async client,
+    which pools connections, rate-limits and retries 429/5xx responses.
     This is a helper for run_rag_indexing_periodically.
+    Results are stored as packed little-endian float32 blobs, the format
+    rag_embeddings and rag_embedding_cache hold.
     Based on original main.py: lines 656-675.
     """
     # Need to import openai here if not at module level for type hints,
@@ -115,19 +285,18 @@ async def _get_embeddings_batch_openai(
                     " "
                 )  # Use single space as fallback to maintain batch size
 
-        # Create a separate async client for each batch for true concurrency
-        # Using async client directly with HTTPX to ensure truly parallel requests
-        async_client = openai.AsyncOpenAI(api_key=openai_api_key)
-        response = await async_client.embeddings.create(
-            input=validated_chunks,
+        response = await create_embeddings(
+            validated_chunks,
             model=EMBEDDING_MODEL,
             dimensions=EMBEDDING_DIMENSION,  # Ensure API returns vector size matching DB schema
+            encoding_format="base64",  # Raw float32 bytes, no per-float JSON parsing
+            estimated_tokens=estimated_tokens,
         )
         # Store results directly in the provided results list
         for j, item_embedding in enumerate(response.data):
             pos = batch_index_start + j
             if pos < len(results_list):
-                results_list[pos] = item_embedding.embedding
+                results_list[pos] = _embedding_to_blob(item_embedding.embedding)
         # logger.info(f"Completed embedding batch starting at index {batch_index_start}") # Original: main.py:672
         return True
     except Exception as e:
@@ -141,678 +310,772 @@ async def _get_embeddings_batch_openai(
         return False
 
 
-async def run_rag_indexing_periodically(
-    interval_seconds: int = 300, *, task_status=anyio.TASK_STATUS_IGNORED
-) -> NoReturn:
-    """
-    Periodically scans sources (Markdown files, project context) and updates
-    the RAG index in the database.
-    Original main.py: lines 512 - 826.
+async def _embed_and_store_sources(
+    conn: sqlite3.Connection,
+    cursor: sqlite3.Cursor,
+    sources: List[Tuple[str, str, str, List[Tuple[str, Dict[str, Any]]]]],
+) -> Tuple[bool, Set[Tuple[str, str]]]:
     """
-    logger.info("Background RAG indexer process starting...")
-    # Signal that the task has started successfully for the TaskGroup
-    task_status.started()
+    Replaces the indexed chunks of the given sources: deletes old chunks,
+    embeds the new ones (cache first, then the API) and bulk-inserts them.
+    Called once per flush of the chunking pipeline, so only a bounded number
+    of chunks is held in memory at a time.
 
-    await anyio.sleep(10)  # Initial sleep to allow server startup (main.py:515)
+    Args:
+        sources: (source_type, source_ref, content_hash, chunks_with_metadata).
 
-    # Get OpenAI client. The service initializes it and stores in g.openai_client_instance
-    # The API key itself is also needed for the truly async batch embedding function.
-    # Get API key directly from environment
-    openai_api_key_for_batches = os.environ.get("OPENAI_API_KEY")
+    Returns:
+        (embeddings_api_successful, settled_sources) where settled_sources are
+        the sources whose index is now current.
+    """
+    settled_sources: Set[Tuple[str, str]] = set()
+    logger.info(f"Processing {len(sources)} updated/new sources for RAG index.")
 
-    if not openai_api_key_for_batches:
-        logger.error("OpenAI API Key not configured. RAG indexer cannot run.")
-        return
+    processed_hashes_to_update_in_meta: Dict[str, str] = {}
+    processed_sources: Set[Tuple[str, str]] = set()
 
-    # Check if the OpenAI library itself was loaded
-    if openai is None:
-        logger.error("OpenAI Python library not loaded. RAG indexer cannot run.")
-        return
+    # Delete existing chunks for sources needing update (Original main.py:619-628)
+    logger.info(
+        "Deleting existing chunks and embeddings for sources needing update..."
+    )
+    delete_count = 0
+    for source_type, source_ref, _, _ in sources:
+        # Delete from embeddings first (using rowid from chunks)
+        # Ensure rag_embeddings table exists before attempting delete
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
+        )
+        if cursor.fetchone() is not None:
+            # Keep the old vectors addressable by chunk text so unchanged
+            # chunks of this source are not re-embedded below.
+            harvest_source_embeddings_into_cache(
+                cursor,
+                EMBEDDING_MODEL,
+                EMBEDDING_DIMENSION,
+                source_type,
+                source_ref,
+            )
+            cursor.execute(
+                "DELETE FROM rag_embeddings WHERE rowid IN (SELECT chunk_id FROM rag_chunks WHERE source_type = ? AND source_ref = ?)",
+                (source_type, source_ref),
+            )
+        # Delete from chunks
+        res_chk = cursor.execute(
+            "DELETE FROM rag_chunks WHERE source_type = ? AND source_ref = ?",
+            (source_type, source_ref),
+        )
+        if res_chk.rowcount > 0:
+            delete_count += res_chk.rowcount
+    if delete_count > 0:
+        logger.info(
+            f"Deleted {delete_count} old chunks and their embeddings."
+        )
+        bump_rag_index_version(cursor)
+    # Commit deletions (and harvested cache rows) so no write transaction is
+    # held open while waiting on the embedding API
+    conn.commit()
+
+    # Flatten chunks and prepare for embedding (Original main.py:631-647)
+    all_chunks_texts_to_embed: List[str] = []
+    chunk_source_metadata_map: List[
+        Tuple[str, str, str, Dict[str, Any]]
+    ] = []  # type, ref, current_hash, metadata for each chunk
+
+    for (
+        source_type,
+        source_ref,
+        current_hash_of_source,
+        chunks_with_metadata,
+    ) in sources:
+        if not chunks_with_metadata:
+            logger.warning(
+                f"No chunks generated for {source_type}: {source_ref} (likely empty or only whitespace). Skipping."
+            )
+            settled_sources.add((source_type, source_ref))
+            continue
+
+        for chunk_text, metadata in chunks_with_metadata:
+            # Validate chunk before adding - skip empty or whitespace-only chunks
+            if chunk_text and chunk_text.strip():
+                all_chunks_texts_to_embed.append(chunk_text.strip())
+                # Store metadata along with source info
+                chunk_source_metadata_map.append(
+                    (
+                        source_type,
+                        source_ref,
+                        current_hash_of_source,
+                        metadata,
+                    )
+                )
+            else:
+                logger.warning(
+                    f"Skipping empty chunk from {source_type}: {source_ref}"
+                )
 
-    while g.server_running:  # Uses global flag (main.py:521)
-        cycle_start_time = time.time()
+    embeddings_api_successful = True  # Flag to track overall success of API calls
+    if all_chunks_texts_to_embed:
+        logger.info(
+            f"Generated {len(all_chunks_texts_to_embed)} new chunks for embedding."
+        )
 
-        # Log what content will be indexed based on mode
-        if EMBEDDING_DIMENSION == 3072:
-            logger.info(
-                "Starting RAG index update cycle (advanced mode: markdown, code, context, tasks)..."
-            )
-        else:
+        all_embeddings_vectors: List[Optional[bytes]] = [None] * len(
+            all_chunks_texts_to_embed
+        )
+        # Reuse stored vectors for chunks whose text was embedded before
+        # (same model and dimension); only misses go to the API.
+        chunk_text_hashes = [
+            hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+            for chunk_text in all_chunks_texts_to_embed
+        ]
+        cached_vectors = get_cached_embeddings(
+            cursor, EMBEDDING_MODEL, EMBEDDING_DIMENSION, chunk_text_hashes
+        )
+        api_chunk_indices: List[int] = []
+        for i, text_hash in enumerate(chunk_text_hashes):
+            cached_vector = cached_vectors.get(text_hash)
+            if cached_vector is not None:
+                all_embeddings_vectors[i] = cached_vector
+            else:
+                api_chunk_indices.append(i)
+        chunks_needing_api = [
+            all_chunks_texts_to_embed[i] for i in api_chunk_indices
+        ]
+        api_embedding_vectors: List[Optional[bytes]] = [None] * len(
+            chunks_needing_api
+        )
+        logger.info(
+            f"Embedding cache: {len(all_chunks_texts_to_embed) - len(chunks_needing_api)} hits, {len(chunks_needing_api)} chunks need the embedding API."
+        )
+
+        # Parallel embedding processing: token-sized batches run
+        # concurrently, paced by the shared rate limiter rather than
+        # fixed groups with a sleep in between.
+        embedding_api_call_start_time = time.time()
+        embedding_batches = batch_texts_by_tokens(chunks_needing_api)
+        if embedding_batches:
             logger.info(
-                "Starting RAG index update cycle (simple mode: markdown, context only)..."
+                f"Processing {len(chunks_needing_api)} chunks in {len(embedding_batches)} token-sized embedding batches (max {MAX_CONCURRENT_EMBEDDING_REQUESTS} in flight)..."
             )
+        embedding_request_limiter = anyio.CapacityLimiter(
+            MAX_CONCURRENT_EMBEDDING_REQUESTS
+        )
 
-        conn = None  # Initialize conn here for broader scope in try-finally
-
-        # Initialize timestamp trackers
-        max_code_mod_timestamp = 0
-        max_md_mod_timestamp = 0
+        async def _run_embedding_batch(
+            batch_start: int, batch_end: int, batch_tokens: int
+        ) -> None:
+            async with embedding_request_limiter:
+                await _get_embeddings_batch_openai(
+                    chunks_needing_api[batch_start:batch_end],
+                    batch_start,
+                    api_embedding_vectors,
+                    batch_tokens,
+                )
 
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            async with anyio.create_task_group() as tg_embed:
+                for batch_start, batch_end, batch_tokens in embedding_batches:
+                    tg_embed.start_soon(
+                        _run_embedding_batch,
+                        batch_start,
+                        batch_end,
+                        batch_tokens,
+                    )
+        except Exception as e_tg:  # Catch errors from the task group itself
+            logger.error(
+                f"Error in parallel embedding batch processing task group: {e_tg}"
+            )
+            embeddings_api_successful = False
+
+        embedding_api_duration = time.time() - embedding_api_call_start_time
+        logger.info(
+            f"Completed all embedding API calls in {embedding_api_duration:.2f} seconds."
+        )
 
-            # Check if VSS is usable (vec0 table exists as a proxy)
-            # Original main.py:526-531
+        # Scatter API results back and remember them for future cycles
+        new_cache_rows: List[Tuple[str, bytes]] = []
+        for api_pos, chunk_pos in enumerate(api_chunk_indices):
+            embedding_vector = api_embedding_vectors[api_pos]
+            all_embeddings_vectors[chunk_pos] = embedding_vector
+            if embedding_vector is not None:
+                new_cache_rows.append(
+                    (chunk_text_hashes[chunk_pos], embedding_vector)
+                )
+        store_cached_embeddings(
+            cursor, EMBEDDING_MODEL, EMBEDDING_DIMENSION, new_cache_rows
+        )
+        touch_cached_embeddings(
+            cursor, EMBEDDING_MODEL, EMBEDDING_DIMENSION, cached_vectors.keys()
+        )
+
+        # Check for failed embeddings (None values)
+        failed_embedding_count = sum(
+            1 for emb_vec in all_embeddings_vectors if emb_vec is None
+        )
+        if failed_embedding_count > 0:
+            logger.warning(
+                f"{failed_embedding_count} out of {len(all_embeddings_vectors)} embeddings failed to generate."
+            )
+            # If a significant portion failed, mark the overall API call as unsuccessful
             if (
-                not is_vss_loadable()
-            ):  # This checks the global flag set by initial check
-                logger.warning(
-                    "Vector Search (sqlite-vec) is not loadable. Skipping RAG indexing cycle."
+                failed_embedding_count > len(all_embeddings_vectors) // 2
+            ):  # More than half failed
+                embeddings_api_successful = False
+                logger.error(
+                    "More than half of the embeddings failed. Marking RAG indexing cycle for these sources as unsuccessful."
                 )
-                await anyio.sleep(interval_seconds * 2)  # Sleep longer if VSS fails
-                continue  # Skip to next iteration of the while loop
 
-            # Check for rag_embeddings table specifically
-            cursor.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
+        # Insert new chunks and embeddings into DB (Original main.py:697-722)
+        if embeddings_api_successful:
+            logger.info(
+                "Inserting new chunks and embeddings into the database..."
             )
-            if cursor.fetchone() is None:
-                logger.warning(
-                    "Vector table 'rag_embeddings' not found. Skipping RAG indexing cycle. Ensure DB schema is initialized."
+            indexed_at_iso = datetime.datetime.now().isoformat()
+            rows_to_insert: List[
+                Tuple[str, str, str, str, Optional[str], bytes]
+            ] = []
+            row_chunk_indices: List[int] = []
+            for i, chunk_text_to_insert in enumerate(
+                all_chunks_texts_to_embed
+            ):
+                embedding_vector = all_embeddings_vectors[i]
+                if embedding_vector is None:
+                    logger.warning(
+                        f"Skipping chunk {i} for DB insertion due to missing embedding."
+                    )
+                    continue
+
+                (
+                    source_type,
+                    source_ref,
+                    _,
+                    chunk_metadata,
+                ) = chunk_source_metadata_map[i]
+                # Store chunk with optional metadata
+                metadata_json = (
+                    json.dumps(chunk_metadata) if chunk_metadata else None
                 )
-                await anyio.sleep(interval_seconds * 2)
-                continue
+                # Embedding is already a packed float32 blob (see _get_embeddings_batch_openai)
+                rows_to_insert.append(
+                    (
+                        source_type,
+                        source_ref,
+                        chunk_text_to_insert,
+                        indexed_at_iso,
+                        metadata_json,
+                        embedding_vector,
+                    )
+                )
+                row_chunk_indices.append(i)
 
-            # Get last indexed timestamps and stored hashes
-            # Original main.py:534-535 (last_indexed) and main.py:597-598 (stored_hashes)
-            cursor.execute("SELECT meta_key, meta_value FROM rag_meta")
-            rag_meta_data = {
-                row["meta_key"]: row["meta_value"] for row in cursor.fetchall()
-            }
-            last_indexed_timestamps = {
-                k: v for k, v in rag_meta_data.items() if k.startswith("last_indexed_")
-            }
-            stored_hashes = {
-                k: v for k, v in rag_meta_data.items() if k.startswith("hash_")
-            }
-
-            current_project_dir = get_project_dir()  # From config (main.py:537)
-            sources_to_check: List[
-                Tuple[str, str, str, Any, str]
-            ] = []  # type, ref, content, mod_time/iso, hash
-
-            # --- Unify file scanning ---
-            all_files_to_scan = []
-
-            # Define all extensions to scan
-            extensions_to_scan = DOCUMENT_EXTENSIONS
-            if ADVANCED_EMBEDDINGS:
-                extensions_to_scan += CODE_EXTENSIONS
+            # Batched executemany with pre-assigned chunk_ids, one short
+            # explicit transaction per batch (see bulk_insert_chunks_with_embeddings)
+            inserted_row_positions = bulk_insert_chunks_with_embeddings(
+                conn, rows_to_insert
+            )
+            inserted_count = len(inserted_row_positions)
+            for row_pos in inserted_row_positions:
+                (
+                    source_type,
+                    source_ref,
+                    current_hash_of_source,
+                    _,
+                ) = chunk_source_metadata_map[row_chunk_indices[row_pos]]
+                # Mark this source's hash to be updated in rag_meta
+                processed_hashes_to_update_in_meta[
+                    f"hash_{source_type}_{source_ref}"
+                ] = current_hash_of_source
+                processed_sources.add((source_type, source_ref))
 
             logger.info(
-                f"Scanning for files with extensions: {', '.join(extensions_to_scan)}"
+                f"Successfully inserted {inserted_count} new chunks/embeddings."
             )
 
-            for extension in extensions_to_scan:
-                # Skip '.md' if auto-indexing is off
-                if extension == ".md" and DISABLE_AUTO_INDEXING:
-                    continue
+            # Update rag_meta with the new hashes for successfully processed sources
+            # Original main.py:725-728
+            if processed_hashes_to_update_in_meta:
+                logger.info(
+                    f"Updating {len(processed_hashes_to_update_in_meta)} source hashes in rag_meta..."
+                )
+                meta_update_tuples = list(
+                    processed_hashes_to_update_in_meta.items()
+                )
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
+                    meta_update_tuples,
+                )
+                settled_sources.update(processed_sources)
+        else:
+            logger.warning(
+                "Skipping DB insertion and hash updates for this RAG cycle due to embedding API errors."
+            )
 
-                for file_path_str in glob.glob(
-                    str(current_project_dir / f"**/*{extension}"), recursive=True
-                ):
-                    file_path_obj = Path(file_path_str)
+    conn.commit()
+    return embeddings_api_successful, settled_sources
 
-                    # Filter out ignored directories
-                    if any(
-                        part in IGNORE_DIRS_FOR_INDEXING for part in file_path_obj.parts
-                    ):
-                        continue
 
-                    # Filter out dotfiles/dotdirs
-                    if any(
-                        part.startswith(".") and part not in [".", ".."]
-                        for part in file_path_obj.parts
-                    ):
-                        continue
+async def _run_rag_index_cycle(changed_paths: Optional[Set[str]] = None) -> bool:
+    """
+    Runs one RAG index update cycle (files, project context, tasks).
+    Shared by the periodic and the filesystem-watch indexers.
 
-                    all_files_to_scan.append(file_path_obj)
+    Args:
+        changed_paths: Project-relative paths reported by a filesystem watcher.
+            When None, the whole project tree is walked; otherwise only these
+            paths are stat'ed and no other file I/O happens.
 
-            logger.info(
-                f"Found {len(all_files_to_scan)} total files to consider for indexing."
-            )
+    Returns:
+        False if the cycle was skipped because vector search is unavailable,
+        True otherwise (including cycles that logged errors).
+    """
+    cycle_start_time = time.time()
 
-            # Process all found files
-            for file_path_obj in all_files_to_scan:
-                try:
-                    mod_time = file_path_obj.stat().st_mtime
-                    content = file_path_obj.read_text(encoding="utf-8")
-                    normalized_path = str(
-                        file_path_obj.relative_to(current_project_dir).as_posix()
-                    )
-                    current_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    # Log what content will be indexed based on mode
+    if EMBEDDING_DIMENSION == 3072:
+        logger.info(
+            "Starting RAG index update cycle (advanced mode: markdown, code, context, tasks)..."
+        )
+    else:
+        logger.info(
+            "Starting RAG index update cycle (simple mode: markdown, context only)..."
+        )
 
-                    # Determine source type based on extension
-                    source_type = (
-                        "code"
-                        if file_path_obj.suffix in CODE_EXTENSIONS
-                        else "markdown"
-                    )
+    conn = None  # Initialize conn here for broader scope in try-finally
 
-                    sources_to_check.append(
-                        (
-                            source_type,
-                            normalized_path,
-                            content,
-                            mod_time,
-                            current_hash,
-                        )
-                    )
+    # Initialize timestamp trackers
+    max_code_mod_timestamp = 0
+    max_md_mod_timestamp = 0
 
-                    if source_type == "code" and mod_time > max_code_mod_timestamp:
-                        max_code_mod_timestamp = mod_time
-                    elif source_type == "markdown" and mod_time > max_md_mod_timestamp:
-                        max_md_mod_timestamp = mod_time
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
 
-                except Exception as e:
-                    logger.warning(
-                        f"Failed to read or process file {file_path_obj}: {e}"
-                    )
+        # Check if VSS is usable (vec0 table exists as a proxy)
+        # Original main.py:526-531
+        if (
+            not is_vss_loadable()
+        ):  # This checks the global flag set by initial check
+            logger.warning(
+                "Vector Search (sqlite-vec) is not loadable. Skipping RAG indexing cycle."
+            )
+            return False  # Caller sleeps longer if VSS fails
 
-            # 2. Scan Project Context (Original main.py:585-603)
-            last_ctx_time_str = last_indexed_timestamps.get(
-                "last_indexed_context", "1970-01-01T00:00:00Z"
+        # Check for rag_embeddings table specifically
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
+        )
+        if cursor.fetchone() is None:
+            logger.warning(
+                "Vector table 'rag_embeddings' not found. Skipping RAG indexing cycle. Ensure DB schema is initialized."
             )
-            max_ctx_mod_time_iso = (
-                last_ctx_time_str  # Keep as ISO string for direct comparison
+            return False
+
+        # Get last indexed timestamps and stored hashes
+        # Original main.py:534-535 (last_indexed) and main.py:597-598 (stored_hashes)
+        cursor.execute("SELECT meta_key, meta_value FROM rag_meta")
+        rag_meta_data = {
+            row["meta_key"]: row["meta_value"] for row in cursor.fetchall()
+        }
+        last_indexed_timestamps = {
+            k: v for k, v in rag_meta_data.items() if k.startswith("last_indexed_")
+        }
+        stored_hashes = {
+            k: v for k, v in rag_meta_data.items() if k.startswith("hash_")
+        }
+
+        current_project_dir = get_project_dir()  # From config (main.py:537)
+        sources_to_check: List[
+            Tuple[str, str, str, Any, str]
+        ] = []  # type, ref, content, mod_time/iso, hash
+
+        # --- Unify file scanning (manifest-driven) ---
+        extensions_to_scan = _get_extensions_to_scan()
+
+        logger.info(
+            f"Scanning for files with extensions: {', '.join(sorted(extensions_to_scan))}"
+        )
+
+        file_manifest = get_file_manifest(cursor)
+        if changed_paths is None:
+            scanned_files = _scan_project_files(current_project_dir, extensions_to_scan)
+        else:
+            changed_paths = _expand_directory_changes(
+                current_project_dir,
+                changed_paths,
+                file_manifest.keys(),
+                extensions_to_scan,
             )
+            scanned_files = _stat_changed_files(
+                current_project_dir, changed_paths, extensions_to_scan
+            )
+        # Manifest rows to write once the corresponding source is settled:
+        # path -> (size, mtime_ns, inode, content_hash, source_type)
+        pending_manifest_updates: Dict[str, Tuple[int, int, int, str, str]] = {}
 
-            # The original checked `last_updated > ?`. This is good.
-            cursor.execute(
-                "SELECT context_key, value, description, last_updated FROM project_context WHERE last_updated > ?",
-                (last_ctx_time_str,),
+        logger.info(
+            f"Found {len(scanned_files)} total files to consider for indexing ({len(file_manifest)} in manifest)."
+        )
+
+        # Only files whose stat signature differs from the manifest are handed
+        # to the chunking pipeline (read + hash + chunk in worker processes)
+        file_chunk_jobs: List[FileChunkJob] = []
+        changed_file_stats: Dict[str, os.stat_result] = {}
+        for normalized_path, file_stat in scanned_files.items():
+            file_path_obj = current_project_dir / normalized_path
+            mod_time = file_stat.st_mtime
+
+            # Determine source type based on extension
+            source_type = (
+                "code" if file_path_obj.suffix in CODE_EXTENSIONS else "markdown"
             )
-            for row in cursor.fetchall():
-                key = row["context_key"]
-                value_str = row["value"]  # Already a JSON string in DB
-                desc = row["description"] or ""
-                last_mod_iso = row["last_updated"]
-                # Content for hashing and embedding (main.py:593-595)
-                content_for_embedding = (
-                    f"Context Key: {key}\nDescription: {desc}\nValue: {value_str}"
-                )
-                current_hash = hashlib.sha256(
-                    content_for_embedding.encode("utf-8")
-                ).hexdigest()
-                sources_to_check.append(
-                    ("context", key, content_for_embedding, last_mod_iso, current_hash)
+
+            if source_type == "code" and mod_time > max_code_mod_timestamp:
+                max_code_mod_timestamp = mod_time
+            elif source_type == "markdown" and mod_time > max_md_mod_timestamp:
+                max_md_mod_timestamp = mod_time
+
+            manifest_entry = file_manifest.get(normalized_path)
+            if manifest_entry is not None and _stat_signature_matches(
+                manifest_entry, file_stat
+            ):
+                continue
+
+            file_chunk_jobs.append(
+                FileChunkJob(
+                    normalized_path,
+                    source_type,
+                    stored_hashes.get(f"hash_{source_type}_{normalized_path}"),
                 )
-                if last_mod_iso > max_ctx_mod_time_iso:
-                    max_ctx_mod_time_iso = last_mod_iso
+            )
+            changed_file_stats[normalized_path] = file_stat
+
+        # Drop index data for files that disappeared since the last cycle.
+        # Only consider extensions scanned this cycle so toggling
+        # DISABLE_AUTO_INDEXING does not wipe existing markdown chunks.
+        candidate_removed_paths = (
+            file_manifest.keys()
+            if changed_paths is None
+            else changed_paths & file_manifest.keys()
+        )
+        removed_files = {
+            path: file_manifest[path]["source_type"]
+            for path in candidate_removed_paths
+            if path not in scanned_files and Path(path).suffix in extensions_to_scan
+        }
+        if removed_files:
+            removed_chunk_count = remove_deleted_files_from_index(
+                cursor, removed_files, vec_table_exists=True
+            )
+            logger.info(
+                f"Removed {len(removed_files)} deleted files ({removed_chunk_count} chunks) from the RAG index."
+            )
+            conn.commit()
 
-            # 3. Scan File Metadata (Original main.py:605 - "Skipped for now") - Still skipped.
+        # 2. Scan Project Context (Original main.py:585-603)
+        last_ctx_time_str = last_indexed_timestamps.get(
+            "last_indexed_context", "1970-01-01T00:00:00Z"
+        )
+        max_ctx_mod_time_iso = (
+            last_ctx_time_str  # Keep as ISO string for direct comparison
+        )
 
-            # 4. Scan Tasks (only in advanced mode - For System 8)
-            max_task_mod_time_iso = last_indexed_timestamps.get(
+        # The original checked `last_updated > ?`. This is good.
+        cursor.execute(
+            "SELECT context_key, value, description, last_updated FROM project_context WHERE last_updated > ?",
+            (last_ctx_time_str,),
+        )
+        for row in cursor.fetchall():
+            key = row["context_key"]
+            value_str = row["value"]  # Already a JSON string in DB
+            desc = row["description"] or ""
+            last_mod_iso = row["last_updated"]
+            # Content for hashing and embedding (main.py:593-595)
+            content_for_embedding = (
+                f"Context Key: {key}\nDescription: {desc}\nValue: {value_str}"
+            )
+            current_hash = hashlib.sha256(
+                content_for_embedding.encode("utf-8")
+            ).hexdigest()
+            sources_to_check.append(
+                ("context", key, content_for_embedding, last_mod_iso, current_hash)
+            )
+            if last_mod_iso > max_ctx_mod_time_iso:
+                max_ctx_mod_time_iso = last_mod_iso
+
+        # 3. Scan File Metadata (Original main.py:605 - "Skipped for now") - Still skipped.
+
+        # 4. Scan Tasks (only in advanced mode - For System 8)
+        max_task_mod_time_iso = last_indexed_timestamps.get(
+            "last_indexed_tasks", "1970-01-01T00:00:00Z"
+        )
+
+        if ADVANCED_EMBEDDINGS:
+            last_task_time_str = last_indexed_timestamps.get(
                 "last_indexed_tasks", "1970-01-01T00:00:00Z"
             )
 
-            if ADVANCED_EMBEDDINGS:
-                last_task_time_str = last_indexed_timestamps.get(
-                    "last_indexed_tasks", "1970-01-01T00:00:00Z"
-                )
+            # Get tasks that have been updated since last indexing
+            cursor.execute(
+                "SELECT task_id, title, description, status, assigned_to, created_by, "
+                f"parent_task, {TASK_DEPENDENCIES_JSON_SQL} AS depends_on_tasks, "
+                "priority, created_at, updated_at "
+                "FROM tasks WHERE updated_at > ?",
+                (last_task_time_str,),
+            )
 
-                # Get tasks that have been updated since last indexing
-                cursor.execute(
-                    "SELECT task_id, title, description, status, assigned_to, created_by, "
-                    "parent_task, depends_on_tasks, priority, created_at, updated_at "
-                    "FROM tasks WHERE updated_at > ?",
-                    (last_task_time_str,),
-                )
+            for task_row in cursor.fetchall():
+                task_data = dict(task_row)
+                task_id = task_data["task_id"]
+                last_mod_iso = task_data["updated_at"]
 
-                for task_row in cursor.fetchall():
-                    task_data = dict(task_row)
-                    task_id = task_data["task_id"]
-                    last_mod_iso = task_data["updated_at"]
-
-                    # Format task for embedding
-                    content_for_embedding = format_task_for_embedding(task_data)
-                    current_hash = hashlib.sha256(
-                        content_for_embedding.encode("utf-8")
-                    ).hexdigest()
-
-                    sources_to_check.append(
-                        (
-                            "task",
-                            task_id,
-                            content_for_embedding,
-                            last_mod_iso,
-                            current_hash,
-                        )
-                    )
+                # Format task for embedding
+                content_for_embedding = format_task_for_embedding(task_data)
+                current_hash = hashlib.sha256(
+                    content_for_embedding.encode("utf-8")
+                ).hexdigest()
 
-                    if last_mod_iso > max_task_mod_time_iso:
-                        max_task_mod_time_iso = last_mod_iso
-
-            # Filter sources based on hash comparison (Original main.py:608-615)
-            sources_to_process_for_embedding: List[
-                Tuple[str, str, str, str]
-            ] = []  # type, ref, content, current_hash
-            for source_type, source_ref, content, _, current_hash in sources_to_check:
-                meta_key_for_hash = f"hash_{source_type}_{source_ref}"
-                stored_source_hash = stored_hashes.get(meta_key_for_hash)
-                if current_hash != stored_source_hash:
-                    logger.info(
-                        f"Change detected for {source_type}: {source_ref} (Hash mismatch or new). Queued for re-indexing."
-                    )
-                    sources_to_process_for_embedding.append(
-                        (source_type, source_ref, content, current_hash)
+                sources_to_check.append(
+                    (
+                        "task",
+                        task_id,
+                        content_for_embedding,
+                        last_mod_iso,
+                        current_hash,
                     )
-                # else: logger.debug(f"No change for {source_type}:{source_ref} (hash match)")
-
-            if not sources_to_process_for_embedding:
-                logger.info(
-                    "No new or modified sources found requiring RAG index update."
                 )
+
+                if last_mod_iso > max_task_mod_time_iso:
+                    max_task_mod_time_iso = last_mod_iso
+
+        # Filter context/task sources based on hash comparison (Original main.py:608-615)
+        # and chunk them inline; they are small compared to project files.
+        pending_sources: List[
+            Tuple[str, str, str, List[Tuple[str, Dict[str, Any]]]]
+        ] = []  # type, ref, current_hash, chunks_with_metadata
+        pending_chunk_count = 0
+        queued_source_count = 0
+        # Sources whose index is up to date by the end of this cycle; their
+        # manifest rows are written so the next cycle skips them.
+        settled_sources: Set[Tuple[str, str]] = set()
+        for source_type, source_ref, content, _, current_hash in sources_to_check:
+            meta_key_for_hash = f"hash_{source_type}_{source_ref}"
+            stored_source_hash = stored_hashes.get(meta_key_for_hash)
+            if current_hash == stored_source_hash:
+                settled_sources.add((source_type, source_ref))
             else:
                 logger.info(
-                    f"Processing {len(sources_to_process_for_embedding)} updated/new sources for RAG index."
+                    f"Change detected for {source_type}: {source_ref} (Hash mismatch or new). Queued for re-indexing."
                 )
-
-                processed_hashes_to_update_in_meta: Dict[str, str] = {}
-
-                # Delete existing chunks for sources needing update (Original main.py:619-628)
-                logger.info(
-                    "Deleting existing chunks and embeddings for sources needing update..."
+                chunks_with_metadata = chunk_source(
+                    source_type, source_ref, content, None, ADVANCED_EMBEDDINGS
                 )
-                delete_count = 0
-                for source_type, source_ref, _, _ in sources_to_process_for_embedding:
-                    # Delete from embeddings first (using rowid from chunks)
-                    # Ensure rag_embeddings table exists before attempting delete
-                    cursor.execute(
-                        "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
-                    )
-                    if cursor.fetchone() is not None:
-                        res_emb = cursor.execute(
-                            "DELETE FROM rag_embeddings WHERE rowid IN (SELECT chunk_id FROM rag_chunks WHERE source_type = ? AND source_ref = ?)",
-                            (source_type, source_ref),
-                        )
-                    # Delete from chunks
-                    res_chk = cursor.execute(
-                        "DELETE FROM rag_chunks WHERE source_type = ? AND source_ref = ?",
-                        (source_type, source_ref),
-                    )
-                    if res_chk.rowcount > 0:
-                        delete_count += res_chk.rowcount
-                if delete_count > 0:
-                    logger.info(
-                        f"Deleted {delete_count} old chunks and their embeddings."
-                    )
-                    conn.commit()  # Commit deletions
-
-                # Generate chunks and prepare for embedding (Original main.py:631-647)
-                all_chunks_texts_to_embed: List[str] = []
-                chunk_source_metadata_map: List[
-                    Tuple[str, str, str, Dict[str, Any]]
-                ] = []  # type, ref, current_hash, metadata for each chunk
+                pending_sources.append(
+                    (source_type, source_ref, current_hash, chunks_with_metadata)
+                )
+                pending_chunk_count += len(chunks_with_metadata)
+                queued_source_count += 1
 
-                # ADVANCED_EMBEDDINGS is already imported at module level
+        embeddings_api_successful = True
 
-                for (
-                    source_type,
-                    source_ref,
-                    content,
-                    current_hash_of_source,
-                ) in sources_to_process_for_embedding:
-                    chunks_with_metadata: List[Tuple[str, Dict[str, Any]]] = []
-
-                    if ADVANCED_EMBEDDINGS:
-                        # Advanced mode: Use sophisticated chunking
-                        if source_type == "markdown":
-                            # Markdown-aware chunking
-                            text_chunks = markdown_aware_chunker(content)
-                            chunks_with_metadata = [
-                                (chunk, {"source_type": "markdown"})
-                                for chunk in text_chunks
-                            ]
-                        elif source_type == "code":
-                            # Code-aware chunking for code files
-                            file_path = current_project_dir / source_ref
-
-                            # First, create a file summary
-                            entities = extract_code_entities(content, file_path)
-                            file_summary = create_file_summary(
-                                content, file_path, entities
-                            )
-                            summary_text = f"File: {source_ref}\n{json.dumps(file_summary, indent=2)}"
-                            chunks_with_metadata.append(
-                                (
-                                    summary_text,
-                                    {"source_type": "code_summary", **file_summary},
-                                )
-                            )
-
-                            # Then chunk the code
-                            code_chunks = chunk_code_aware(content, file_path)
-                            chunks_with_metadata.extend(code_chunks)
-                        else:
-                            # Simple chunking for other types
-                            text_chunks = simple_chunker(content)
-                            chunks_with_metadata = [
-                                (chunk, {"source_type": source_type})
-                                for chunk in text_chunks
-                            ]
-                    else:
-                        # Original/Simple mode: Basic chunking for all types
-                        text_chunks = simple_chunker(content)
-                        # Store minimal metadata
-                        chunks_with_metadata = [
-                            (chunk, {"source_type": source_type})
-                            for chunk in text_chunks
-                        ]
-
-                    if not chunks_with_metadata:
-                        file_size = len(content) if content else 0
-                        logger.warning(
-                            f"No chunks generated for {source_type}: {source_ref} (file size: {file_size} bytes, likely empty or only whitespace). Skipping."
-                        )
-                        continue
-
-                    for chunk_text, metadata in chunks_with_metadata:
-                        # Validate chunk before adding - skip empty or whitespace-only chunks
-                        if chunk_text and chunk_text.strip():
-                            all_chunks_texts_to_embed.append(chunk_text.strip())
-                            # Store metadata along with source info
-                            chunk_source_metadata_map.append(
-                                (
-                                    source_type,
-                                    source_ref,
-                                    current_hash_of_source,
-                                    metadata,
-                                )
-                            )
-                        else:
-                            logger.warning(
-                                f"Skipping empty chunk from {source_type}: {source_ref}"
-                            )
-
-                if all_chunks_texts_to_embed:
-                    logger.info(
-                        f"Generated {len(all_chunks_texts_to_embed)} new chunks for embedding."
+        async def _flush_pending_sources() -> None:
+            nonlocal pending_sources, pending_chunk_count, embeddings_api_successful
+            if not pending_sources:
+                return
+            flush_successful, flushed_settled = await _embed_and_store_sources(
+                conn, cursor, pending_sources
+            )
+            embeddings_api_successful = embeddings_api_successful and flush_successful
+            settled_sources.update(flushed_settled)
+            pending_sources = []
+            pending_chunk_count = 0
+
+        # Changed files are read, hashed and chunked in worker processes and
+        # streamed back here; chunks are embedded in flushes of
+        # RAG_EMBED_FLUSH_CHUNKS while the workers keep going.
+        async with open_chunk_pipeline(
+            current_project_dir, file_chunk_jobs, ADVANCED_EMBEDDINGS
+        ) as file_results:
+            async for file_result in file_results:
+                if file_result.error:
+                    logger.warning(
+                        f"Failed to read or process file {file_result.source_ref}: {file_result.error}"
                     )
-
-                    all_embeddings_vectors: List[Optional[List[float]]] = [None] * len(
-                        all_chunks_texts_to_embed
+                    continue
+                file_stat = changed_file_stats[file_result.source_ref]
+                pending_manifest_updates[file_result.source_ref] = (
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                    file_stat.st_ino,
+                    file_result.content_hash,
+                    file_result.source_type,
+                )
+                if file_result.chunks is None:
+                    # Content hash matches rag_meta; only the stat signature changed
+                    settled_sources.add(
+                        (file_result.source_type, file_result.source_ref)
                     )
-                    embeddings_api_successful = (
-                        True  # Flag to track overall success of API calls
+                    continue
+                logger.info(
+                    f"Change detected for {file_result.source_type}: {file_result.source_ref} (Hash mismatch or new). Queued for re-indexing."
+                )
+                pending_sources.append(
+                    (
+                        file_result.source_type,
+                        file_result.source_ref,
+                        file_result.content_hash,
+                        file_result.chunks,
                     )
+                )
+                pending_chunk_count += len(file_result.chunks)
+                queued_source_count += 1
+                if pending_chunk_count >= RAG_EMBED_FLUSH_CHUNKS:
+                    await _flush_pending_sources()
+        await _flush_pending_sources()
 
-                    # Parallel embedding processing (Original main.py:662-690)
-                    embedding_api_call_start_time = time.time()
-                    # Process batches in groups with controlled concurrency
-                    for group_start_idx in range(
-                        0,
-                        len(all_chunks_texts_to_embed),
-                        MAX_CONCURRENT_EMBEDDING_REQUESTS
-                        * PARALLEL_EMBEDDING_BATCH_SIZE,
-                    ):
-                        # Determine how many batches to run in this parallel group
-                        num_batches_in_group = 0
-                        temp_idx = group_start_idx
-                        while (
-                            num_batches_in_group < MAX_CONCURRENT_EMBEDDING_REQUESTS
-                            and temp_idx < len(all_chunks_texts_to_embed)
-                        ):
-                            num_batches_in_group += 1
-                            temp_idx += PARALLEL_EMBEDDING_BATCH_SIZE
-
-                        logger.info(
-                            f"Processing up to {num_batches_in_group} embedding batches in parallel (group starting at chunk {group_start_idx})..."
-                        )
-
-                        try:
-                            async with anyio.create_task_group() as tg_embed:
-                                for i in range(num_batches_in_group):
-                                    batch_actual_start_index = (
-                                        group_start_idx
-                                        + i * PARALLEL_EMBEDDING_BATCH_SIZE
-                                    )
-                                    if batch_actual_start_index >= len(
-                                        all_chunks_texts_to_embed
-                                    ):
-                                        break  # No more chunks
-
-                                    batch_end_index = min(
-                                        batch_actual_start_index
-                                        + PARALLEL_EMBEDDING_BATCH_SIZE,
-                                        len(all_chunks_texts_to_embed),
-                                    )
-                                    current_batch_chunks = all_chunks_texts_to_embed[
-                                        batch_actual_start_index:batch_end_index
-                                    ]
-
-                                    if not current_batch_chunks:
-                                        continue
-
-                                    tg_embed.start_soon(
-                                        _get_embeddings_batch_openai,
-                                        current_batch_chunks,
-                                        batch_actual_start_index,
-                                        all_embeddings_vectors,
-                                        openai_api_key_for_batches,  # Pass the API key
-                                    )
-                        except (
-                            Exception
-                        ) as e_tg:  # Catch errors from the task group itself
-                            logger.error(
-                                f"Error in parallel embedding batch processing task group: {e_tg}"
-                            )
-                            embeddings_api_successful = (
-                                False  # Mark failure if task group fails
-                            )
-
-                        if not embeddings_api_successful:
-                            break  # Stop if a task group failed
-
-                        # Minimal delay between batch groups (Original main.py:689)
-                        if (
-                            group_start_idx
-                            + MAX_CONCURRENT_EMBEDDING_REQUESTS
-                            * PARALLEL_EMBEDDING_BATCH_SIZE
-                            < len(all_chunks_texts_to_embed)
-                        ):
-                            await anyio.sleep(0.1)  # Reduced from 0.2
-
-                    embedding_api_duration = time.time() - embedding_api_call_start_time
-                    logger.info(
-                        f"Completed all embedding API calls in {embedding_api_duration:.2f} seconds."
-                    )
+        if not queued_source_count:
+            logger.info(
+                "No new or modified sources found requiring RAG index update."
+            )
 
-                    # Check for failed embeddings (None values)
-                    failed_embedding_count = sum(
-                        1 for emb_vec in all_embeddings_vectors if emb_vec is None
-                    )
-                    if failed_embedding_count > 0:
-                        logger.warning(
-                            f"{failed_embedding_count} out of {len(all_embeddings_vectors)} embeddings failed to generate."
-                        )
-                        # If a significant portion failed, mark the overall API call as unsuccessful
-                        if (
-                            failed_embedding_count > len(all_embeddings_vectors) // 2
-                        ):  # More than half failed
-                            embeddings_api_successful = False
-                            logger.error(
-                                "More than half of the embeddings failed. Marking RAG indexing cycle for these sources as unsuccessful."
-                            )
-
-                    # Insert new chunks and embeddings into DB (Original main.py:697-722)
-                    if embeddings_api_successful:
-                        logger.info(
-                            "Inserting new chunks and embeddings into the database..."
-                        )
-                        inserted_count = 0
-                        indexed_at_iso = datetime.datetime.now().isoformat()
-                        for i, chunk_text_to_insert in enumerate(
-                            all_chunks_texts_to_embed
-                        ):
-                            embedding_vector = all_embeddings_vectors[i]
-                            if embedding_vector is None:
-                                logger.warning(
-                                    f"Skipping chunk {i} for DB insertion due to missing embedding."
-                                )
-                                continue
-
-                            (
-                                source_type,
-                                source_ref,
-                                current_hash_of_source,
-                                chunk_metadata,
-                            ) = chunk_source_metadata_map[i]
-                            try:
-                                # Store chunk with optional metadata
-                                metadata_json = (
-                                    json.dumps(chunk_metadata)
-                                    if chunk_metadata
-                                    else None
-                                )
-                                cursor.execute(
-                                    "INSERT INTO rag_chunks (source_type, source_ref, chunk_text, indexed_at, metadata) VALUES (?, ?, ?, ?, ?)",
-                                    (
-                                        source_type,
-                                        source_ref,
-                                        chunk_text_to_insert,
-                                        indexed_at_iso,
-                                        metadata_json,
-                                    ),
-                                )
-                                chunk_rowid = cursor.lastrowid  # This is the chunk_id
-
-                                embedding_json_str = json.dumps(embedding_vector)
-                                cursor.execute(
-                                    "INSERT INTO rag_embeddings (rowid, embedding) VALUES (?, ?)",
-                                    (chunk_rowid, embedding_json_str),
-                                )
-                                inserted_count += 1
-                                # Mark this source's hash to be updated in rag_meta
-                                meta_key_for_hash_update = (
-                                    f"hash_{source_type}_{source_ref}"
-                                )
-                                processed_hashes_to_update_in_meta[
-                                    meta_key_for_hash_update
-                                ] = current_hash_of_source
-                            except sqlite3.Error as db_err:
-                                logger.error(
-                                    f"DB Error inserting chunk/embedding for {source_type}:{source_ref} (Chunk index {i}): {db_err}"
-                                )
-                                # If one insert fails, we might lose its hash update.
-                                # Consider if transaction should be per source or all-or-nothing for the cycle.
-                                # Original code continued, so we do too.
-                            except Exception as e_ins:
-                                logger.error(
-                                    f"Unexpected error inserting chunk/embedding: {e_ins}",
-                                    exc_info=True,
-                                )
-
-                        logger.info(
-                            f"Successfully inserted {inserted_count} new chunks/embeddings."
-                        )
-
-                        # Update rag_meta with the new hashes for successfully processed sources
-                        # Original main.py:725-728
-                        if processed_hashes_to_update_in_meta:
-                            logger.info(
-                                f"Updating {len(processed_hashes_to_update_in_meta)} source hashes in rag_meta..."
-                            )
-                            meta_update_tuples = list(
-                                processed_hashes_to_update_in_meta.items()
-                            )
-                            cursor.executemany(
-                                "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
-                                meta_update_tuples,
-                            )
-                    else:
-                        logger.warning(
-                            "Skipping DB insertion and hash updates for this RAG cycle due to embedding API errors."
-                        )
-
-            # Update last indexed *timestamps* in rag_meta (Original main.py:731-737)
-            # Only update if the embedding part (if attempted) was successful or no embeddings were needed.
-            # The 'embeddings_api_successful' flag covers this.
-            if (
-                "embeddings_api_successful" not in locals() or embeddings_api_successful
-            ):  # Check if flag exists and is True
-                # Only update markdown timestamp if auto-indexing is enabled
-                if not DISABLE_AUTO_INDEXING:
-                    new_md_time_iso = (
-                        datetime.datetime.fromtimestamp(
-                            max_md_mod_timestamp
-                        ).isoformat()
-                        + "Z"
-                    )
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
-                        ("last_indexed_markdown", new_md_time_iso),
-                    )
+        # Update last indexed *timestamps* in rag_meta (Original main.py:731-737)
+        # Only update if the embedding part (if attempted) was successful or no embeddings were needed.
+        # The 'embeddings_api_successful' flag covers this.
+        if embeddings_api_successful:
+            # Only update markdown timestamp if auto-indexing is enabled
+            if not DISABLE_AUTO_INDEXING:
+                new_md_time_iso = max(
+                    last_indexed_timestamps.get(
+                        "last_indexed_markdown", "1970-01-01T00:00:00Z"
+                    ),
+                    datetime.datetime.fromtimestamp(max_md_mod_timestamp).isoformat()
+                    + "Z",
+                )
                 cursor.execute(
                     "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
-                    ("last_indexed_context", max_ctx_mod_time_iso),
+                    ("last_indexed_markdown", new_md_time_iso),
                 )
+            cursor.execute(
+                "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
+                ("last_indexed_context", max_ctx_mod_time_iso),
+            )
 
-                # Only update code and tasks timestamps in advanced mode
-                if ADVANCED_EMBEDDINGS:
-                    new_code_time_iso = (
-                        datetime.datetime.fromtimestamp(
-                            max_code_mod_timestamp
-                        ).isoformat()
-                        + "Z"
-                    )
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
-                        ("last_indexed_code", new_code_time_iso),
-                    )
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
-                        ("last_indexed_tasks", max_task_mod_time_iso),
-                    )
-                # Add other source types here
-            else:
-                logger.warning(
-                    "Skipping rag_meta timestamp updates due to errors in the embedding/indexing cycle."
+            # Only update code and tasks timestamps in advanced mode
+            if ADVANCED_EMBEDDINGS:
+                new_code_time_iso = max(
+                    last_indexed_timestamps.get(
+                        "last_indexed_code", "1970-01-01T00:00:00Z"
+                    ),
+                    datetime.datetime.fromtimestamp(max_code_mod_timestamp).isoformat()
+                    + "Z",
                 )
+                cursor.execute(
+                    "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
+                    ("last_indexed_code", new_code_time_iso),
+                )
+                cursor.execute(
+                    "INSERT OR REPLACE INTO rag_meta (meta_key, meta_value) VALUES (?, ?)",
+                    ("last_indexed_tasks", max_task_mod_time_iso),
+                )
+            # Add other source types here
+        else:
+            logger.warning(
+                "Skipping rag_meta timestamp updates due to errors in the embedding/indexing cycle."
+            )
 
-            conn.commit()  # Commit all DB changes for this cycle
+        # Record stat signatures for files whose index is now current.
+        # Files that failed to embed keep their old manifest row and are retried.
+        manifest_indexed_at = datetime.datetime.now().isoformat()
+        manifest_rows = [
+            (path, *signature, manifest_indexed_at)
+            for path, signature in pending_manifest_updates.items()
+            if (signature[4], path) in settled_sources
+        ]
+        manifest_rows_written = upsert_file_manifest_entries(cursor, manifest_rows)
+        if manifest_rows_written:
+            logger.info(f"Updated {manifest_rows_written} file manifest entries.")
 
-            # Diagnostic query (Original main.py:740-747)
-            try:
-                diag_cursor = conn.cursor()  # Use a new cursor or the same one
-                diag_cursor.execute("SELECT COUNT(*) FROM rag_chunks")
-                chunk_count_diag = diag_cursor.fetchone()[0]
-                diag_cursor.execute("SELECT COUNT(*) FROM rag_embeddings")
-                embedding_count_diag = diag_cursor.fetchone()[0]
-                logger.info(
-                    f"DB RAG DIAGNOSTIC: Found {chunk_count_diag} chunks and {embedding_count_diag} embeddings post-cycle."
-                )
-            except Exception as e_diag:
-                logger.error(f"Error running RAG database diagnostics: {e_diag}")
+        pruned_cache_rows = prune_embedding_cache(cursor, EMBEDDING_CACHE_MAX_ENTRIES)
+        if pruned_cache_rows:
+            logger.info(
+                f"Pruned {pruned_cache_rows} least recently used embedding cache entries."
+            )
 
-        except sqlite3.OperationalError as e_sqlite_op:  # main.py:750-753
-            if (
-                "no such module: vec0" in str(e_sqlite_op)
-                or "vector search requires" in str(e_sqlite_op).lower()
-            ):
-                logger.warning(
-                    f"Vector search module (vec0) not available or table missing. RAG indexing cycle skipped. Error: {e_sqlite_op}"
-                )
-                g.global_vss_load_successful = (
-                    False  # Mark VSS as not usable if this happens
-                )
-            else:
-                logger.error(
-                    f"Database operational error in RAG indexing cycle: {e_sqlite_op}",
-                    exc_info=True,
-                )
-        except Exception as e_cycle:  # main.py:756 (general catch-all for the cycle)
-            logger.error(f"Error in RAG indexing cycle: {e_cycle}", exc_info=True)
-        finally:
-            if conn:
-                conn.close()
+        conn.commit()  # Commit all DB changes for this cycle
 
-        elapsed_cycle_time = time.time() - cycle_start_time
-        logger.info(
-            f"RAG index update cycle finished in {elapsed_cycle_time:.2f} seconds."
-        )
+        # Diagnostic query (Original main.py:740-747)
+        try:
+            diag_cursor = conn.cursor()  # Use a new cursor or the same one
+            diag_cursor.execute("SELECT COUNT(*) FROM rag_chunks")
+            chunk_count_diag = diag_cursor.fetchone()[0]
+            diag_cursor.execute("SELECT COUNT(*) FROM rag_embeddings")
+            embedding_count_diag = diag_cursor.fetchone()[0]
+            logger.info(
+                f"DB RAG DIAGNOSTIC: Found {chunk_count_diag} chunks and {embedding_count_diag} embeddings post-cycle."
+            )
+        except Exception as e_diag:
+            logger.error(f"Error running RAG database diagnostics: {e_diag}")
+
+    except sqlite3.OperationalError as e_sqlite_op:  # main.py:750-753
+        if (
+            "no such module: vec0" in str(e_sqlite_op)
+            or "vector search requires" in str(e_sqlite_op).lower()
+        ):
+            logger.warning(
+                f"Vector search module (vec0) not available or table missing. RAG indexing cycle skipped. Error: {e_sqlite_op}"
+            )
+            g.global_vss_load_successful = (
+                False  # Mark VSS as not usable if this happens
+            )
+        else:
+            logger.error(
+                f"Database operational error in RAG indexing cycle: {e_sqlite_op}",
+                exc_info=True,
+            )
+    except Exception as e_cycle:  # main.py:756 (general catch-all for the cycle)
+        logger.error(f"Error in RAG indexing cycle: {e_cycle}", exc_info=True)
+    finally:
+        if conn:
+            conn.close()
+
+    elapsed_cycle_time = time.time() - cycle_start_time
+    logger.info(
+        f"RAG index update cycle finished in {elapsed_cycle_time:.2f} seconds."
+    )
+
+    return True
+
+
+async def run_rag_indexing_periodically(
+    interval_seconds: int = 300, *, task_status=anyio.TASK_STATUS_IGNORED
+) -> NoReturn:
+    """
+    Periodically scans sources (Markdown files, project context) and updates
+    the RAG index in the database.
+    Original main.py: lines 512 - 826.
+    """
+    logger.info("Background RAG indexer process starting...")
+    # Signal that the task has started successfully for the TaskGroup
+    task_status.started()
+
+    await anyio.sleep(10)  # Initial sleep to allow server startup (main.py:515)
+
+    # Get OpenAI client. The service initializes it and stores in g.openai_client_instance
+    # The API key itself is also needed for the truly async batch embedding function.
+    # Get API key directly from environment
+    openai_api_key_for_batches = os.environ.get("OPENAI_API_KEY")
+
+    if not openai_api_key_for_batches:
+        logger.error("OpenAI API Key not configured. RAG indexer cannot run.")
+        return
+
+    # Check if the OpenAI library itself was loaded
+    if openai is None:
+        logger.error("OpenAI Python library not loaded. RAG indexer cannot run.")
+        return
+
+    while g.server_running:  # Uses global flag (main.py:521)
+        if not await _run_rag_index_cycle():
+            await anyio.sleep(interval_seconds * 2)  # Sleep longer if VSS fails
+            continue
 
         # Sleep interval (Original main.py:760)
         # Adjusted sleep: min 60s, or interval_seconds, whichever is larger.
@@ -826,8 +1089,124 @@ async def run_rag_indexing_periodically(
     logger.info("Background RAG indexer process stopped.")
 
 
-# This function, run_rag_indexing_periodically, will be started as a background task
-# by the server lifecycle management (e.g., in app/server_lifecycle.py).
+def _make_watch_filter(project_dir: Path, extensions: Set[str]):
+    """
+    Builds a watchfiles filter that lets through indexable files and
+    directories (a directory rename/move only produces directory events),
+    honouring IGNORE_DIRS_FOR_INDEXING (which also keeps the .agent database
+    writes from re-triggering the indexer). Paths that no longer exist pass
+    too, since a deleted directory can no longer be told apart from a file.
+    """
+
+    def _watch_filter(change, path: str) -> bool:
+        try:
+            relative_path = Path(path).relative_to(project_dir).as_posix()
+        except ValueError:
+            return False
+        if _is_indexable_relative_path(relative_path, extensions):
+            return True
+        if _is_ignored_relative_path(relative_path):
+            return False
+        return os.path.isdir(path) or not os.path.exists(path)
+
+    return _watch_filter
+
+
+async def run_rag_indexing_on_changes(
+    debounce_ms: int = 1500,
+    fallback_interval_seconds: int = 300,
+    *,
+    task_status=anyio.TASK_STATUS_IGNORED,
+) -> NoReturn:
+    """
+    Event-driven RAG indexer. Subscribes to filesystem change events under the
+    project directory and re-indexes only the paths that changed.
+
+    Bursts of events (e.g. a branch checkout) are debounced by watchfiles and
+    coalesced into one batched cycle; events arriving while a cycle runs are
+    delivered together on the next iteration. Directory events are expanded
+    into the files under them. If no file changes for
+    `fallback_interval_seconds`, a cycle without file I/O runs to keep project
+    context and task updates flowing into the index. The full tree is only
+    walked at startup and, if MCP_RAG_WATCH_RECONCILE_SECONDS is set, at that
+    interval to catch events the watcher missed.
+    """
+    logger.info("Background RAG indexer process starting (filesystem-watch mode)...")
+    # Signal that the task has started successfully for the TaskGroup
+    task_status.started()
+
+    if awatch is None:
+        logger.warning(
+            "watchfiles library not installed. Falling back to periodic RAG indexing."
+        )
+        await run_rag_indexing_periodically(fallback_interval_seconds)
+        return
+
+    await anyio.sleep(10)  # Initial sleep to allow server startup
+
+    openai_api_key_for_batches = os.environ.get("OPENAI_API_KEY")
+    if not openai_api_key_for_batches:
+        logger.error("OpenAI API Key not configured. RAG indexer cannot run.")
+        return
+    if openai is None:
+        logger.error("OpenAI Python library not loaded. RAG indexer cannot run.")
+        return
+
+    # One full scan catches anything that changed while the server was down
+    if not await _run_rag_index_cycle():
+        logger.warning(
+            "Initial RAG index cycle skipped (vector search unavailable). Watching for changes anyway."
+        )
+
+    last_reconcile = time.monotonic()
+    current_project_dir = get_project_dir()
+    watch_filter = _make_watch_filter(current_project_dir, _get_extensions_to_scan())
+
+    async for changes in awatch(
+        current_project_dir,
+        watch_filter=watch_filter,
+        debounce=debounce_ms,
+        rust_timeout=fallback_interval_seconds * 1000,
+        yield_on_timeout=True,
+    ):
+        if not g.server_running:
+            break
+
+        changed_paths: Set[str] = set()
+        for _, changed_path in changes:
+            try:
+                changed_paths.add(
+                    Path(changed_path).relative_to(current_project_dir).as_posix()
+                )
+            except ValueError:
+                continue
+
+        if (
+            RAG_WATCH_RECONCILE_SECONDS > 0
+            and time.monotonic() - last_reconcile >= RAG_WATCH_RECONCILE_SECONDS
+        ):
+            # Opt-in reconcile of the whole tree against the manifest
+            # (unchanged files are skipped by their stat signature)
+            logger.info("RAG watcher: periodic full-tree reconcile.")
+            last_reconcile = time.monotonic()
+            await _run_rag_index_cycle()
+            continue
+
+        if not changes:
+            # Timeout tick: project context and tasks only, no file I/O
+            await _run_rag_index_cycle(changed_paths=set())
+            continue
+
+        logger.info(
+            f"RAG watcher: {len(changed_paths)} changed paths, starting batched re-index."
+        )
+        await _run_rag_index_cycle(changed_paths=changed_paths)
+
+    logger.info("Background RAG indexer process stopped (filesystem-watch mode).")
+
+
+# run_rag_indexing_periodically / run_rag_indexing_on_changes are started as background
+# tasks by the server lifecycle management (e.g., in app/server_lifecycle.py).
 
 
 # Task indexing functions for System 8
@@ -890,16 +1269,16 @@ async def index_task_data(task_id: str, task_data: Dict[str, Any]) -> None:
                 )
                 chunk_id = cursor.lastrowid
 
-                # Insert embedding
-                embedding_json_str = json.dumps(embedding_vector)
+                # Insert embedding as a packed float32 blob
                 cursor.execute(
                     "INSERT INTO rag_embeddings (rowid, embedding) VALUES (?, ?)",
-                    (chunk_id, embedding_json_str),
+                    (chunk_id, pack_embedding(embedding_vector)),
                 )
 
             except Exception as e:
                 logger.error(f"Error generating embedding for task {task_id}: {e}")
 
+        bump_rag_index_version(cursor)
         conn.commit()
         logger.info(f"Successfully indexed task {task_id}")
 
@@ -922,7 +1301,8 @@ async def index_all_tasks() -> None:
         # Get all tasks
         cursor.execute(
             "SELECT task_id, title, description, status, assigned_to, created_by, "
-            "parent_task, depends_on_tasks, priority, created_at, updated_at "
+            f"parent_task, {TASK_DEPENDENCIES_JSON_SQL} AS depends_on_tasks, "
+            "priority, created_at, updated_at "
             "FROM tasks"
         )
 
@@ -1,7 +1,11 @@
 # Agent-MCP/mcp_template/mcp_server_src/features/rag/query.py
+import os
 import json
 import sqlite3  # For type hinting and error handling
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+import anyio
+import anyio.to_thread
 
 # Imports from our project
 from ...core.config import (
@@ -12,47 +16,252 @@ from ...core.config import (
     MAX_CONTEXT_TOKENS,  # From main.py:182
 )
 from ...db.connection import get_db_connection, is_vss_loadable
-from ...external.openai_service import get_openai_client
+from ...db.actions.task_db import TASK_DEPENDENCIES_JSON_SQL
+from ...external.openai_service import get_async_openai_client, create_embeddings
+from ...db.actions.rag_db import (
+    get_rag_index_version,
+    search_chunks_fts,
+    search_tasks_fts,
+)
+from ...utils.vector_utils import pack_embedding
+from .hybrid import reciprocal_rank_fusion
+from .query_cache import (
+    query_embedding_cache,
+    rag_answer_cache,
+    normalize_query,
+    fingerprint_live_data,
+)
 
 # For OpenAI exceptions
 import openai
 
-# Original location: main.py lines 1432 - 1566 (ask_project_rag_tool function body)
+# Queries never block the event loop: OpenAI calls go through the shared async
+# client and SQLite work runs in worker threads, each with its own connection.
+# At most RAG_QUERY_MAX_CONCURRENCY queries run at once; further callers wait.
+RAG_QUERY_MAX_CONCURRENCY = int(os.environ.get("MCP_RAG_QUERY_CONCURRENCY", "8"))
+_rag_query_limiter = anyio.CapacityLimiter(RAG_QUERY_MAX_CONCURRENCY)
+# Threads used for RAG query DB work (a query runs at most one DB call at a time)
+_rag_db_limiter = anyio.CapacityLimiter(RAG_QUERY_MAX_CONCURRENCY)
 
+VECTOR_SEARCH_K = 13  # Optimized based on recent RAG research
+# Candidates taken from each retriever before reciprocal-rank fusion
+HYBRID_CANDIDATES_PER_RETRIEVER = VECTOR_SEARCH_K * 2
 
-async def query_rag_system(query_text: str) -> str:
+
+async def _run_db(func, *args):
+    """Runs a blocking DB function in a worker thread."""
+    return await anyio.to_thread.run_sync(func, *args, limiter=_rag_db_limiter)
+
+
+def _has_vector_table() -> bool:
+    """Returns True if the rag_embeddings table exists (runs in a worker thread)."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
+        )
+        return cursor.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def _vector_search(
+    query_embedding_blob: bytes, k_results: int
+) -> List[Dict[str, Any]]:
     """
-    Processes a natural language query using the RAG system.
-    Fetches relevant context from live data and indexed knowledge,
-    then uses an LLM to synthesize an answer.
+    Runs the sqlite-vec KNN search with chunk metadata (runs in a worker thread).
 
-    Args:
-        query_text: The natural language question from the user.
+    Raises:
+        sqlite3.Error: On database errors.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        sql_vector_search = """
+            SELECT c.chunk_id, c.chunk_text, c.source_type, c.source_ref, c.metadata,
+                   r.distance
+            FROM rag_embeddings r
+            JOIN rag_chunks c ON r.rowid = c.chunk_id
+            WHERE r.embedding MATCH ? AND k = ?
+            ORDER BY r.distance
+        """
+        cursor.execute(sql_vector_search, (query_embedding_blob, k_results))
+        raw_results = cursor.fetchall()
+    finally:
+        conn.close()
 
-    Returns:
-        A string containing the answer or an error message.
+    return _parse_chunk_metadata([dict(row) for row in raw_results])
+
+
+def _lexical_search(query_text: str, limit: int) -> List[Dict[str, Any]]:
     """
-    # Get OpenAI client (main.py:1438)
-    openai_client = get_openai_client()
-    if not openai_client:
-        logger.error("RAG Query: OpenAI client is not available. Cannot process query.")
-        return "RAG Error: OpenAI client not available. Please check server configuration and OpenAI API key."
+    BM25 search over rag_chunks_fts (runs in a worker thread). Returns no
+    results if the FTS index does not exist.
+    """
+    conn = get_db_connection()
+    try:
+        return _parse_chunk_metadata(
+            search_chunks_fts(conn.cursor(), query_text, limit)
+        )
+    except sqlite3.OperationalError as e_fts:
+        if "no such table" not in str(e_fts):
+            raise
+        logger.debug(f"RAG Query: rag_chunks_fts unavailable ({e_fts}).")
+        return []
+    finally:
+        conn.close()
 
-    conn = None
-    answer = (
-        "An unexpected error occurred during the RAG query."  # Default error message
-    )
 
+def _parse_chunk_metadata(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Parses the JSON metadata column of chunk result dicts in place."""
+    for result in results:
+        # Parse metadata JSON if present
+        if result.get("metadata"):
+            try:
+                result["metadata"] = json.loads(result["metadata"])
+            except json.JSONDecodeError:
+                result["metadata"] = None
+    return results
+
+
+async def _search_vector_index(query_text: str) -> List[Dict[str, Any]]:
+    """
+    Embeds the query with the async client and runs the vector search off the
+    event loop. Errors are logged and yield no results.
+    """
+    if not is_vss_loadable():  # Check global VSS status
+        logger.warning(
+            "RAG Query: Vector search (sqlite-vec) is not available. Skipping vector search."
+        )
+        return []
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Check if rag_embeddings table exists (main.py:1480-1484)
+        if not await _run_db(_has_vector_table):
+            logger.warning(
+                "RAG Query: 'rag_embeddings' table not found. Skipping vector search."
+            )
+            return []
+        # Embed the query (main.py:1487-1492), reusing a cached embedding
+        embedding_cache_key = (EMBEDDING_MODEL, EMBEDDING_DIMENSION, query_text)
+        query_embedding_blob = query_embedding_cache.get(embedding_cache_key)
+        if query_embedding_blob is None:
+            response = await create_embeddings(
+                [query_text], model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSION
+            )
+            query_embedding_blob = pack_embedding(response.data[0].embedding)
+            query_embedding_cache.set(embedding_cache_key, query_embedding_blob)
+        return await _run_db(
+            _vector_search, query_embedding_blob, HYBRID_CANDIDATES_PER_RETRIEVER
+        )
+    except sqlite3.Error as e_vec_sql:
+        logger.error(f"RAG Query: Database error during vector search: {e_vec_sql}")
+    except openai.APIError as e_openai_emb:  # Catch OpenAI errors during embedding
+        logger.error(
+            f"RAG Query: OpenAI API error during query embedding: {e_openai_emb}"
+        )
+    except Exception as e_vec_other:
+        logger.error(
+            f"RAG Query: Unexpected error during vector search part: {e_vec_other}",
+            exc_info=True,
+        )
+    return []
+
+
+async def _search_indexed_knowledge(query_text: str) -> List[Dict[str, Any]]:
+    """
+    Hybrid retrieval: BM25 over rag_chunks_fts and k-NN over rag_embeddings
+    run concurrently and are fused with reciprocal-rank fusion. Exact
+    identifier matches surface through BM25 even when their embedding is not
+    among the nearest neighbours; either retriever alone still works if the
+    other is unavailable.
+    """
+    retrieved: Dict[str, List[Dict[str, Any]]] = {"vector": [], "lexical": []}
 
-        live_context_results: List[Dict[str, Any]] = []
-        live_task_results: List[Dict[str, Any]] = []
-        vector_search_results: List[
-            Dict[str, Any]
-        ] = []  # Store as dicts for easier access
+    async def _vector() -> None:
+        retrieved["vector"] = await _search_vector_index(query_text)
+
+    async def _lexical() -> None:
+        try:
+            retrieved["lexical"] = await _run_db(
+                _lexical_search, query_text, HYBRID_CANDIDATES_PER_RETRIEVER
+            )
+        except sqlite3.Error as e_fts:
+            logger.error(f"RAG Query: Database error during lexical search: {e_fts}")
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(_vector)
+        tg.start_soon(_lexical)
+
+    return reciprocal_rank_fusion(
+        [retrieved["vector"], retrieved["lexical"]], limit=VECTOR_SEARCH_K
+    )
+
+
+def _fetch_live_tasks_like(
+    cursor: sqlite3.Cursor, query_text: str
+) -> List[Dict[str, Any]]:
+    """Keyword task lookup with LIKE scans, used when tasks_fts is unavailable."""
+    live_task_results: List[Dict[str, Any]] = []
+    query_keywords = [
+        f"%{word.strip().lower()}%"
+        for word in query_text.split()
+        if len(word.strip()) > 2
+    ]
+    if query_keywords:
+        # Build LIKE clauses for title and description
+        # Ensure each keyword is used for both title and description search
+        conditions = []
+        sql_params_tasks: List[str] = []
+        for kw in query_keywords:
+            conditions.append("LOWER(title) LIKE ?")
+            sql_params_tasks.append(kw)
+            conditions.append("LOWER(description) LIKE ?")
+            sql_params_tasks.append(kw)
+
+        if conditions:
+            # Validate that all conditions are safe (only LIKE patterns)
+            safe_conditions = []
+            for condition in conditions:
+                if condition not in [
+                    "LOWER(title) LIKE ?",
+                    "LOWER(description) LIKE ?",
+                ]:
+                    logger.warning(
+                        f"RAG Query: Skipping unsafe condition: {condition}"
+                    )
+                    continue
+                safe_conditions.append(condition)
+
+            if safe_conditions:
+                where_clause = " OR ".join(safe_conditions)
+                task_query_sql = f"""
+                    SELECT task_id, title, status, description, updated_at
+                    FROM tasks
+                    WHERE {where_clause}
+                    ORDER BY updated_at DESC
+                    LIMIT 5
+                """
+                cursor.execute(task_query_sql, sql_params_tasks)
+            live_task_results = [dict(row) for row in cursor.fetchall()]
+    return live_task_results
 
+
+def _fetch_live_data(
+    query_text: str,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """
+    Fetches recently updated project context and keyword-matched tasks, plus
+    the RAG index version (runs in a worker thread with its own connection).
+
+    Returns:
+        (live_context_results, live_task_results, index_version)
+    """
+    live_context_results: List[Dict[str, Any]] = []
+    live_task_results: List[Dict[str, Any]] = []
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
         # --- 1. Fetch Live Context (Recently Updated) ---
         # Original main.py: lines 1445 - 1457
         try:
@@ -92,47 +301,13 @@ async def query_rag_system(query_text: str) -> str:
         # --- 2. Fetch Live Tasks (Keyword Search) ---
         # Original main.py: lines 1459 - 1477
         try:
-            query_keywords = [
-                f"%{word.strip().lower()}%"
-                for word in query_text.split()
-                if len(word.strip()) > 2
-            ]
-            if query_keywords:
-                # Build LIKE clauses for title and description
-                # Ensure each keyword is used for both title and description search
-                conditions = []
-                sql_params_tasks: List[str] = []
-                for kw in query_keywords:
-                    conditions.append("LOWER(title) LIKE ?")
-                    sql_params_tasks.append(kw)
-                    conditions.append("LOWER(description) LIKE ?")
-                    sql_params_tasks.append(kw)
-
-                if conditions:
-                    # Validate that all conditions are safe (only LIKE patterns)
-                    safe_conditions = []
-                    for condition in conditions:
-                        if condition not in [
-                            "LOWER(title) LIKE ?",
-                            "LOWER(description) LIKE ?",
-                        ]:
-                            logger.warning(
-                                f"RAG Query: Skipping unsafe condition: {condition}"
-                            )
-                            continue
-                        safe_conditions.append(condition)
-
-                    if safe_conditions:
-                        where_clause = " OR ".join(safe_conditions)
-                        task_query_sql = f"""
-                            SELECT task_id, title, status, description, updated_at
-                            FROM tasks
-                            WHERE {where_clause}
-                            ORDER BY updated_at DESC
-                            LIMIT 5
-                        """
-                        cursor.execute(task_query_sql, sql_params_tasks)
-                    live_task_results = [dict(row) for row in cursor.fetchall()]
+            # BM25 lookup over tasks_fts (ID, title, description); falls back
+            # to LIKE scans if this SQLite build has no FTS5 index
+            try:
+                live_task_results = search_tasks_fts(cursor, query_text, 5)
+            except sqlite3.OperationalError as e_fts:
+                logger.debug(f"RAG Query: tasks_fts unavailable ({e_fts}); using LIKE.")
+                live_task_results = _fetch_live_tasks_like(cursor, query_text)
         except sqlite3.Error as e_live_task:
             logger.warning(
                 f"RAG Query: Failed to fetch live tasks based on query keywords: {e_live_task}"
@@ -142,70 +317,106 @@ async def query_rag_system(query_text: str) -> str:
                 f"RAG Query: Unexpected error fetching live tasks: {e_live_task_other}",
                 exc_info=True,
             )
+        index_version = get_rag_index_version(cursor)
+    finally:
+        conn.close()
+    return live_context_results, live_task_results, index_version
+
+
+def _fetch_live_data_for_analysis() -> (
+    Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]
+):
+    """
+    Fetches all project context and open tasks for task analysis queries
+    (runs in a worker thread with its own connection).
+
+    Raises:
+        sqlite3.Error: On database errors.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        # Get live context (same as regular RAG)
+        cursor.execute(
+            "SELECT context_key, value, description, last_updated FROM project_context ORDER BY last_updated DESC"
+        )
+        live_context_results = [dict(row) for row in cursor.fetchall()]
+
+        # Get live tasks (same as regular RAG)
+        cursor.execute(
+            f"""
+            SELECT task_id, title, description, status, created_by, assigned_to, 
+                   priority, parent_task, {TASK_DEPENDENCIES_JSON_SQL} AS depends_on_tasks,
+                   created_at, updated_at 
+            FROM tasks 
+            WHERE status IN ('pending', 'in_progress') 
+            ORDER BY updated_at DESC
+        """
+        )
+        live_task_results = [dict(row) for row in cursor.fetchall()]
+        index_version = get_rag_index_version(cursor)
+    finally:
+        conn.close()
+    return live_context_results, live_task_results, index_version
+
+
+# Original location: main.py lines 1432 - 1566 (ask_project_rag_tool function body)
+
+
+async def query_rag_system(query_text: str) -> str:
+    """
+    Processes a natural language query using the RAG system.
+    Waits for a free slot if RAG_QUERY_MAX_CONCURRENCY queries are running.
+    """
+    async with _rag_query_limiter:
+        return await _query_rag_system(query_text)
+
+
+async def _query_rag_system(query_text: str) -> str:
+    """
+    Processes a natural language query using the RAG system.
+    Fetches relevant context from live data and indexed knowledge,
+    then uses an LLM to synthesize an answer.
+
+    Args:
+        query_text: The natural language question from the user.
+
+    Returns:
+        A string containing the answer or an error message.
+    """
+    # Get OpenAI client (main.py:1438)
+    openai_client = get_async_openai_client()
+    if not openai_client:
+        logger.error("RAG Query: OpenAI client is not available. Cannot process query.")
+        return "RAG Error: OpenAI client not available. Please check server configuration and OpenAI API key."
+
+    answer = (
+        "An unexpected error occurred during the RAG query."  # Default error message
+    )
+
+    try:
+        # --- 1 & 2. Fetch Live Context and Tasks (off the event loop) ---
+        live_context_results, live_task_results, index_version = await _run_db(
+            _fetch_live_data, query_text
+        )
+
+        # Serve a cached answer if nothing it was built from has changed
+        answer_cache_key = (
+            "ask_project_rag",
+            CHAT_MODEL,
+            MAX_CONTEXT_TOKENS,
+            normalize_query(query_text),
+            index_version,
+            fingerprint_live_data(live_context_results, live_task_results),
+        )
+        cached_answer = rag_answer_cache.get(answer_cache_key)
+        if cached_answer is not None:
+            logger.info("RAG Query: Served answer from cache.")
+            return cached_answer
 
         # --- 3. Perform Vector Search (Indexed Knowledge) ---
         # Original main.py: lines 1479 - 1506
-        if is_vss_loadable():  # Check global VSS status
-            try:
-                # Check if rag_embeddings table exists (main.py:1480-1484)
-                cursor.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
-                )
-                if cursor.fetchone() is not None:
-                    # Embed the query (main.py:1487-1492)
-                    response = openai_client.embeddings.create(
-                        input=[query_text],
-                        model=EMBEDDING_MODEL,
-                        dimensions=EMBEDDING_DIMENSION,
-                    )
-                    query_embedding = response.data[0].embedding
-                    query_embedding_json = json.dumps(query_embedding)
-
-                    # Search Vector Table with metadata
-                    k_results = 13  # Optimized based on recent RAG research
-                    sql_vector_search = """
-                        SELECT c.chunk_text, c.source_type, c.source_ref, c.metadata, r.distance
-                        FROM rag_embeddings r
-                        JOIN rag_chunks c ON r.rowid = c.chunk_id
-                        WHERE r.embedding MATCH ? AND k = ?
-                        ORDER BY r.distance
-                    """
-                    cursor.execute(sql_vector_search, (query_embedding_json, k_results))
-                    raw_results = cursor.fetchall()
-
-                    # Process results to parse metadata
-                    for row in raw_results:
-                        result = dict(row)
-                        # Parse metadata JSON if present
-                        if result.get("metadata"):
-                            try:
-                                result["metadata"] = json.loads(result["metadata"])
-                            except json.JSONDecodeError:
-                                result["metadata"] = None
-                        vector_search_results.append(result)
-                else:
-                    logger.warning(
-                        "RAG Query: 'rag_embeddings' table not found. Skipping vector search."
-                    )
-            except sqlite3.Error as e_vec_sql:
-                logger.error(
-                    f"RAG Query: Database error during vector search: {e_vec_sql}"
-                )
-            except (
-                openai.APIError
-            ) as e_openai_emb:  # Catch OpenAI errors during embedding
-                logger.error(
-                    f"RAG Query: OpenAI API error during query embedding: {e_openai_emb}"
-                )
-            except Exception as e_vec_other:
-                logger.error(
-                    f"RAG Query: Unexpected error during vector search part: {e_vec_other}",
-                    exc_info=True,
-                )
-        else:
-            logger.warning(
-                "RAG Query: Vector search (sqlite-vec) is not available. Skipping vector search."
-            )
+        vector_search_results = await _search_indexed_knowledge(query_text)
 
         # --- 4. Combine Contexts for LLM ---
         # Original main.py: lines 1509 - 1548
@@ -309,7 +520,7 @@ Always err on the side of providing more detailed explanations and comprehensive
                 f"RAG Query: User message for LLM:\n{user_message_for_llm[:500]}..."
             )
 
-            chat_response = openai_client.chat.completions.create(
+            chat_response = await openai_client.chat.completions.create(
                 model=CHAT_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt_for_llm},
@@ -318,6 +529,8 @@ Always err on the side of providing more detailed explanations and comprehensive
                 temperature=0.4,  # Increased for more diverse context discovery while maintaining accuracy
             )
             answer = chat_response.choices[0].message.content
+            if answer:
+                rag_answer_cache.set(answer_cache_key, answer)
 
     except openai.APIError as e_openai:  # main.py:1563
         logger.error(f"RAG Query: OpenAI API error: {e_openai}", exc_info=True)
@@ -330,15 +543,23 @@ Always err on the side of providing more detailed explanations and comprehensive
         answer = (
             f"An unexpected error occurred during the RAG query: {str(e_unexpected)}"
         )
-    finally:
-        if conn:
-            conn.close()
 
     return answer
 
 
 async def query_rag_system_with_model(
     query_text: str, model_name: str, max_tokens: int = None
+) -> str:
+    """
+    Processes a query using the RAG system with a specific OpenAI model.
+    Shares the query concurrency limit with query_rag_system.
+    """
+    async with _rag_query_limiter:
+        return await _query_rag_system_with_model(query_text, model_name, max_tokens)
+
+
+async def _query_rag_system_with_model(
+    query_text: str, model_name: str, max_tokens: int = None
 ) -> str:
     """
     Processes a query using the RAG system with a specific OpenAI model.
@@ -354,7 +575,7 @@ async def query_rag_system_with_model(
         A string containing the answer or an error message.
     """
     # Get OpenAI client
-    openai_client = get_openai_client()
+    openai_client = get_async_openai_client()
     if not openai_client:
         logger.error("RAG Query: OpenAI client is not available. Cannot process query.")
         return "RAG Error: OpenAI client not available. Please check server configuration and OpenAI API key."
@@ -362,91 +583,28 @@ async def query_rag_system_with_model(
     # Use provided max_tokens or default to the configured value
     context_limit = max_tokens if max_tokens else MAX_CONTEXT_TOKENS
 
-    conn = None
     answer = "An unexpected error occurred during the RAG query."
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        live_context_results: List[Dict[str, Any]] = []
-        live_task_results: List[Dict[str, Any]] = []
-        vector_search_results: List[Dict[str, Any]] = []
-
-        # Get live context (same as regular RAG)
-        cursor.execute(
-            "SELECT context_key, value, description, last_updated FROM project_context ORDER BY last_updated DESC"
+        live_context_results, live_task_results, index_version = await _run_db(
+            _fetch_live_data_for_analysis
         )
-        live_context_results = [dict(row) for row in cursor.fetchall()]
 
-        # Get live tasks (same as regular RAG)
-        cursor.execute(
-            """
-            SELECT task_id, title, description, status, created_by, assigned_to, 
-                   priority, parent_task, depends_on_tasks, created_at, updated_at 
-            FROM tasks 
-            WHERE status IN ('pending', 'in_progress') 
-            ORDER BY updated_at DESC
-        """
+        answer_cache_key = (
+            "task_analysis",
+            model_name,
+            context_limit,
+            normalize_query(query_text),
+            index_version,
+            fingerprint_live_data(live_context_results, live_task_results),
         )
-        live_task_results = [dict(row) for row in cursor.fetchall()]
+        cached_answer = rag_answer_cache.get(answer_cache_key)
+        if cached_answer is not None:
+            logger.info(f"Task Analysis Query: Served {model_name} answer from cache.")
+            return cached_answer
 
         # Get vector search results if VSS is available
-        if is_vss_loadable():
-            try:
-                # Check if rag_embeddings table exists
-                cursor.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name='rag_embeddings'"
-                )
-                if cursor.fetchone() is not None:
-                    # Embed the query
-                    query_embedding_response = openai_client.embeddings.create(
-                        input=[query_text],
-                        model=EMBEDDING_MODEL,
-                        dimensions=EMBEDDING_DIMENSION,
-                    )
-                    query_embedding = query_embedding_response.data[0].embedding
-                    query_embedding_json = json.dumps(query_embedding)
-
-                    # Perform vector search using sqlite-vec (matching working implementation)
-                    k_results = 13  # Optimized based on recent RAG research
-                    vector_search_sql = """
-                        SELECT c.chunk_text, c.source_type, c.source_ref, c.metadata, r.distance
-                        FROM rag_embeddings r
-                        JOIN rag_chunks c ON r.rowid = c.chunk_id
-                        WHERE r.embedding MATCH ? AND k = ?
-                        ORDER BY r.distance
-                    """
-                    cursor.execute(vector_search_sql, (query_embedding_json, k_results))
-                    raw_results = cursor.fetchall()
-
-                    # Process results to parse metadata
-                    for row in raw_results:
-                        result = dict(row)
-                        # Parse metadata JSON if present
-                        if result.get("metadata"):
-                            try:
-                                result["metadata"] = json.loads(result["metadata"])
-                            except json.JSONDecodeError:
-                                result["metadata"] = None
-                        vector_search_results.append(result)
-                else:
-                    logger.warning(
-                        "RAG Query: 'rag_embeddings' table not found. Skipping vector search."
-                    )
-            except sqlite3.Error as e_vec_sql:
-                logger.error(
-                    f"RAG Query: Database error during vector search: {e_vec_sql}"
-                )
-            except openai.APIError as e_openai_emb:
-                logger.error(
-                    f"RAG Query: OpenAI API error during query embedding: {e_openai_emb}"
-                )
-            except Exception as e_vec_other:
-                logger.error(
-                    f"RAG Query: Unexpected error during vector search: {e_vec_other}",
-                    exc_info=True,
-                )
+        vector_search_results = await _search_indexed_knowledge(query_text)
 
         # Build context (same structure as regular RAG)
         context_parts = []
@@ -551,7 +709,7 @@ Answer in the exact JSON format requested, but include thorough explanations in
             )
 
             # Use the specified model for this query
-            chat_response = openai_client.chat.completions.create(
+            chat_response = await openai_client.chat.completions.create(
                 model=model_name,
                 messages=[
                     {"role": "system", "content": system_prompt_for_llm},
@@ -560,12 +718,11 @@ Answer in the exact JSON format requested, but include thorough explanations in
                 temperature=0.4,  # Increased for more diverse analysis while maintaining JSON consistency
             )
             answer = chat_response.choices[0].message.content
+            if answer:
+                rag_answer_cache.set(answer_cache_key, answer)
 
     except Exception as e:
         logger.error(f"RAG Query with model {model_name}: Error: {e}", exc_info=True)
         answer = f"Error during RAG query with {model_name}: {str(e)}"
-    finally:
-        if conn:
-            conn.close()
 
     return answer
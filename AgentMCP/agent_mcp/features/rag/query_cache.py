@@ -0,0 +1,103 @@
+# Agent-MCP/agent_mcp/features/rag/query_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Two-level cache for ask_project_rag:
+#   1. query text -> query embedding (skips the embedding round-trip)
+#   2. (normalised query, model, index version, live data fingerprint) -> answer
+# The index version lives in rag_meta and is bumped by the indexer whenever it
+# commits chunk changes, and the live data fingerprint covers the context/task
+# rows fetched for the prompt, so a cached answer is never served for changed data.
+RAG_CACHE_TTL_SECONDS = float(os.environ.get("MCP_RAG_CACHE_TTL_SECONDS", "900"))
+RAG_QUERY_EMBEDDING_CACHE_SIZE = int(
+    os.environ.get("MCP_RAG_QUERY_EMBEDDING_CACHE_SIZE", "1024")
+)
+RAG_ANSWER_CACHE_SIZE = int(os.environ.get("MCP_RAG_ANSWER_CACHE_SIZE", "256"))
+
+
+class TTLLRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+query_embedding_cache = TTLLRUCache(
+    RAG_QUERY_EMBEDDING_CACHE_SIZE, RAG_CACHE_TTL_SECONDS
+)
+rag_answer_cache = TTLLRUCache(RAG_ANSWER_CACHE_SIZE, RAG_CACHE_TTL_SECONDS)
+
+
+def normalize_query(query_text: str) -> str:
+    """Case- and whitespace-insensitive form of a query used in answer cache keys."""
+    return " ".join(query_text.lower().split())
+
+
+def fingerprint_live_data(*live_results: Any) -> str:
+    """Stable hash of the live context/task rows that go into a RAG prompt."""
+    payload = json.dumps(live_results, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_rag_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for both cache levels."""
+    return {
+        "query_embeddings": query_embedding_cache.get_stats(),
+        "answers": rag_answer_cache.get_stats(),
+    }
@@ -29,6 +29,7 @@ from ..utils.tmux_utils import (
 from ..utils.prompt_templates import build_agent_prompt
 from ..db.connection import get_db_connection
 from ..db.actions.agent_actions_db import log_agent_action_to_db  # For DB logging
+from ..db.actions.task_db import TASK_SELECT_COLUMNS
 
 
 def get_admin_token_suffix(admin_token: str) -> str:
@@ -276,7 +277,10 @@ async def create_agent_tool_impl(
                 g.tasks[task_id]["updated_at"] = created_at_iso
             else:
                 # If task not in cache, fetch from database and add to cache
-                cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+                cursor.execute(
+                    f"SELECT {TASK_SELECT_COLUMNS} FROM tasks WHERE task_id = ?",
+                    (task_id,),
+                )
                 task_row = cursor.fetchone()
                 if task_row:
                     task_data = dict(task_row)
@@ -10,7 +10,7 @@ from .registry import register_tool
 from ..core.config import logger
 from ..core.auth import get_agent_id, verify_token
 from ..utils.audit_utils import log_audit
-from ..db.connection import get_db_connection, execute_db_write
+from ..db.connection import get_db_connection, execute_db_batched_write
 from ..db.actions.agent_actions_db import log_agent_action_to_db
 
 
@@ -457,11 +457,10 @@ async def _handle_single_context_update(
             )
         ]
 
-    # Define the write operation as an async function
-    async def write_operation():
-        conn = None
+    # Define the write operation; the write queue runs it inside a shared
+    # (group-committed) transaction, so it must not commit or close the connection
+    def write_operation(conn):
         try:
-            conn = get_db_connection()
             cursor = conn.cursor()
             updated_at_iso = datetime.datetime.now().isoformat()
 
@@ -487,7 +486,6 @@ async def _handle_single_context_update(
                 "updated_context",
                 details={"context_key": context_key_to_update, "action": "set/update"},
             )
-            conn.commit()
 
             logger.info(
                 f"Project context for key '{context_key_to_update}' updated by '{requesting_agent_id}'."
@@ -495,28 +493,21 @@ async def _handle_single_context_update(
             return "success"
 
         except sqlite3.Error as e_sql:
-            if conn:
-                conn.rollback()
             logger.error(
                 f"Database error updating project context for key '{context_key_to_update}': {e_sql}",
                 exc_info=True,
             )
             raise e_sql
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(
                 f"Unexpected error updating project context for key '{context_key_to_update}': {e}",
                 exc_info=True,
             )
             raise e
-        finally:
-            if conn:
-                conn.close()
 
     # Execute the write operation through the queue
     try:
-        await execute_db_write(write_operation)
+        await execute_db_batched_write(write_operation)
         return [
             mcp_types.TextContent(
                 type="text",
@@ -548,14 +539,12 @@ async def _handle_bulk_context_update(
         {"update_count": len(updates_list)},
     )
 
-    # Define the write operation as an async function
-    async def write_operation():
-        conn = None
+    # Define the write operation; it runs inside the write queue's shared transaction
+    def write_operation(conn):
         results = []
         failed_updates = []
 
         try:
-            conn = get_db_connection()
             cursor = conn.cursor()
             updated_at_iso = datetime.datetime.now().isoformat()
 
@@ -608,7 +597,6 @@ async def _handle_bulk_context_update(
                         f"✗ Failed '{update.get('context_key', 'unknown')}': {str(e_update)}"
                     )
 
-            conn.commit()
 
             # Build response
             response_parts = [
@@ -629,24 +617,17 @@ async def _handle_bulk_context_update(
             return response_parts
 
         except sqlite3.Error as e_sql:
-            if conn:
-                conn.rollback()
             logger.error(
                 f"Database error in bulk context update: {e_sql}", exc_info=True
             )
             raise e_sql
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Unexpected error in bulk context update: {e}", exc_info=True)
             raise e
-        finally:
-            if conn:
-                conn.close()
 
     # Execute the write operation through the queue
     try:
-        response_parts = await execute_db_write(write_operation)
+        response_parts = await execute_db_batched_write(write_operation)
         return [mcp_types.TextContent(type="text", text="\n".join(response_parts))]
     except sqlite3.Error as e_sql:
         return [
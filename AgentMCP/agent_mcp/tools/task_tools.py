@@ -1,6 +1,7 @@
 # Agent-MCP/mcp_template/mcp_server_src/tools/task_tools.py
 import json
 import datetime
+import functools
 import secrets  # For task_id generation
 import os  # For request_assistance (notifications path)
 import sqlite3  # For database operations
@@ -13,9 +14,18 @@ from .registry import register_tool
 from ..core.config import logger, ENABLE_TASK_PLACEMENT_RAG, ALLOW_RAG_OVERRIDE
 from ..core import globals as g
 from ..core.auth import verify_token, get_agent_id
+from ..core.task_store import TaskStore
 from ..utils.audit_utils import log_audit
-from ..db.connection import get_db_connection, execute_db_write
+from ..db.connection import get_db_connection, execute_db_batched_write
 from ..db.actions.agent_actions_db import log_agent_action_to_db
+from ..db.actions.task_db import (
+    TASK_SELECT_COLUMNS_WITHOUT_NOTES,
+    add_task_note,
+    delete_task_relations,
+    get_dependent_task_ids,
+    insert_task,
+    set_task_dependencies,
+)
 from ..features.task_placement.validator import validate_task_placement
 from ..features.task_placement.suggestions import (
     format_suggestions_for_agent,
@@ -39,16 +49,25 @@ from ..utils.tmux_utils import (
 from ..utils.prompt_templates import build_agent_prompt
 
 
-def estimate_tokens(text: str) -> int:
-    """Accurate token estimation using tiktoken for GPT-4"""
+@functools.lru_cache(maxsize=1)
+def _get_token_encoding():
+    """The GPT-4 tiktoken encoding, or None if tiktoken is unavailable (resolved once)."""
     try:
         import tiktoken
 
-        encoding = tiktoken.encoding_for_model("gpt-4")
-        return len(encoding.encode(text))
-    except ImportError:
+        return tiktoken.encoding_for_model("gpt-4")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Accurate token estimation using tiktoken for GPT-4"""
+    encoding = _get_token_encoding()
+    if encoding is None:
         # Fallback to rough estimation if tiktoken not available
         return len(text) // 4
+    try:
+        return len(encoding.encode(text))
     except Exception:
         # Fallback for any other tiktoken errors
         return len(text) // 4
@@ -59,6 +78,16 @@ def _generate_task_id() -> str:
     return f"task_{secrets.token_hex(6)}"
 
 
+def _cache_new_task(task_data: Dict[str, Any]) -> None:
+    """Adds a committed task to g.tasks and to its cached parent's child list."""
+    g.tasks[task_data["task_id"]] = task_data
+    parent = g.tasks.get(task_data.get("parent_task"))
+    if parent is not None:
+        children = parent.setdefault("child_tasks", [])
+        if task_data["task_id"] not in children:
+            children.append(task_data["task_id"])
+
+
 def _generate_notification_id() -> str:
     """Generates a unique notification ID."""
     return f"notification_{secrets.token_hex(8)}"
@@ -114,7 +143,10 @@ async def _launch_testing_agent_for_completed_task(
         await _send_escape_to_agent(completed_by_agent)
 
         # 2. Get task details for context
-        cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (completed_task_id,))
+        cursor.execute(
+            "SELECT task_id, title, description FROM tasks WHERE task_id = ?",
+            (completed_task_id,),
+        )
         task_row = cursor.fetchone()
         if not task_row:
             logger.error(f"Cannot find completed task {completed_task_id} for testing")
@@ -376,8 +408,11 @@ async def _update_single_task(
 ) -> Dict[str, Any]:
     """Helper function to update a single task with smart features"""
 
-    # Fetch task current data
-    cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+    # Fetch task current data (notes are not needed to append one)
+    cursor.execute(
+        f"SELECT {TASK_SELECT_COLUMNS_WITHOUT_NOTES} FROM tasks WHERE task_id = ?",
+        (task_id,),
+    )
     task_db_row = cursor.fetchone()
     if not task_db_row:
         return {"success": False, "error": f"Task '{task_id}' not found"}
@@ -394,6 +429,15 @@ async def _update_single_task(
             "error": f"Unauthorized: Cannot update task '{task_id}' assigned to {task_current_data.get('assigned_to')}",
         }
 
+    # Reject dependency cycles before anything is written
+    if is_admin_request and new_depends_on_tasks is not None:
+        cycle = g.tasks.graph.find_cycle(task_id, new_depends_on_tasks)
+        if cycle:
+            return {
+                "success": False,
+                "error": f"Dependency cycle rejected for '{task_id}': {' -> '.join(cycle)}",
+            }
+
     updated_at_iso = datetime.datetime.now().isoformat()
 
     # Build update query
@@ -401,17 +445,11 @@ async def _update_single_task(
     update_params = [new_status, updated_at_iso]
 
     # Handle notes
-    current_notes_list = json.loads(task_current_data.get("notes") or "[]")
+    new_note = None
     if notes_content:
-        current_notes_list.append(
-            {
-                "timestamp": updated_at_iso,
-                "author": requesting_agent_id,
-                "content": notes_content,
-            }
+        new_note = add_task_note(
+            cursor, task_id, requesting_agent_id, notes_content, updated_at_iso
         )
-    update_fields_sql.append("notes = ?")
-    update_params.append(json.dumps(current_notes_list))
 
     # Admin-only field updates
     if is_admin_request:
@@ -428,8 +466,7 @@ async def _update_single_task(
             update_fields_sql.append("assigned_to = ?")
             update_params.append(new_assigned_to)
         if new_depends_on_tasks is not None:
-            update_fields_sql.append("depends_on_tasks = ?")
-            update_params.append(json.dumps(new_depends_on_tasks))
+            set_task_dependencies(cursor, task_id, new_depends_on_tasks)
 
     update_params.append(task_id)
 
@@ -439,12 +476,10 @@ async def _update_single_task(
         allowed_field_patterns = [
             "status = ?",
             "updated_at = ?",
-            "notes = ?",
             "title = ?",
             "description = ?",
             "priority = ?",
             "assigned_to = ?",
-            "depends_on_tasks = ?",
         ]
 
         safe_fields = []
@@ -465,7 +500,8 @@ async def _update_single_task(
     if task_id in g.tasks:
         g.tasks[task_id]["status"] = new_status
         g.tasks[task_id]["updated_at"] = updated_at_iso
-        g.tasks[task_id]["notes"] = current_notes_list
+        if new_note:
+            g.tasks[task_id].setdefault("notes", []).append(new_note)
         if is_admin_request:
             if new_title is not None:
                 g.tasks[task_id]["title"] = new_title
@@ -483,23 +519,20 @@ async def _update_single_task(
         "parent_task"
     ):
         parent_task_id = task_current_data["parent_task"]
-        cursor.execute("SELECT notes FROM tasks WHERE task_id = ?", (parent_task_id,))
-        parent_row = cursor.fetchone()
-        if parent_row:
-            parent_notes_list = json.loads(parent_row["notes"] or "[]")
-            parent_notes_list.append(
-                {
-                    "timestamp": updated_at_iso,
-                    "author": "system",
-                    "content": f"Subtask '{task_id}' ({task_current_data.get('title', '')}) status changed to: {new_status}",
-                }
-            )
-            cursor.execute(
-                "UPDATE tasks SET notes = ?, updated_at = ? WHERE task_id = ?",
-                (json.dumps(parent_notes_list), updated_at_iso, parent_task_id),
+        cursor.execute(
+            "UPDATE tasks SET updated_at = ? WHERE task_id = ?",
+            (updated_at_iso, parent_task_id),
+        )
+        if cursor.rowcount:
+            parent_note = add_task_note(
+                cursor,
+                parent_task_id,
+                "system",
+                f"Subtask '{task_id}' ({task_current_data.get('title', '')}) status changed to: {new_status}",
+                updated_at_iso,
             )
             if parent_task_id in g.tasks:
-                g.tasks[parent_task_id]["notes"] = parent_notes_list
+                g.tasks[parent_task_id].setdefault("notes", []).append(parent_note)
                 g.tasks[parent_task_id]["updated_at"] = updated_at_iso
 
     return {
@@ -515,7 +548,7 @@ async def _update_single_task(
 
 
 def _analyze_task_dependencies(
-    task: Dict[str, Any], all_tasks: Dict[str, Dict[str, Any]]
+    task: Dict[str, Any], all_tasks: TaskStore
 ) -> Dict[str, Any]:
     """Analyze task dependencies and blocking conditions"""
     task_id = task.get("task_id")
@@ -559,17 +592,8 @@ def _analyze_task_dependencies(
             analysis["is_blocked"] = True
             analysis["can_start"] = False
 
-    # Find tasks that depend on this one
-    for other_id, other_task in all_tasks.items():
-        other_deps = other_task.get("depends_on_tasks", [])
-        if isinstance(other_deps, str):
-            try:
-                other_deps = json.loads(other_deps)
-            except json.JSONDecodeError:
-                other_deps = []
-
-        if task_id in other_deps:
-            analysis["blocks_tasks"].append(other_id)
+    # Find tasks that depend on this one (reverse-dependency index)
+    analysis["blocks_tasks"] = all_tasks.dependents_of(task_id)
 
     # Determine health
     if analysis["missing_dependencies"]:
@@ -604,15 +628,8 @@ def _calculate_task_health_metrics(tasks: List[Dict[str, Any]]) -> Dict[str, Any
         priority = task.get("priority", "medium")
         priority_counts[priority] = priority_counts.get(priority, 0) + 1
 
-        # Check for blocked tasks (has dependencies but can't proceed)
-        deps = task.get("depends_on_tasks", [])
-        if isinstance(deps, str):
-            try:
-                deps = json.loads(deps)
-            except json.JSONDecodeError:
-                deps = []
-
-        if deps and status == "pending":
+        # Check for blocked tasks (maintained by the dependency graph)
+        if g.tasks.graph.is_blocked(task.get("task_id")):
             blocked_count += 1
 
         # Check for stale tasks (no updates in 7+ days)
@@ -681,13 +698,13 @@ async def _create_unassigned_tasks(
     priority = arguments.get("priority", "medium")
     parent_task_id_arg = arguments.get("parent_task_id")
 
-    # Define the write operation as an async function
-    async def write_operation():
-        conn = None
+    # Define the write operation; the write queue runs it inside a shared
+    # (group-committed) transaction, so it must not commit or close the connection
+    def write_operation(conn):
         try:
-            conn = get_db_connection()
             cursor = conn.cursor()
             created_tasks = []
+            new_task_rows = []
             created_at = datetime.datetime.now().isoformat()
 
             if tasks:
@@ -713,20 +730,12 @@ async def _create_unassigned_tasks(
                         "created_at": created_at,
                         "updated_at": created_at,
                         "parent_task": parent_task,
-                        "child_tasks": json.dumps([]),
-                        "depends_on_tasks": json.dumps([]),
-                        "notes": json.dumps([]),
+                        "child_tasks": [],
+                        "depends_on_tasks": [],
+                        "notes": [],
                     }
 
-                    cursor.execute(
-                        """
-                        INSERT INTO tasks (task_id, title, description, assigned_to, created_by, status, priority, 
-                                           created_at, updated_at, parent_task, child_tasks, depends_on_tasks, notes)
-                        VALUES (:task_id, :title, :description, :assigned_to, :created_by, :status, :priority, 
-                                :created_at, :updated_at, :parent_task, :child_tasks, :depends_on_tasks, :notes)
-                    """,
-                        task_data,
-                    )
+                    insert_task(cursor, task_data)
 
                     log_agent_action_to_db(
                         cursor,
@@ -736,8 +745,7 @@ async def _create_unassigned_tasks(
                         details={"title": title, "mode": "unassigned_multiple"},
                     )
 
-                    # Add to global cache
-                    g.tasks[task_id] = task_data
+                    new_task_rows.append(task_data)
 
                     created_tasks.append(
                         {"task_id": task_id, "title": title, "priority": task_priority}
@@ -758,20 +766,12 @@ async def _create_unassigned_tasks(
                     "created_at": created_at,
                     "updated_at": created_at,
                     "parent_task": parent_task_id_arg,
-                    "child_tasks": json.dumps([]),
-                    "depends_on_tasks": json.dumps([]),
-                    "notes": json.dumps([]),
+                    "child_tasks": [],
+                    "depends_on_tasks": [],
+                    "notes": [],
                 }
 
-                cursor.execute(
-                    """
-                    INSERT INTO tasks (task_id, title, description, assigned_to, created_by, status, priority, 
-                                       created_at, updated_at, parent_task, child_tasks, depends_on_tasks, notes)
-                    VALUES (:task_id, :title, :description, :assigned_to, :created_by, :status, :priority, 
-                            :created_at, :updated_at, :parent_task, :child_tasks, :depends_on_tasks, :notes)
-                """,
-                    task_data,
-                )
+                insert_task(cursor, task_data)
 
                 log_agent_action_to_db(
                     cursor,
@@ -781,8 +781,7 @@ async def _create_unassigned_tasks(
                     details={"title": task_title, "mode": "unassigned_single"},
                 )
 
-                # Add to global cache
-                g.tasks[task_id] = task_data
+                new_task_rows.append(task_data)
 
                 created_tasks.append(
                     {"task_id": task_id, "title": task_title, "priority": priority}
@@ -793,21 +792,19 @@ async def _create_unassigned_tasks(
                     "Error: Provide either 'task_title' and 'task_description' for single task, or 'tasks' array for multiple tasks."
                 )
 
-            conn.commit()
-            return created_tasks
+            return created_tasks, new_task_rows
 
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Error creating unassigned tasks: {e}", exc_info=True)
             raise e
-        finally:
-            if conn:
-                conn.close()
 
     # Execute the write operation through the queue
     try:
-        created_tasks = await execute_db_write(write_operation)
+        created_tasks, new_task_rows = await execute_db_batched_write(write_operation)
+
+        # Add to global cache only once the batch has committed
+        for task_data in new_task_rows:
+            _cache_new_task(task_data)
 
         # Build response
         response_parts = [
@@ -1004,21 +1001,13 @@ async def _create_and_assign_multiple_tasks(
                 "created_at": created_at,
                 "updated_at": created_at,
                 "parent_task": parent_task,
-                "child_tasks": json.dumps([]),
-                "depends_on_tasks": json.dumps([]),
-                "notes": json.dumps([]),
+                "child_tasks": [],
+                "depends_on_tasks": [],
+                "notes": [],
             }
 
             # Insert task
-            cursor.execute(
-                """
-                INSERT INTO tasks (task_id, title, description, assigned_to, created_by, status, priority, 
-                                   created_at, updated_at, parent_task, child_tasks, depends_on_tasks, notes)
-                VALUES (:task_id, :title, :description, :assigned_to, :created_by, :status, :priority, 
-                        :created_at, :updated_at, :parent_task, :child_tasks, :depends_on_tasks, :notes)
-            """,
-                task_data,
-            )
+            insert_task(cursor, task_data)
 
             # Log the creation
             log_agent_action_to_db(
@@ -1141,7 +1130,6 @@ async def assign_task_tool_impl(
         )
         agent_row = cursor.fetchone()
         if not agent_row:
-            conn.close()
             return [
                 mcp_types.TextContent(
                     type="text",
@@ -1153,7 +1141,6 @@ async def assign_task_tool_impl(
 
         # Prevent admin agents from being assigned tasks
         if target_agent_id.lower().startswith("admin"):
-            conn.close()
             return [
                 mcp_types.TextContent(
                     type="text",
@@ -1162,7 +1149,6 @@ async def assign_task_tool_impl(
             ]
 
     except Exception as e:
-        conn.close()
         logger.error(f"Error validating agent token: {e}", exc_info=True)
         return [mcp_types.TextContent(type="text", text=f"Error validating agent: {e}")]
     finally:
@@ -1506,23 +1492,13 @@ async def assign_task_tool_impl(
             "created_at": created_at_iso,
             "updated_at": created_at_iso,
             "parent_task": final_parent_task_id,  # Use validated value
-            "child_tasks": json.dumps([]),
-            "depends_on_tasks": json.dumps(
-                final_depends_on_tasks or []
-            ),  # Use validated value
-            "notes": json.dumps(initial_notes),
+            "child_tasks": [],
+            "depends_on_tasks": final_depends_on_tasks or [],  # Use validated value
+            "notes": initial_notes,
         }
 
         # Save task to database (main.py:1370-1373)
-        cursor.execute(
-            """
-            INSERT INTO tasks (task_id, title, description, assigned_to, created_by, status, priority, 
-                               created_at, updated_at, parent_task, child_tasks, depends_on_tasks, notes)
-            VALUES (:task_id, :title, :description, :assigned_to, :created_by, :status, :priority, 
-                    :created_at, :updated_at, :parent_task, :child_tasks, :depends_on_tasks, :notes)
-        """,
-            task_data_for_db,
-        )
+        insert_task(cursor, task_data_for_db)
 
         # Update agent's current task in DB if they don't have one (main.py:1376-1387)
         should_update_agent_current_task = False
@@ -1564,14 +1540,8 @@ async def assign_task_tool_impl(
             g.active_agents[assigned_agent_active_token]["current_task"] = new_task_id
 
         # Add task to in-memory tasks dictionary (main.py:1394-1398)
-        # Convert JSON strings back for in-memory representation
         task_data_for_memory = task_data_for_db.copy()
-        task_data_for_memory["child_tasks"] = []
-        task_data_for_memory["depends_on_tasks"] = (
-            final_depends_on_tasks or []
-        )  # Use validated value
-        task_data_for_memory["notes"] = []
-        g.tasks[new_task_id] = task_data_for_memory
+        _cache_new_task(task_data_for_memory)
 
         # System 8: Index the new task for RAG
         # Convert database format to the format expected by indexing
@@ -1838,22 +1808,12 @@ async def create_self_task_tool_impl(
             "created_at": created_at_iso,
             "updated_at": created_at_iso,
             "parent_task": final_parent_task_id,  # Use validated value
-            "child_tasks": json.dumps([]),
-            "depends_on_tasks": json.dumps(
-                final_depends_on_tasks or []
-            ),  # Use validated value
-            "notes": json.dumps([]),
+            "child_tasks": [],
+            "depends_on_tasks": final_depends_on_tasks or [],  # Use validated value
+            "notes": [],
         }
 
-        cursor.execute(
-            """
-            INSERT INTO tasks (task_id, title, description, assigned_to, created_by, status, priority, 
-                               created_at, updated_at, parent_task, child_tasks, depends_on_tasks, notes)
-            VALUES (:task_id, :title, :description, :assigned_to, :created_by, :status, :priority, 
-                    :created_at, :updated_at, :parent_task, :child_tasks, :depends_on_tasks, :notes)
-        """,
-            task_data_for_db,
-        )
+        insert_task(cursor, task_data_for_db)
 
         # Update agent's current task in DB if they don't have one (main.py:1455-1469)
         should_update_agent_current_task = False
@@ -1891,12 +1851,7 @@ async def create_self_task_tool_impl(
             g.active_agents[agent_auth_token]["current_task"] = new_task_id
 
         task_data_for_memory = task_data_for_db.copy()
-        task_data_for_memory["child_tasks"] = []
-        task_data_for_memory["depends_on_tasks"] = (
-            final_depends_on_tasks or []
-        )  # Use validated value
-        task_data_for_memory["notes"] = []
-        g.tasks[new_task_id] = task_data_for_memory
+        _cache_new_task(task_data_for_memory)
 
         # System 8: Index the new task for RAG
         # Convert database format to the format expected by indexing
@@ -2087,53 +2042,45 @@ async def update_task_status_tool_impl(
         if auto_update_dependencies:
             for result in results:
                 if result["success"] and new_status == "completed":
-                    # Find tasks that depend on this completed task
-                    cursor.execute("SELECT task_id, depends_on_tasks FROM tasks")
-                    all_tasks = cursor.fetchall()
-
-                    for task_row in all_tasks:
-                        task_deps = json.loads(task_row["depends_on_tasks"] or "[]")
-                        if result["task_id"] in task_deps:
-                            # Check if all dependencies are now completed
-                            all_deps_completed = True
-                            for dep_id in task_deps:
-                                if (
-                                    dep_id != result["task_id"]
-                                ):  # Skip the one we just completed
-                                    cursor.execute(
-                                        "SELECT status FROM tasks WHERE task_id = ?",
-                                        (dep_id,),
-                                    )
-                                    dep_row = cursor.fetchone()
-                                    if not dep_row or dep_row["status"] != "completed":
-                                        all_deps_completed = False
-                                        break
-
-                            if all_deps_completed:
-                                # Auto-update dependent task to in_progress if it's pending
-                                cursor.execute(
-                                    "SELECT status FROM tasks WHERE task_id = ?",
-                                    (task_row["task_id"],),
+                    # Find tasks that depend on this completed task (indexed lookup)
+                    for dependent_task_id in get_dependent_task_ids(
+                        cursor, result["task_id"]
+                    ):
+                        # Check if all its other dependencies are completed
+                        cursor.execute(
+                            """
+                            SELECT COUNT(*) FROM task_dependencies
+                            LEFT JOIN tasks ON tasks.task_id = task_dependencies.depends_on_task_id
+                            WHERE task_dependencies.task_id = ?
+                              AND task_dependencies.depends_on_task_id != ?
+                              AND (tasks.status IS NULL OR tasks.status != 'completed')
+                        """,
+                            (dependent_task_id, result["task_id"]),
+                        )
+                        all_deps_completed = cursor.fetchone()[0] == 0
+
+                        if all_deps_completed:
+                            # Auto-update dependent task to in_progress if it's pending
+                            cursor.execute(
+                                "SELECT status FROM tasks WHERE task_id = ?",
+                                (dependent_task_id,),
+                            )
+                            dependent_task = cursor.fetchone()
+                            if dependent_task and dependent_task["status"] == "pending":
+                                dep_result = await _update_single_task(
+                                    cursor,
+                                    dependent_task_id,
+                                    "in_progress",
+                                    requesting_agent_id,
+                                    is_admin_request,
+                                    "Auto-advanced: all dependencies completed",
+                                    None,
+                                    None,
+                                    None,
+                                    None,
+                                    None,
                                 )
-                                dependent_task = cursor.fetchone()
-                                if (
-                                    dependent_task
-                                    and dependent_task["status"] == "pending"
-                                ):
-                                    dep_result = await _update_single_task(
-                                        cursor,
-                                        task_row["task_id"],
-                                        "in_progress",
-                                        requesting_agent_id,
-                                        is_admin_request,
-                                        "Auto-advanced: all dependencies completed",
-                                        None,
-                                        None,
-                                        None,
-                                        None,
-                                        None,
-                                    )
-                                    dependency_updates.append(dep_result)
+                                dependency_updates.append(dep_result)
 
         # Phase 3.5: Auto-launch testing agents for completed tasks
         testing_agent_launches = []
@@ -2317,94 +2264,29 @@ async def view_tasks_tool_impl(
                 )
             ]
 
-    # Advanced filtering with dependency analysis
-    tasks_to_display: List[Dict[str, Any]] = []
-
-    # Pre-analyze all tasks for dependency checking
-    all_tasks_dict = dict(g.tasks)
-
-    for task_id, task_data in g.tasks.items():
-        # Basic permission filtering
-        matches_agent = True
-        if (
-            target_agent_id_for_filter
-            and task_data.get("assigned_to") != target_agent_id_for_filter
-        ):
-            matches_agent = False
-
-        # Status filtering
-        matches_status = True
-        if filter_status and task_data.get("status") != filter_status:
-            matches_status = False
-
-        # Priority filtering
-        matches_priority = True
-        if filter_priority and task_data.get("priority") != filter_priority:
-            matches_priority = False
-
-        # Parent task filtering
-        matches_parent = True
-        if filter_parent_task and task_data.get("parent_task") != filter_parent_task:
-            matches_parent = False
-
-        # Blocked tasks filtering
-        matches_blocked = True
-        if show_blocked_tasks:
-            dependency_analysis = _analyze_task_dependencies(task_data, all_tasks_dict)
-            matches_blocked = (
-                dependency_analysis["is_blocked"]
-                or not dependency_analysis["can_start"]
-            )
-
-        if (
-            matches_agent
-            and matches_status
-            and matches_priority
-            and matches_parent
-            and matches_blocked
-        ):
-            # Add dependency analysis if requested
-            if show_dependencies:
-                task_data_copy = task_data.copy()
-                task_data_copy["_dependency_analysis"] = _analyze_task_dependencies(
-                    task_data, all_tasks_dict
-                )
-                tasks_to_display.append(task_data_copy)
-            else:
-                tasks_to_display.append(task_data)
-
-    # Smart sorting
-    def get_sort_key(task):
-        if sort_by == "priority":
-            priority_order = {"high": 3, "medium": 2, "low": 1}
-            return priority_order.get(task.get("priority", "medium"), 2)
-        elif sort_by == "status":
-            status_order = {
-                "failed": 5,
-                "in_progress": 4,
-                "pending": 3,
-                "completed": 2,
-                "cancelled": 1,
-            }
-            return status_order.get(task.get("status", "pending"), 3)
-        elif sort_by == "updated_at":
-            return task.get("updated_at", "")
-        else:  # created_at (default)
-            return task.get("created_at", "")
-
-    reverse_sort = sort_by in ["created_at", "updated_at", "priority", "status"]
-    tasks_to_display.sort(key=get_sort_key, reverse=reverse_sort)
-
-    # Handle pagination with start_after
-    if start_after:
-        start_index = 0
-        for i, task in enumerate(tasks_to_display):
-            if task.get("task_id") == start_after:
-                start_index = i + 1
-                break
-        tasks_to_display = tasks_to_display[start_index:]
+    # Indexed filtering: only tasks matching the agent/status/priority/parent
+    # filters are touched, and they come back lazily in sort order. Blocked
+    # tasks come from the dependency graph's incrementally maintained set.
+    if sort_by not in ("created_at", "updated_at", "priority", "status"):
+        sort_by = "created_at"
+    candidate_ids = g.tasks.select(
+        within=g.tasks.graph.blocked if show_blocked_tasks else None,
+        assigned_to=target_agent_id_for_filter or None,
+        status=filter_status or None,
+        priority=filter_priority or None,
+        parent_task=filter_parent_task or None,
+    )
+    tasks_to_display = g.tasks.iter_sorted(
+        candidate_ids, sort_by, descending=True, start_after=start_after
+    )
+    total_matching = g.tasks.count_after(
+        candidate_ids, sort_by, descending=True, start_after=start_after
+    )
+    if show_health_analysis:
+        # Health metrics need every matching task, so materialize the selection
+        tasks_to_display = list(tasks_to_display)
 
-    if not tasks_to_display:
+    if not total_matching:
         response_text = "No tasks found matching the criteria."
     else:
         # Generate health analysis if requested
@@ -2425,7 +2307,7 @@ async def view_tasks_tool_impl(
         if show_blocked_tasks:
             filter_info.append("blocked_only=true")
 
-        header = f"Tasks ({len(tasks_to_display)} found"
+        header = f"Tasks ({total_matching} found"
         if filter_info:
             header += f", filtered by: {', '.join(filter_info)}"
         header += f", sorted by: {sort_by})"
@@ -2467,7 +2349,11 @@ async def view_tasks_tool_impl(
 
         for task in tasks_to_display:
             # Format task with dependency info if requested
-            if show_dependencies and "_dependency_analysis" in task:
+            if show_dependencies:
+                task = dict(task)
+                task["_dependency_analysis"] = _analyze_task_dependencies(
+                    task, g.tasks
+                )
                 task_text = _format_task_with_dependencies(task)
             elif summary_mode:
                 task_text = _format_task_summary(task)
@@ -2492,12 +2378,12 @@ async def view_tasks_tool_impl(
 
         # Add smart pagination and usage tips
         if truncated:
-            remaining_count = len(tasks_to_display) - tasks_included
+            remaining_count = total_matching - tasks_included
             response_parts.append(
                 f"--- Response truncated to stay under {max_tokens} tokens ---"
             )
             response_parts.append(
-                f"Showing {tasks_included} of {len(tasks_to_display)} tasks ({remaining_count} remaining)"
+                f"Showing {tasks_included} of {total_matching} tasks ({remaining_count} remaining)"
             )
             response_parts.append(
                 f"Continue: view_tasks(start_after='{last_task_id}', max_tokens={max_tokens})"
@@ -2868,7 +2754,10 @@ async def request_assistance_tool_impl(
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (parent_task_id,))
+        cursor.execute(
+            f"SELECT {TASK_SELECT_COLUMNS_WITHOUT_NOTES} FROM tasks WHERE task_id = ?",
+            (parent_task_id,),
+        )
         parent_task_db_row = cursor.fetchone()
         if not parent_task_db_row:
             return [
@@ -2949,44 +2838,25 @@ async def request_assistance_tool_impl(
             "created_at": timestamp_iso,
             "updated_at": timestamp_iso,
             "parent_task": parent_task_id,
-            "depends_on_tasks": json.dumps([]),
+            "depends_on_tasks": [],
             "created_by": requesting_agent_id,  # The agent who requested assistance
-            "child_tasks": json.dumps([]),
-            "notes": json.dumps([]),
+            "child_tasks": [],
+            "notes": [],
         }
-        cursor.execute(
-            """
-            INSERT INTO tasks (task_id, title, description, status, assigned_to, priority, created_at, 
-                               updated_at, parent_task, depends_on_tasks, created_by, child_tasks, notes)
-            VALUES (:task_id, :title, :description, :status, :assigned_to, :priority, :created_at, 
-                    :updated_at, :parent_task, :depends_on_tasks, :created_by, :child_tasks, :notes)
-        """,
-            child_task_db_data,
-        )
-
-        # Update parent task's child_tasks field and notes (main.py:1737-1764)
-        parent_child_tasks_list = json.loads(
-            parent_task_current_data.get("child_tasks") or "[]"
-        )
-        parent_child_tasks_list.append(child_task_id)
+        insert_task(cursor, child_task_db_data)
 
-        parent_notes_list = json.loads(parent_task_current_data.get("notes") or "[]")
-        parent_notes_list.append(
-            {
-                "timestamp": timestamp_iso,
-                "author": requesting_agent_id,
-                "content": f"Requested assistance: {assistance_description}. Assistance task created: {child_task_id}",
-            }
+        # Note the request on the parent task; insert_task already linked the
+        # child (main.py:1737-1764)
+        parent_note = add_task_note(
+            cursor,
+            parent_task_id,
+            requesting_agent_id,
+            f"Requested assistance: {assistance_description}. Assistance task created: {child_task_id}",
+            timestamp_iso,
         )
-
         cursor.execute(
-            "UPDATE tasks SET child_tasks = ?, notes = ?, updated_at = ? WHERE task_id = ?",
-            (
-                json.dumps(parent_child_tasks_list),
-                json.dumps(parent_notes_list),
-                timestamp_iso,
-                parent_task_id,
-            ),
+            "UPDATE tasks SET updated_at = ? WHERE task_id = ?",
+            (timestamp_iso, parent_task_id),
         )
 
         log_agent_action_to_db(
@@ -3004,15 +2874,10 @@ async def request_assistance_tool_impl(
         # Update in-memory caches (g.tasks)
         # Parent task
         if parent_task_id in g.tasks:
-            g.tasks[parent_task_id]["child_tasks"] = parent_child_tasks_list
-            g.tasks[parent_task_id]["notes"] = parent_notes_list
+            g.tasks[parent_task_id].setdefault("notes", []).append(parent_note)
             g.tasks[parent_task_id]["updated_at"] = timestamp_iso
-        # New child task
-        child_task_mem_data = child_task_db_data.copy()
-        child_task_mem_data["depends_on_tasks"] = []  # from json.dumps([])
-        child_task_mem_data["child_tasks"] = []
-        child_task_mem_data["notes"] = []
-        g.tasks[child_task_id] = child_task_mem_data
+        # New child task (also appended to the parent's cached child_tasks)
+        _cache_new_task(child_task_db_data.copy())
 
         # Send direct message to admin via new communication system
         try:
@@ -3149,7 +3014,9 @@ async def bulk_task_operations_tool_impl(
                 continue
 
             # Verify task exists and permissions
-            cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+            cursor.execute(
+                "SELECT task_id, assigned_to FROM tasks WHERE task_id = ?", (task_id,)
+            )
             task_row = cursor.fetchone()
             if not task_row:
                 results.append(f"Operation {i + 1}: Task '{task_id}' not found")
@@ -3196,22 +3063,20 @@ async def bulk_task_operations_tool_impl(
                     update_params = [new_status, updated_at_iso]
 
                     # Handle notes
-                    current_notes = json.loads(task_data.get("notes") or "[]")
+                    new_note = None
                     if notes_content:
-                        current_notes.append(
-                            {
-                                "timestamp": updated_at_iso,
-                                "author": requesting_agent_id,
-                                "content": notes_content,
-                            }
+                        new_note = add_task_note(
+                            cursor,
+                            task_id,
+                            requesting_agent_id,
+                            notes_content,
+                            updated_at_iso,
                         )
-                    update_fields.append("notes = ?")
-                    update_params.append(json.dumps(current_notes))
 
                     update_params.append(task_id)
 
                     # Validate field assignments for security
-                    allowed_bulk_fields = ["status = ?", "updated_at = ?", "notes = ?"]
+                    allowed_bulk_fields = ["status = ?", "updated_at = ?"]
                     safe_fields = [
                         field for field in update_fields if field in allowed_bulk_fields
                     ]
@@ -3227,7 +3092,8 @@ async def bulk_task_operations_tool_impl(
                     if task_id in g.tasks:
                         g.tasks[task_id]["status"] = new_status
                         g.tasks[task_id]["updated_at"] = updated_at_iso
-                        g.tasks[task_id]["notes"] = current_notes
+                        if new_note:
+                            g.tasks[task_id].setdefault("notes", []).append(new_note)
 
                     results.append(
                         f"Operation {i + 1}: Task '{task_id}' status updated to '{new_status}'"
@@ -3268,22 +3134,20 @@ async def bulk_task_operations_tool_impl(
                         )
                         continue
 
-                    current_notes = json.loads(task_data.get("notes") or "[]")
-                    current_notes.append(
-                        {
-                            "timestamp": updated_at_iso,
-                            "author": requesting_agent_id,
-                            "content": note_content,
-                        }
+                    new_note = add_task_note(
+                        cursor,
+                        task_id,
+                        requesting_agent_id,
+                        note_content,
+                        updated_at_iso,
                     )
-
                     cursor.execute(
-                        "UPDATE tasks SET notes = ?, updated_at = ? WHERE task_id = ?",
-                        (json.dumps(current_notes), updated_at_iso, task_id),
+                        "UPDATE tasks SET updated_at = ? WHERE task_id = ?",
+                        (updated_at_iso, task_id),
                     )
 
                     if task_id in g.tasks:
-                        g.tasks[task_id]["notes"] = current_notes
+                        g.tasks[task_id].setdefault("notes", []).append(new_note)
                         g.tasks[task_id]["updated_at"] = updated_at_iso
 
                     results.append(f"Operation {i + 1}: Note added to task '{task_id}'")
@@ -3410,18 +3274,16 @@ async def search_tasks_tool_impl(
             )
         ]
 
-    # Get tasks user can see
-    candidate_tasks = []
-    for task_id, task_data in g.tasks.items():
-        # Permission check
-        if not is_admin_request and task_data.get("assigned_to") != requesting_agent_id:
-            continue
-
-        # Status filter
-        if status_filter and task_data.get("status") != status_filter:
-            continue
-
-        candidate_tasks.append(task_data)
+    # Get tasks user can see (permission and status filters via the task indexes)
+    candidate_ids = g.tasks.select(
+        assigned_to=None if is_admin_request else requesting_agent_id,
+        status=status_filter or None,
+    )
+    candidate_tasks = (
+        list(g.tasks.values())
+        if candidate_ids is None
+        else [g.tasks[task_id] for task_id in candidate_ids]
+    )
 
     if not candidate_tasks:
         return [
@@ -3546,6 +3408,102 @@ async def search_tasks_tool_impl(
     return [mcp_types.TextContent(type="text", text="\n".join(response_parts))]
 
 
+# --- get_ready_tasks tool ---
+async def get_ready_tasks_tool_impl(
+    arguments: Dict[str, Any],
+) -> List[mcp_types.TextContent]:
+    agent_auth_token = arguments.get("token")
+    filter_agent_id = arguments.get("agent_id")
+    filter_priority = arguments.get("filter_priority")
+    max_results = arguments.get("max_results", 20)
+
+    requesting_agent_id = get_agent_id(agent_auth_token)
+    if not requesting_agent_id:
+        return [
+            mcp_types.TextContent(
+                type="text", text="Unauthorized: Valid token required"
+            )
+        ]
+
+    # Validate max_results
+    try:
+        max_results = max(1, min(int(max_results), 200))
+    except (ValueError, TypeError):
+        return [
+            mcp_types.TextContent(
+                type="text", text="Error: max_results must be an integer."
+            )
+        ]
+
+    is_admin_request = verify_token(agent_auth_token, "admin")
+
+    # Same permission rule as view_tasks
+    target_agent_id_for_filter = filter_agent_id
+    if not is_admin_request:
+        if filter_agent_id is None:
+            target_agent_id_for_filter = requesting_agent_id
+        elif filter_agent_id != requesting_agent_id:
+            return [
+                mcp_types.TextContent(
+                    type="text",
+                    text="Unauthorized: Non-admin agents can only view their own ready tasks.",
+                )
+            ]
+
+    # The ready set is maintained incrementally by the dependency graph, so
+    # this touches only ready tasks, not the whole task set
+    graph = g.tasks.graph
+    ready_ids = g.tasks.select(
+        within=graph.ready,
+        assigned_to=target_agent_id_for_filter or None,
+        priority=filter_priority or None,
+    )
+    ready_tasks = []
+    for task in g.tasks.iter_sorted(ready_ids, "priority", descending=True):
+        ready_tasks.append(task)
+        if len(ready_tasks) >= max_results:
+            break
+
+    critical_path = graph.critical_path()
+    header = f"Ready tasks ({len(ready_ids)} ready"
+    if target_agent_id_for_filter:
+        header += f", agent={target_agent_id_for_filter}"
+    if filter_priority:
+        header += f", priority={filter_priority}"
+    header += ")"
+    response_parts = [header + "\n"]
+
+    if not ready_tasks:
+        response_parts.append("No tasks are ready to start.")
+    for task in ready_tasks:
+        task_id = task.get("task_id")
+        unblocks = len(g.tasks.dependents_of(task_id))
+        response_parts.append(
+            f"• {task_id}: {task.get('title', 'Untitled')} "
+            f"[{task.get('priority', 'medium')}] "
+            f"assigned to {task.get('assigned_to') or 'unassigned'}"
+            + (f", unblocks {unblocks} task(s)" if unblocks else "")
+        )
+    if len(ready_ids) > len(ready_tasks):
+        response_parts.append(
+            f"... {len(ready_ids) - len(ready_tasks)} more (raise max_results to see them)"
+        )
+
+    response_parts.append(
+        f"\nDependency graph: {len(graph.ready)} ready, {len(graph.blocked)} blocked, "
+        f"critical path {len(critical_path)} task(s)"
+    )
+    if critical_path:
+        response_parts.append(f"Critical path: {' -> '.join(critical_path)}")
+
+    log_audit(
+        requesting_agent_id,
+        "get_ready_tasks",
+        {"filter_agent_id": filter_agent_id, "ready": len(ready_ids)},
+    )
+    return [mcp_types.TextContent(type="text", text="\n".join(response_parts))]
+
+
 # --- Register all task tools ---
 def register_task_tools():
     register_tool(
@@ -3889,6 +3847,35 @@ def register_task_tools():
         implementation=search_tasks_tool_impl,
     )
 
+    register_tool(
+        name="get_ready_tasks",
+        description="List pending tasks whose dependencies are all completed, highest priority first, with the current critical path. Cheap to poll: served from the incrementally maintained dependency graph.",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "token": {"type": "string", "description": "Authentication token"},
+                "agent_id": {
+                    "type": "string",
+                    "description": "Filter ready tasks by agent ID (optional). If non-admin, can only be self.",
+                },
+                "filter_priority": {
+                    "type": "string",
+                    "description": "Filter by priority level",
+                    "enum": ["low", "medium", "high"],
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum tasks to list (default: 20)",
+                    "minimum": 1,
+                    "maximum": 200,
+                },
+            },
+            "required": ["token"],
+            "additionalProperties": False,
+        },
+        implementation=get_ready_tasks_tool_impl,
+    )
+
     register_tool(
         name="request_assistance",  # main.py:1808
         description="Request assistance with a task. This creates a child task assigned to 'None' and notifies admin.",
@@ -4040,7 +4027,10 @@ async def delete_task_tool_impl(
         cursor = conn.cursor()
 
         # Check if task exists
-        cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+        cursor.execute(
+            f"SELECT {TASK_SELECT_COLUMNS_WITHOUT_NOTES} FROM tasks WHERE task_id = ?",
+            (task_id,),
+        )
         task_row = cursor.fetchone()
 
         if not task_row:
@@ -4053,8 +4043,7 @@ async def delete_task_tool_impl(
         task_data = dict(task_row)
 
         # Parse relationships
-        child_tasks = json.loads(task_data.get("child_tasks", "[]"))
-        depends_on_tasks = json.loads(task_data.get("depends_on_tasks", "[]"))  # noqa: F841
+        child_tasks = json.loads(task_data.get("child_tasks") or "[]")
 
         # Check for child tasks
         if child_tasks and not force_delete:
@@ -4067,8 +4056,12 @@ async def delete_task_tool_impl(
 
         # Check for tasks that depend on this one
         cursor.execute(
-            "SELECT task_id, title FROM tasks WHERE json_extract(depends_on_tasks, '$') LIKE ?",
-            (f'%"{task_id}"%',),
+            """
+            SELECT tasks.task_id, tasks.title FROM task_dependencies
+            JOIN tasks ON tasks.task_id = task_dependencies.task_id
+            WHERE task_dependencies.depends_on_task_id = ?
+        """,
+            (task_id,),
         )
         dependent_tasks = cursor.fetchall()
 
@@ -4085,36 +4078,30 @@ async def delete_task_tool_impl(
 
         # Begin cascade deletion operations
         cascade_operations = []
+        deleted_at_iso = datetime.datetime.now().isoformat()
 
         # Update parent task to remove this child
         if task_data.get("parent_task"):
             parent_id = task_data["parent_task"]
             cursor.execute(
-                "SELECT child_tasks FROM tasks WHERE task_id = ?", (parent_id,)
+                "DELETE FROM task_children WHERE parent_task_id = ? AND child_task_id = ?",
+                (parent_id, task_id),
             )
-            parent_row = cursor.fetchone()
-
-            if parent_row:
-                parent_children = json.loads(parent_row["child_tasks"] or "[]")
-                if task_id in parent_children:
-                    parent_children.remove(task_id)
-                    cursor.execute(
-                        "UPDATE tasks SET child_tasks = ?, updated_at = ? WHERE task_id = ?",
-                        (
-                            json.dumps(parent_children),
-                            datetime.datetime.now().isoformat(),
-                            parent_id,
-                        ),
-                    )
-                    cascade_operations.append(
-                        f"Updated parent task '{parent_id}' to remove child reference"
-                    )
+            if cursor.rowcount > 0:
+                cursor.execute(
+                    "UPDATE tasks SET updated_at = ? WHERE task_id = ?",
+                    (deleted_at_iso, parent_id),
+                )
+                cascade_operations.append(
+                    f"Updated parent task '{parent_id}' to remove child reference"
+                )
 
         # Handle child tasks
         if child_tasks and force_delete:
             for child_id in child_tasks:
                 cursor.execute("DELETE FROM tasks WHERE task_id = ?", (child_id,))
                 if cursor.rowcount > 0:
+                    delete_task_relations(cursor, child_id)
                     cascade_operations.append(f"Deleted child task '{child_id}'")
 
         # Handle dependent tasks
@@ -4122,27 +4109,17 @@ async def delete_task_tool_impl(
             for dep_row in dependent_tasks:
                 dep_id = dep_row["task_id"]
                 cursor.execute(
-                    "SELECT depends_on_tasks FROM tasks WHERE task_id = ?", (dep_id,)
+                    "DELETE FROM task_dependencies WHERE task_id = ? AND depends_on_task_id = ?",
+                    (dep_id, task_id),
                 )
-                dep_task_row = cursor.fetchone()
-
-                if dep_task_row:
-                    dep_dependencies = json.loads(
-                        dep_task_row["depends_on_tasks"] or "[]"
+                if cursor.rowcount > 0:
+                    cursor.execute(
+                        "UPDATE tasks SET updated_at = ? WHERE task_id = ?",
+                        (deleted_at_iso, dep_id),
+                    )
+                    cascade_operations.append(
+                        f"Updated task '{dep_id}' to remove dependency on '{task_id}'"
                     )
-                    if task_id in dep_dependencies:
-                        dep_dependencies.remove(task_id)
-                        cursor.execute(
-                            "UPDATE tasks SET depends_on_tasks = ?, updated_at = ? WHERE task_id = ?",
-                            (
-                                json.dumps(dep_dependencies),
-                                datetime.datetime.now().isoformat(),
-                                dep_id,
-                            ),
-                        )
-                        cascade_operations.append(
-                            f"Updated task '{dep_id}' to remove dependency on '{task_id}'"
-                        )
 
         # Delete the main task
         cursor.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
@@ -4153,6 +4130,7 @@ async def delete_task_tool_impl(
                     type="text", text=f"Error: Failed to delete task '{task_id}'"
                 )
             ]
+        delete_task_relations(cursor, task_id)
 
         # Log the deletion action
         log_agent_action_to_db(
@@ -4169,6 +4147,32 @@ async def delete_task_tool_impl(
 
         conn.commit()
 
+        # Update in-memory cache (keeps the dependency graph's ready/blocked sets current)
+        g.tasks.pop(task_id, None)
+        if child_tasks and force_delete:
+            for child_id in child_tasks:
+                g.tasks.pop(child_id, None)
+        if dependent_tasks and force_delete:
+            for dep_row in dependent_tasks:
+                cached_dependent = g.tasks.get(dep_row["task_id"])
+                if cached_dependent is not None:
+                    cached_dependent["depends_on_tasks"] = [
+                        dep_id
+                        for dep_id in cached_dependent.get("depends_on_tasks") or []
+                        if dep_id != task_id
+                    ]
+                    cached_dependent["updated_at"] = deleted_at_iso
+        cached_parent = g.tasks.get(task_data.get("parent_task"))
+        if cached_parent is not None and task_id in (
+            cached_parent.get("child_tasks") or []
+        ):
+            cached_parent["child_tasks"] = [
+                child_id
+                for child_id in cached_parent["child_tasks"]
+                if child_id != task_id
+            ]
+            cached_parent["updated_at"] = deleted_at_iso
+
         # Prepare response
         response_parts = [
             f"Task '{task_id}' ({task_data.get('title', 'Untitled')}) deleted successfully."
@@ -0,0 +1,59 @@
+# Agent-MCP/agent_mcp/utils/vector_utils.py
+import json
+import sys
+from array import array
+from typing import List, Optional, Sequence, Union
+
+# Embeddings are stored and queried as packed little-endian float32 blobs,
+# the native vector format of sqlite-vec. A 3072-dim vector is 12 KB as a
+# blob versus ~60 KB as JSON text, and needs no parsing on either side.
+
+_IS_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def pack_embedding(vector: Sequence[float]) -> bytes:
+    """Packs an embedding into a little-endian float32 blob."""
+    packed = array("f", vector)
+    if not _IS_LITTLE_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_embedding(
+    stored: Union[bytes, bytearray, memoryview, str],
+    dimension: Optional[int] = None,
+) -> Optional[List[float]]:
+    """
+    Unpacks a stored embedding back into a list of floats.
+    Accepts float32 blobs as well as legacy JSON text so rows written before
+    the binary migration remain readable.
+
+    Args:
+        stored: The value read from the database.
+        dimension: If given, vectors of any other length are rejected.
+
+    Returns:
+        The vector, or None if the value is unreadable or has the wrong dimension.
+    """
+    if isinstance(stored, (bytes, bytearray, memoryview)):
+        raw = bytes(stored)
+        if len(raw) % 4 != 0:
+            return None
+        unpacked = array("f")
+        unpacked.frombytes(raw)
+        if not _IS_LITTLE_ENDIAN:
+            unpacked.byteswap()
+        vector = unpacked.tolist()
+    elif isinstance(stored, str):
+        try:
+            vector = json.loads(stored)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(vector, list):
+            return None
+    else:
+        return None
+
+    if dimension is not None and len(vector) != dimension:
+        return None
+    return vector
@@ -0,0 +1,353 @@
+# genesys_integration/backend_router.py
+"""
+Roteamento entre o modelo local e o Gemini por tempo de conclusão previsto.
+
+Para cada requisição estimamos quanto cada backend levaria:
+
+    local  = espera na fila + tokens_prompt * s/token_prefill + tokens_saida * s/token_decode
+    gemini = latência de ida e volta + tokens_saida * s/token_remoto
+
+Os coeficientes começam nos valores GENESYS_ROUTER_* e são ajustados por média
+móvel exponencial com o tempo observado de cada requisição concluída. O tamanho
+esperado da resposta é aprendido por classe de tarefa (as palavras-chave que
+antes decidiam sozinhas o roteamento agora só indicam uma tarefa "complexa",
+com respostas mais longas). Cada decisão é registrada com as previsões e, ao
+final, com o tempo real, o que alimenta o relatório de acurácia.
+
+O modelo local é o padrão: nada sai da máquina enquanto os custos locais não
+foram medidos (o aquecimento do modelo já fornece a primeira amostra), e depois
+disso o Gemini só é escolhido quando o ganho previsto supera
+GENESYS_ROUTER_MIN_GAIN_SECONDS e GENESYS_ROUTER_MIN_GAIN_RATIO. Uma fração
+GENESYS_ROUTER_EXPLORE das decisões pelo Gemini roda localmente mesmo assim,
+para que as estimativas locais continuem aprendendo com tráfego real.
+"""
+
+import itertools
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+LOCAL = "local"
+GEMINI = "gemini"
+
+ROUTER_ALPHA = float(os.getenv("GENESYS_ROUTER_ALPHA", "0.2"))
+# Fração das decisões pelo Gemini executadas no local para manter as estimativas
+# locais vivas (a exploração nunca manda ao Gemini o que ficaria no local)
+ROUTER_EXPLORE = float(os.getenv("GENESYS_ROUTER_EXPLORE", "0.1"))
+# Ganho previsto mínimo (absoluto e relativo) para tirar a requisição do local
+ROUTER_MIN_GAIN_SECONDS = float(os.getenv("GENESYS_ROUTER_MIN_GAIN_SECONDS", "15"))
+ROUTER_MIN_GAIN_RATIO = float(os.getenv("GENESYS_ROUTER_MIN_GAIN_RATIO", "3.0"))
+LOCAL_PREFILL_TPS = float(os.getenv("GENESYS_ROUTER_LOCAL_PREFILL_TPS", "20"))
+LOCAL_DECODE_TPS = float(os.getenv("GENESYS_ROUTER_LOCAL_DECODE_TPS", "2"))
+REMOTE_RTT_SECONDS = float(os.getenv("GENESYS_ROUTER_REMOTE_RTT_SECONDS", "1.5"))
+REMOTE_DECODE_TPS = float(os.getenv("GENESYS_ROUTER_REMOTE_DECODE_TPS", "50"))
+DECISION_HISTORY = 500
+
+COMPLEX_TASK_HINTS = [
+    "analise",
+    "refatore",
+    "arquitetura",
+    "explique detalhadamente",
+    "crie um plano",
+    "projete",
+    "melhore este código",
+    "auditoria",
+    "implemente a seguinte feature",
+    "escreva um teste completo",
+]
+# Tamanho inicial esperado da resposta por classe de tarefa (tokens)
+EXPECTED_OUTPUT_PRIORS = {"complex": 600.0, "simple": 150.0}
+# Respostas curtas medem principalmente a latência de ida e volta
+RTT_SAMPLE_MAX_TOKENS = 32
+
+
+class _Ewma:
+    def __init__(self, initial: float, alpha: float = ROUTER_ALPHA):
+        self.value = initial
+        self.alpha = alpha
+        self.samples = 0
+
+    def update(self, sample: float) -> None:
+        # A primeira medição substitui o valor inicial, que é só um chute
+        if self.samples:
+            self.value += self.alpha * (sample - self.value)
+        else:
+            self.value = sample
+        self.samples += 1
+
+
+def task_class(task: str) -> str:
+    task_lower = task.lower()
+    return "complex" if any(h in task_lower for h in COMPLEX_TASK_HINTS) else "simple"
+
+
+class RoutingDecision:
+    """Uma decisão de roteamento, completada com o resultado real em record()."""
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        backend: str,
+        predicted: Dict[str, float],
+        features: Dict[str, Any],
+        reason: str,
+    ):
+        self.id = next(self._ids)
+        self.backend = backend
+        self.predicted = predicted
+        self.features = features
+        self.reason = reason
+        self.created_at = time.time()
+        self.actual_seconds: Optional[float] = None
+        self.failed = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "backend": self.backend,
+            "reason": self.reason,
+            "predicted_seconds": {k: round(v, 2) for k, v in self.predicted.items()},
+            "actual_seconds": (
+                round(self.actual_seconds, 2) if self.actual_seconds is not None else None
+            ),
+            "failed": self.failed,
+            "features": self.features,
+            "created_at": self.created_at,
+        }
+
+
+class BackendRouter:
+    """Escolhe o backend com menor tempo de conclusão previsto e aprende com o resultado."""
+
+    def __init__(self):
+        self.local_prefill = _Ewma(1.0 / LOCAL_PREFILL_TPS)
+        self.local_decode = _Ewma(1.0 / LOCAL_DECODE_TPS)
+        self.local_service = _Ewma(
+            EXPECTED_OUTPUT_PRIORS["simple"] / LOCAL_DECODE_TPS
+        )
+        self.remote_rtt = _Ewma(REMOTE_RTT_SECONDS)
+        self.remote_decode = _Ewma(1.0 / REMOTE_DECODE_TPS)
+        self.expected_output = {
+            name: _Ewma(prior) for name, prior in EXPECTED_OUTPUT_PRIORS.items()
+        }
+        self.decisions: Deque[RoutingDecision] = deque(maxlen=DECISION_HISTORY)
+
+    @property
+    def local_calibrated(self) -> bool:
+        """Os custos locais já vêm de execuções reais, não só dos valores iniciais."""
+        return self.local_decode.samples > 0
+
+    # --- Previsão ---
+
+    def predict(
+        self,
+        prompt_tokens: int,
+        output_tokens: float,
+        queue_stats: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, float]:
+        queue_stats = queue_stats or {}
+        ahead = queue_stats.get("queued", 0) + queue_stats.get("active", 0)
+        concurrency = max(1, queue_stats.get("max_concurrency", 1))
+        queue_wait = ahead / concurrency * self.local_service.value
+        return {
+            LOCAL: queue_wait
+            + prompt_tokens * self.local_prefill.value
+            + output_tokens * self.local_decode.value,
+            GEMINI: self.remote_rtt.value + output_tokens * self.remote_decode.value,
+        }
+
+    def route(
+        self,
+        task: str,
+        prompt_tokens: int,
+        local_available: bool,
+        remote_available: bool,
+        queue_stats: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        exclude: Optional[str] = None,
+    ) -> RoutingDecision:
+        """exclude: backend que acabou de falhar para esta requisição."""
+        from agent_mcp.core.config import logger
+
+        if exclude == GEMINI:
+            remote_available = False
+        elif exclude == LOCAL:
+            local_available = False
+
+        kind = task_class(task)
+        expected_output = self.expected_output[kind].value
+        if max_tokens:
+            expected_output = min(expected_output, max_tokens)
+        predicted = self.predict(prompt_tokens, expected_output, queue_stats)
+
+        if local_available and remote_available:
+            gain = predicted[LOCAL] - predicted[GEMINI]
+            backend = LOCAL
+            if not self.local_calibrated:
+                reason = "local padrão (custos locais ainda não medidos)"
+            elif gain >= ROUTER_MIN_GAIN_SECONDS and predicted[LOCAL] >= (
+                ROUTER_MIN_GAIN_RATIO * predicted[GEMINI]
+            ):
+                backend = GEMINI
+                reason = "ganho previsto no Gemini"
+                if ROUTER_EXPLORE and random.random() < ROUTER_EXPLORE:
+                    backend = LOCAL
+                    reason = "exploração"
+            else:
+                reason = "local padrão (ganho previsto abaixo da margem)"
+        elif remote_available:
+            backend = GEMINI
+            reason = "falha no modelo local" if exclude else "modelo local indisponível"
+        else:
+            backend = LOCAL
+            reason = "falha no Gemini" if exclude else "Gemini não configurado"
+
+        decision = RoutingDecision(
+            backend,
+            predicted,
+            {
+                "task_class": kind,
+                "prompt_tokens": prompt_tokens,
+                "expected_output_tokens": round(expected_output),
+                "queue_depth": (queue_stats or {}).get("queued", 0),
+            },
+            reason,
+        )
+        self.decisions.append(decision)
+        logger.info(
+            f"Roteamento #{decision.id}: {backend} ({reason}); previsto local="
+            f"{predicted[LOCAL]:.1f}s gemini={predicted[GEMINI]:.1f}s, "
+            f"prompt={prompt_tokens} tokens, classe={kind}"
+        )
+        return decision
+
+    # --- Aprendizado ---
+
+    def record(
+        self,
+        decision: RoutingDecision,
+        total_seconds: float,
+        output_tokens: int,
+        queue_seconds: float = 0.0,
+        first_token_seconds: Optional[float] = None,
+        failed: bool = False,
+    ) -> None:
+        """
+        Registra o resultado da decisão e ajusta os coeficientes do backend usado.
+        first_token_seconds (desde o início da execução, sem a fila) separa o
+        custo do prompt do custo da geração quando há streaming.
+        """
+        decision.actual_seconds = total_seconds
+        decision.failed = failed
+        if failed:
+            return
+        self.expected_output[decision.features["task_class"]].update(output_tokens)
+        prompt_tokens = decision.features["prompt_tokens"]
+
+        if decision.backend == LOCAL:
+            self.observe_local(
+                prompt_tokens,
+                output_tokens,
+                max(0.0, total_seconds - queue_seconds),
+                first_token_seconds,
+            )
+        else:
+            if output_tokens <= RTT_SAMPLE_MAX_TOKENS:
+                self.remote_rtt.update(
+                    max(0.0, total_seconds - output_tokens * self.remote_decode.value)
+                )
+            else:
+                self.remote_decode.update(
+                    max(0.0, total_seconds - self.remote_rtt.value) / output_tokens
+                )
+
+    def observe_local(
+        self,
+        prompt_tokens: int,
+        output_tokens: int,
+        service_seconds: float,
+        first_token_seconds: Optional[float] = None,
+    ) -> None:
+        """Ajusta os custos do modelo local com uma execução (também streams sem decisão)."""
+        self.local_service.update(service_seconds)
+        if first_token_seconds is not None and prompt_tokens:
+            self.local_prefill.update(first_token_seconds / prompt_tokens)
+            decode_seconds = service_seconds - first_token_seconds
+        else:
+            decode_seconds = service_seconds - prompt_tokens * self.local_prefill.value
+        if output_tokens:
+            self.local_decode.update(max(0.0, decode_seconds) / output_tokens)
+
+    # --- Relatório ---
+
+    def get_report(self, recent: int = 20) -> Dict[str, Any]:
+        """Acurácia das previsões para o backend escolhido, por backend."""
+        per_backend: Dict[str, Dict[str, Any]] = {}
+        for backend in (LOCAL, GEMINI):
+            chosen = [d for d in self.decisions if d.backend == backend]
+            done = [
+                d for d in chosen if d.actual_seconds is not None and not d.failed
+            ]
+            errors = [abs(d.predicted[backend] - d.actual_seconds) for d in done]
+            relative = [
+                abs(d.predicted[backend] - d.actual_seconds) / d.actual_seconds
+                for d in done
+                if d.actual_seconds > 0
+            ]
+            per_backend[backend] = {
+                "decisions": len(chosen),
+                "completed": len(done),
+                "failed": sum(1 for d in chosen if d.failed),
+                "mean_predicted_seconds": (
+                    round(sum(d.predicted[backend] for d in done) / len(done), 2)
+                    if done
+                    else None
+                ),
+                "mean_actual_seconds": (
+                    round(sum(d.actual_seconds for d in done) / len(done), 2)
+                    if done
+                    else None
+                ),
+                "mean_absolute_error_seconds": (
+                    round(sum(errors) / len(errors), 2) if errors else None
+                ),
+                "mean_absolute_percentage_error": (
+                    round(sum(relative) / len(relative), 4) if relative else None
+                ),
+                "within_25_percent": (
+                    round(sum(1 for r in relative if r <= 0.25) / len(relative), 4)
+                    if relative
+                    else None
+                ),
+            }
+
+        recent_decisions: List[Dict[str, Any]] = [
+            d.to_dict() for d in list(self.decisions)[-recent:]
+        ]
+        return {
+            "backends": per_backend,
+            "model": {
+                "local_prefill_tokens_per_second": round(
+                    1.0 / max(self.local_prefill.value, 1e-6), 2
+                ),
+                "local_decode_tokens_per_second": round(
+                    1.0 / max(self.local_decode.value, 1e-6), 2
+                ),
+                "local_mean_service_seconds": round(self.local_service.value, 2),
+                "remote_rtt_seconds": round(self.remote_rtt.value, 2),
+                "remote_decode_tokens_per_second": round(
+                    1.0 / max(self.remote_decode.value, 1e-6), 2
+                ),
+                "expected_output_tokens": {
+                    name: round(ewma.value) for name, ewma in self.expected_output.items()
+                },
+            },
+            "local_calibrated": self.local_calibrated,
+            "explore_rate": ROUTER_EXPLORE,
+            "min_gain_seconds": ROUTER_MIN_GAIN_SECONDS,
+            "min_gain_ratio": ROUTER_MIN_GAIN_RATIO,
+            "recent_decisions": recent_decisions,
+        }
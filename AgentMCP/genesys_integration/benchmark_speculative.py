@@ -0,0 +1,191 @@
+# genesys_integration/benchmark_speculative.py
+"""
+Benchmark da decodificação especulativa da Genesys.
+
+Carrega o modelo principal com os mesmos parâmetros do agente (llama_tuning),
+roda um conjunto fixo de prompts com decodificação normal e com o rascunho
+configurado, e compara tokens/s e taxa de aceitação. Com temperatura 0 as duas
+saídas devem ser idênticas; a coluna "igual" confere isso.
+
+Uso:
+    python -m genesys_integration.benchmark_speculative \\
+        --model models/llama-3-70b-instruct.Q4_K_M.gguf \\
+        --draft models/llama-3.2-1b-instruct.Q8_0.gguf --runs 2
+
+    --draft prompt-lookup compara com o rascunho por n-gramas do prompt.
+
+Observação: a linha de base usa o mesmo objeto Llama com o rascunho desligado.
+Como o modelo foi criado com logits_all=True (exigido pelo rascunho), a linha de
+base fica um pouco mais lenta do que um modelo carregado sem rascunho.
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from .llama_tuning import DEFAULT_N_CTX, resolve_load_params
+from .speculative import GENESYS_DRAFT_TOKENS, build_draft_model
+
+# Prompts fixos, parecidos com o uso real via IDE
+BENCHMARK_PROMPTS = [
+    "Escreva uma função Python que valide um CPF e explique cada passo.",
+    "Explique a diferença entre asyncio.gather e anyio task groups, com exemplos.",
+    "Refatore este código para usar dataclasses:\n\nclass Ponto:\n    def __init__(self, x, y):\n        self.x = x\n        self.y = y\n    def __repr__(self):\n        return f'Ponto({self.x}, {self.y})'\n",
+    "Liste os passos para criar um índice FTS5 no SQLite e consultá-lo com bm25.",
+    "Escreva um teste pytest para uma função que soma dois números inteiros.",
+]
+
+
+def _run_prompt(llm: Any, prompt: str, max_tokens: int) -> Dict[str, Any]:
+    llm.reset()  # Sem reaproveitar o KV da rodada anterior
+    started = time.monotonic()
+    result = llm.create_completion(prompt, max_tokens=max_tokens, temperature=0.0)
+    elapsed = time.monotonic() - started
+    completion_tokens = result["usage"]["completion_tokens"]
+    return {
+        "text": result["choices"][0]["text"],
+        "completion_tokens": completion_tokens,
+        "seconds": elapsed,
+    }
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, float]:
+    tokens = sum(r["completion_tokens"] for r in runs)
+    seconds = sum(r["seconds"] for r in runs)
+    return {
+        "completion_tokens": tokens,
+        "seconds": round(seconds, 2),
+        "tokens_per_second": round(tokens / seconds, 2) if seconds else 0.0,
+    }
+
+
+def run_benchmark(
+    model_path: str,
+    draft: str,
+    prompts: List[str],
+    max_tokens: int,
+    runs: int,
+    num_pred_tokens: int,
+) -> Dict[str, Any]:
+    from llama_cpp import Llama
+
+    profile = resolve_load_params(model_path)
+    params = dict(profile["params"])
+    params.setdefault("n_ctx", DEFAULT_N_CTX)
+    draft_model = build_draft_model(
+        n_ctx=params["n_ctx"],
+        n_threads=params.get("n_threads"),
+        draft=draft,
+        num_pred_tokens=num_pred_tokens,
+    )
+    if draft_model is None:
+        raise RuntimeError("Nenhum modelo de rascunho configurado (use --draft).")
+
+    print(f"🧠 Carregando {model_path} ...")
+    llm = Llama(model_path=model_path, draft_model=draft_model, **params)
+
+    plain_runs, speculative_runs, per_prompt = [], [], []
+    for index, prompt in enumerate(prompts):
+        for _ in range(runs):
+            llm.draft_model = None
+            plain = _run_prompt(llm, prompt, max_tokens)
+
+            llm.draft_model = draft_model
+            before = draft_model.stats.get_stats()
+            speculative = _run_prompt(llm, prompt, max_tokens)
+            after = draft_model.stats.get_stats()
+
+            plain_runs.append(plain)
+            speculative_runs.append(speculative)
+            per_prompt.append(
+                {
+                    "prompt": index,
+                    "plain_tps": round(plain["completion_tokens"] / plain["seconds"], 2),
+                    "speculative_tps": round(
+                        speculative["completion_tokens"] / speculative["seconds"], 2
+                    ),
+                    "accepted_tokens": after["accepted_tokens"]
+                    - before["accepted_tokens"],
+                    "proposed_tokens": after["proposed_tokens"]
+                    - before["proposed_tokens"],
+                    "same_output": plain["text"] == speculative["text"],
+                }
+            )
+            print(
+                f"  prompt {index}: {per_prompt[-1]['plain_tps']} → "
+                f"{per_prompt[-1]['speculative_tps']} tokens/s"
+            )
+
+    plain_summary = _summarize(plain_runs)
+    speculative_summary = _summarize(speculative_runs)
+    return {
+        "model": model_path,
+        "draft": draft,
+        "num_pred_tokens": num_pred_tokens,
+        "max_tokens": max_tokens,
+        "runs_per_prompt": runs,
+        "load_params": params,
+        "plain": plain_summary,
+        "speculative": speculative_summary,
+        "speedup": (
+            round(
+                speculative_summary["tokens_per_second"]
+                / plain_summary["tokens_per_second"],
+                3,
+            )
+            if plain_summary["tokens_per_second"]
+            else None
+        ),
+        "draft_stats": draft_model.stats.get_stats(),
+        "identical_outputs": sum(p["same_output"] for p in per_prompt),
+        "per_prompt": per_prompt,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara decodificação normal e especulativa no modelo local."
+    )
+    parser.add_argument("--model", required=True, help="GGUF do modelo principal")
+    parser.add_argument(
+        "--draft", required=True, help='GGUF do rascunho ou "prompt-lookup"'
+    )
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--runs", type=int, default=1, help="Repetições por prompt")
+    parser.add_argument("--draft-tokens", type=int, default=GENESYS_DRAFT_TOKENS)
+    parser.add_argument(
+        "--prompts-file",
+        help="Arquivo JSON com uma lista de prompts (substitui o conjunto padrão)",
+    )
+    parser.add_argument("--output", help="Grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    prompts = BENCHMARK_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding="utf-8") as f:
+            prompts = json.load(f)
+
+    report = run_benchmark(
+        args.model,
+        args.draft,
+        prompts,
+        args.max_tokens,
+        args.runs,
+        args.draft_tokens,
+    )
+    print("\n📊 Resultado")
+    print(f"  Normal:       {report['plain']['tokens_per_second']} tokens/s")
+    print(f"  Especulativo: {report['speculative']['tokens_per_second']} tokens/s")
+    print(f"  Speedup:      {report['speedup']}x")
+    print(f"  Aceitação:    {report['draft_stats']['acceptance_rate']:.1%}")
+    print(f"  Saídas iguais: {report['identical_outputs']}/{len(report['per_prompt'])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Relatório salvo em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# genesys_integration/chat_format.py
+"""
+Renderização de conversas OpenAI (lista de messages) para o modelo local.
+
+Usa o chat template embutido no GGUF (tokenizer.chat_template) e, na falta
+dele, o formato do Llama 3. A conversa é encaixada na janela de contexto
+descartando os turnos mais antigos (o system prompt é sempre mantido) e, em
+último caso, cortando o início da mensagem mais recente. As contagens de
+tokens usam o tokenizer do próprio modelo.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+try:
+    from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+    JINJA_TEMPLATES_AVAILABLE = True
+except ImportError:
+    JINJA_TEMPLATES_AVAILABLE = False
+
+# Marcadores de fim de turno usados pelos templates mais comuns
+END_OF_TURN_MARKERS = ["<|eot_id|>", "<|im_end|>", "<end_of_turn>", "<|end|>"]
+
+# Mensagens com texto acima disso são cortadas antes de contar tokens, para
+# que um payload gigante não custe uma tokenização inteira só para ser descartado
+MAX_MESSAGE_CHARS = 200_000
+
+
+class ContextWindowExceededError(ValueError):
+    """Nem o system prompt cabe na janela de contexto com a reserva para a resposta."""
+
+
+class RenderedChat(NamedTuple):
+    """Prompt pronto para o modelo e o que foi preciso fazer para caber no contexto."""
+
+    prompt: str
+    stop: List[str]
+    prompt_tokens: int
+    max_tokens: int
+    dropped_messages: int
+    truncated: bool
+
+
+def message_text(content: Any) -> str:
+    """Texto de uma mensagem OpenAI (string ou lista de partes {"type": "text"})."""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
+    return str(content)
+
+
+def normalize_messages(
+    messages: List[Dict[str, Any]], system_prompt: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """
+    Converte para [{"role", "content"}] com um único system prompt no início
+    (muitos templates aceitam só um): o do agente seguido dos enviados pelo cliente.
+    """
+    system_parts = [system_prompt] if system_prompt else []
+    conversation = []
+    for message in messages:
+        role = message.get("role", "user")
+        text = message_text(message.get("content"))[:MAX_MESSAGE_CHARS]
+        if role in ("system", "developer"):
+            system_parts.append(text)
+        elif role in ("user", "assistant"):
+            conversation.append({"role": role, "content": text})
+        else:
+            # tool/function: o template não conhece o papel; entra como contexto do usuário
+            conversation.append({"role": "user", "content": f"[{role}]\n{text}"})
+    if system_parts:
+        conversation.insert(
+            0, {"role": "system", "content": "\n\n".join(p for p in system_parts if p)}
+        )
+    return conversation
+
+
+def _render_llama3(messages: List[Dict[str, str]], bos_token: str) -> str:
+    parts = [bos_token]
+    for message in messages:
+        parts.append(
+            f"<|start_header_id|>{message['role']}<|end_header_id|>\n\n"
+            f"{message['content'].strip()}<|eot_id|>"
+        )
+    parts.append("<|start_header_id|>assistant<|end_header_id|>\n\n")
+    return "".join(parts)
+
+
+class ChatRenderer:
+    """Aplica o chat template do modelo e mede o resultado em tokens."""
+
+    def __init__(self, llama: Any):
+        self.llama = llama
+        self.n_ctx = llama.n_ctx()
+        eos_id, bos_id = llama.token_eos(), llama.token_bos()
+        self.eos_token = llama._model.token_get_text(eos_id) if eos_id != -1 else ""
+        self.bos_token = llama._model.token_get_text(bos_id) if bos_id != -1 else ""
+
+        template = (getattr(llama, "metadata", None) or {}).get(
+            "tokenizer.chat_template"
+        )
+        self._formatter = None
+        if template and JINJA_TEMPLATES_AVAILABLE:
+            self._formatter = Jinja2ChatFormatter(
+                template=template, eos_token=self.eos_token, bos_token=self.bos_token
+            )
+            self.template_source = "gguf"
+        else:
+            template = "<|eot_id|>"  # Formato Llama 3
+            self.template_source = "llama3"
+        self.stop = [self.eos_token] if self.eos_token else []
+        self.stop += [m for m in END_OF_TURN_MARKERS if m in template and m not in self.stop]
+
+    def count_tokens(self, text: str, add_bos: bool = False) -> int:
+        if not text:
+            return 0
+        return len(self.llama.tokenize(text.encode("utf-8"), add_bos=add_bos, special=True))
+
+    def render(self, messages: List[Dict[str, str]]) -> str:
+        if self._formatter is not None:
+            prompt = self._formatter(messages=messages).prompt
+        else:
+            prompt = _render_llama3(messages, self.bos_token)
+        # create_completion adiciona o BOS na tokenização; o do template duplicaria
+        if self.bos_token and prompt.startswith(self.bos_token):
+            prompt = prompt[len(self.bos_token):]
+        return prompt
+
+    def render_system_prefix(self, system_prompt: str) -> Optional[str]:
+        """
+        Início de toda conversa com este system prompt: o turno de sistema e o
+        cabeçalho do turno do usuário, sem o cabeçalho final do assistente.
+        É o prefixo que vale pré-avaliar no cache de prefixos. None se o
+        template não deixar separar o prefixo.
+        """
+        marker = "GENESYS_PREFIX_MARKER"
+        prompt = self.render(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": marker},
+            ]
+        )
+        cut = prompt.find(marker)
+        return prompt[:cut] if cut > 0 else None
+
+    def _cut_to_tail(self, text: str, max_tokens: int) -> str:
+        """Mantém os últimos max_tokens tokens do texto (sempre remove ao menos um)."""
+        tokens = self.llama.tokenize(text.encode("utf-8"), add_bos=False, special=False)
+        keep = min(max_tokens, len(tokens) - 1)
+        if keep <= 0:
+            return ""
+        return self.llama.detokenize(tokens[-keep:]).decode("utf-8", errors="ignore")
+
+    def render_within_context(
+        self, messages: List[Dict[str, str]], max_tokens: int
+    ) -> RenderedChat:
+        """
+        Renderiza a conversa deixando max_tokens livres para a resposta.
+        Descarta os turnos mais antigos até caber; se só restar um turno e ainda
+        não couber, mantém o final da mensagem (onde costuma estar a pergunta).
+
+        Cada turno é tokenizado uma única vez e o ponto de corte sai das
+        contagens acumuladas (conteúdo mais a moldura média do template); a
+        conversa só é renderizada de novo para conferir que coube. Como a
+        moldura é estimada, o corte pode levar um turno além do mínimo.
+        """
+        max_tokens = max(1, min(max_tokens, self.n_ctx // 2))
+        budget = self.n_ctx - max_tokens
+        system = [m for m in messages[:1] if m["role"] == "system"]
+        turns = messages[len(system):]
+        start = 0
+        truncated = False
+
+        prompt = self.render(system + turns)
+        prompt_tokens = self.count_tokens(prompt, add_bos=True)
+        turn_tokens: Optional[List[int]] = None
+        while prompt_tokens > budget:
+            if len(turns) - start > 1:
+                if turn_tokens is None:
+                    turn_tokens = [self.count_tokens(turn["content"]) for turn in turns]
+                    # Moldura média por mensagem (cabeçalhos e fim de turno), por baixo
+                    frame = max(
+                        0,
+                        prompt_tokens
+                        - sum(turn_tokens)
+                        - sum(self.count_tokens(m["content"]) for m in system),
+                    ) // (len(system) + len(turns) + 1)
+                    turn_tokens = [tokens + frame for tokens in turn_tokens]
+                excess = prompt_tokens - budget
+                freed = 0
+                while len(turns) - start > 1 and freed < excess:
+                    freed += turn_tokens[start]
+                    start += 1
+                # Não começar a conversa por uma resposta do assistente
+                while len(turns) - start > 1 and turns[start]["role"] == "assistant":
+                    start += 1
+            elif len(turns) == start or not turns[start]["content"]:
+                # Nem o system prompt cabe: cortá-lo mudaria o comportamento do agente
+                raise ContextWindowExceededError(
+                    f"O prompt ({prompt_tokens} tokens) não cabe na janela de contexto "
+                    f"({self.n_ctx} tokens, {max_tokens} reservados para a resposta)."
+                )
+            else:
+                last = turns[start]
+                excess = prompt_tokens - budget
+                # A fronteira do corte pode re-tokenizar diferente; a próxima volta confere
+                keep = self.count_tokens(last["content"]) - excess
+                turns = turns[:start] + [
+                    {**last, "content": self._cut_to_tail(last["content"], keep)}
+                ]
+                truncated = True
+            prompt = self.render(system + turns[start:])
+            prompt_tokens = self.count_tokens(prompt, add_bos=True)
+
+        return RenderedChat(
+            prompt=prompt,
+            stop=list(self.stop),
+            prompt_tokens=prompt_tokens,
+            max_tokens=max_tokens,
+            dropped_messages=start,
+            truncated=truncated,
+        )
@@ -0,0 +1,173 @@
+# genesys_integration/completion_cache.py
+"""
+Cache persistente de respostas do modelo local da Genesys.
+
+Chamadas repetidas da IDE ("explique esta função") pagam segundos de decode
+por uma resposta que, com temperatura 0, seria exatamente a mesma. Este cache
+guarda a resposta num SQLite em disco, com chave em
+
+    (impressão digital do GGUF, prompt renderizado, parâmetros de amostragem)
+
+e remove as entradas usadas há mais tempo quando o arquivo passa do limite.
+
+Só respostas determinísticas entram: requisições com temperatura > 0 ou com
+cache=False passam direto pelo modelo.
+
+Configuração:
+    GENESYS_COMPLETION_CACHE=true          ativa o cache (desligado por padrão)
+    GENESYS_COMPLETION_CACHE_PATH=<arquivo> onde fica o SQLite
+    GENESYS_COMPLETION_CACHE_MB=256        tamanho máximo das respostas guardadas
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+GENESYS_COMPLETION_CACHE = (
+    os.getenv("GENESYS_COMPLETION_CACHE", "false").lower() == "true"
+)
+GENESYS_COMPLETION_CACHE_PATH = os.getenv(
+    "GENESYS_COMPLETION_CACHE_PATH",
+    str(Path(__file__).parent / "cache" / "completions.sqlite3"),
+)
+GENESYS_COMPLETION_CACHE_MB = float(os.getenv("GENESYS_COMPLETION_CACHE_MB", "256"))
+
+# Ler um GGUF de dezenas de GB inteiro só para a chave seria caro; tamanho,
+# mtime e as pontas do arquivo identificam a versão do modelo
+FINGERPRINT_CHUNK_BYTES = 1024 * 1024
+
+
+def model_fingerprint(model_path: str) -> str:
+    """Impressão digital barata do arquivo do modelo."""
+    stat = os.stat(model_path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(model_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK_BYTES))
+        if stat.st_size > FINGERPRINT_CHUNK_BYTES:
+            f.seek(max(FINGERPRINT_CHUNK_BYTES, stat.st_size - FINGERPRINT_CHUNK_BYTES))
+            digest.update(f.read(FINGERPRINT_CHUNK_BYTES))
+    return digest.hexdigest()
+
+
+def is_cacheable(temperature: Optional[float], cache: Optional[bool] = None) -> bool:
+    """Só respostas determinísticas (temperatura 0) e sem opt-out do cliente."""
+    return cache is not False and temperature is not None and temperature <= 0
+
+
+def completion_key(model_hash: str, prompt: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([model_hash, prompt, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """LRU limitado por tamanho, persistido em SQLite. Seguro entre threads."""
+
+    def __init__(
+        self,
+        path: str = GENESYS_COMPLETION_CACHE_PATH,
+        max_bytes: int = int(GENESYS_COMPLETION_CACHE_MB * 1024 * 1024),
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions (last_used)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE completions SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self.stores += 1
+            while self._bytes > self.max_bytes:
+                victim = self._conn.execute(
+                    "SELECT key, size FROM completions ORDER BY last_used LIMIT 1"
+                ).fetchone()
+                if victim is None:
+                    break
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (victim[0],))
+                self._bytes -= victim[1]
+                self.evictions += 1
+            self._conn.commit()
+
+    def record_bypass(self) -> None:
+        self.bypassed += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
@@ -8,11 +8,15 @@ import os
 import sys
 import asyncio
 import json
-import anyio # Adicionado para executar tarefas bloqueantes em threads
-from typing import Dict, Any
+import time
+from functools import partial
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
+import anyio
+import anyio.to_thread
+
 import google.generativeai as genai
 
 # Importações para o modelo LLaMA
@@ -49,6 +53,33 @@ except ImportError:
 import re
 
 from .tools import TOOL_DEFINITIONS, execute_tool
+from .inference_scheduler import (
+    InferenceQueueFullError,
+    InferenceScheduler,
+    PRIORITY_NORMAL,
+)
+from .token_stream import open_token_stream
+from .prompt_cache import attach_prompt_cache, warm_prefix
+from .llama_tuning import DEFAULT_N_CTX, resolve_load_params
+from .chat_format import ChatRenderer, RenderedChat, message_text, normalize_messages
+from .backend_router import GEMINI, BackendRouter, RoutingDecision
+from .speculative import build_draft_model
+from .model_manager import ModelInstance, ModelManager
+from .completion_cache import (
+    GENESYS_COMPLETION_CACHE,
+    CompletionCache,
+    completion_key,
+    is_cacheable,
+    model_fingerprint,
+)
+
+# Limite de tokens da resposta quando o cliente não envia max_tokens
+GENESYS_DEFAULT_MAX_TOKENS = int(os.getenv("GENESYS_DEFAULT_MAX_TOKENS", "512"))
+# Temperatura do LlamaCpp quando a requisição não define uma
+LOCAL_TEMPERATURE = 0.7
+# Geração curta feita no modelo novo antes da troca a quente
+WARMUP_TASK = "Responda apenas: pronto."
+WARMUP_MAX_TOKENS = 4
 
 # --- Prompts ---
 
@@ -94,10 +125,23 @@ class GenesysAgent:
         self.use_gpu = use_gpu
         self.model = None
         self.tokenizer = None
-        self.llama_cpp = None
-        self.is_loaded = False
         self.tools = self._setup_tools()
         self.gemini_model = None
+        # Fila justa na frente do modelo local (um único contexto LlamaCpp).
+        # Sem batch_runner: LlamaCpp.generate avalia os prompts um após o outro,
+        # então um "lote" só faria todos esperarem a soma das gerações. Só faz
+        # sentido com um backend realmente em lote (várias sequências no
+        # llama_batch ou um servidor llama.cpp com slots paralelos).
+        self.scheduler = InferenceScheduler()
+        # Instância do modelo que está servindo; trocada a quente em reload_model
+        self.models = ModelManager()
+        self.router = BackendRouter()
+        self.completion_cache = None
+        if GENESYS_COMPLETION_CACHE:
+            try:
+                self.completion_cache = CompletionCache()
+            except Exception as e:
+                print(f"⚠️ Cache de respostas desativado: {e}")
 
         # Carregar variáveis de ambiente
         load_dotenv()
@@ -116,6 +160,32 @@ class GenesysAgent:
                 "⚠️ GEMINI_API_KEY não encontrada no .env. Funções avançadas desativadas."
             )
 
+    # Atalhos para a instância atual do modelo (None enquanto nada foi carregado)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.models.current is not None
+
+    @property
+    def llama_cpp(self):
+        return self.models.current.llama_cpp if self.models.current else None
+
+    @property
+    def chat_renderer(self) -> Optional[ChatRenderer]:
+        return self.models.current.chat_renderer if self.models.current else None
+
+    @property
+    def prompt_cache(self):
+        return self.models.current.prompt_cache if self.models.current else None
+
+    @property
+    def draft_model(self):
+        return self.models.current.draft_model if self.models.current else None
+
+    @property
+    def load_profile(self) -> Optional[Dict[str, Any]]:
+        return self.models.current.load_profile if self.models.current else None
+
     def _get_model_path(self) -> str:
         """Determina o caminho do modelo baseado na configuração"""
         # Primeiro, tentar usar o modelo da Genesys original
@@ -160,6 +230,10 @@ class GenesysAgent:
             logger.error("LOAD_MODEL: Falha crítica - Dependências do LlamaCpp não estão disponíveis.")
             return False
 
+        if self.models.swapping:
+            logger.info("LOAD_MODEL: Carregamento já em andamento; aguardando.")
+            await self.models.wait_for_swap()
+
         if self.is_loaded:
             logger.info("LOAD_MODEL: Modelo já estava carregado.")
             return True
@@ -171,102 +245,298 @@ class GenesysAgent:
                 logger.error(f"LOAD_MODEL: Arquivo do modelo não encontrado em '{self.model_path}'.")
                 return False
 
-            logger.info("LOAD_MODEL: Instanciando LlamaCpp...")
-            # model_kwargs para parâmetros específicos do llama-cpp-python
-            model_kwargs = {
-                # Tenta descarregar o máximo de camadas possível para a GPU para aliviar a RAM ao máximo.
-                "n_gpu_layers": 5, # Reduzido para um valor mínimo para testar a nova configuração.
-                # Divide o carregamento dos tensores para evitar picos de RAM.
-                "tensor_split": [1.0],
-                "main_gpu": 0,
-                "use_mmap": False, # Desativado para alterar o padrão de alocação de memória.
-                "low_vram": True, # Força a biblioteca a otimizar o uso de VRAM.
-            }
-
-            llama_params = {
-                "model_path": self.model_path,
-                "n_batch": 32, # Reduzido ao mínimo para diminuir o "scratch buffer" na VRAM.
-                "n_ctx": 4096,
-                "f16_kv": True,
-                "callback_manager": CallbackManager([StreamingStdOutCallbackHandler()]),
-                "verbose": True,
-                "temperature": 0.7,
-                "n_threads": 2, # Reduzido drasticamente para simplificar a alocação de memória.
-                "model_kwargs": model_kwargs, # Passa os parâmetros específicos do modelo
-            }
-            logger.info(f"LOAD_MODEL: Inicializando LlamaCpp com parâmetros: {llama_params}")
-
-            self.llama_cpp = LlamaCpp(**llama_params)
-            
-            logger.info("LOAD_MODEL: Instância do LlamaCpp criada com sucesso.")
-            
-            self.is_loaded = True
-            logger.info("✅✅✅ LOAD_MODEL: Modelo Genesys carregado e pronto para uso! ✅✅✅")
+            report = await self.models.swap(
+                partial(self._build_model, self.model_path), self._warm_up
+            )
+            logger.info(
+                f"✅✅✅ LOAD_MODEL: Modelo Genesys carregado e pronto para uso em "
+                f"{report['total_seconds']}s! ✅✅✅"
+            )
             return True
 
         except Exception as e:
             logger.error(f"❌❌❌ LOAD_MODEL: Uma exceção ocorreu durante o carregamento do modelo. ❌❌❌", exc_info=True)
-            self.is_loaded = False
             return False
 
-    def _should_use_gemini(self, task: str) -> bool:
-        """Determina se a tarefa é complexa o suficiente para usar a API do Gemini."""
-        if not self.gemini_model:
-            return False
+    async def reload_model(self, model_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Troca a quente: carrega o modelo (o mesmo arquivo ou model_path) ao lado
+        do atual, aquece, troca e drena o antigo. O agente continua atendendo
+        durante todo o processo. Retorna as durações da troca; levanta
+        ModelSwapInProgressError se já houver uma troca em andamento.
+        """
+        from agent_mcp.core.config import logger
 
-        complex_keywords = [
-            "analise",
-            "refatore",
-            "arquitetura",
-            "explique detalhadamente",
-            "crie um plano",
-            "projete",
-            "melhore este código",
-            "auditoria",
-            "implemente a seguinte feature",
-            "escreva um teste completo",
-        ]
+        model_path = model_path or self.model_path
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Arquivo do modelo não encontrado: {model_path}")
+
+        logger.info(f"RELOAD_MODEL: Carregando {model_path} ao lado do modelo atual.")
+        report = await self.models.swap(
+            partial(self._build_model, model_path), self._warm_up
+        )
+        self.model_path = model_path
+        logger.info(
+            f"RELOAD_MODEL: Troca concluída em {report['total_seconds']}s "
+            f"(carga {report['load_seconds']}s, aquecimento {report['warmup_seconds']}s, "
+            f"drenagem {report['drain_seconds']}s)."
+        )
+        return report
+
+    def _build_model(self, model_path: str) -> ModelInstance:
+        """Instancia o LlamaCpp e os objetos que dependem dele (bloqueante; roda numa thread)."""
+        from agent_mcp.core.config import logger
+
+        logger.info("LOAD_MODEL: Instanciando LlamaCpp...")
+        # Threads, n_batch, mmap/mlock e offload escolhidos a partir do hardware
+        # (ou das variáveis GENESYS_* de cada deployment)
+        load_profile = resolve_load_params(model_path, self.use_gpu)
+        tuned = dict(load_profile["params"])
+        # Parâmetros do Llama que o wrapper do LangChain não declara
+        model_kwargs = {
+            key: tuned.pop(key)
+            for key in ("n_threads_batch", "numa")
+            if key in tuned
+        }
+        if tuned.get("n_gpu_layers"):
+            model_kwargs.update({"tensor_split": [1.0], "main_gpu": 0})
+
+        # Decodificação especulativa opcional (GENESYS_DRAFT_MODEL). O vocabulário
+        # é conferido antes de construir o LlamaCpp: com draft_model o contexto
+        # fica com logits_all=True por toda a vida do modelo
+        try:
+            draft_model = build_draft_model(
+                n_ctx=tuned.get("n_ctx", DEFAULT_N_CTX),
+                n_threads=tuned.get("n_threads"),
+                target_model_path=model_path,
+            )
+        except Exception as e:
+            logger.warning(
+                f"LOAD_MODEL: Modelo de rascunho desativado: {e}"
+            )
+            draft_model = None
+        if draft_model is not None:
+            model_kwargs["draft_model"] = draft_model
+            logger.info(
+                f"LOAD_MODEL: Decodificação especulativa ativa ({draft_model.stats.kind}, "
+                f"{draft_model.stats.num_pred_tokens} tokens por rodada)."
+            )
+
+        llama_params = {
+            "model_path": model_path,
+            "n_ctx": DEFAULT_N_CTX,
+            "f16_kv": True,
+            "temperature": LOCAL_TEMPERATURE,
+            **tuned,
+            "model_kwargs": model_kwargs,
+        }
+        if tuned.get("verbose"):
+            # Ecoa cada token no stdout; útil só para depuração
+            llama_params["callback_manager"] = CallbackManager(
+                [StreamingStdOutCallbackHandler()]
+            )
+        logger.info(
+            f"LOAD_MODEL: Perfil de carga ({load_profile['mode']}): "
+            f"hardware={load_profile['hardware']}, "
+            f"overrides={load_profile['overrides']}"
+        )
+        logger.info(f"LOAD_MODEL: Inicializando LlamaCpp com parâmetros: {llama_params}")
+
+        llama_cpp = LlamaCpp(**llama_params)
+        
+        logger.info("LOAD_MODEL: Instância do LlamaCpp criada com sucesso.")
+
+        chat_renderer = ChatRenderer(llama_cpp.client)
+
+        # Cache de estados por prefixo: o preâmbulo fixo é avaliado uma única vez.
+        # process_task começa pelo preâmbulo cru; o chat (/v1/chat/completions)
+        # começa pelo turno de sistema renderizado pelo template, então os dois
+        # prefixos são pré-avaliados
+        prompt_cache = attach_prompt_cache(llama_cpp.client)
+        if prompt_cache is not None:
+            preamble = self._static_preamble()
+            prefixes = [("preâmbulo", preamble)]
+            chat_prefix = chat_renderer.render_system_prefix(preamble)
+            if chat_prefix:
+                prefixes.append(("turno de sistema do chat", chat_prefix))
+            for label, prefix in prefixes:
+                try:
+                    warmed = warm_prefix(llama_cpp.client, prompt_cache, prefix)
+                    logger.info(
+                        f"LOAD_MODEL: {label.capitalize()} pré-avaliado no cache de prefixos ({warmed} tokens)."
+                    )
+                except Exception as e:
+                    logger.warning(
+                        f"LOAD_MODEL: Falha ao pré-avaliar o {label}: {e}"
+                    )
+
+        return ModelInstance(
+            llama_cpp,
+            model_path,
+            load_profile=load_profile,
+            chat_renderer=chat_renderer,
+            prompt_cache=prompt_cache,
+            draft_model=draft_model,
+            # Chave do cache de respostas: outro GGUF não reaproveita respostas
+            model_hash=model_fingerprint(model_path) if self.completion_cache else None,
+        )
 
-        task_lower = task.lower()
-        return any(keyword in task_lower for keyword in complex_keywords)
+    def _warm_up(self, instance: ModelInstance) -> None:
+        """
+        Geração curta no modelo novo antes de colocá-lo em serviço. O tempo
+        medido é a primeira amostra dos custos locais do roteador, que até lá
+        só conhece os valores iniciais e mantém tudo no local.
+        """
+        prompt = self._create_specialized_prompt(WARMUP_TASK, use_tools=False)
+        started = time.monotonic()
+        first_token_at = None
+        output_parts = []
+        for chunk in instance.llama_cpp.stream(prompt, max_tokens=WARMUP_MAX_TOKENS):
+            if isinstance(chunk, GenerationChunk):
+                chunk = chunk.content
+            if isinstance(chunk, str):
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                output_parts.append(chunk)
+        service_seconds = time.monotonic() - started
+
+        count_tokens = instance.chat_renderer.count_tokens
+        prompt_tokens = count_tokens(prompt)
+        if instance.prompt_cache is not None:
+            # O preâmbulo já está no cache de prefixos: só o restante é avaliado
+            prompt_tokens = max(1, prompt_tokens - count_tokens(self._static_preamble()))
+        self.router.observe_local(
+            prompt_tokens,
+            count_tokens("".join(output_parts)),
+            service_seconds,
+            first_token_at - started if first_token_at is not None else None,
+        )
+
+    async def _generate_gemini(self, prompt: str) -> str:
+        """Chama a API do Gemini; exceções chegam ao chamador."""
+        response = await self.gemini_model.generate_content_async(prompt)
+        return response.text
 
     async def _call_gemini_api(self, prompt: str) -> str:
         """Chama a API do Gemini com o prompt fornecido."""
-        print("🧠 Tarefa complexa detectada. Usando API do Gemini...")
+        print("🧠 Usando API do Gemini...")
         try:
-            response = await self.gemini_model.generate_content_async(prompt)
-            return response.text
+            return await self._generate_gemini(prompt)
         except Exception as e:
             print(f"❌ Erro ao chamar a API do Gemini: {e}")
             return f"Erro ao processar com Gemini: {e}"
 
+    def _estimate_tokens(self, text: str) -> int:
+        """Tokens pelo tokenizer local quando carregado; senão ~4 caracteres por token."""
+        if self.chat_renderer is not None:
+            return self.count_tokens(text)
+        return len(text) // 4
+
+    def _route(
+        self,
+        task: str,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        exclude: Optional[str] = None,
+    ) -> RoutingDecision:
+        return self.router.route(
+            task,
+            self._estimate_tokens(prompt),
+            local_available=self.is_loaded or LLAMA_AVAILABLE,
+            remote_available=self.gemini_model is not None,
+            queue_stats=self.scheduler.get_stats(),
+            max_tokens=max_tokens,
+            exclude=exclude,
+        )
+
+    async def _run_on_gemini(
+        self, decision: RoutingDecision, prompt: str
+    ) -> Optional[str]:
+        """Executa no Gemini e registra o resultado; None se falhar (cai para o local)."""
+        started = time.monotonic()
+        try:
+            response = await self._generate_gemini(prompt)
+        except Exception as e:
+            print(f"❌ Erro ao chamar a API do Gemini: {e}")
+            self.router.record(decision, time.monotonic() - started, 0, failed=True)
+            return None
+        self.router.record(
+            decision, time.monotonic() - started, self._estimate_tokens(response)
+        )
+        return response
+
     async def process_task(
-        self, task: str, context: Dict = None, use_tools: bool = True
+        self,
+        task: str,
+        context: Dict = None,
+        use_tools: bool = True,
+        client_id: str = "anonymous",
+        priority: int = PRIORITY_NORMAL,
+        temperature: Optional[float] = None,
+        cache: Optional[bool] = None,
     ) -> str:
-        """Processa uma tarefa usando o modelo Genesys ou a API do Gemini."""
+        """
+        Processa uma tarefa usando o modelo Genesys ou a API do Gemini.
+        Chamadas ao modelo local passam pelo escalonador e podem levantar
+        InferenceQueueFullError quando a fila está cheia. Com temperature=0 a
+        resposta local pode vir do cache de respostas (cache=False desativa).
+        """
 
         specialized_prompt = self._create_specialized_prompt(task, context, use_tools)
-
-        # Lógica de decisão: Usar Gemini para tarefas complexas
-        if self._should_use_gemini(task):
-            return await self._call_gemini_api(specialized_prompt)
+        params = {"temperature": LOCAL_TEMPERATURE if temperature is None else temperature}
+        use_cache = self._use_completion_cache(params["temperature"], cache)
+
+        response = None
+        if use_cache:
+            response = await self._cached_completion(specialized_prompt, params)
+        if response is None:
+            # Backend com menor tempo de conclusão previsto (fila, tamanho, latências)
+            decision = self._route(task, specialized_prompt)
+            if decision.backend == GEMINI:
+                response = await self._run_on_gemini(decision, specialized_prompt)
+                if response is not None:
+                    return response
+                decision = self._route(task, specialized_prompt, exclude=GEMINI)
 
         # Lógica original para usar o modelo local
-        if not self.is_loaded:
+        if response is None and not self.is_loaded:
             # A chamada síncrona aqui é um problema, mas para o caso de
             # uma chamada não-streaming, vamos mantê-la simples por enquanto.
             # Idealmente, o carregamento do modelo deve ser garantido na inicialização.
             await self.load_model()
 
-        if not self.is_loaded:
+        if response is None and not self.is_loaded:
             return "❌ Modelo Genesys não está carregado"
 
         try:
-            # Usar llama-cpp-python de forma não-bloqueante
-            # A função invoke é a substituta moderna para o __call__
-            response = await anyio.to_thread.run_sync(
-                self.llama_cpp.invoke, specialized_prompt
-            )
+            if response is None:
+                # A função invoke é a substituta moderna para o __call__; o escalonador
+                # a executa numa thread quando chegar a vez deste cliente
+                started = time.monotonic()
+                timings: Dict[str, float] = {}
+                try:
+                    # A instância reservada não é liberada por uma troca a quente
+                    async with self.models.lease() as model:
+                        response = await self._generate_local(
+                            model,
+                            specialized_prompt,
+                            client_id,
+                            priority,
+                            timings,
+                            **({} if temperature is None else {"temperature": temperature}),
+                        )
+                except Exception:
+                    self.router.record(decision, time.monotonic() - started, 0, failed=True)
+                    raise
+                self.router.record(
+                    decision,
+                    time.monotonic() - started,
+                    self._estimate_tokens(response),
+                    queue_seconds=timings.get("queue_seconds", 0.0),
+                    first_token_seconds=timings.get("first_token_seconds"),
+                )
+                if use_cache:
+                    await self._store_completion(model, specialized_prompt, params, response)
 
             # Se a resposta indica uso de ferramenta, executar
             if use_tools and self._should_use_tools(response):
@@ -277,12 +547,47 @@ class GenesysAgent:
 
             return response
 
+        except InferenceQueueFullError:
+            # Fila cheia deve chegar à rota como 429, não como texto de erro
+            raise
         except Exception as e:
             return f"❌ Erro no processamento local: {str(e)}"
 
-    async def stream_task(self, task: str, context: Dict = None):
+    # --- Cache de respostas ---
+
+    def _use_completion_cache(self, temperature: float, cache: Optional[bool]) -> bool:
+        if self.completion_cache is None:
+            return False
+        if not is_cacheable(temperature, cache):
+            self.completion_cache.record_bypass()
+            return False
+        return True
+
+    async def _cached_completion(self, prompt: str, params: Dict[str, Any]) -> Optional[str]:
+        model = self.models.current
+        if model is None or not model.model_hash:
+            return None
+        key = completion_key(model.model_hash, prompt, params)
+        return await anyio.to_thread.run_sync(self.completion_cache.get, key)
+
+    async def _store_completion(
+        self, model: ModelInstance, prompt: str, params: Dict[str, Any], response: str
+    ) -> None:
+        if not model.model_hash:
+            return
+        key = completion_key(model.model_hash, prompt, params)
+        await anyio.to_thread.run_sync(self.completion_cache.set, key, response)
+
+    async def stream_task(
+        self,
+        task: str,
+        context: Dict = None,
+        client_id: str = "anonymous",
+        priority: int = PRIORITY_NORMAL,
+    ):
         """
         Processa uma tarefa de forma assíncrona e transmite os tokens de resposta.
+        O modelo fica reservado no escalonador durante todo o stream.
         """
         if not self.is_loaded:
             yield "event: error\n"
@@ -294,20 +599,10 @@ class GenesysAgent:
         )
 
         try:
-            # O método .stream() retorna um gerador de tokens.
-            # Envolvemos sua execução em to_thread.run_sync para não bloquear o event loop
-            # enquanto esperamos que o gerador seja criado.
-            token_stream_iterator = await anyio.to_thread.run_sync(
-                self.llama_cpp.stream, specialized_prompt
-            )
-
-            # Iteramos sobre o gerador de forma assíncrona
-            for chunk in token_stream_iterator:
-                # O chunk pode ser uma string ou um objeto GenerationChunk
-                if isinstance(chunk, GenerationChunk):
-                    yield chunk.content
-                elif isinstance(chunk, str):
-                    yield chunk
+            async for token in self._stream_prompt(
+                specialized_prompt, client_id, priority
+            ):
+                yield token
 
         except Exception as e:
             from agent_mcp.core.config import logger
@@ -316,22 +611,223 @@ class GenesysAgent:
             yield "event: error\n"
             yield f"data: {error_message}\n\n"
 
-    def _create_specialized_prompt(
-        self, task: str, context: Dict = None, use_tools: bool = True
+    async def _generate_local(
+        self,
+        model: ModelInstance,
+        prompt: str,
+        client_id: str,
+        priority: int,
+        timings: Dict[str, float],
+        **params: Any,
     ) -> str:
-        """Cria prompt especializado baseado no contexto"""
-        base_prompt = f"""🤖 **AGENTE GENESYS MASTER**
+        """
+        Resposta completa do modelo local, gerada pelo mesmo caminho do
+        streaming: se a requisição for cancelada (cliente desconectou, hedge do
+        bridge ficou com o remoto), a thread para no próximo token e o slot do
+        escalonador é liberado, em vez de a geração ir até o fim ocupando o
+        modelo. timings recebe "queue_seconds" e "first_token_seconds".
+        """
+        async with self.scheduler.slot(client_id, priority) as ticket:
+            timings["queue_seconds"] = ticket.started_at - ticket.enqueued_at
+            output_parts = []
+            async with open_token_stream(
+                partial(model.llama_cpp.stream, **params), prompt
+            ) as token_stream:
+                async for chunk in token_stream:
+                    if isinstance(chunk, GenerationChunk):
+                        chunk = chunk.content
+                    if isinstance(chunk, str):
+                        ticket.mark_first_token()
+                        output_parts.append(chunk)
+            if ticket.first_token_at:
+                timings["first_token_seconds"] = ticket.first_token_at - ticket.started_at
+        return "".join(output_parts)
+
+    async def _stream_prompt(
+        self, prompt: str, client_id: str, priority: int, **params: Any
+    ):
+        """Reserva o modelo no escalonador e transmite os tokens gerados para o prompt."""
+        async with self.models.lease() as model, self.scheduler.slot(
+            client_id, priority
+        ) as ticket:
+            # O gerador de .stream() é consumido inteiro numa thread de trabalho;
+            # os tokens chegam ao event loop por um canal limitado.
+            async with open_token_stream(
+                partial(model.llama_cpp.stream, **params), prompt
+            ) as token_stream:
+                output_parts = []
+                async for chunk in token_stream:
+                    # O chunk pode ser uma string ou um objeto GenerationChunk
+                    if isinstance(chunk, GenerationChunk):
+                        chunk = chunk.content
+                    if isinstance(chunk, str):
+                        ticket.mark_first_token()
+                        output_parts.append(chunk)
+                        yield chunk
+            # Streams sempre rodam no local; servem para calibrar o roteador
+            self.router.observe_local(
+                self._estimate_tokens(prompt),
+                self._estimate_tokens("".join(output_parts)),
+                time.monotonic() - ticket.started_at,
+                (ticket.first_token_at - ticket.started_at)
+                if ticket.first_token_at
+                else None,
+            )
+
+    def count_tokens(self, text: str) -> int:
+        """Número de tokens do texto no tokenizer do modelo local."""
+        return self.chat_renderer.count_tokens(text)
+
+    def prepare_chat(
+        self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None
+    ) -> RenderedChat:
+        """
+        Renderiza a lista de messages (formato OpenAI) com o chat template do
+        modelo, com o preâmbulo da Genesys como system prompt, encaixada na
+        janela de contexto. Levanta ContextWindowExceededError se nem o system
+        prompt couber.
+        """
+        conversation = normalize_messages(messages, self._static_preamble())
+        return self.chat_renderer.render_within_context(
+            conversation, max_tokens or GENESYS_DEFAULT_MAX_TOKENS
+        )
+
+    def _completion_params(
+        self,
+        rendered: RenderedChat,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        params = {"stop": rendered.stop + list(stop or []), "max_tokens": rendered.max_tokens}
+        if temperature is not None:
+            params["temperature"] = temperature
+        return params
+
+    def _usage(self, rendered: RenderedChat, completion: str) -> Dict[str, int]:
+        completion_tokens = self.count_tokens(completion)
+        return {
+            "prompt_tokens": rendered.prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": rendered.prompt_tokens + completion_tokens,
+        }
+
+    async def complete_chat(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+        client_id: str = "anonymous",
+        priority: int = PRIORITY_NORMAL,
+        cache: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Conversa multi-turno completa (sem streaming).
+        Retorna {"content", "finish_reason", "usage", "dropped_messages", "truncated"}.
+        Com temperature=0 a resposta pode vir do cache de respostas (cache=False desativa).
+        """
+        # Tokenizar um histórico longo é CPU pura: fora do event loop
+        rendered = await anyio.to_thread.run_sync(self.prepare_chat, messages, max_tokens)
+        params = self._completion_params(rendered, temperature, stop)
+        cache_params = {**params, "temperature": params.get("temperature", LOCAL_TEMPERATURE)}
+        use_cache = self._use_completion_cache(cache_params["temperature"], cache)
+        if use_cache:
+            cached = await self._cached_completion(rendered.prompt, cache_params)
+            if cached is not None:
+                return self._chat_result(rendered, cached)
+
+        last_user = next(
+            (
+                message_text(m.get("content"))
+                for m in reversed(messages)
+                if m.get("role") == "user"
+            ),
+            "",
+        )
+        decision = self._route(last_user, rendered.prompt, rendered.max_tokens)
+        content = None
+        finish_reason = None
+        if decision.backend == GEMINI:
+            transcript = "\n\n".join(
+                f"{m['role'].upper()}: {m['content']}"
+                for m in normalize_messages(messages, self._static_preamble())
+            )
+            content = await self._run_on_gemini(decision, transcript)
+            if content is not None:
+                finish_reason = "stop"
+            else:
+                decision = self._route(
+                    last_user, rendered.prompt, rendered.max_tokens, exclude=GEMINI
+                )
+        if content is None:
+            started = time.monotonic()
+            timings: Dict[str, float] = {}
+            try:
+                async with self.models.lease() as model:
+                    content = await self._generate_local(
+                        model, rendered.prompt, client_id, priority, timings, **params
+                    )
+            except Exception:
+                self.router.record(decision, time.monotonic() - started, 0, failed=True)
+                raise
+            self.router.record(
+                decision,
+                time.monotonic() - started,
+                self.count_tokens(content),
+                queue_seconds=timings.get("queue_seconds", 0.0),
+                first_token_seconds=timings.get("first_token_seconds"),
+            )
+            if use_cache:
+                await self._store_completion(model, rendered.prompt, cache_params, content)
+
+        return self._chat_result(rendered, content, finish_reason)
+
+    def _chat_result(
+        self, rendered: RenderedChat, content: str, finish_reason: Optional[str] = None
+    ) -> Dict[str, Any]:
+        usage = self._usage(rendered, content)
+        if finish_reason is None:
+            finish_reason = (
+                "length" if usage["completion_tokens"] >= rendered.max_tokens else "stop"
+            )
+        return {
+            "content": content,
+            "finish_reason": finish_reason,
+            "usage": usage,
+            "dropped_messages": rendered.dropped_messages,
+            "truncated": rendered.truncated,
+        }
+
+    async def stream_chat(
+        self,
+        rendered: RenderedChat,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+        client_id: str = "anonymous",
+        priority: int = PRIORITY_NORMAL,
+    ):
+        """Transmite os tokens da resposta a um prompt preparado por prepare_chat."""
+        async for token in self._stream_prompt(
+            rendered.prompt,
+            client_id,
+            priority,
+            **self._completion_params(rendered, temperature, stop),
+        ):
+            yield token
+
+    def _static_preamble(self) -> str:
+        """
+        Parte fixa do prompt. Precisa vir antes de tudo que muda por requisição
+        para que o cache de prefixos do llama.cpp a reaproveite.
+        """
+        return f"""🤖 **AGENTE GENESYS MASTER**
 ID: {self.agent_id}
 Especializações: {", ".join(self.specializations)}
 
 CONTEXTO DO PROJETO: Agent-MCP - Sistema de orquestração multi-agente
 MEU PAPEL: Agente especialista master com modelo LLaMA 70B local
 
-TAREFA RECEBIDA: {task}
-
-CONTEXTO ADICIONAL: {json.dumps(context, indent=2) if context else "Nenhum"}
-
-FERRAMENTAS DISPONÍVEIS: {"Ativadas" if use_tools else "Desativadas"}
+FERRAMENTAS:
 - file_system: Modificar arquivos
 - list_files: Listar diretórios
 - read_file: Ler arquivos
@@ -345,9 +841,21 @@ INSTRUÇÕES:
 4. Coordene com outros agentes via Agent-MCP
 5. Mantenha foco em código e implementação
 
+"""
+
+    def _create_specialized_prompt(
+        self, task: str, context: Dict = None, use_tools: bool = True
+    ) -> str:
+        """Cria prompt especializado baseado no contexto"""
+        # Ordem do mais estável para o mais variável: preâmbulo, contexto da sessão, tarefa
+        return f"""{self._static_preamble()}CONTEXTO ADICIONAL: {json.dumps(context, indent=2) if context else "Nenhum"}
+
+FERRAMENTAS DISPONÍVEIS: {"Ativadas" if use_tools else "Desativadas"}
+
+TAREFA RECEBIDA: {task}
+
 RESPOSTA:
 """
-        return base_prompt
 
     def _should_use_tools(self, response: str) -> bool:
         """Determina se a resposta indica necessidade de usar ferramentas"""
@@ -448,8 +956,21 @@ Análise da imagem fornecida juntamente com o texto...
             "model_loaded": self.is_loaded,
             "model_path": self.model_path,
             "gpu_enabled": self.use_gpu,
+            "load_profile": self.load_profile,
             "tools_available": True, # GENESYS_TOOLS_AVAILABLE, # Removido para evitar conflito
             "llama_available": LLAMA_AVAILABLE,
+            "scheduler": self.scheduler.get_stats(),
+            "model_manager": self.models.get_stats(),
+            "router": self.router.get_report(recent=5),
+            "speculative": (
+                self.draft_model.stats.get_stats() if self.draft_model else None
+            ),
+            "prompt_cache": (
+                self.prompt_cache.get_stats() if self.prompt_cache else None
+            ),
+            "completion_cache": (
+                self.completion_cache.get_stats() if self.completion_cache else None
+            ),
         }
 
 
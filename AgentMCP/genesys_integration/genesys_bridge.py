@@ -6,19 +6,68 @@ Expõe Genesys como ferramentas MCP
 
 import asyncio
 import json
-import requests
+import httpx
+import anyio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
 from mcp.server.fastmcp import FastMCP
 import os  # Added for os.getenv
 import time  # Added for time.time()
 
+
+@asynccontextmanager
+async def _bridge_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Fecha o cliente HTTP compartilhado quando o servidor MCP encerra."""
+    try:
+        yield
+    finally:
+        await bridge.aclose()
+
+
 # Inicializar servidor MCP
-mcp = FastMCP("GenesysBridge")
+mcp = FastMCP("GenesysBridge", lifespan=_bridge_lifespan)
 
 # Configuração do servidor Genesys local
-GENESYS_LOCAL_URL = "http://1227.0.0.1:8002"
+GENESYS_LOCAL_URL = "http://127.0.0.1:8002"
 GENESYS_REMOTE_URL = "https://genesys.webcreations.com.br"
 AGENT_MCP_API_URL = "http://127.0.0.1:8080"  # URL do orquestrador
 
+# Pool de conexões compartilhado por todas as chamadas do bridge
+BRIDGE_MAX_CONNECTIONS = int(os.getenv("GENESYS_BRIDGE_MAX_CONNECTIONS", "20"))
+BRIDGE_MAX_KEEPALIVE = int(os.getenv("GENESYS_BRIDGE_MAX_KEEPALIVE", "10"))
+
+# Hedging: se o local não responder dentro do orçamento, dispara o remoto também
+# e fica com a primeira resposta. Sem GENESYS_HEDGE_AFTER_SECONDS, o orçamento é
+# o p95 do tempo até o primeiro byte observado no local.
+GENESYS_HEDGE_ENABLED = os.getenv("GENESYS_HEDGE_ENABLED", "false").lower() == "true"
+GENESYS_HEDGE_AFTER_SECONDS = os.getenv("GENESYS_HEDGE_AFTER_SECONDS")
+HEDGE_DEFAULT_SECONDS = 30.0  # Até haver amostras suficientes para o p95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+class _BackendUnavailable(Exception):
+    """O backend não pode atender agora (conexão falhou ou modelo carregando)."""
+
+    def __init__(self, error: str, url: str, loading: bool = False):
+        super().__init__(error)
+        self.error = error
+        self.url = url
+        self.loading = loading
+
+    def to_result(self, fallback_attempted: bool) -> dict:
+        result = {"error": self.error, "fallback_attempted": fallback_attempted}
+        if self.loading:
+            result["status"] = "loading"
+        else:
+            result["attempted_url"] = self.url
+        return result
+
+
+def _is_answer(outcome: Any) -> bool:
+    return isinstance(outcome, dict) and "error" not in outcome
+
 
 class GenesysBridge:
     """Bridge entre Agent-MCP e Genesys"""
@@ -31,52 +80,168 @@ class GenesysBridge:
         self.use_remote_fallback = True
         self.active_agents = {}
         self.request_timeout = 60
+        self.hedge_enabled = GENESYS_HEDGE_ENABLED
+        self.hedge_after_seconds = (
+            float(GENESYS_HEDGE_AFTER_SECONDS) if GENESYS_HEDGE_AFTER_SECONDS else None
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._local_first_byte: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self.stats = {"requests": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP assíncrono compartilhado, criado no primeiro uso."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=BRIDGE_MAX_CONNECTIONS,
+                    max_keepalive_connections=BRIDGE_MAX_KEEPALIVE,
+                ),
+                timeout=self.request_timeout,
+                headers={"Content-Type": "application/json"},
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def hedge_delay(self) -> float:
+        """Orçamento para o primeiro byte do local antes de disparar o remoto."""
+        if self.hedge_after_seconds is not None:
+            return self.hedge_after_seconds
+        if len(self._local_first_byte) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_SECONDS
+        ordered = sorted(self._local_first_byte)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    async def _post(
+        self, base_url: str, endpoint: str, data: dict, first_byte: Optional[anyio.Event] = None
+    ) -> dict:
+        """Uma chamada a um backend. Levanta _BackendUnavailable quando vale tentar o outro."""
+        url = f"{base_url}{endpoint}"
+        is_local = base_url == self.local_url
+        started = time.monotonic()
+        try:
+            try:
+                async with self.client.stream("POST", url, json=data) as response:
+                    first_byte_seconds = time.monotonic() - started
+                    if first_byte is not None:
+                        first_byte.set()
+                    await response.aread()
+            except anyio.get_cancelled_exc_class():
+                if is_local and first_byte is not None and not first_byte.is_set():
+                    # Cancelado pelo hedge: o tempo real é no mínimo este
+                    self._local_first_byte.append(time.monotonic() - started)
+                raise
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            raise _BackendUnavailable("Conexão falhou", url)
+        except Exception as e:
+            return {"error": f"Erro inesperado: {str(e)}", "attempted_url": url}
+
+        if response.status_code == 200:
+            if is_local:
+                self._local_first_byte.append(first_byte_seconds)
+            return response.json()
+        elif response.status_code == 503:  # Modelo carregando
+            raise _BackendUnavailable("Modelo ainda carregando", url, loading=True)
+        return {
+            "error": f"Erro HTTP {response.status_code}",
+            "details": response.text[:200],
+        }
 
     async def call_genesys(
         self, endpoint: str, data: dict, use_local: bool = True
     ) -> dict:
         """Chama a API da Genesys (local ou remoto)"""
-        base_url = self.local_url if use_local else self.remote_url
-        url = f"{base_url}{endpoint}"
+        self.stats["requests"] += 1
+        if not use_local:
+            try:
+                return await self._post(self.remote_url, endpoint, data)
+            except _BackendUnavailable as e:
+                return e.to_result(fallback_attempted=False)
 
-        try:
-            response = requests.post(
-                url,
-                json=data,
-                timeout=self.request_timeout,
-                headers={"Content-Type": "application/json"},
-            )
+        if self.use_remote_fallback and self.hedge_enabled:
+            return await self._call_hedged(endpoint, data)
 
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 503:  # Modelo carregando
-                if use_local and self.use_remote_fallback:
-                    # Tentar fallback para remoto
-                    return await self.call_genesys(endpoint, data, use_local=False)
-                else:
-                    return {
-                        "error": "Modelo ainda carregando",
-                        "status": "loading",
-                        "fallback_attempted": use_local and self.use_remote_fallback,
-                    }
-            else:
-                return {
-                    "error": f"Erro HTTP {response.status_code}",
-                    "details": response.text[:200],
-                }
-
-        except requests.exceptions.ConnectionError:
-            if use_local and self.use_remote_fallback:
-                # Tentar fallback para remoto
-                return await self.call_genesys(endpoint, data, use_local=False)
+        try:
+            return await self._post(self.local_url, endpoint, data)
+        except _BackendUnavailable as e:
+            if not self.use_remote_fallback:
+                return e.to_result(fallback_attempted=False)
+        # Tentar fallback para remoto
+        self.stats["fallbacks"] += 1
+        try:
+            return await self._post(self.remote_url, endpoint, data)
+        except _BackendUnavailable as e:
+            return e.to_result(fallback_attempted=True)
+
+    async def _call_hedged(self, endpoint: str, data: dict) -> dict:
+        """
+        Chama o local e, se ele não der o primeiro byte dentro de hedge_delay()
+        (ou estiver indisponível), também o remoto. A primeira resposta válida
+        vence e a outra chamada é cancelada.
+        """
+        outcomes: Dict[str, Any] = {}
+        winner: Optional[str] = None
+        first_byte = anyio.Event()
+        local_done = anyio.Event()
+        hedged = False
+
+        async with anyio.create_task_group() as tg:
+
+            async def attempt(name: str, base_url: str) -> None:
+                nonlocal winner
+                try:
+                    outcomes[name] = await self._post(
+                        base_url, endpoint, data, first_byte if name == "local" else None
+                    )
+                except _BackendUnavailable as e:
+                    outcomes[name] = e
+                finally:
+                    if name == "local":
+                        first_byte.set()
+                        local_done.set()
+                if winner is None and _is_answer(outcomes[name]):
+                    winner = name
+                    tg.cancel_scope.cancel()
+
+            tg.start_soon(attempt, "local", self.local_url)
+            with anyio.move_on_after(self.hedge_delay()):
+                await first_byte.wait()
+            if not first_byte.is_set():
+                hedged = True
+                self.stats["hedges"] += 1
+                tg.start_soon(attempt, "remote", self.remote_url)
             else:
-                return {
-                    "error": "Conexão falhou",
-                    "attempted_url": url,
-                    "fallback_attempted": use_local and self.use_remote_fallback,
-                }
-        except Exception as e:
-            return {"error": f"Erro inesperado: {str(e)}", "attempted_url": url}
+                await local_done.wait()
+                if isinstance(outcomes["local"], _BackendUnavailable):
+                    self.stats["fallbacks"] += 1
+                    tg.start_soon(attempt, "remote", self.remote_url)
+
+        if winner is not None:
+            if winner == "remote" and hedged:
+                self.stats["hedge_wins"] += 1
+            return outcomes[winner]
+
+        local = outcomes.get("local")
+        remote = outcomes.get("remote")
+        if remote is not None and (local is None or isinstance(local, _BackendUnavailable)):
+            outcome = remote
+        else:
+            outcome = local
+        if isinstance(outcome, _BackendUnavailable):
+            return outcome.to_result(fallback_attempted=remote is not None)
+        return outcome
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_after_seconds": round(self.hedge_delay(), 2),
+            "local_first_byte_samples": len(self._local_first_byte),
+        }
 
 
 # Instância global do bridge
@@ -150,13 +315,20 @@ async def genesys_status() -> str:
         Status detalhado da Genesys
     """
     try:
-        response = requests.get(f"{bridge.local_url}/status", timeout=10)
+        response = await bridge.client.get(f"{bridge.local_url}/status", timeout=10)
         if response.status_code == 200:
             data = response.json()
 
             status = data.get("status", "unknown")
             agent_info = data.get("agent_info", {})
             uptime = data.get("server_uptime", 0)
+            stats = bridge.get_stats()
+            hedge_line = (
+                f"hedge após {stats['hedge_after_seconds']}s "
+                f"({stats['hedges']} disparados, {stats['hedge_wins']} vencidos pelo remoto)"
+                if stats["hedge_enabled"]
+                else "hedge desativado"
+            ) + f" | {stats['requests']} chamadas, {stats['fallbacks']} fallbacks"
 
             status_report = f"""🤖 **STATUS DA GENESYS MASTER**
 
@@ -170,6 +342,8 @@ async def genesys_status() -> str:
 **URLs:**
 - Local: {bridge.local_url}
 - Remoto: {bridge.remote_url}
+
+**Bridge:** {hedge_line}
 """
             return status_report
         else:
@@ -188,9 +362,18 @@ async def genesys_reload_model() -> str:
         Status do recarregamento
     """
     try:
-        response = requests.post(f"{bridge.local_url}/reload-model", timeout=5)
+        # O endpoint exige o token de admin
+        response = await bridge.client.post(
+            f"{bridge.local_url}/reload-model",
+            headers={"Authorization": f"Bearer {os.getenv('MCP_ADMIN_TOKEN', '')}"},
+            timeout=5,
+        )
         if response.status_code == 200:
-            return "✅ Recarregamento do modelo Genesys iniciado"
+            return "✅ Recarregamento do modelo Genesys iniciado (o modelo atual segue atendendo até a troca)"
+        elif response.status_code == 401:
+            return "❌ Recarregamento negado: MCP_ADMIN_TOKEN ausente ou inválido"
+        elif response.status_code == 409:
+            return "⏳ Já existe uma troca de modelo em andamento"
         else:
             return f"❌ Erro no recarregamento: HTTP {response.status_code}"
     except Exception as e:
@@ -225,9 +408,7 @@ async def create_genesys_agent(
     }
 
     try:
-        response = requests.post(
-            mcp_endpoint, json=payload, timeout=bridge.request_timeout
-        )
+        response = await bridge.client.post(mcp_endpoint, json=payload)
         response_data = response.json()
 
         if response.status_code not in [200, 201]:
@@ -5,10 +5,14 @@ Executa em segundo plano fornecendo API para o agente
 """
 
 import asyncio
+import hmac
 import time
 import threading
 import uvicorn
-from typing import Dict, Any, Optional
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anyio
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
@@ -21,6 +25,69 @@ import uuid
 from fastapi import HTTPException
 
 from .genesys_agent import GenesysAgent
+from .inference_scheduler import InferenceQueueFullError
+from .chat_format import ContextWindowExceededError
+
+
+def _queue_full_response(error: InferenceQueueFullError) -> JSONResponse:
+    """Resposta 429 quando a fila do modelo local está cheia."""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(error.retry_after)},
+        content={
+            "error": str(error),
+            "status": "queue_full",
+            "queue_depth": error.queue_depth,
+        },
+    )
+
+
+# Intervalo de verificação de cliente desconectado durante uma geração
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    """O cliente fechou a conexão antes da resposta."""
+
+
+async def _run_until_disconnected(
+    http_request: Request, call: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Executa call() e a cancela se o cliente desconectar (por exemplo, o hedge
+    do bridge ficou com a resposta do remoto). O cancelamento para a geração
+    local no próximo token e libera o slot do modelo para a fila.
+    Levanta ClientDisconnected nesse caso; exceções de call() passam intactas.
+    """
+    outcome: Dict[str, Any] = {}
+
+    async with anyio.create_task_group() as tg:
+
+        async def _run() -> None:
+            try:
+                outcome["result"] = await call()
+            except Exception as e:
+                outcome["error"] = e
+            tg.cancel_scope.cancel()
+
+        async def _watch() -> None:
+            while not await http_request.is_disconnected():
+                await anyio.sleep(DISCONNECT_POLL_SECONDS)
+            tg.cancel_scope.cancel()
+
+        tg.start_soon(_run)
+        tg.start_soon(_watch)
+
+    if "error" in outcome:
+        raise outcome["error"]
+    if "result" not in outcome:
+        raise ClientDisconnected()
+    return outcome["result"]
+
+
+def _client_closed_response() -> JSONResponse:
+    """Ninguém lê esta resposta; 499 só deixa o motivo claro nos logs."""
+    return JSONResponse(status_code=499, content={"error": "Cliente desconectou"})
 
 
 # Modelos de dados
@@ -28,6 +95,8 @@ class ChatRequest(BaseModel):
     prompt: str
     context: Optional[Dict] = None
     use_tools: bool = True
+    temperature: Optional[float] = None
+    cache: Optional[bool] = None  # False ignora o cache de respostas
 
 
 class MultimodalRequest(BaseModel):
@@ -188,8 +257,14 @@ async def get_agent_status():
     )
 
 
+@app.get("/router-report")
+async def get_router_report(recent: int = 20):
+    """Acurácia das previsões do roteamento local/Gemini e decisões recentes"""
+    return genesys_agent_instance.router.get_report(recent=recent)
+
+
 @app.post("/chat")
-async def chat_with_genesys(request: ChatRequest):
+async def chat_with_genesys(request: ChatRequest, http_request: Request):
     """Endpoint principal para chat com Genesys"""
     server_state["requests_processed"] += 1
 
@@ -207,8 +282,16 @@ async def chat_with_genesys(request: ChatRequest):
     try:
         start_time = time.time()
 
-        response = await genesys_agent_instance.process_task(
-            task=request.prompt, context=request.context, use_tools=request.use_tools
+        response = await _run_until_disconnected(
+            http_request,
+            partial(
+                genesys_agent_instance.process_task,
+                task=request.prompt,
+                context=request.context,
+                use_tools=request.use_tools,
+                temperature=request.temperature,
+                cache=request.cache,
+            ),
         )
 
         processing_time = time.time() - start_time
@@ -221,6 +304,10 @@ async def chat_with_genesys(request: ChatRequest):
             "context_provided": bool(request.context),
         }
 
+    except InferenceQueueFullError as e:
+        return _queue_full_response(e)
+    except ClientDisconnected:
+        return _client_closed_response()
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -257,6 +344,8 @@ async def process_multimodal(request: MultimodalRequest):
             "multimodal": bool(request.image_data),
         }
 
+    except InferenceQueueFullError as e:
+        return _queue_full_response(e)
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -266,7 +355,12 @@ async def process_multimodal(request: MultimodalRequest):
 
 @app.post("/v1/chat/completions")
 async def chat_completions(request: Request):
-    """Endpoint compatível com OpenAI para chat."""
+    """Endpoint compatível com OpenAI para chat (conversa completa, uso em tokens reais)."""
+    if not server_state["model_loaded"]:
+        return JSONResponse(
+            status_code=503, content={"error": "Modelo ainda carregando"}
+        )
+
     try:
         body = await request.json()
         model = body.get("model", "genesys-model")
@@ -278,9 +372,20 @@ async def chat_completions(request: Request):
                 content={"error": "A lista de mensagens não pode estar vazia."},
             )
 
-        # Simula o processamento e obtém uma resposta do agente Genesys
-        last_message = messages[-1]["content"]
-        response = await genesys_agent_instance.get_response_async(last_message)
+        stop = body.get("stop")
+        completion = await _run_until_disconnected(
+            request,
+            partial(
+                genesys_agent_instance.complete_chat,
+                messages,
+                max_tokens=body.get("max_completion_tokens") or body.get("max_tokens"),
+                temperature=body.get("temperature"),
+                stop=[stop] if isinstance(stop, str) else stop,
+                client_id=body.get("user")
+                or (request.client.host if request.client else "anonymous"),
+                cache=body.get("cache"),
+            ),
+        )
 
         # Formata a resposta no padrão OpenAI
         return {
@@ -291,16 +396,27 @@ async def chat_completions(request: Request):
             "choices": [
                 {
                     "index": 0,
-                    "message": {"role": "assistant", "content": response},
-                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": completion["content"]},
+                    "finish_reason": completion["finish_reason"],
                 }
             ],
-            "usage": {
-                "prompt_tokens": len(last_message.split()),
-                "completion_tokens": len(response.split()),
-                "total_tokens": len(last_message.split()) + len(response.split()),
-            },
+            "usage": completion["usage"],
         }
+    except InferenceQueueFullError as e:
+        return _queue_full_response(e)
+    except ClientDisconnected:
+        return _client_closed_response()
+    except ContextWindowExceededError as e:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "error": {
+                    "message": str(e),
+                    "type": "invalid_request_error",
+                    "code": "context_length_exceeded",
+                }
+            },
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -313,26 +429,101 @@ async def chat_completions(request: Request):
         )
 
 
+def _is_admin_request(request: Request) -> bool:
+    """Confere o Bearer token com MCP_ADMIN_TOKEN; sem token configurado, nega."""
+    admin_token = os.getenv("MCP_ADMIN_TOKEN")
+    if not admin_token:
+        return False
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    return hmac.compare_digest(token.encode(), admin_token.encode())
+
+
+def _resolve_model_path(model_path: str, current_model_path: str) -> Optional[str]:
+    """
+    Caminho real de um GGUF dentro do diretório de modelos
+    (GENESYS_MODELS_DIR, ou o diretório do modelo atual). Aceita o nome do
+    arquivo ou um caminho; qualquer coisa fora do diretório devolve None.
+    """
+    models_dir = os.path.realpath(
+        os.getenv("GENESYS_MODELS_DIR") or os.path.dirname(current_model_path) or "."
+    )
+    candidate = os.path.realpath(os.path.join(models_dir, model_path))
+    if os.path.dirname(candidate) != models_dir:
+        return None
+    if not candidate.lower().endswith(".gguf"):
+        return None
+    return candidate
+
+
 @app.post("/reload-model")
-async def reload_model(background_tasks: BackgroundTasks):
-    """Recarrega o modelo Genesys"""
+async def reload_model(
+    request: Request, background_tasks: BackgroundTasks, model_path: Optional[str] = None
+):
+    """
+    Recarrega o modelo Genesys sem indisponibilidade: o novo modelo (o mesmo
+    arquivo ou model_path) é carregado ao lado do atual, que continua atendendo
+    até a troca. A duração da troca aparece em /status (model_manager.last_swap).
+    Exige o token de admin (Authorization: Bearer <MCP_ADMIN_TOKEN>); model_path
+    só pode apontar para um .gguf do diretório de modelos.
+    """
     global genesys_agent_instance
+    if not _is_admin_request(request):
+        return JSONResponse(
+            status_code=401,
+            content={"error": "Token de admin ausente ou inválido."},
+        )
     if genesys_agent_instance:
-        background_tasks.add_task(genesys_agent_instance.reload_model)
-        return {"message": "O recarregamento do modelo foi iniciado em segundo plano."}
+        if genesys_agent_instance.models.swapping:
+            return JSONResponse(
+                status_code=409,
+                content={"error": "Já existe uma troca de modelo em andamento."},
+            )
+        if model_path:
+            resolved_path = _resolve_model_path(
+                model_path, genesys_agent_instance.model_path
+            )
+            if resolved_path is None:
+                return JSONResponse(
+                    status_code=400,
+                    content={
+                        "error": "model_path deve ser um arquivo .gguf do diretório de modelos."
+                    },
+                )
+            if not os.path.isfile(resolved_path):
+                return JSONResponse(
+                    status_code=404,
+                    content={"error": f"Arquivo do modelo não encontrado: {model_path}"},
+                )
+            model_path = resolved_path
+        background_tasks.add_task(genesys_agent_instance.reload_model, model_path)
+        return {
+            "message": "O recarregamento do modelo foi iniciado em segundo plano; "
+            "o modelo atual continua atendendo até a troca."
+        }
     return {"error": "O agente Genesys não foi inicializado."}
 
 
 @app.post("/process-task")
 async def process_task(
-    task_request: ChatRequest,
+    task_request: ChatRequest, http_request: Request
 ):  # Changed from TaskRequest to ChatRequest
     """Processa uma tarefa usando o agente Genesys."""
     if not genesys_agent_instance:
         raise HTTPException(status_code=503, detail="O agente Genesys não está pronto.")
-    response = await genesys_agent_instance.process_task(
-        task_request.prompt
-    )  # Changed from task_request.task to task_request.prompt
+    try:
+        response = await _run_until_disconnected(
+            http_request,
+            partial(
+                genesys_agent_instance.process_task,
+                task_request.prompt,
+                temperature=task_request.temperature,
+                cache=task_request.cache,
+            ),
+        )  # Changed from task_request.task to task_request.prompt
+    except InferenceQueueFullError as e:
+        return _queue_full_response(e)
+    except ClientDisconnected:
+        return _client_closed_response()
     return {"response": response}
 
 
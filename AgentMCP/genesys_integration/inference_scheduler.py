@@ -0,0 +1,332 @@
+# genesys_integration/inference_scheduler.py
+"""
+Escalonador de inferência para o modelo local da Genesys.
+
+O modelo LlamaCpp tem um único contexto e não pode atender duas gerações ao
+mesmo tempo. Este módulo coloca uma fila na frente dele:
+
+- fila limitada (GENESYS_MAX_QUEUE_DEPTH); acima disso a requisição é rejeitada
+  com InferenceQueueFullError, que as rotas HTTP convertem em 429;
+- prioridades (PRIORITY_HIGH < PRIORITY_NORMAL < PRIORITY_LOW) e, dentro de
+  cada prioridade, round-robin entre clientes para que um cliente com muitas
+  requisições não monopolize o modelo;
+- métricas de espera na fila, tempo até o primeiro token (TTFT) e latência total.
+
+Quando o backend expõe geração em lote (batch_runner e GENESYS_MAX_BATCH_SIZE > 1),
+requisições não-streaming que estão esperando são agrupadas com a que acabou de
+ganhar o slot e executadas numa única chamada ao backend.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+import anyio
+import anyio.to_thread
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {"high": PRIORITY_HIGH, "normal": PRIORITY_NORMAL, "low": PRIORITY_LOW}
+
+GENESYS_MAX_CONCURRENCY = int(os.getenv("GENESYS_MAX_CONCURRENCY", "1"))
+GENESYS_MAX_QUEUE_DEPTH = int(os.getenv("GENESYS_MAX_QUEUE_DEPTH", "32"))
+GENESYS_MAX_BATCH_SIZE = int(os.getenv("GENESYS_MAX_BATCH_SIZE", "1"))
+# Quantas amostras recentes entram nos percentis das métricas
+METRICS_WINDOW = 512
+
+
+def parse_priority(value: Any) -> int:
+    """Converte "high"/"normal"/"low" ou um inteiro 0-2 na prioridade da fila."""
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in PRIORITY_NAMES:
+            return PRIORITY_NAMES[value]
+    try:
+        return min(max(int(value), PRIORITY_HIGH), PRIORITY_LOW)
+    except (TypeError, ValueError):
+        return PRIORITY_NORMAL
+
+
+class InferenceQueueFullError(Exception):
+    """A fila do modelo local atingiu GENESYS_MAX_QUEUE_DEPTH."""
+
+    def __init__(self, queue_depth: int, retry_after: int):
+        super().__init__(
+            f"Fila de inferência cheia ({queue_depth} requisições aguardando)"
+        )
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+class InferenceTicket:
+    """Uma requisição na fila. Vive do enfileiramento até a liberação do slot."""
+
+    def __init__(self, client_id: str, priority: int, prompt: Optional[str] = None):
+        self.client_id = client_id
+        self.priority = priority
+        self.prompt = prompt  # Só requisições com prompt podem entrar em lote
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.ready = anyio.Event()
+        # Preenchidos quando a requisição foi executada no lote de outra
+        self.batched = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def mark_first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": pick(1.0)}
+
+
+class InferenceScheduler:
+    """Fila justa e limitada na frente de um backend de inferência."""
+
+    def __init__(
+        self,
+        max_concurrency: int = GENESYS_MAX_CONCURRENCY,
+        max_queue_depth: int = GENESYS_MAX_QUEUE_DEPTH,
+        max_batch_size: int = GENESYS_MAX_BATCH_SIZE,
+        batch_runner: Optional[Callable[[List[str]], List[str]]] = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max(0, max_queue_depth)
+        self.max_batch_size = max(1, max_batch_size) if batch_runner else 1
+        self.batch_runner = batch_runner
+
+        # prioridade -> (cliente -> fila de tickets); a ordem do OrderedDict é o round-robin
+        self._pending: Dict[int, "OrderedDict[str, Deque[InferenceTicket]]"] = {}
+        self._queued = 0
+        self._active = 0
+
+        self._queue_wait: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._ttft: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._latency: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_requests = 0
+
+    # --- Fila ---
+
+    def check_capacity(self) -> None:
+        """Rejeita antecipadamente quando a fila está cheia (usado antes de abrir um stream)."""
+        if self._active >= self.max_concurrency and self._queued >= self.max_queue_depth:
+            self.rejected += 1
+            raise InferenceQueueFullError(self._queued, self._retry_after())
+
+    def _retry_after(self) -> int:
+        typical = _percentiles(self._latency)["p50_ms"] / 1000 or 5.0
+        waves = (self._queued // self.max_concurrency) + 1
+        return max(1, int(typical * waves))
+
+    def _enqueue(self, ticket: InferenceTicket) -> None:
+        self.check_capacity()
+        clients = self._pending.setdefault(ticket.priority, OrderedDict())
+        clients.setdefault(ticket.client_id, deque()).append(ticket)
+        self._queued += 1
+
+    def _remove(self, ticket: InferenceTicket) -> bool:
+        clients = self._pending.get(ticket.priority)
+        queue = clients.get(ticket.client_id) if clients else None
+        if not queue or ticket not in queue:
+            return False
+        queue.remove(ticket)
+        if not queue:
+            del clients[ticket.client_id]
+        self._queued -= 1
+        return True
+
+    def _iter_fair(self):
+        """Tickets pendentes na ordem em que seriam atendidos."""
+        for priority in sorted(self._pending):
+            clients = self._pending[priority]
+            queues = [list(q) for q in clients.values()]
+            depth = max((len(q) for q in queues), default=0)
+            for position in range(depth):
+                for queue in queues:
+                    if position < len(queue):
+                        yield queue[position]
+
+    def _pop_next(self) -> Optional[InferenceTicket]:
+        for priority in sorted(self._pending):
+            clients = self._pending[priority]
+            if not clients:
+                continue
+            client_id, queue = next(iter(clients.items()))
+            ticket = queue.popleft()
+            # O cliente atendido vai para o fim da rodada
+            del clients[client_id]
+            if queue:
+                clients[client_id] = queue
+            self._queued -= 1
+            return ticket
+        return None
+
+    def _dispatch(self) -> None:
+        while self._active < self.max_concurrency:
+            ticket = self._pop_next()
+            if ticket is None:
+                return
+            self._active += 1
+            ticket.started_at = time.monotonic()
+            self._queue_wait.append(ticket.started_at - ticket.enqueued_at)
+            ticket.ready.set()
+
+    def _release(self, ticket: InferenceTicket, failed: bool = False) -> None:
+        self._active -= 1
+        self._record_done(ticket, failed)
+        self._dispatch()
+
+    def _record_done(self, ticket: InferenceTicket, failed: bool) -> None:
+        now = time.monotonic()
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+            if ticket.first_token_at is None:
+                # Sem streaming o primeiro token só é visível com a resposta completa
+                ticket.first_token_at = now
+            self._ttft.append(ticket.first_token_at - ticket.enqueued_at)
+        self._latency.append(now - ticket.enqueued_at)
+
+    async def _wait_turn(self, ticket: InferenceTicket) -> None:
+        self._enqueue(ticket)
+        self._dispatch()
+        try:
+            await ticket.ready.wait()
+        except BaseException:
+            # Cancelado enquanto esperava: sai da fila ou devolve o slot recebido
+            if not self._remove(ticket) and not ticket.batched:
+                self._active -= 1
+                self._dispatch()
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self, client_id: str = "anonymous", priority: int = PRIORITY_NORMAL
+    ) -> AsyncIterator[InferenceTicket]:
+        """
+        Espera a vez do cliente e mantém o modelo reservado dentro do bloco.
+        Usado pelo streaming, que chama ticket.mark_first_token() no primeiro token.
+        """
+        ticket = InferenceTicket(client_id, priority)
+        await self._wait_turn(ticket)
+        failed = True
+        try:
+            yield ticket
+            failed = False
+        finally:
+            self._release(ticket, failed)
+
+    async def generate(
+        self,
+        prompt: str,
+        runner: Callable[[str], str],
+        client_id: str = "anonymous",
+        priority: int = PRIORITY_NORMAL,
+        batchable: bool = True,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> str:
+        """
+        Executa runner(prompt) numa thread quando chegar a vez do cliente.
+        batchable=False para runners com parâmetros próprios (stop, max_tokens),
+        que o batch_runner não conhece. Se timings for passado, recebe
+        "queue_seconds" (espera até o início da execução).
+        """
+        ticket = InferenceTicket(client_id, priority, prompt if batchable else None)
+        await self._wait_turn(ticket)
+        if timings is not None:
+            timings["queue_seconds"] = ticket.started_at - ticket.enqueued_at
+        if ticket.batched:
+            # Outra requisição já executou este prompt no lote dela
+            if ticket.error is not None:
+                raise ticket.error
+            return ticket.result
+
+        riders = self._take_batch_riders()
+        if not riders:
+            failed = True
+            try:
+                result = await anyio.to_thread.run_sync(runner, prompt)
+                failed = False
+                return result
+            finally:
+                self._release(ticket, failed)
+
+        prompts = [prompt] + [rider.prompt for rider in riders]
+        self.batches += 1
+        self.batched_requests += len(prompts)
+        try:
+            results = await anyio.to_thread.run_sync(self.batch_runner, prompts)
+        except BaseException as e:
+            for rider in riders:
+                rider.error = e
+                self._record_done(rider, failed=True)
+                rider.ready.set()
+            self._release(ticket, failed=True)
+            raise
+        for rider, result in zip(riders, results[1:]):
+            rider.result = result
+            self._record_done(rider, failed=False)
+            rider.ready.set()
+        self._release(ticket)
+        return results[0]
+
+    def _take_batch_riders(self) -> List[InferenceTicket]:
+        """Retira da fila, na ordem justa, requisições que podem entrar no lote atual."""
+        if self.max_batch_size <= 1:
+            return []
+        riders = []
+        for ticket in list(self._iter_fair()):
+            if len(riders) >= self.max_batch_size - 1:
+                break
+            if ticket.prompt is None:
+                continue
+            self._remove(ticket)
+            ticket.batched = True
+            ticket.started_at = time.monotonic()
+            self._queue_wait.append(ticket.started_at - ticket.enqueued_at)
+            riders.append(ticket)
+        return riders
+
+    # --- Métricas ---
+
+    def get_stats(self) -> Dict[str, Any]:
+        queued_by_client: Dict[str, int] = {}
+        for clients in self._pending.values():
+            for client_id, queue in clients.items():
+                queued_by_client[client_id] = queued_by_client.get(client_id, 0) + len(
+                    queue
+                )
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "active": self._active,
+            "queued": self._queued,
+            "queued_by_client": queued_by_client,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "queue_wait": _percentiles(self._queue_wait),
+            "time_to_first_token": _percentiles(self._ttft),
+            "latency": _percentiles(self._latency),
+        }
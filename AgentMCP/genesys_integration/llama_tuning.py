@@ -0,0 +1,146 @@
+# genesys_integration/llama_tuning.py
+"""
+Escolha dos parâmetros de carga do LlamaCpp a partir do hardware.
+
+Com GENESYS_TUNING=auto (padrão) detectamos núcleos físicos, nós NUMA, RAM
+livre, limite de mlock e tamanho do GGUF, e derivamos threads, n_batch e
+mmap/mlock. Qualquer parâmetro pode ser fixado por deployment com as variáveis
+GENESYS_N_* / GENESYS_USE_* abaixo; com GENESYS_TUNING=manual só os valores
+informados são aplicados e o resto fica no padrão do llama.cpp.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import psutil
+
+GENESYS_TUNING = os.getenv("GENESYS_TUNING", "auto").strip().lower()
+
+# Variável de ambiente -> (parâmetro do LlamaCpp, tipo)
+TUNING_OVERRIDES = {
+    "GENESYS_N_THREADS": ("n_threads", int),
+    "GENESYS_N_THREADS_BATCH": ("n_threads_batch", int),
+    "GENESYS_N_BATCH": ("n_batch", int),
+    "GENESYS_N_CTX": ("n_ctx", int),
+    "GENESYS_N_GPU_LAYERS": ("n_gpu_layers", int),
+    "GENESYS_USE_MMAP": ("use_mmap", bool),
+    "GENESYS_USE_MLOCK": ("use_mlock", bool),
+    "GENESYS_NUMA": ("numa", bool),
+    "GENESYS_LLAMA_VERBOSE": ("verbose", bool),
+}
+
+DEFAULT_N_CTX = 4096
+# A VRAM disponível não é detectada; o offload parcial usado até aqui continua
+# como padrão com GPU e GENESYS_N_GPU_LAYERS ajusta por deployment
+DEFAULT_GPU_LAYERS = 5
+# Margem de RAM deixada para o KV-cache, o servidor e o sistema operacional
+RAM_HEADROOM_BYTES = 2 << 30
+
+
+def _parse_bool(value: str) -> bool:
+    normalized = value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(value)
+
+
+def _numa_nodes() -> int:
+    nodes_dir = Path("/sys/devices/system/node")
+    try:
+        return max(1, len(list(nodes_dir.glob("node[0-9]*"))))
+    except OSError:
+        return 1
+
+
+def _mlock_limit() -> Optional[int]:
+    """Limite de memória travável em bytes; None quando ilimitado ou desconhecido."""
+    try:
+        import resource
+
+        soft, _ = resource.getrlimit(resource.RLIMIT_MEMLOCK)
+        return None if soft == resource.RLIM_INFINITY else soft
+    except (ImportError, AttributeError, ValueError, OSError):
+        return None
+
+
+def _gpu_offload_supported() -> bool:
+    try:
+        import llama_cpp
+
+        return bool(llama_cpp.llama_supports_gpu_offload())
+    except Exception:
+        return False
+
+
+def detect_hardware(model_path: str) -> Dict[str, Any]:
+    """Fotografia do hardware relevante para a carga do modelo."""
+    try:
+        model_size = os.path.getsize(model_path)
+    except OSError:
+        model_size = 0
+    logical = psutil.cpu_count(logical=True) or 1
+    return {
+        "physical_cores": psutil.cpu_count(logical=False) or logical,
+        "logical_cores": logical,
+        "numa_nodes": _numa_nodes(),
+        "available_ram_bytes": psutil.virtual_memory().available,
+        "mlock_limit_bytes": _mlock_limit(),
+        "model_size_bytes": model_size,
+        "gpu_offload_supported": _gpu_offload_supported(),
+    }
+
+
+def _auto_params(hardware: Dict[str, Any], use_gpu: bool) -> Dict[str, Any]:
+    physical = hardware["physical_cores"]
+    model_size = hardware["model_size_bytes"]
+    available = hardware["available_ram_bytes"]
+    fits_in_ram = model_size + RAM_HEADROOM_BYTES <= available
+    mlock_limit = hardware["mlock_limit_bytes"]
+    gpu = use_gpu and hardware["gpu_offload_supported"]
+
+    return {
+        # A geração é limitada por banda de memória: threads além dos núcleos
+        # físicos disputam a mesma banda; o prompt (compute-bound) usa todos os lógicos
+        "n_threads": physical,
+        "n_threads_batch": hardware["logical_cores"],
+        "n_batch": 512 if fits_in_ram else 128,
+        "n_ctx": DEFAULT_N_CTX,
+        # mmap evita copiar o GGUF inteiro para a heap; o page cache é compartilhado
+        "use_mmap": True,
+        # Travar as páginas só quando o modelo cabe com folga e o limite permite
+        "use_mlock": fits_in_ram
+        and (mlock_limit is None or mlock_limit >= model_size),
+        "numa": hardware["numa_nodes"] > 1,
+        "n_gpu_layers": DEFAULT_GPU_LAYERS if gpu else 0,
+        "verbose": False,
+    }
+
+
+def resolve_load_params(model_path: str, use_gpu: bool = True) -> Dict[str, Any]:
+    """
+    Retorna o perfil de carga: {"mode", "hardware", "params", "overrides"}.
+    "params" contém apenas parâmetros aceitos pelo construtor Llama.
+    """
+    hardware = detect_hardware(model_path)
+    params = _auto_params(hardware, use_gpu) if GENESYS_TUNING == "auto" else {}
+
+    overrides = {}
+    for env_name, (param, kind) in TUNING_OVERRIDES.items():
+        raw = os.getenv(env_name)
+        if raw is None or raw.strip() == "":
+            continue
+        try:
+            overrides[param] = _parse_bool(raw) if kind is bool else kind(raw)
+        except ValueError:
+            print(f"⚠️ Valor inválido em {env_name}={raw!r}; ignorando.")
+    params.update(overrides)
+
+    return {
+        "mode": GENESYS_TUNING,
+        "hardware": hardware,
+        "params": params,
+        "overrides": sorted(overrides),
+    }
@@ -0,0 +1,194 @@
+# genesys_integration/model_manager.py
+"""
+Troca a quente do modelo local da Genesys.
+
+Recarregar um GGUF de 70B leva minutos; destruir o modelo atual antes de
+carregar o novo deixaria o agente indisponível nesse intervalo. O ModelManager
+carrega a nova instância ao lado da que está servindo, aquece-a com um prompt
+curto e só então troca a referência (uma única atribuição, sem pausa para as
+requisições). A instância antiga continua atendendo quem já a estava usando e
+é liberada quando a última requisição em andamento termina.
+
+Cada requisição local segura a instância com `async with manager.lease()`;
+é esse contador que permite drenar a instância antiga.
+"""
+
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import anyio
+import anyio.to_thread
+
+# Quanto a troca espera a instância antiga drenar antes de deixar a liberação
+# para a última requisição em andamento
+GENESYS_DRAIN_TIMEOUT_SECONDS = float(os.getenv("GENESYS_DRAIN_TIMEOUT_SECONDS", "300"))
+
+
+class ModelSwapInProgressError(RuntimeError):
+    """Já existe um carregamento/troca de modelo em andamento."""
+
+
+class ModelInstance:
+    """Um modelo carregado e os objetos que dependem dele."""
+
+    def __init__(
+        self,
+        llama_cpp: Any,
+        model_path: str,
+        load_profile: Optional[Dict[str, Any]] = None,
+        chat_renderer: Any = None,
+        prompt_cache: Any = None,
+        draft_model: Any = None,
+        model_hash: Optional[str] = None,
+    ):
+        self.llama_cpp = llama_cpp
+        self.model_path = model_path
+        self.load_profile = load_profile
+        self.chat_renderer = chat_renderer
+        self.prompt_cache = prompt_cache
+        self.draft_model = draft_model
+        self.model_hash = model_hash
+        self.generation = 0  # Definido pelo ModelManager ao instalar
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self.retired = False
+        self.closed = False
+        self._drained: Optional[anyio.Event] = None
+
+    def close(self) -> None:
+        """Libera os pesos e o contexto (do modelo e do rascunho)."""
+        if self.closed:
+            return
+        self.closed = True
+        for llama in (
+            getattr(self.llama_cpp, "client", None),
+            getattr(self.draft_model, "llama", None),
+        ):
+            if llama is not None and hasattr(llama, "close"):
+                llama.close()
+        self.llama_cpp = None
+        self.chat_renderer = None
+        self.prompt_cache = None
+        self.draft_model = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "model_path": self.model_path,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+        }
+
+
+class ModelManager:
+    """Mantém a instância que está servindo e faz a troca sem indisponibilidade."""
+
+    def __init__(self, drain_timeout: float = GENESYS_DRAIN_TIMEOUT_SECONDS):
+        self.drain_timeout = drain_timeout
+        self.current: Optional[ModelInstance] = None
+        self.retiring: List[ModelInstance] = []
+        # Flag simples em vez de um Lock: a carga inicial roda no event loop de
+        # uma thread própria (server_lifecycle) e as trocas no loop do servidor
+        self.swapping = False
+        self.swaps = 0
+        self.last_swap: Optional[Dict[str, Any]] = None
+        self._generations = 0
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[ModelInstance]:
+        """Reserva a instância atual até o fim do bloco (uma trocada não é liberada antes disso)."""
+        instance = self.current
+        if instance is None:
+            raise RuntimeError("Nenhum modelo carregado")
+        instance.in_flight += 1
+        try:
+            yield instance
+        finally:
+            instance.in_flight -= 1
+            if instance.retired and instance.in_flight == 0:
+                if instance._drained is not None:
+                    instance._drained.set()  # A troca está esperando e libera
+                else:
+                    self._free(instance)
+
+    def _free(self, instance: ModelInstance) -> None:
+        instance.close()
+        if instance in self.retiring:
+            self.retiring.remove(instance)
+
+    async def wait_for_swap(self, poll_interval: float = 0.5) -> None:
+        while self.swapping:
+            await anyio.sleep(poll_interval)
+
+    async def swap(
+        self,
+        build: Callable[[], ModelInstance],
+        warm_up: Optional[Callable[[ModelInstance], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Carrega (build) e aquece (warm_up) a nova instância em threads de trabalho,
+        instala-a como atual e drena a anterior. Retorna as durações de cada fase.
+        Levanta ModelSwapInProgressError se outra troca estiver em andamento; se
+        build ou warm_up falharem, a instância atual continua servindo.
+        """
+        if self.swapping:
+            raise ModelSwapInProgressError("Já existe uma troca de modelo em andamento")
+        self.swapping = True
+        started = time.monotonic()
+        try:
+            instance = await anyio.to_thread.run_sync(build)
+            loaded = time.monotonic()
+            if warm_up is not None:
+                try:
+                    await anyio.to_thread.run_sync(warm_up, instance)
+                except BaseException:
+                    instance.close()
+                    raise
+            warmed = time.monotonic()
+
+            self._generations += 1
+            instance.generation = self._generations
+            previous, self.current = self.current, instance
+            swapped = time.monotonic()
+
+            drained = True
+            if previous is not None:
+                previous.retired = True
+                self.retiring.append(previous)
+                if previous.in_flight:
+                    previous._drained = anyio.Event()
+                    with anyio.move_on_after(self.drain_timeout):
+                        await previous._drained.wait()
+                    drained = previous.in_flight == 0
+                    # Sem drenar a tempo, a última requisição em andamento libera
+                    previous._drained = None
+                if drained:
+                    self._free(previous)
+            finished = time.monotonic()
+        finally:
+            self.swapping = False
+
+        self.swaps += 1
+        self.last_swap = {
+            "generation": instance.generation,
+            "model_path": instance.model_path,
+            "previous_model_path": previous.model_path if previous else None,
+            "load_seconds": round(loaded - started, 2),
+            "warmup_seconds": round(warmed - loaded, 2),
+            "drain_seconds": round(finished - swapped, 2),
+            "total_seconds": round(finished - started, 2),
+            "drained": drained,
+            "finished_at": time.time(),
+        }
+        return self.last_swap
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "current": self.current.describe() if self.current else None,
+            "retiring": [instance.describe() for instance in self.retiring],
+            "swapping": self.swapping,
+            "swaps": self.swaps,
+            "last_swap": self.last_swap,
+        }
@@ -0,0 +1,117 @@
+# genesys_integration/prompt_cache.py
+"""
+Reaproveitamento do KV-cache para prefixos de prompt repetidos.
+
+Todo prompt da Genesys começa com o mesmo preâmbulo e, numa sessão, com o mesmo
+contexto. O llama-cpp-python aceita um cache de estados salvos indexado por
+tokens: antes de gerar, ele carrega o estado com o maior prefixo em comum com o
+novo prompt e só avalia o sufixo. Aqui usamos um LlamaRAMCache (LRU limitado
+em bytes) com contadores de acerto, e pré-avaliamos o preâmbulo fixo na carga
+do modelo para que a primeira requisição já o encontre pronto.
+"""
+
+import os
+import time
+from typing import Any, Dict, Optional, Sequence
+
+GENESYS_PROMPT_CACHE_BYTES = int(
+    os.getenv("GENESYS_PROMPT_CACHE_BYTES", str(1 << 30))
+)
+
+try:
+    from llama_cpp import LlamaRAMCache
+
+    PROMPT_CACHE_AVAILABLE = True
+except ImportError:
+    LlamaRAMCache = object
+    PROMPT_CACHE_AVAILABLE = False
+
+
+def state_size_bytes(state: Any) -> int:
+    """
+    Memória de um LlamaState: o estado do contexto mais as cópias de input_ids
+    e scores (n_batch × n_vocab float32, ou n_ctx × n_vocab com logits_all).
+    """
+    size = state.llama_state_size
+    for field in ("scores", "input_ids"):
+        array = getattr(state, field, None)
+        if array is not None:
+            size += array.nbytes
+    return size
+
+
+class PrefixStateCache(LlamaRAMCache):
+    """
+    LlamaRAMCache que conta acertos e quantos tokens de prefixo foram poupados.
+    O tamanho considera o estado inteiro (state_size_bytes): o LlamaRAMCache só
+    soma llama_state_size, e os scores salvos a cada completion dominam a memória.
+    """
+
+    def __init__(self, capacity_bytes: int = GENESYS_PROMPT_CACHE_BYTES):
+        super().__init__(capacity_bytes=capacity_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.warm_prefix_tokens = 0
+        self.warm_seconds = 0.0
+
+    @property
+    def cache_size(self) -> int:
+        return sum(state_size_bytes(state) for state in self.cache_state.values())
+
+    def __getitem__(self, key: Sequence[int]):
+        try:
+            state = super().__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        # Tamanho do prefixo em comum entre o estado salvo e o novo prompt
+        saved = state.input_ids.tolist()
+        common = 0
+        for saved_token, token in zip(saved, key):
+            if saved_token != token:
+                break
+            common += 1
+        self.reused_tokens += common
+        return state
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache_state),
+            "size_bytes": self.cache_size,
+            "capacity_bytes": self.capacity_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "reused_tokens": self.reused_tokens,
+            "warm_prefix_tokens": self.warm_prefix_tokens,
+            "warm_seconds": round(self.warm_seconds, 2),
+        }
+
+
+def attach_prompt_cache(llama: Any) -> Optional[PrefixStateCache]:
+    """Instala o cache de prefixos no objeto Llama; None se indisponível ou desativado."""
+    if not PROMPT_CACHE_AVAILABLE or GENESYS_PROMPT_CACHE_BYTES <= 0:
+        return None
+    cache = PrefixStateCache(GENESYS_PROMPT_CACHE_BYTES)
+    llama.set_cache(cache)
+    return cache
+
+
+def warm_prefix(llama: Any, cache: PrefixStateCache, prefix: str) -> int:
+    """
+    Avalia o prefixo uma vez e guarda o estado resultante no cache.
+    Bloqueante: deve rodar na carga do modelo, antes de qualquer requisição.
+    """
+    started = time.monotonic()
+    # Mesma tokenização usada por create_completion (com BOS e tokens especiais)
+    tokens = llama.tokenize(prefix.encode("utf-8"), special=True)
+    llama.reset()
+    llama.eval(tokens)
+    cache[tokens] = llama.save_state()
+    # Vários prefixos podem ser pré-avaliados (preâmbulo cru e turno de sistema do chat)
+    cache.warm_prefix_tokens += len(tokens)
+    cache.warm_seconds += time.monotonic() - started
+    return len(tokens)
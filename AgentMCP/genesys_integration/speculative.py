@@ -0,0 +1,187 @@
+# genesys_integration/speculative.py
+"""
+Decodificação especulativa para o modelo local da Genesys.
+
+Um modelo pequeno (GGUF com o mesmo vocabulário, ex.: Llama 3.2 1B para o
+Llama 3 70B) propõe alguns tokens de forma gulosa; o modelo grande avalia a
+proposta inteira num único batch e aceita o maior prefixo que coincide com o
+que ele mesmo amostraria. A saída é a mesma da decodificação normal; o ganho
+depende da taxa de aceitação, por isso ela é medida aqui.
+
+Configuração:
+    GENESYS_DRAFT_MODEL=<caminho .gguf>   modelo de rascunho
+    GENESYS_DRAFT_MODEL=prompt-lookup      sem segundo modelo: propõe n-gramas
+                                           já presentes no prompt
+    GENESYS_DRAFT_TOKENS=8                 tokens propostos por rodada
+"""
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import numpy as np
+    from llama_cpp import Llama
+    from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+    SPECULATIVE_AVAILABLE = True
+except ImportError:
+    LlamaDraftModel = object
+    SPECULATIVE_AVAILABLE = False
+
+GENESYS_DRAFT_MODEL = os.getenv("GENESYS_DRAFT_MODEL", "").strip()
+GENESYS_DRAFT_TOKENS = int(os.getenv("GENESYS_DRAFT_TOKENS", "8"))
+PROMPT_LOOKUP = "prompt-lookup"
+
+
+class DraftStats:
+    """Contadores de propostas e aceitação, comuns aos dois tipos de rascunho."""
+
+    def __init__(self, kind: str, num_pred_tokens: int):
+        self.kind = kind
+        self.num_pred_tokens = num_pred_tokens
+        self.rounds = 0
+        self.proposed = 0
+        self.verified = 0  # Propostas cujo resultado já foi observado
+        self.accepted = 0
+        self.draft_seconds = 0.0
+        self._last_base: Optional[int] = None
+        self._last_anchor: Optional[int] = None
+        self._last_proposal: Any = None
+
+    def observe(self, input_ids: Any) -> None:
+        """
+        Conta quantos tokens da proposta anterior o modelo grande aceitou.
+        Após a verificação, o contexto seguinte contém o prefixo aceito da
+        proposta logo depois do ponto em que ela foi feita.
+        """
+        if self._last_proposal is None or not len(self._last_proposal):
+            return
+        base = self._last_base
+        # Mesma sequência? (a próxima requisição começa outro contexto)
+        if len(input_ids) > base and input_ids[base - 1] == self._last_anchor:
+            actual = input_ids[base : base + len(self._last_proposal)]
+            accepted = 0
+            for proposed_token, actual_token in zip(self._last_proposal, actual):
+                if proposed_token != actual_token:
+                    break
+                accepted += 1
+            self.verified += len(self._last_proposal)
+            self.accepted += accepted
+        self._last_proposal = None
+
+    def record(self, input_ids: Any, proposal: Any, seconds: float) -> None:
+        self.rounds += 1
+        self.proposed += len(proposal)
+        self.draft_seconds += seconds
+        self._last_base = len(input_ids)
+        self._last_anchor = input_ids[-1] if len(input_ids) else None
+        self._last_proposal = proposal
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "num_pred_tokens": self.num_pred_tokens,
+            "rounds": self.rounds,
+            "proposed_tokens": self.proposed,
+            "accepted_tokens": self.accepted,
+            "acceptance_rate": (
+                round(self.accepted / self.verified, 4) if self.verified else 0.0
+            ),
+            "draft_seconds": round(self.draft_seconds, 2),
+        }
+
+
+class GGUFDraftModel(LlamaDraftModel):
+    """Rascunho gerado por um GGUF pequeno, com decodificação gulosa."""
+
+    def __init__(
+        self,
+        model_path: str,
+        n_ctx: int,
+        num_pred_tokens: int = GENESYS_DRAFT_TOKENS,
+        n_threads: Optional[int] = None,
+        n_batch: int = 512,
+    ):
+        self.model_path = model_path
+        self.num_pred_tokens = num_pred_tokens
+        # Mesmo n_ctx do modelo grande: o rascunho recebe o contexto inteiro
+        self.llama = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            n_batch=n_batch,
+            verbose=False,
+        )
+        self.stats = DraftStats("model", num_pred_tokens)
+
+    def n_vocab(self) -> int:
+        return self.llama.n_vocab()
+
+    def __call__(self, input_ids: Any, /, **kwargs: Any) -> Any:
+        self.stats.observe(input_ids)
+        started = time.monotonic()
+        proposal = []
+        # generate reaproveita o KV do rascunho pelo maior prefixo em comum,
+        # então cada rodada só avalia os tokens novos
+        for token in self.llama.generate(input_ids.tolist(), top_k=1, temp=0.0):
+            proposal.append(token)
+            if len(proposal) >= self.num_pred_tokens:
+                break
+        proposal = np.array(proposal, dtype=np.intc)
+        self.stats.record(input_ids, proposal, time.monotonic() - started)
+        return proposal
+
+
+class PromptLookupDraftModel(LlamaDraftModel):
+    """LlamaPromptLookupDecoding com as mesmas métricas de aceitação."""
+
+    def __init__(self, num_pred_tokens: int = GENESYS_DRAFT_TOKENS):
+        self._lookup = LlamaPromptLookupDecoding(num_pred_tokens=num_pred_tokens)
+        self.stats = DraftStats(PROMPT_LOOKUP, num_pred_tokens)
+
+    def __call__(self, input_ids: Any, /, **kwargs: Any) -> Any:
+        self.stats.observe(input_ids)
+        started = time.monotonic()
+        proposal = self._lookup(input_ids)
+        self.stats.record(input_ids, proposal, time.monotonic() - started)
+        return proposal
+
+
+def gguf_vocab_size(model_path: str) -> int:
+    """Tamanho do vocabulário de um GGUF, lendo só o vocabulário (sem os pesos)."""
+    llama = Llama(model_path=model_path, vocab_only=True, verbose=False)
+    try:
+        return llama.n_vocab()
+    finally:
+        llama.close()
+
+
+def build_draft_model(
+    n_ctx: int,
+    n_threads: Optional[int] = None,
+    draft: str = GENESYS_DRAFT_MODEL,
+    num_pred_tokens: int = GENESYS_DRAFT_TOKENS,
+    target_model_path: Optional[str] = None,
+) -> Optional[LlamaDraftModel]:
+    """
+    Cria o modelo de rascunho configurado; None quando desativado.
+    Com target_model_path, confere antes de carregar qualquer peso se o
+    rascunho tem o mesmo vocabulário do modelo grande (outro tokenizer só
+    produziria propostas rejeitadas) e levanta ValueError se não tiver.
+    """
+    if not draft or not SPECULATIVE_AVAILABLE:
+        return None
+    if draft == PROMPT_LOOKUP:
+        return PromptLookupDraftModel(num_pred_tokens)
+    if not os.path.exists(draft):
+        raise FileNotFoundError(f"Modelo de rascunho não encontrado: {draft}")
+    if target_model_path is not None:
+        draft_vocab = gguf_vocab_size(draft)
+        target_vocab = gguf_vocab_size(target_model_path)
+        if draft_vocab != target_vocab:
+            raise ValueError(
+                f"vocabulário do rascunho ({draft_vocab} tokens) difere do modelo "
+                f"({target_vocab} tokens)"
+            )
+    return GGUFDraftModel(draft, n_ctx, num_pred_tokens, n_threads=n_threads)
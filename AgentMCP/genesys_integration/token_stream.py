@@ -0,0 +1,74 @@
+# genesys_integration/token_stream.py
+"""
+Ponte entre geradores síncronos de tokens (llama.cpp) e o event loop.
+
+O decode roda inteiro numa thread de trabalho; cada token é entregue ao loop
+por um canal assíncrono limitado. Quando o consumidor atrasa, o canal enche e a
+thread espera (backpressure); quando o consumidor desiste (cliente desconectou),
+a thread para no próximo token.
+"""
+
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable
+
+import anyio
+import anyio.from_thread
+import anyio.to_thread
+from anyio.streams.memory import MemoryObjectReceiveStream
+
+GENESYS_STREAM_BUFFER = int(os.getenv("GENESYS_STREAM_BUFFER", "64"))
+
+
+@asynccontextmanager
+async def open_token_stream(
+    iterator_factory: Callable[..., Iterable[Any]],
+    *args: Any,
+    buffer_size: int = GENESYS_STREAM_BUFFER,
+) -> AsyncIterator[MemoryObjectReceiveStream]:
+    """
+    Executa iterator_factory(*args) numa thread e entrega os itens ao loop.
+    Exceções do gerador são relançadas no consumidor ao sair do bloco.
+
+    Uso:
+        async with open_token_stream(llm.stream, prompt) as tokens:
+            async for token in tokens:
+                ...
+    """
+    send_stream, receive_stream = anyio.create_memory_object_stream(
+        max(1, buffer_size)
+    )
+    stop = threading.Event()
+
+    def _decode() -> None:
+        for item in iterator_factory(*args):
+            if stop.is_set():
+                return
+            try:
+                # Bloqueia esta thread (não o loop) enquanto o canal estiver cheio
+                anyio.from_thread.run(send_stream.send, item)
+            except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+                return  # Consumidor parou de ler
+
+    decode_errors = []
+
+    async def _run_decoder() -> None:
+        async with send_stream:
+            try:
+                await anyio.to_thread.run_sync(_decode)
+            except Exception as e:
+                # Relançado fora do task group, sem o ExceptionGroup em volta
+                decode_errors.append(e)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(_run_decoder)
+        try:
+            async with receive_stream:
+                yield receive_stream
+        finally:
+            # A thread não pode ser interrompida no meio de um token; ela vê o
+            # sinal (ou o canal fechado) no próximo e termina sozinha.
+            stop.set()
+    if decode_errors:
+        raise decode_errors[0]